@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+File Manager Benchmark
+Generates a synthetic video archive of sparse MP4 files and times the
+controller's file maintenance cycle over it, on tmpfs and on disk, counting
+filesystem calls and peak memory.
+"""
+
+import os
+import sys
+import json
+import shutil
+import struct
+import random
+import logging
+import argparse
+import builtins
+import resource
+import tempfile
+import time
+import multiprocessing
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path so we can import mobius package
+sys.path.append(str(Path(__file__).parent.parent))
+
+from mobius.config import settings
+from mobius.core.clock import VirtualClock
+from mobius.services.mp4 import MP4_EPOCH_OFFSET
+
+# Filesystem calls counted during a cycle; each is one system call, except
+# scandir, which reads a directory in batches of entries
+COUNTED_CALLS = ('stat', 'lstat', 'fstat', 'scandir', 'listdir', 'remove', 'unlink', 'rename', 'replace')
+
+# Clips end here; the maintenance cycle runs at this time
+END_TIME = datetime(2024, 6, 30, 23, 0)
+
+
+def _box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def mp4_header(created, duration, timescale=1000):
+    """ftyp and moov boxes of a clip with the given creation time and duration
+
+    Returns:
+        bytes: Header, to be followed by an mdat box covering the rest of the file
+    """
+    mvhd = struct.pack('>I4I', 0, created + MP4_EPOCH_OFFSET, created + MP4_EPOCH_OFFSET, timescale,
+                       int(duration * timescale)) + bytes(80)
+    return _box(b'ftyp', b'isom\0\0\2\0isomiso2mp41') + _box(b'moov', _box(b'mvhd', mvhd))
+
+
+def generate(directory, args):
+    """Create the synthetic archive
+
+    Clips are named like the camera's (xx-YYYYMMDDHHMMSS.mp4) and spread
+    over the last args.days days. Each is a sparse file of a realistic
+    size whose MP4 header is real, so the clip is parsed as the camera's
+    would be; a fraction has no movie header, as if still recording.
+
+    Returns:
+        dict: Clip count and apparent and allocated bytes
+    """
+    rng = random.Random(args.seed)
+    start = END_TIME - timedelta(days=args.days)
+    span = (END_TIME - start).total_seconds()
+    apparent = 0
+    for index in range(args.clips):
+        created = start + timedelta(seconds=rng.uniform(0, span))
+        duration = rng.uniform(2, 60)
+        # Roughly log-normal sizes around a 4 Mbit/s stream, with some near-still scenes
+        bitrate = rng.lognormvariate(15.2, 0.6)
+        size = max(64 * 1024, int(bitrate * duration / 8))
+        name = '{:02d}-{}.mp4'.format(index % 4 + 1, created.strftime('%Y%m%d%H%M%S'))
+        path = os.path.join(directory, name)
+        timestamp = int(time.mktime(created.timetuple()))
+
+        header = b''
+        if rng.random() >= args.unparsed_fraction:
+            header = mp4_header(timestamp, duration)
+        mdat = size - len(header)
+        with open(path, 'wb') as f:
+            f.write(header)
+            f.write(struct.pack('>I4s', mdat, b'mdat'))
+            # Only the headers take space; the media data is a hole
+            f.truncate(size)
+        os.utime(path, (timestamp + duration, timestamp + duration))
+        apparent += size
+
+    allocated = sum(entry.stat().st_blocks * 512 for entry in os.scandir(directory))
+    return {'clips': args.clips, 'apparent_bytes': apparent, 'allocated_bytes': allocated}
+
+
+class CallCounter:
+    """Counts calls to os filesystem functions and builtin open while active"""
+
+    def __init__(self):
+        self.counts = {}
+        self._originals = {}
+
+    def _wrap(self, module, name):
+        original = getattr(module, name)
+        self._originals[(module, name)] = original
+        key = 'open' if module is builtins else name
+
+        def counted(*args, **kwargs):
+            self.counts[key] = self.counts.get(key, 0) + 1
+            return original(*args, **kwargs)
+        setattr(module, name, counted)
+
+    def __enter__(self):
+        for name in COUNTED_CALLS:
+            self._wrap(os, name)
+        self._wrap(builtins, 'open')
+        return self
+
+    def __exit__(self, *exc_info):
+        for (module, name), original in self._originals.items():
+            setattr(module, name, original)
+        self._originals = {}
+
+    def take(self):
+        counts, self.counts = self.counts, {}
+        return counts
+
+
+def run_cycle(directory, index_path, drop_caches):
+    """One file maintenance cycle as the controller runs it, in a fresh process
+
+    Returns:
+        dict: Seconds, filesystem calls and peak RSS of each step
+    """
+    logging.basicConfig(level=logging.CRITICAL)
+    settings.DATA_DIR = directory
+    settings.VIDEO_INDEX_FILE = index_path
+    settings.ARCHIVE_DIR = ''
+    from mobius.services.file_manager import FileManager
+
+    if drop_caches:
+        os.sync()
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    clock = VirtualClock(start=END_TIME)
+    manager = FileManager(clock=clock)
+    steps = [
+        ('get_mp4s', manager.get_mp4s),
+        ('get_total_size', lambda: manager.get_total_size(clock.now() - timedelta(days=1), clock.now())),
+        ('clean_videos', lambda: manager.clean_videos(
+            min_hour=settings.VIDEO_CLEAN_MIN_HOUR,
+            max_hour=settings.VIDEO_CLEAN_MAX_HOUR,
+            max_size=settings.VIDEO_CLEAN_MAX_SIZE)),
+    ]
+    results = {'steps': {}}
+    with CallCounter() as counter:
+        for name, step in steps:
+            start = time.perf_counter()
+            step()
+            elapsed = time.perf_counter() - start
+            results['steps'][name] = {'seconds': elapsed, 'calls': counter.take()}
+    results['seconds'] = sum(step['seconds'] for step in results['steps'].values())
+    results['index'] = manager.video_index.stats()
+    results['remaining'] = len(manager.get_mp4s())
+    results['base_rss_kb'] = base_rss
+    results['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return results
+
+
+def run_target(name, root, args):
+    """Generate an archive under root and run the maintenance cycles on it"""
+    directory = tempfile.mkdtemp(prefix='mobius-bench-', dir=root)
+    try:
+        videos = os.path.join(directory, 'videos')
+        os.mkdir(videos)
+        start = time.perf_counter()
+        archive = generate(videos, args)
+        archive['generate_seconds'] = time.perf_counter() - start
+
+        # Each cycle runs in a new process so peak RSS is its own; the first
+        # parses every clip, later ones reuse the saved video index
+        context = multiprocessing.get_context('spawn')
+        cycles = []
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            for _ in range(args.cycles):
+                cycles.append(pool.apply(run_cycle, (videos, os.path.join(directory, 'video_index.json'),
+                                                     args.drop_caches)))
+        return {'target': name, 'path': root, 'archive': archive, 'cycles': cycles}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def run(args):
+    """Run the benchmark and return the results dictionary"""
+    roots = {'tmpfs': args.tmpfs_dir, 'disk': args.disk_dir}
+    results = {'clips': args.clips, 'days': args.days, 'targets': []}
+    for name in args.targets.split(','):
+        root = roots[name]
+        if not os.path.isdir(root):
+            logging.warning("Skipping {name}: {root} does not exist".format(name=name, root=root))
+            continue
+        results['targets'].append(run_target(name, root, args))
+    return results
+
+
+def print_report(results):
+    """Print a human-readable benchmark report"""
+    print("{clips} clips over {days} days".format(**results))
+    for target in results['targets']:
+        archive = target['archive']
+        print("\n{target} ({path}): {apparent:.1f} GB apparent, {allocated:.1f} MB allocated, "
+              "generated in {generate_seconds:.1f} s".format(
+                  target=target['target'], path=target['path'], apparent=archive['apparent_bytes'] / 1e9,
+                  allocated=archive['allocated_bytes'] / 1e6, generate_seconds=archive['generate_seconds']))
+        for number, cycle in enumerate(target['cycles'], 1):
+            print("  cycle {number}: {seconds:.2f} s, peak RSS {peak:.1f} MB (+{growth:.1f} MB), "
+                  "{remaining} clips left, index {index}".format(
+                      number=number, seconds=cycle['seconds'], peak=cycle['peak_rss_kb'] / 1024.0,
+                      growth=(cycle['peak_rss_kb'] - cycle['base_rss_kb']) / 1024.0,
+                      remaining=cycle['remaining'], index=cycle['index']))
+            for name, step in cycle['steps'].items():
+                calls = ', '.join('{}={}'.format(call, count) for call, count in sorted(step['calls'].items()))
+                print("    {name:15s} {ms:9.1f} ms  {calls}".format(name=name, ms=step['seconds'] * 1000,
+                                                                     calls=calls or '-'))
+
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Time FileManager maintenance over a synthetic video archive')
+    parser.add_argument('--clips', type=int, default=20000, help='Number of synthetic clips')
+    parser.add_argument('--days', type=int, default=30, help='Days the clips are spread over')
+    parser.add_argument('--unparsed-fraction', type=float, default=0.05,
+                        help='Fraction of clips without a movie header')
+    parser.add_argument('--cycles', type=int, default=2, help='Maintenance cycles to run on each archive')
+    parser.add_argument('--targets', default='tmpfs,disk', help='Comma-separated targets: tmpfs, disk')
+    parser.add_argument('--tmpfs-dir', default='/dev/shm', help='Directory on tmpfs')
+    parser.add_argument('--disk-dir', default=tempfile.gettempdir(), help='Directory on disk')
+    parser.add_argument('--drop-caches', action='store_true',
+                        help='Drop the page cache before each cycle (needs root)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
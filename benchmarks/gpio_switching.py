@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+GPIO Switching Benchmark
+Compares per-pin and bulk relay switching on the gpiochip backend, against
+the mock chip (with a modelled ioctl cost) or a real /dev/gpiochip* node.
+"""
+
+import sys
+import json
+import random
+import logging
+import argparse
+import time
+from pathlib import Path
+
+# Add parent directory to path so we can import mobius package
+sys.path.append(str(Path(__file__).parent.parent))
+
+from mobius.config import settings
+from mobius.hardware.drivers.gpiochip import ChipDevice, GpioChip, MockChipDevice
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(durations):
+    """Latency summary in microseconds"""
+    values = sorted(d * 1e6 for d in durations)
+    return {
+        'count': len(values),
+        'p50_us': percentile(values, 0.50),
+        'p95_us': percentile(values, 0.95),
+        'p99_us': percentile(values, 0.99),
+        'max_us': values[-1] if values else 0.0,
+    }
+
+
+def switch(chip, pins, vectors, bulk):
+    """Apply each state vector, one output call per pin or one for all pins
+
+    Returns:
+        list: Seconds taken by each vector
+    """
+    durations = []
+    for values in vectors:
+        start = time.perf_counter()
+        if bulk:
+            chip.output(pins, values)
+        else:
+            for pin, value in zip(pins, values):
+                chip.output(pin, value)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def run(args):
+    """Run the benchmark and return the results dictionary"""
+    pins = sorted(pin for pin in settings.DEVICE_PINS.values() if not isinstance(pin, list))
+    rng = random.Random(args.seed)
+    vectors = [[rng.randint(0, 1) for _ in pins] for _ in range(args.vectors)]
+
+    if args.chip:
+        device = ChipDevice()
+        path = args.chip
+    else:
+        device = MockChipDevice(latency=args.syscall_latency)
+        path = 'mock'
+
+    results = {'chip': path, 'pins': len(pins), 'vectors': args.vectors, 'modes': {}}
+    for mode, bulk in (('per_pin', False), ('bulk', True)):
+        chip = GpioChip(path, device=device, consumer='mobius-bench')
+        try:
+            chip.setup(pins, chip.OUT, initial=chip.HIGH)
+            writes = chip.write_count
+            durations = switch(chip, pins, vectors, bulk)
+            summary = summarize(durations)
+            summary['ioctls_per_vector'] = (chip.write_count - writes) / float(len(vectors))
+            results['modes'][mode] = summary
+        finally:
+            chip.cleanup()
+
+    per_pin, bulk = results['modes']['per_pin'], results['modes']['bulk']
+    results['speedup_p50'] = per_pin['p50_us'] / bulk['p50_us'] if bulk['p50_us'] else 0.0
+    return results
+
+
+def print_report(results):
+    """Print a human-readable benchmark report"""
+    print("Chip: {chip}, {pins} relay pins, {vectors} state vectors".format(**results))
+    for mode, summary in results['modes'].items():
+        print("{mode:8s} ioctls/vector={ioctls_per_vector:<5g} p50={p50_us:.1f} us  p95={p95_us:.1f} us  "
+              "p99={p99_us:.1f} us  max={max_us:.1f} us".format(mode=mode, **summary))
+    print("Bulk speedup (p50): {speedup_p50:.1f}x".format(**results))
+
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Compare per-pin and bulk gpiochip relay switching')
+    parser.add_argument('--vectors', type=int, default=2000, help='Random relay state vectors to apply')
+    parser.add_argument('--chip', default='', help='Real gpiochip node to use (e.g. /dev/gpiochip0) '
+                        'instead of the mock; the DEVICE_PINS lines will be driven')
+    parser.add_argument('--syscall-latency', type=float, default=0.0,
+                        help='Seconds each mock ioctl takes')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the state vectors')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.CRITICAL)
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Sample Pipeline Benchmark
+Measures the time and memory allocated per tick as readings flow from the
+sensor manager through the sampler, alerts, compression, dashboard series,
+live state and InfluxDB point formatting, against simulated hardware.
+"""
+
+import sys
+import json
+import logging
+import argparse
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path so we can import mobius package
+sys.path.append(str(Path(__file__).parent.parent))
+
+from mobius.config import settings
+from mobius.core.clock import VirtualClock
+from mobius.core.controller import VivController
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(durations):
+    """Latency summary in microseconds"""
+    values = sorted(d * 1e6 for d in durations)
+    return {
+        'count': len(values),
+        'p50_us': percentile(values, 0.50),
+        'p95_us': percentile(values, 0.95),
+        'p99_us': percentile(values, 0.99),
+        'max_us': values[-1] if values else 0.0,
+    }
+
+
+def make_controller(args, directory):
+    """Controller on simulated hardware with every pipeline stage enabled"""
+    settings.ADAPTIVE_SAMPLING = not args.no_sampler
+    settings.SAMPLE_MAX_AGE = dict(settings.SAMPLE_MAX_AGE, telemetry=0)
+    settings.LIVE_STATE_PATH = str(Path(directory) / 'live')
+    settings.DASHBOARD_DIR = directory
+    clock = VirtualClock(start=datetime(2024, 6, 1, 12))
+    enclosures = {'enclosure{}'.format(index): {} for index in range(args.enclosures)}
+    return VivController(simulate=True, clock=clock, enclosures=enclosures)
+
+
+def stage_read(controller, readings):
+    for name, enclosure in controller.enclosures.items():
+        readings[name] = enclosure.read_sensors()
+
+
+def stage_alerts(controller, readings):
+    for name, data in readings.items():
+        controller.alerts.observe(name, data)
+
+
+def stage_points(controller, readings):
+    controller.make_sensor_points(readings)
+
+
+def stage_dashboard(controller, readings):
+    if any(readings.values()):
+        now = controller.clock.now().timestamp()
+        for name, data in readings.items():
+            controller.dashboard.observe(name, data, now)
+
+
+def stage_live(controller, readings):
+    if any(readings.values()):
+        controller.publish_live_state(readings)
+
+
+# The steps of the controller's sensor task, in order
+STAGES = (('read', stage_read), ('alerts', stage_alerts), ('points', stage_points), ('dashboard', stage_dashboard),
+          ('live', stage_live))
+
+
+def tick(controller, readings, timings=None, peaks=None):
+    """One sensor task, timing each stage or tracing its peak allocation"""
+    for name, stage in STAGES:
+        if peaks is not None:
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            stage(controller, readings)
+            peaks[name].append(tracemalloc.get_traced_memory()[1] - current)
+        elif timings is not None:
+            start = time.perf_counter()
+            stage(controller, readings)
+            timings[name].append(time.perf_counter() - start)
+        else:
+            stage(controller, readings)
+
+
+def run(args):
+    """Run the benchmark and return the results dictionary"""
+    with tempfile.TemporaryDirectory() as directory:
+        controller = make_controller(args, directory)
+        readings = {}
+        try:
+            # Warm up caches, compressors and alert history
+            for _ in range(args.warmup):
+                controller.clock.advance(args.step)
+                tick(controller, readings)
+
+            timings = {name: [] for name, _ in STAGES}
+            for _ in range(args.ticks):
+                controller.clock.advance(args.step)
+                tick(controller, readings, timings=timings)
+
+            # Memory is traced in a separate pass, as tracing slows every allocation down
+            peaks = {name: [] for name, _ in STAGES}
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            for _ in range(args.ticks):
+                controller.clock.advance(args.step)
+                tick(controller, readings, peaks=peaks)
+            # Memory still held by the pipeline's own code after the run
+            pipeline = [tracemalloc.Filter(True, str(Path(__file__).parent.parent / 'mobius' / '*'))]
+            growth = tracemalloc.take_snapshot().filter_traces(pipeline).compare_to(
+                before.filter_traces(pipeline), 'filename')
+            retained = sum(stat.size_diff for stat in growth)
+            tracemalloc.stop()
+        finally:
+            controller.live_state.close()
+
+    stages = {}
+    for name, _ in STAGES:
+        values = sorted(peaks[name])
+        stages[name] = summarize(timings[name])
+        stages[name]['alloc_bytes_p50'] = percentile(values, 0.50)
+        stages[name]['alloc_bytes_max'] = values[-1] if values else 0
+    totals = [sum(values) for values in zip(*timings.values())]
+    last_readings = list(controller.enclosures.values())[0].last_readings
+    return {
+        'enclosures': args.enclosures,
+        'sampler': not args.no_sampler,
+        'ticks': args.ticks,
+        'fields': sum(len(enclosure.sensor_manager.fields) for enclosure in controller.enclosures.values()),
+        'tick': summarize(totals),
+        'stages': stages,
+        'retained_bytes': retained,
+        'readings_type': type(last_readings).__name__,
+        'readings_bytes': sys.getsizeof(last_readings),
+    }
+
+
+def print_report(results):
+    """Print a human-readable benchmark report"""
+    print("{enclosures} enclosure(s), {fields} fields, sampler={sampler}, {ticks} ticks".format(**results))
+    print("Tick: p50={p50_us:.1f} us  p95={p95_us:.1f} us  p99={p99_us:.1f} us  max={max_us:.1f} us".format(
+        **results['tick']))
+    for name, stage in results['stages'].items():
+        print("  {name:9s} p50={p50_us:.1f} us  p99={p99_us:.1f} us  allocated p50={alloc_bytes_p50} B  "
+              "max={alloc_bytes_max} B".format(name=name, **stage))
+    print("Retained by the pipeline after {ticks} ticks: {retained_bytes} B".format(**results))
+    print("Readings held as {readings_type} ({readings_bytes} B)".format(**results))
+
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Measure per-tick cost of the sensor sample pipeline')
+    parser.add_argument('--ticks', type=int, default=2000, help='Measured sensor ticks')
+    parser.add_argument('--warmup', type=int, default=200, help='Ticks run before measuring')
+    parser.add_argument('--step', type=float, default=2.0, help='Simulated seconds between ticks')
+    parser.add_argument('--enclosures', type=int, default=1, help='Number of simulated enclosures')
+    parser.add_argument('--no-sampler', action='store_true', help='Read every channel each tick')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.CRITICAL)
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
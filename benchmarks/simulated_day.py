@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Simulated Day Benchmark
+Runs the full controller against simulated hardware and a fake InfluxDB server
+for a day of accelerated time, reporting throughput, latency and memory use.
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path so we can import mobius package
+sys.path.append(str(Path(__file__).parent.parent))
+
+from mobius.config import settings
+from mobius.core.clock import VirtualClock
+from mobius.core.controller import VivController
+from mobius.hardware.relay import RelayManager
+from mobius.hardware.sensor import SensorManager
+from mobius.hardware.simulation import SimulatedHardware
+from mobius.services.alerts import AlertDispatcher, AlertEngine
+from mobius.services.fake_influx import FakeInfluxServer
+from mobius.services.file_manager import FileManager
+from mobius.services.influx_client import InfluxClient
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(durations):
+    """Latency summary in milliseconds"""
+    values = sorted(d * 1000 for d in durations)
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 0.50),
+        'p95_ms': percentile(values, 0.95),
+        'p99_ms': percentile(values, 0.99),
+        'max_ms': values[-1] if values else 0.0,
+    }
+
+
+def run(args):
+    """Run the benchmark and return the results dictionary"""
+    clock = VirtualClock(start=datetime(2024, 6, 1))
+    end_time = clock.now() + timedelta(hours=args.hours)
+
+    hardware = SimulatedHardware(
+        now=clock.now,
+        seed=args.seed,
+        dht_latency=args.dht_latency,
+        dht_failure_rate=args.dht_failure_rate,
+        onewire_latency=args.onewire_latency,
+        crc_failure_rate=args.crc_failure_rate,
+        gpio_failure_rate=0.0
+    )
+
+    with FakeInfluxServer(latency=args.influx_latency, failure_rate=args.influx_failure_rate,
+                          seed=args.seed) as server, tempfile.TemporaryDirectory() as data_dir:
+        influx_client = InfluxClient(credentials=server.credentials)
+        relay_manager = RelayManager(gpio=hardware.gpio, influx_client=influx_client, clock=clock)
+        hardware.gpio.failure_rate = args.gpio_failure_rate
+        file_manager = FileManager(clock=clock)
+        file_manager.source_path = data_dir
+        # Keep the run's outputs away from a live controller's
+        settings.LIVE_STATE_PATH = os.path.join(data_dir, 'live')
+        settings.DASHBOARD_DIR = data_dir
+
+        controller = VivController(
+            clock=clock,
+            influx_client=influx_client,
+            sensor_manager=SensorManager(dht=hardware.dht, onewire=hardware.onewire, clock=clock),
+            relay_manager=relay_manager,
+            file_manager=file_manager,
+            alert_engine=AlertEngine(dispatcher=AlertDispatcher(notifiers=[]), clock=clock)
+        )
+
+        tick_durations = []
+        control_durations = []
+        temperatures = []
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        while clock.now() < end_time:
+            tick_start = time.perf_counter()
+            ran = controller.tick(clock.now())
+            elapsed = time.perf_counter() - tick_start
+
+            tick_durations.append(elapsed)
+            if 'relays' in ran:
+                control_durations.append(elapsed)
+                temperatures.append(hardware.environment.temperature)
+            clock.advance(args.tick)
+        wall_time = time.perf_counter() - started
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'simulated_hours': args.hours,
+            'ticks': len(tick_durations),
+            'wall_seconds': wall_time,
+            'ticks_per_second': len(tick_durations) / wall_time if wall_time else 0.0,
+            'speedup': args.hours * 3600 / wall_time if wall_time else 0.0,
+            'tick_latency': summarize(tick_durations),
+            'control_latency': summarize(control_durations),
+            'peak_traced_kb': peak_traced / 1024,
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'temperature_min': min(temperatures) if temperatures else None,
+            'temperature_max': max(temperatures) if temperatures else None,
+            'hardware': hardware.stats(),
+            'influx_requests': server.request_count,
+            'influx_points': server.point_count,
+            'alerts': controller.alerts.notification_count,
+            'energy_wh': {
+                device: usage['energy_wh']
+                for device, usage in relay_manager.usage.totals(clock.now()).items() if usage['on_seconds']
+            },
+            'compression': {
+                field: channel['ratio']
+                for enclosure in controller.enclosures.values() if enclosure.compressor is not None
+                for field, channel in sorted(enclosure.compressor.stats().items())
+            },
+        }
+
+
+def print_report(results):
+    """Print a human-readable benchmark report"""
+    print("Simulated {simulated_hours:g} h in {wall_seconds:.2f} s ({speedup:.0f}x real time)".format(**results))
+    print("Ticks: {ticks} ({ticks_per_second:.0f} ticks/s)".format(**results))
+    for name in ('tick_latency', 'control_latency'):
+        print("{name:16s} n={count:<6d} p50={p50_ms:.3f} ms  p95={p95_ms:.3f} ms  "
+              "p99={p99_ms:.3f} ms  max={max_ms:.3f} ms".format(name=name, **results[name]))
+    print("Memory: peak traced {peak_traced_kb:.0f} KB, max RSS {max_rss_kb} KB".format(**results))
+    if results['temperature_min'] is not None:
+        print("Enclosure temperature: {temperature_min:.1f} - {temperature_max:.1f} C".format(**results))
+    print("Hardware: {}".format(', '.join('{}={}'.format(k, v) for k, v in sorted(results['hardware'].items()))))
+    print("InfluxDB: {influx_requests} requests, {influx_points} points".format(**results))
+    print("Alerts: {alerts} notifications".format(**results))
+    if results['energy_wh']:
+        print("Relay energy: {}".format(', '.join(
+            '{}={:.0f} Wh'.format(device, wh) for device, wh in sorted(results['energy_wh'].items()))))
+    if results['compression']:
+        print("Compression: {}".format(', '.join(
+            '{}={:.1f}x'.format(field, ratio) for field, ratio in results['compression'].items())))
+
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Run a simulated vivarium day in accelerated time')
+    parser.add_argument('--hours', type=float, default=24, help='Simulated hours to run')
+    parser.add_argument('--tick', type=float, default=1.0, help='Simulated seconds per controller tick')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for noise and failures')
+    parser.add_argument('--dht-latency', type=float, default=0.0, help='Seconds per DHT read attempt')
+    parser.add_argument('--dht-failure-rate', type=float, default=0.0, help='Probability of DHT timeouts')
+    parser.add_argument('--onewire-latency', type=float, default=0.0, help='Seconds per one-wire read')
+    parser.add_argument('--crc-failure-rate', type=float, default=0.0, help='Probability of w1 CRC failures')
+    parser.add_argument('--gpio-failure-rate', type=float, default=0.0, help='Probability of GPIO errors')
+    parser.add_argument('--influx-latency', type=float, default=0.0, help='Seconds per InfluxDB request')
+    parser.add_argument('--influx-failure-rate', type=float, default=0.0, help='Probability of InfluxDB errors')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.CRITICAL)
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
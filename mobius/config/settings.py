@@ -9,12 +9,31 @@ from pathlib import Path
 # Base directories
 BASE_DIR = Path(__file__).parent.parent.parent
 DATA_DIR = os.environ.get('MOBIUS_DATA_DIR', '/var/www/html/Mobius_Website/images/')
+STATE_DIR = os.environ.get('MOBIUS_STATE_DIR', os.path.expanduser('~/.mobius'))  # Caches and checkpoints
 
 # System timing intervals (seconds)
 SENSOR_READ_INTERVAL = 10       # How often to read and log sensor data
 RELAY_CHECK_INTERVAL = 30       # How often to update relay states
 FILE_MAINTENANCE_INTERVAL = 3600  # How often to perform file maintenance (1 hour)
 
+# Adaptive sampling: each sensor channel is read on its own interval, starting at
+# SENSOR_READ_INTERVAL, faster while its signal changes or is away from the target
+ADAPTIVE_SAMPLING = True
+SAMPLING_MIN_INTERVAL = 2       # Shortest interval between reads of a channel (seconds)
+SAMPLING_MAX_INTERVAL = 60      # Longest interval between reads of a channel (seconds)
+SAMPLING_TEMP_STEP = 0.2        # Read about once per this smoothed change in temperature (C)
+SAMPLING_HUMIDITY_STEP = 1.0    # Read about once per this smoothed change in humidity (%)
+SAMPLING_TARGET_BAND = 1.0      # Distance from the thermostat target treated as settled (C)
+SAMPLING_BACKOFF = 1.5          # Interval growth per read while a channel is flat
+SAMPLING_SMOOTHING = 0.3        # Weight of each new read in the smoothed value used for rates
+
+# Oldest cached sensor sample each consumer accepts before the sensor is read again (seconds)
+SAMPLE_MAX_AGE = {
+    'telemetry': 1,             # Sampled channels; reuses a read made earlier in the same tick
+    'thermostat': SENSOR_READ_INTERVAL,  # No staler than the fixed-interval readings it replaced
+    'status': 300,
+}
+
 # Time-based device settings
 # Format: {condition_name: {'on': (start_hour, end_hour), 'devices': [device_names]}}
 TIME_SETTINGS = {
@@ -53,20 +72,186 @@ DEVICE_PINS = {
     'lowvolt_relay4': 21,
 }
 
+# Relay states applied on shutdown and cleanup (True = ON); unlisted devices go OFF
+RELAY_SAFE_STATES = {device: False for device in DEVICE_PINS}
+
+# Power drawn by each device when on (watts), for energy estimates; unlisted devices count as 0
+DEVICE_WATTAGE = {
+    'lamp': 100,
+    'heatpad_backwall': 25,
+    'heatpad_underlog': 15,
+    'led_lights': 10,
+    'fountain': 5,
+}
+
+# Relay usage rollups: on-time, switches, duty cycle and energy per device.
+# Buckets kept per period, and the periods written to InfluxDB as they close.
+RELAY_USAGE_RETENTION = {'minute': 60, 'hour': 48, 'day': 31}
+RELAY_USAGE_EMIT = ('hour', 'day')
+
 # DHT sensor configuration
 DHT_PINS = [4, 17, 27, 22]      # GPIO pins for DHT sensors
 DHT_JITTER = 0.08               # Amount of jitter to add to DHT readings
+DHT_MIN_INTERVAL = 2.0          # Shortest time between reads of one DHT sensor (seconds)
+DHT_MAX_BACKOFF = 60            # Longest delay before retrying a failing DHT sensor (seconds)
+DHT_MAX_AGE = 120               # Oldest cached DHT value still reported (seconds)
 
 # One-wire temperature sensor configuration
 ONEWIRE_BASE_DIR = '/sys/bus/w1/devices/'
 ONEWIRE_DEVICE_PREFIX = '28*'
+ONEWIRE_RETRY_DELAY = 0.2       # Delay between one-wire CRC retries (seconds)
+
+# GPIO backend for relays: 'rpi' (RPi.GPIO) or 'gpiochip' (Linux GPIO character
+# device, which writes every relay in one ioctl). Falls back to simulated GPIO.
+GPIO_BACKEND = os.environ.get('MOBIUS_GPIO_BACKEND', 'rpi')
+GPIO_CHIP = '/dev/gpiochip0'
+
+# Relay switching
+RELAY_SETTLE_DELAY = 0.1        # Delay after switching a relay (seconds)
+
+# Enclosures driven by this controller, each with its own sensors, relays,
+# schedules and Influx tags. Missing keys fall back to the globals above.
+# Format: {name: {'run': run_tag, 'device_pins': {...}, 'dht_pins': [...],
+#                 'dht_sensors': [sensor_ids], 'onewire_device': glob,
+#                 'time_settings': {...}, 'thermo_settings': {...},
+#                 'safe_states': {...}}}
+ENCLOSURES = {
+    'main': {
+        'run': 'v1',
+        'device_pins': DEVICE_PINS,
+        'dht_pins': DHT_PINS,
+        'dht_sensors': [1, 2, 4],
+        'onewire_device': ONEWIRE_DEVICE_PREFIX,
+        'time_settings': TIME_SETTINGS,
+        'thermo_settings': THERMO_SETTINGS,
+        'safe_states': RELAY_SAFE_STATES,
+    }
+}
+SENSOR_WORKER_THREADS = 4       # Threads shared by all enclosures for sensor reads
+TELEMETRY_BATCH_MAX_POINTS = 500  # Points buffered before the batcher writes early
+
+# Telemetry compression: only readings needed to reconstruct each field within
+# its tolerance are written ('swinging_door', 'deadband', or '' to write every reading)
+TELEMETRY_COMPRESSION = 'swinging_door'
+COMPRESSION_TOLERANCES = {      # Largest reconstruction error, by longest matching field name suffix
+    '_Temp': 0.5,               # DHT temperature (C), half the DHT11's 1 C resolution
+    '_Hum': 2.0,                # DHT relative humidity (%)
+    'Water_Temp': 0.2,          # One-wire probe (C), which is far less noisy
+}
+COMPRESSION_HEARTBEAT = 600     # Longest gap between stored points of a field (seconds)
+CONFIG_WATCH_INTERVAL = 5       # Seconds between checks of the --config file for changes
+
+# Alerting: rules are checked against every enclosure's readings each
+# ALERT_CHECK_INTERVAL. Each rule sets one of 'above', 'below', 'rate_above',
+# 'rate_below' (per hour) or 'stale' (seconds since the last reading), plus
+# optional 'clear' (hysteresis), 'for' (seconds before firing), 'severity'
+# and 'enclosures'. 'channel' may be a glob such as 'DHT*_Hum'.
+ALERT_CHECK_INTERVAL = 5
+ALERT_RULES = [
+    {'name': 'water_overheat', 'channel': 'Water_Temp', 'above': 38, 'clear': 37, 'severity': 'critical'},
+    {'name': 'water_cold', 'channel': 'Water_Temp', 'below': 22, 'clear': 24, 'for': 1800,
+     'severity': 'critical'},  # Heat pad failure
+    {'name': 'water_heating_fast', 'channel': 'Water_Temp', 'rate_above': 8, 'clear': 5, 'for': 900},  # Stuck relay
+    {'name': 'water_probe_stale', 'channel': 'Water_Temp', 'stale': 180, 'severity': 'critical'},
+    {'name': 'dht_stale', 'channel': 'DHT*_Temp', 'stale': 600},
+    {'name': 'humidity_low', 'channel': 'DHT*_Hum', 'below': 40, 'clear': 45, 'for': 3600},
+    {'name': 'humidity_high', 'channel': 'DHT*_Hum', 'above': 90, 'clear': 85, 'for': 3600},
+]
+ALERT_RATE_WINDOW = 600         # Seconds of history used for rate-of-change rules
+ALERT_MIN_INTERVAL = 900        # Shortest time between notifications of one alert (flapping suppression)
+ALERT_REPEAT_INTERVAL = 4 * 3600  # Reminder interval while an alert stays active
+ALERT_NOTIFIERS = ['log', 'file']  # Any of 'log', 'file', 'smtp' and 'webhook'
+ALERT_SPOOL_FILE = os.path.join(STATE_DIR, 'alerts.jsonl')
+ALERT_SMTP = {'host': 'localhost', 'port': 25, 'from': 'mobius@localhost', 'to': []}
+ALERT_WEBHOOK_URL = os.environ.get('MOBIUS_ALERT_WEBHOOK', '')
+ALERT_QUEUE_SIZE = 100          # Undelivered alerts kept before new ones are dropped
 
 # Video file management
 VIDEO_MAX_AGE_DAYS = 14         # Maximum age for video files
 VIDEO_CLEAN_MIN_HOUR = 6        # Start hour for daytime videos to clean
 VIDEO_CLEAN_MAX_HOUR = 20       # End hour for daytime videos to clean
-VIDEO_CLEAN_MAX_SIZE = 3e6      # Maximum size for videos to keep (bytes)
+VIDEO_CLEAN_MAX_SIZE = 3e6      # Size below which unparseable videos are removed (bytes)
+VIDEO_CLEAN_MIN_DURATION = 5    # Videos shorter than this are removed (seconds)
+VIDEO_CLEAN_MIN_BITRATE = 500e3  # Videos below this bitrate show little motion (bits/s)
+VIDEO_INDEX_FILE = os.path.join(STATE_DIR, 'video_index.json')  # Cached MP4 metadata
+
+# Video archiving to a cold tier (e.g. a USB disk); an empty ARCHIVE_DIR disables it
+ARCHIVE_DIR = os.environ.get('MOBIUS_ARCHIVE_DIR', '')
+ARCHIVE_AFTER_DAYS = 7          # Archive videos older than this instead of deleting them
+ARCHIVE_WORKERS = 1             # Archiver processes
+ARCHIVE_MAX_BYTES_PER_SEC = 4 * 1024 * 1024  # Total read rate for archiving
+ARCHIVE_NICE = 19               # CPU niceness of archiver processes
+ARCHIVE_IONICE_CLASS = 3        # I/O scheduling class of archiver processes (3 = idle)
+
+# Shutdown and telemetry buffering
+SHUTDOWN_TIMEOUT = 20           # Total seconds allowed for a graceful shutdown
+SHUTDOWN_TELEMETRY_TIMEOUT = 5  # Share of it spent retrying unwritten InfluxDB points
+INFLUX_PENDING_MAX_POINTS = 1000  # Failed InfluxDB points kept for retry on flush
+
+# Deadline monitoring: a task overruns if one run takes longer than its deadline
+# or it has not started within its interval plus deadline. When a CRITICAL_TASKS
+# task overruns, relays are held in RELAY_FAILSAFE_STATES and the watchdog is not
+# fed until it recovers; overruns of other tasks are only logged and alerted.
+TASK_DEADLINES = {'sensors': 10, 'relays': 5, 'alerts': 5, 'config': 5, 'files': 120, 'dashboard': 10}
+CRITICAL_TASKS = ('sensors', 'relays')
+TASK_DEFAULT_DEADLINE = 30      # Deadline of tasks not listed above (seconds)
+WATCHDOG_CHECK_INTERVAL = 1     # Seconds between deadline checks
+WATCHDOG_DEVICE = os.environ.get('MOBIUS_WATCHDOG', '')  # '/dev/watchdog', 'simulated', or '' for none
+WATCHDOG_TIMEOUT = 15           # Reset timeout of the simulated watchdog (seconds)
+RELAY_FAILSAFE_STATES = None    # Relay states while tasks overrun (None = each enclosure's safe states)
+
+# Live state: latest readings, relay states and health in a memory-mapped file
+# that local processes read with mobius.services.live_state.LiveStateReader
+# ('' disables it)
+LIVE_STATE_PATH = os.environ.get('MOBIUS_LIVE_STATE', '/dev/shm/mobius-live' if os.path.isdir('/dev/shm')
+                                 else os.path.join(STATE_DIR, 'live'))
+LIVE_STATE_REOPEN_AFTER = 10    # Seconds without updates before readers check for a new segment file
+
+# Dashboard data files: chart series for the website, pre-aggregated as readings
+# arrive and written as dashboard-<range>.json, so page views never query
+# InfluxDB ('' disables them). Each range keeps 'buckets' buckets of 'bucket'
+# seconds and its file is rewritten at most every 'write_every' seconds.
+DASHBOARD_DIR = os.environ.get('MOBIUS_DASHBOARD_DIR', DATA_DIR)
+DASHBOARD_RANGES = {
+    '24h': {'bucket': 300, 'buckets': 288, 'write_every': 60},
+    '7d': {'bucket': 1800, 'buckets': 336, 'write_every': 600},
+    '30d': {'bucket': 7200, 'buckets': 360, 'write_every': 1800},
+}
+DASHBOARD_TIMELINE_RANGE = '24h'  # Range whose file also lists every relay on/off transition
+DASHBOARD_TIMELINE_MAX = 5000   # Transitions kept per relay
+DASHBOARD_WRITE_INTERVAL = 60   # Seconds between checks for range files that are due
+
+# History export (mobius export)
+EXPORT_CHUNK_HOURS = 6          # Time span per InfluxDB query; bounds memory use
+EXPORT_BATCH_ROWS = 5000        # Rows per write batch (Parquet row group)
+EXPORT_GZIP_LEVEL = 6           # CSV compression level
+EXPORT_PARQUET_COMPRESSION = 'zstd'
+
+# Asyncio runtime (mobius --runtime asyncio)
+ASYNC_WORKER_THREADS = 2        # Executor threads for blocking sensor/relay/file work
+STATUS_HTTP_HOST = '127.0.0.1'  # Interface for the HTTP status endpoint
+STATUS_HTTP_PORT = 8090         # Port for the HTTP status endpoint (0 disables it)
+INFLUX_HTTP_TIMEOUT = 10        # Seconds to wait for an InfluxDB HTTP request
+
+# Hardware simulation (used off-device or with --simulate)
+SIM_AMBIENT_TEMP = 24.0         # Room temperature the enclosure drifts towards
+SIM_HEATER_GAIN = 0.02          # Degrees per second added per active heater
+SIM_THERMAL_TIME_CONSTANT = 1800  # Seconds for the enclosure to settle to ambient
+SIM_DHT_LATENCY = 0.0           # Seconds each simulated DHT read takes
+SIM_DHT_FAILURE_RATE = 0.0      # Probability a simulated DHT read times out
+SIM_ONEWIRE_LATENCY = 0.0       # Seconds each simulated one-wire read takes
+SIM_ONEWIRE_CRC_FAILURE_RATE = 0.0  # Probability a one-wire read fails its CRC
+SIM_GPIO_FAILURE_RATE = 0.0     # Probability a GPIO write raises an error
+SIM_INFLUX_LATENCY = 0.0        # Seconds the fake InfluxDB server takes per request
+SIM_INFLUX_FAILURE_RATE = 0.0   # Probability the fake InfluxDB server returns 500
 
 # Logging configuration
 LOG_LEVEL = 'INFO'
-LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s' 
\ No newline at end of file
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_DIR = os.environ.get('MOBIUS_LOG_DIR', os.path.expanduser('~/mobius_logs'))
+LOG_FILE_NAME = 'mobius.log'
+LOG_ROTATE_WHEN = 'midnight'    # Time-based rotation schedule
+LOG_BACKUP_COUNT = 30           # Rotated files to keep
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotate early if the active file reaches this size
+LOG_MAX_TOTAL_BYTES = 100 * 1024 * 1024  # Cap on the combined size of rotated files
+LOG_COMPRESS = True             # Gzip rotated files in the background 
\ No newline at end of file
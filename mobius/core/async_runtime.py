@@ -0,0 +1,210 @@
+"""
+Asyncio Runtime Module
+Runs the controller's scheduled tasks on a single event loop
+"""
+
+import json
+import signal
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from mobius.config import settings
+from mobius.services.async_influx import AsyncInfluxWriter
+
+
+class AsyncRuntime:
+    """Event-loop runtime for a VivController
+
+    Blocking hardware and file work runs in a small executor, every point is
+    written to InfluxDB over a keep-alive connection (failed writes go back
+    to the InfluxClient's pending queue and are retried with the next
+    write), and a JSON status endpoint is served from the same loop. SIGINT/SIGTERM cancel every task
+    and SIGHUP requests a config reload.
+    """
+
+    def __init__(self, controller, status_host=None, status_port=None, workers=None):
+        """Initialize the runtime
+
+        Args:
+            controller: VivController whose scheduler defines the tasks
+            status_host: Interface for the status endpoint (defaults to STATUS_HTTP_HOST)
+            status_port: Port for the status endpoint, 0 to disable (defaults to STATUS_HTTP_PORT)
+            workers: Executor threads (defaults to ASYNC_WORKER_THREADS)
+        """
+        self.logger = logging.getLogger('mobius.core.async_runtime')
+        self.controller = controller
+        self.status_host = settings.STATUS_HTTP_HOST if status_host is None else status_host
+        self.status_port = settings.STATUS_HTTP_PORT if status_port is None else status_port
+        self.executor = ThreadPoolExecutor(max_workers=workers or settings.ASYNC_WORKER_THREADS)
+
+        self.loop = None
+        self.influx_writer = None
+        self.status_server = None
+        self._main_task = None
+
+    def start(self):
+        """Run until cancelled by a signal, then clean up"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._main_task = self.loop.create_task(self.run())
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, self.cancel)
+        if hasattr(signal, 'SIGHUP'):
+            self.loop.add_signal_handler(signal.SIGHUP, self.reload)
+
+        try:
+            self.loop.run_until_complete(self._main_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.run_until_complete(self._shutdown())
+            self.loop.close()
+
+    def cancel(self):
+        """Cancel the runtime (safe to call from signal handlers on the loop)"""
+        self.logger.info("Signal received, cancelling tasks")
+        if self._main_task is not None:
+            self._main_task.cancel()
+
+    def reload(self):
+        """Reload the controller's config in the executor, between task runs"""
+        self.logger.info("SIGHUP received, reloading config")
+        self.loop.run_in_executor(self.executor, self.controller.reload_config)
+
+    async def run(self):
+        """Run every scheduled task concurrently until cancelled"""
+        self.logger.info("Starting asyncio runtime")
+        self.controller.running = True
+        self.influx_writer = AsyncInfluxWriter(self.controller.influx_client.credentials)
+        # Relay, usage and file points are batched on executor threads; hand them to the loop
+        self.controller.telemetry.writer = self._write_threadsafe
+
+        if self.status_port:
+            self.status_server = await asyncio.start_server(
+                self._handle_status, self.status_host, self.status_port)
+            self.logger.info("Status endpoint on http://{host}:{port}/status".format(
+                host=self.status_host, port=self.status_port))
+
+        self.controller.monitor.start()
+        tasks = [
+            self.loop.create_task(self._run_task(task))
+            for task in self.controller.scheduler.tasks.values()
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_task(self, task):
+        """Run one scheduled task whenever it is due"""
+        clock = self.controller.clock
+        handler = self._process_sensors if task.name == 'sensors' else None
+        monitor = self.controller.monitor
+
+        while True:
+            current_time = clock.now()
+            if task.is_due(current_time):
+                task.last_run = current_time
+                monitor.task_started(task.name)
+                try:
+                    if handler is not None:
+                        await handler()
+                    else:
+                        await self.loop.run_in_executor(self.executor, task.func)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.error("Error processing {name}: {e}".format(name=task.name, e=e))
+                finally:
+                    monitor.task_finished(task.name)
+
+            wait = (task.last_run + task.interval - clock.now()).total_seconds()
+            await asyncio.sleep(max(0.1, wait))
+
+    async def _process_sensors(self):
+        """Read sensors in the executor and write them over the async client"""
+        readings = await self.loop.run_in_executor(self.executor, self.controller.read_sensors)
+        points = self.controller.make_sensor_points(readings)
+        if points:
+            await self._write_points(points)
+
+    async def _write_points(self, points):
+        """Write points with any earlier failures, re-queueing them all if the write fails"""
+        influx_client = self.controller.influx_client
+        points = influx_client.take_pending() + list(points)
+        if await self.influx_writer.write_points(points):
+            return True
+        influx_client.queue_pending(points)
+        return False
+
+    def _write_threadsafe(self, points):
+        """TelemetryBatcher writer: schedule the write on the loop from an executor thread
+
+        Returns:
+            bool: True once scheduled; failures are re-queued rather than reported
+        """
+        if self.loop is None or self.loop.is_closed():
+            return self.controller.influx_client.write_points(points)
+        asyncio.run_coroutine_threadsafe(self._write_points(points), self.loop)
+        return True
+
+    async def _handle_status(self, reader, writer):
+        """Serve GET /status as JSON, closing the connection afterwards"""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 5)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] in ('/', '/status'):
+                # get_status may touch hardware, so keep it off the loop
+                status = await self.loop.run_in_executor(self.executor, self.controller.get_status)
+                status['influx'] = {
+                    'writes': self.influx_writer.write_count,
+                    'errors': self.influx_writer.error_count,
+                    'connections': self.influx_writer.connect_count,
+                }
+                code, body = '200 OK', json.dumps(status).encode('utf-8')
+            else:
+                code, body = '404 Not Found', b'{"error": "not found"}'
+
+            writer.write('HTTP/1.1 {code}\r\nContent-Type: application/json\r\nContent-Length: {length}\r\n'
+                         'Connection: close\r\n\r\n'.format(code=code, length=len(body)).encode('latin-1') + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            self.logger.debug("Status request failed: {}".format(e))
+        except Exception as e:
+            self.logger.error("Error serving status: {}".format(e))
+            body = json.dumps({'error': str(e)}).encode('utf-8')
+            try:
+                writer.write('HTTP/1.1 500 Internal Server Error\r\nContent-Type: application/json\r\n'
+                             'Content-Length: {length}\r\nConnection: close\r\n\r\n'.format(
+                                 length=len(body)).encode('latin-1') + body)
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _shutdown(self):
+        """Close servers and connections and release hardware"""
+        self.logger.info("Stopping asyncio runtime")
+        self.controller.running = False
+
+        if self.status_server is not None:
+            self.status_server.close()
+            await self.status_server.wait_closed()
+        # Shutdown flushes go straight to the blocking client, which retries the pending points
+        self.controller.telemetry.writer = self.controller.influx_client.write_points
+        if self.influx_writer is not None:
+            await self.influx_writer.close()
+
+        # The controller's shutdown coordinator bounds the remaining work
+        await self.loop.run_in_executor(None, self.controller.stop)
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,97 @@
+"""
+Clock Module
+Injectable time sources so control logic can run in real or virtual time
+"""
+
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+
+class SystemClock:
+    """Clock backed by the system wall clock"""
+
+    def now(self) -> datetime:
+        """Get the current local time
+
+        Returns:
+            datetime: Current time
+        """
+        return datetime.now()
+
+    def monotonic(self) -> float:
+        """Get a monotonic timestamp for measuring intervals
+
+        Returns:
+            float: Seconds from an arbitrary reference point
+        """
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        """Block for the given number of seconds
+
+        Args:
+            seconds: Time to sleep
+        """
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """Manually advanced clock for replay, simulation and benchmarks
+
+    Sleeping advances virtual time immediately instead of blocking, so
+    control logic runs as fast as the CPU allows.
+    """
+
+    def __init__(self, start: Optional[datetime] = None):
+        """Initialize the virtual clock
+
+        Args:
+            start: Initial time (defaults to midnight today)
+        """
+        if start is None:
+            start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self._start = start
+        self._now = start
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime:
+        with self._lock:
+            return self._now
+
+    def monotonic(self) -> float:
+        with self._lock:
+            return (self._now - self._start).total_seconds()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self.advance(seconds)
+
+    def advance(self, seconds: float) -> datetime:
+        """Move virtual time forward
+
+        Args:
+            seconds: Number of seconds to advance
+
+        Returns:
+            datetime: The new current time
+        """
+        with self._lock:
+            self._now += timedelta(seconds=seconds)
+            return self._now
+
+    def set(self, current_time: datetime) -> None:
+        """Jump to a specific time (must not move backwards)
+
+        Args:
+            current_time: New current time
+        """
+        with self._lock:
+            if current_time < self._now:
+                raise ValueError("VirtualClock cannot move backwards ({} < {})".format(current_time, self._now))
+            self._now = current_time
+
+
+# Shared default clock
+system_clock = SystemClock()
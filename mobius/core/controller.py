@@ -3,41 +3,220 @@ Core Controller Module
 The central control system that coordinates all vivarium functions
 """
 
-import time
+import os
 import logging
 import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import partial
 
 from mobius.config import settings
+from mobius.core.clock import system_clock
+from mobius.core.enclosure import Enclosure
+from mobius.core.plan import ConfigError, load_plan
+from mobius.core.samples import SampleBatch
+from mobius.core.sampling import AdaptiveSampler
+from mobius.core.scheduler import Scheduler
+from mobius.core.shutdown import ShutdownCoordinator
+from mobius.core.watchdog import DeadlineMonitor, make_watchdog
 from mobius.hardware.relay import RelayManager
 from mobius.hardware.sensor import SensorManager
+from mobius.hardware.simulation import SimulatedHardware
+from mobius.services.alerts import AlertEngine
+from mobius.services.compression import TelemetryCompressor
+from mobius.services.dashboard import DashboardSeries
 from mobius.services.influx_client import InfluxClient
+from mobius.services.live_state import LiveStateWriter, make_slots
 from mobius.services.file_manager import FileManager
+from mobius.services.telemetry import TelemetryBatcher
+from mobius.utils.helpers import startup_profiler
 
 
 class VivController:
-    """Main controller for the reptile vivarium system"""
+    """Main controller for the reptile vivarium system
+    
+    Drives one or more enclosures. They share the scheduler, the telemetry
+    batcher and the sensor worker pool.
+    """
 
-    def __init__(self):
-        """Initialize the controller and its components"""
+    # Controller health values in the live state segment
+    LIVE_HEALTH = ('running', 'healthy', 'overruns', 'active_alerts', 'readings_time')
+    
+    def __init__(self, simulate=False, clock=None, influx_client=None, sensor_manager=None,
+                 relay_manager=None, file_manager=None, enclosures=None, config_path=None, alert_engine=None,
+                 live_state=None, dashboard=None, watchdog=None):
+        """Initialize the controller and its components
+        
+        Args:
+            simulate: Use simulated GPIO, DHT and one-wire hardware
+            clock: Optional clock (SystemClock or VirtualClock), defaults to the system clock
+            influx_client: Optional InfluxClient to use instead of the default
+            sensor_manager: Optional SensorManager, only for a single-enclosure plan
+            relay_manager: Optional RelayManager, only for a single-enclosure plan
+            file_manager: Optional FileManager to use instead of the default
+            enclosures: Optional enclosure name to config mapping (defaults to ENCLOSURES)
+            config_path: Optional JSON/TOML config file, reloaded on change or SIGHUP
+            alert_engine: Optional AlertEngine to use instead of the default
+            live_state: Optional LiveStateWriter to use instead of one at LIVE_STATE_PATH, or False for none
+            dashboard: Optional DashboardSeries to use instead of one writing to DASHBOARD_DIR, or False for none
+            watchdog: Optional watchdog to use instead of WATCHDOG_DEVICE (see make_watchdog), or False for none
+            
+        Raises:
+            ValueError: If a sensor or relay manager is given with more than one enclosure
+        """
         self.logger = logging.getLogger('mobius.controller')
         self.logger.info("Initializing VivController")
+        self.clock = clock or system_clock
+        if simulate:
+            self.logger.info("Using simulated hardware")
+        
+        # Telemetry from every enclosure is written in one batch per task
+        self.influx_client = influx_client or InfluxClient()
+        self.telemetry = TelemetryBatcher(self.influx_client)
+        self.sensor_pool = ThreadPoolExecutor(max_workers=settings.SENSOR_WORKER_THREADS)
+        
+        # Validated, compiled control plan; swapped atomically on reload
+        self.config_path = config_path
+        self.base_enclosures = enclosures
+        self.plan = load_plan(config_path, enclosures)
+        self._config_mtime = self.plan.version
+        self._reload_requested = threading.Event()
+        self._relay_lock = threading.Lock()
+        # An injected manager cannot tell which enclosure it belongs to
+        if (sensor_manager or relay_manager) and len(self.plan.enclosures) > 1:
+            self.sensor_pool.shutdown(wait=False)
+            raise ValueError("sensor_manager and relay_manager can only be given for a single enclosure, "
+                             "{} are configured".format(len(self.plan.enclosures)))
         
-        # Initialize components
-        self.influx_client = InfluxClient()
-        self.sensor_manager = SensorManager()
-        self.relay_manager = RelayManager()
-        self.file_manager = FileManager()
+        # Initialize enclosures; all sensor and relay hardware comes up in parallel
+        self.enclosures = OrderedDict()
+        with ThreadPoolExecutor(max_workers=2 * len(self.plan.enclosures)) as pool:
+            pending = []
+            for plan in self.plan.enclosures:
+                name = plan.name
+                # Simulated hardware shares one environment model between sensors and relays
+                hardware = SimulatedHardware(now=self.clock.now, heater_pins=plan.heater_pins()) if simulate else None
+                sensors = sensor_manager or pool.submit(
+                    self._timed, 'init SensorManager ({})'.format(name), partial(
+                        SensorManager,
+                        dht=hardware and hardware.dht,
+                        onewire=hardware and hardware.onewire,
+                        clock=self.clock,
+                        dht_pins=plan.dht_pins,
+                        dht_sensors=plan.dht_sensors,
+                        onewire_device=plan.onewire_device
+                    ))
+                relays = relay_manager or pool.submit(
+                    self._timed, 'init RelayManager ({})'.format(name), partial(
+                        RelayManager,
+                        gpio=hardware and hardware.gpio,
+                        influx_client=self.telemetry,
+                        clock=self.clock,
+                        device_pins=plan.device_pins,
+                        safe_states=plan.safe_states,
+                        tags=dict(plan.tags)
+                    ))
+                pending.append((plan, hardware, sensors, relays))
+                
+            for plan, hardware, sensors, relays in pending:
+                sensors = sensors.result() if isinstance(sensors, Future) else sensors
+                relays = relays.result() if isinstance(relays, Future) else relays
+                sampler = None
+                if settings.ADAPTIVE_SAMPLING and hasattr(sensors, 'read_channels'):
+                    sampler = AdaptiveSampler(sensors.channels, clock=self.clock)
+                compressor = TelemetryCompressor() if settings.TELEMETRY_COMPRESSION else None
+                self.enclosures[plan.name] = Enclosure(plan, sensors, relays, hardware=hardware,
+                                                       sampler=sampler, compressor=compressor)
+        self.telemetry.flush()
+        self.file_manager = file_manager or FileManager(clock=self.clock)
         
-        # Timekeeping
-        self.last_sensor_read = datetime.min
-        self.last_relay_check = datetime.min
-        self.last_file_maintenance = datetime.min
+        # Alert rules are compiled against every enclosure's sensor fields
+        self.alerts = alert_engine or AlertEngine(clock=self.clock)
+        self.alerts.compile({name: getattr(enclosure.sensor_manager, 'fields', [])
+                             for name, enclosure in self.enclosures.items()})
+        
+        # Every task's runs are checked against its deadline; overruns hold the relays in failsafe
+        if watchdog is None:
+            watchdog = make_watchdog(clock=self.clock)
+        self.monitor = DeadlineMonitor(clock=self.clock, watchdog=watchdog or None,
+                                       on_overrun=self._on_deadline_overrun, on_recover=self._on_deadline_recover,
+                                       on_degraded=self._on_task_lagging, on_restored=self._on_task_restored)
+        
+        # Latest state is published to shared memory for other local processes
+        self.live_state = live_state or None
+        if live_state is None and settings.LIVE_STATE_PATH:
+            slots = make_slots(OrderedDict(
+                (name, (getattr(enclosure.sensor_manager, 'fields', []), list(enclosure.relay_manager.device_status)))
+                for name, enclosure in self.enclosures.items()
+            ), health=self.LIVE_HEALTH)
+            try:
+                self.live_state = LiveStateWriter(slots)
+            except OSError as e:
+                self.logger.warning("Live state disabled, cannot create {path}: {e}".format(
+                    path=settings.LIVE_STATE_PATH, e=e))
+        self._readings_time = None
+        self._live_health = [('', 'health', name) for name in self.LIVE_HEALTH]
+        self._live_relays = OrderedDict((name, enclosure.relay_manager.device_status)
+                                        for name, enclosure in self.enclosures.items())
+        
+        # Website chart series are aggregated as readings arrive and written as static files
+        self.dashboard = dashboard or None
+        if dashboard is None and settings.DASHBOARD_DIR:
+            self.dashboard = DashboardSeries(OrderedDict(
+                (name, (getattr(enclosure.sensor_manager, 'fields', []), list(enclosure.relay_manager.device_status)))
+                for name, enclosure in self.enclosures.items()
+            ))
+            self.dashboard.load(self.clock.now().timestamp())
+        if self.dashboard is not None:
+            self.dashboard.record_relays(self._live_relays, self.clock.now().timestamp())
+        
+        # Periodic tasks, run in this order when due
+        self.scheduler = Scheduler(monitor=self.monitor)
+        # With adaptive sampling the task polls often and reads only the channels that are due
+        sensor_interval = settings.SAMPLING_MIN_INTERVAL if settings.ADAPTIVE_SAMPLING else settings.SENSOR_READ_INTERVAL
+        self.scheduler.add('sensors', sensor_interval, self._process_sensors)
+        self.scheduler.add('relays', settings.RELAY_CHECK_INTERVAL, self._process_relays)
+        self.scheduler.add('alerts', settings.ALERT_CHECK_INTERVAL, self.alerts.check)
+        self.scheduler.add('files', settings.FILE_MAINTENANCE_INTERVAL, self._process_files)
+        if self.dashboard is not None:
+            self.scheduler.add('dashboard', settings.DASHBOARD_WRITE_INTERVAL, self._write_dashboard)
+        if config_path:
+            self.scheduler.add('config', settings.CONFIG_WATCH_INTERVAL, self._check_config)
         
         # Flags
         self.running = False
         self.thread = None
+        self._stop_requested = threading.Event()
+        
+    @property
+    def primary(self):
+        """The first enclosure, for single-enclosure callers"""
+        return next(iter(self.enclosures.values()))
         
+    @property
+    def sensor_manager(self):
+        return self.primary.sensor_manager
+        
+    @property
+    def relay_manager(self):
+        return self.primary.relay_manager
+        
+    @property
+    def hardware(self):
+        return self.primary.hardware
+        
+    @property
+    def last_readings(self):
+        """Latest sensor readings of every enclosure, keyed by enclosure name"""
+        return {name: enclosure.last_readings for name, enclosure in self.enclosures.items()}
+        
+    @staticmethod
+    def _timed(name, factory):
+        """Build a component, recording its init time in the startup profiler"""
+        with startup_profiler.section(name):
+            return factory()
+            
     def start(self):
         """Start the main control loop in a separate thread"""
         if self.running:
@@ -45,98 +224,408 @@ class VivController:
             return
             
         self.running = True
+        self._stop_requested.clear()
+        self.monitor.start()
         self.thread = threading.Thread(target=self._run_loop, daemon=True)
         self.thread.start()
         
-        # Block the main thread
+        # Block the main thread until a stop is requested
         try:
             while self.running:
-                time.sleep(1)
+                self._stop_requested.wait(1)
         except KeyboardInterrupt:
-            self.stop()
+            pass
+        self.stop()
             
+    def request_stop(self):
+        """Ask the controller to stop (safe to call from a signal handler)"""
+        self.running = False
+        self._stop_requested.set()
+        
     def stop(self):
-        """Stop the controller and clean up resources"""
+        """Stop the controller and clean up resources within SHUTDOWN_TIMEOUT
+        
+        Returns:
+            dict: Seconds taken by each shutdown phase (None if it timed out)
+        """
         self.logger.info("Stopping controller")
-        self.running = False
+        self.request_stop()
         
-        if self.thread and self.thread.is_alive():
-            self.thread.join(timeout=5)
+        coordinator = ShutdownCoordinator(settings.SHUTDOWN_TIMEOUT)
+        # A slow shutdown is not a stall: stop monitoring and disarm the watchdog first
+        coordinator.add_phase('watchdog', self.monitor.stop, max_time=2)
+        coordinator.add_phase('control loop', self._join_thread, max_time=5)
+        coordinator.add_phase('relays', lambda budget: self._set_safe_states())
+        # Pins are released before anything that waits on the network
+        coordinator.add_phase('hardware', lambda budget: self._cleanup_hardware())
+        coordinator.add_phase('telemetry', self._flush_telemetry, max_time=settings.SHUTDOWN_TELEMETRY_TIMEOUT)
+        coordinator.add_phase('dashboard', lambda budget: self._close_dashboard(), max_time=5)
+        coordinator.add_phase('alerts', self.alerts.close, max_time=5)
+        coordinator.add_phase('files', lambda budget: self.file_manager.close(), max_time=5)
+        coordinator.add_phase('live state', lambda budget: self._close_live_state(), max_time=1)
+        return coordinator.run()
+        
+    def _join_thread(self, timeout):
+        """Wait for the control loop thread to finish its current tick"""
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+            
+    def _set_safe_states(self):
+        """Drive the relays of every enclosure to their safe states
+        
+        Waits briefly for a relay update still running in an executor, but
+        drives the relays either way.
+        """
+        acquired = self._relay_lock.acquire(timeout=1)
+        try:
+            for enclosure in self.enclosures.values():
+                enclosure.set_safe_state()
+        finally:
+            if acquired:
+                self._relay_lock.release()
+            
+    def _on_deadline_overrun(self, error):
+        """Drive every enclosure's relays to failsafe when tasks overrun
+        
+        Runs on the monitor thread while the control loop may be stuck,
+        possibly holding the relay lock, so the relays are driven after a
+        short wait for the lock either way.
+        
+        Args:
+            error: DeadlineExceeded describing the overruns
+        """
+        acquired = self._relay_lock.acquire(timeout=1)
+        try:
+            for enclosure in self.enclosures.values():
+                try:
+                    enclosure.set_failsafe_state()
+                except Exception as e:
+                    self.logger.error("Error setting failsafe relays in {name}: {e}".format(name=enclosure.name, e=e))
+        finally:
+            if acquired:
+                self._relay_lock.release()
+        self.logger.critical("Relays held in failsafe until every task meets its deadline")
+        self.alerts.notify('deadline_overrun', 'firing', str(error))
+        self.record_relays()
+        self.publish_live_state()
+        
+    def _on_deadline_recover(self):
+        """Hand the relays back to the schedules once every task meets its deadline"""
+        self.logger.warning("Deadlines met again, resuming relay control")
+        # Re-evaluate the relays on the next tick rather than after a full interval
+        relays = self.scheduler.tasks.get('relays')
+        if relays is not None:
+            relays.last_run = datetime.min
+        self.alerts.notify('deadline_overrun', 'resolved', "deadline_overrun resolved: all tasks on time")
+        self.publish_live_state()
+        
+    def _on_task_lagging(self, error):
+        """Alert on housekeeping tasks that overrun; relay control carries on
+        
+        Args:
+            error: DeadlineExceeded describing the new overruns
+        """
+        self.alerts.notify('task_overrun', 'firing', str(error), severity='warning')
+        
+    def _on_task_restored(self):
+        """Resolve the housekeeping overrun alert"""
+        self.alerts.notify('task_overrun', 'resolved', "task_overrun resolved: all tasks on time", severity='warning')
+        
+    def publish_live_state(self, readings=None):
+        """Publish readings, relay states and health to the live state segment
+        
+        Args:
+            readings: Enclosure name to readings taken now (defaults to none new)
+        """
+        if self.live_state is None:
+            return
+        now = self.clock.now().timestamp()
+        if readings:
+            self._readings_time = now
+        running, healthy, overruns, active_alerts, readings_time = self._live_health
+        values = {
+            running: self.running,
+            healthy: self.monitor.healthy,
+            overruns: self.monitor.overrun_count,
+            active_alerts: len(self.alerts.active_alerts()),
+            readings_time: self._readings_time,
+        }
+        batches = None
+        for name, data in (readings or {}).items():
+            if isinstance(data, SampleBatch):
+                if batches is None:
+                    batches = {}
+                batches[name] = data
+                continue
+            for field, value in data.items():
+                values[(name, 'readings', field)] = value
+        try:
+            self.live_state.update(values, timestamp=now, readings=batches, relays=self._live_relays)
+        except Exception as e:
+            self.logger.error("Error publishing live state: {}".format(e))
+            
+    def record_relays(self):
+        """Account every enclosure's current relay states in the dashboard series"""
+        if self.dashboard is not None:
+            self.dashboard.record_relays(self._live_relays, self.clock.now().timestamp())
+            
+    def _write_dashboard(self, force=False):
+        """Write the dashboard range files that are due
+        
+        Args:
+            force: Write every changed range, however recently it was written
+        """
+        if self.dashboard is not None:
+            self.dashboard.write(self.clock.now().timestamp(), force=force)
+            
+    def _close_dashboard(self):
+        """Record the safe relay states and write every changed dashboard range"""
+        self.record_relays()
+        self._write_dashboard(force=True)
+            
+    def _close_live_state(self):
+        """Publish the stopped state and unmap the live state segment"""
+        if self.live_state is not None:
+            self.publish_live_state()
+            self.live_state.close()
             
-        # Cleanup hardware
-        self.relay_manager.cleanup()
-        self.sensor_manager.cleanup()
+    def _flush_telemetry(self, timeout):
+        """Write held and batched points, then retry any that failed earlier"""
+        points = []
+        for enclosure in self.enclosures.values():
+            if enclosure.compressor is not None:
+                points.extend(self._compressed_points(enclosure, enclosure.compressor.flush()))
+                self.logger.info("Telemetry compression in {name}: {ratio:.1f}x".format(
+                    name=enclosure.name, ratio=enclosure.compressor.ratio()))
+        self.telemetry.add(points)
+        self.telemetry.flush()
+        return self.influx_client.flush(timeout)
+        
+    def _cleanup_hardware(self):
+        """Release GPIO and sensor resources"""
+        self.sensor_pool.shutdown(wait=False)
+        for enclosure in self.enclosures.values():
+            enclosure.cleanup()
         
     def _run_loop(self):
         """Main control loop"""
         self.logger.info("Starting main control loop")
         
         while self.running:
-            current_time = datetime.now()
+            self.tick(self.clock.now())
             
-            # 1. Read sensors and log data
-            if current_time >= (self.last_sensor_read + timedelta(seconds=settings.SENSOR_READ_INTERVAL)):
-                self.last_sensor_read = current_time
-                try:
-                    self._process_sensors()
-                except Exception as e:
-                    self.logger.error("Error processing sensors: {}".format(e))
+            # Sleep a short time to prevent CPU thrashing
+            self.clock.sleep(0.1)
+    
+    def tick(self, current_time):
+        """Run every task that is due at the given time
+        
+        A requested config reload is applied first, so a new plan is
+        only ever swapped in between ticks.
+        
+        Args:
+            current_time: datetime of this iteration of the control loop
             
-            # 2. Check and update relay states based on time and temperature
-            if current_time >= (self.last_relay_check + timedelta(seconds=settings.RELAY_CHECK_INTERVAL)):
-                self.last_relay_check = current_time
-                try:
-                    self._process_relays()
-                except Exception as e:
-                    self.logger.error("Error processing relays: {}".format(e))
+        Returns:
+            list: Names of the tasks that ran
+        """
+        if self._reload_requested.is_set():
+            self.reload_config()
+        return self.scheduler.run_pending(current_time)
+        
+    def request_reload(self):
+        """Ask for the config file to be reloaded (safe to call from a signal handler)"""
+        self._reload_requested.set()
+        
+    def _check_config(self):
+        """Reload the config file if it was requested or has changed on disk"""
+        if self._reload_requested.is_set():
+            self.reload_config()
+            return
+        try:
+            mtime = os.stat(self.config_path).st_mtime
+        except OSError as e:
+            self.logger.error("Cannot check config file {path}: {e}".format(path=self.config_path, e=e))
+            return
+        if mtime != self._config_mtime:
+            self.reload_config()
             
-            # 3. Perform file maintenance
-            if current_time >= (self.last_file_maintenance + timedelta(seconds=settings.FILE_MAINTENANCE_INTERVAL)):
-                self.last_file_maintenance = current_time
-                try:
-                    self._process_files()
-                except Exception as e:
-                    self.logger.error("Error processing files: {}".format(e))
+    def reload_config(self):
+        """Load, validate and swap in a new control plan
+        
+        The running plan is kept if the file is invalid or changes anything
+        that needs hardware setup (pins, sensors, enclosures). Otherwise
+        relays are re-evaluated at once, touching only those that change.
+        
+        Returns:
+            bool: True if the new plan was applied, False otherwise
+        """
+        self._reload_requested.clear()
+        if not self.config_path:
+            self.logger.warning("Config reload requested but no config file is in use")
+            return False
             
-            # Sleep a short time to prevent CPU thrashing
-            time.sleep(0.1)
-    
+        try:
+            self._config_mtime = os.stat(self.config_path).st_mtime
+            plan = load_plan(self.config_path, self.base_enclosures)
+        except (OSError, ConfigError) as e:
+            self.logger.error("Config reload rejected, keeping current plan: {}".format(e))
+            return False
+            
+        names = [enclosure.name for enclosure in plan.enclosures]
+        if names != list(self.enclosures):
+            self.logger.error("Config reload rejected: adding or removing enclosures needs a restart")
+            return False
+        for new in plan.enclosures:
+            if new.hardware_key() != self.enclosures[new.name].plan.hardware_key():
+                self.logger.error("Config reload rejected: pin or sensor changes in {} need a restart".format(new.name))
+                return False
+                
+        with self._relay_lock:
+            self.plan = plan
+            for new in plan.enclosures:
+                self.enclosures[new.name].apply_plan(new)
+        self.logger.info("Applied config from {}".format(self.config_path))
+        self._process_relays()
+        return True
+        
+    def get_status(self):
+        """Summarize controller state for status endpoints
+        
+        Returns:
+            dict: Running flag, task schedule and per-enclosure device states
+        """
+        return {
+            'running': self.running,
+            'time': self.clock.now().isoformat(),
+            'tasks': {
+                name: {
+                    'interval': task.interval.total_seconds(),
+                    'last_run': task.last_run.isoformat() if task.last_run.year > 1 else None
+                }
+                for name, task in self.scheduler.tasks.items()
+            },
+            'config': {'path': self.config_path, 'version': self.plan.version},
+            'alerts': self.alerts.active_alerts(),
+            'watchdog': self.monitor.status(),
+            'enclosures': {name: enclosure.get_status() for name, enclosure in self.enclosures.items()},
+        }
+        
+    def read_sensors(self):
+        """Read every enclosure's sensors on the shared worker pool
+        
+        The last enclosure is read on the calling thread, so a single
+        enclosure never waits on a thread hand-off.
+        
+        Returns:
+            OrderedDict: Enclosure name to sensor readings
+        """
+        enclosures = list(self.enclosures.values())
+        futures = [(enclosure.name, self.sensor_pool.submit(enclosure.read_sensors))
+                   for enclosure in enclosures[:-1]]
+        last = enclosures[-1]
+        last_readings = last.read_sensors()
+        
+        readings = OrderedDict()
+        for name, future in futures:
+            try:
+                readings[name] = future.result()
+            except Exception as e:
+                self.logger.error("Error reading sensors in {name}: {e}".format(name=name, e=e))
+        readings[last.name] = last_readings
+        
+        for name, data in readings.items():
+            self.alerts.observe(name, data)
+        if any(readings.values()):
+            if self.dashboard is not None:
+                now = self.clock.now().timestamp()
+                for name, data in readings.items():
+                    self.dashboard.observe(name, data, now)
+            self.publish_live_state(readings)
+        return readings
+        
+    def make_sensor_points(self, readings, timestamp=None):
+        """Format per-enclosure readings as tagged InfluxDB json points
+        
+        With compression on, only the readings needed to reconstruct each
+        field are kept, as points stamped with the time they were read.
+        
+        Args:
+            readings: Enclosure name to sensor readings
+            timestamp: Unix time the readings were taken (defaults to now)
+            
+        Returns:
+            list: InfluxDB formatted json data
+        """
+        if timestamp is None:
+            timestamp = self.clock.now().timestamp()
+        points = []
+        for name, data in readings.items():
+            if not data:
+                continue
+            enclosure = self.enclosures[name]
+            if enclosure.compressor is None:
+                points.extend(self.influx_client.make_sensor_points(data, enclosure.tags))
+            else:
+                points.extend(self._compressed_points(enclosure, enclosure.compressor.compress(data, timestamp)))
+        return points
+        
+    def _compressed_points(self, enclosure, fields_by_time):
+        """Format compressor output as timestamped InfluxDB json points
+        
+        Args:
+            enclosure: Enclosure the fields belong to
+            fields_by_time: Timestamp (seconds) to the fields stored at it
+            
+        Returns:
+            list: InfluxDB formatted json data
+        """
+        points = []
+        for point_time, fields in fields_by_time.items():
+            for point in self.influx_client.make_sensor_points(fields, enclosure.tags):
+                point['time'] = point_time
+                points.append(point)
+        return points
+        
     def _process_sensors(self):
         """Read all sensors and log the data"""
         self.logger.debug("Reading sensors")
         
-        # Get readings from all sensors
-        readings = self.sensor_manager.get_all_readings()
-        
-        # Log to InfluxDB
-        self.influx_client.write_sensor_data(readings)
+        # Log every enclosure's readings to InfluxDB in one batch
+        self.telemetry.add(self.make_sensor_points(self.read_sensors()))
+        self.telemetry.flush()
         
     def _process_relays(self):
         """Update relay states based on time and temperature"""
         self.logger.debug("Updating relay states")
+        if not self.monitor.healthy:
+            self.logger.debug("Tasks are overrunning, relays stay in failsafe")
+            return
         
-        # Get current temperature
-        temp = self.sensor_manager.get_temperature()
-        
-        # Update time-based devices
-        self.relay_manager.update_time_devices(settings.TIME_SETTINGS)
-        
-        # Update temperature-based devices
-        self.relay_manager.update_thermo_devices(settings.THERMO_SETTINGS, temp)
+        with self._relay_lock:
+            for enclosure in self.enclosures.values():
+                try:
+                    enclosure.update_relays()
+                except Exception as e:
+                    self.logger.error("Error updating relays in {name}: {e}".format(name=enclosure.name, e=e))
+        self.telemetry.flush()
+        self.record_relays()
+        self.publish_live_state()
         
     def _process_files(self):
         """Perform file maintenance"""
         self.logger.debug("Performing file maintenance")
         
         # Get file stats for the past day
-        start_date = datetime.now() - timedelta(days=1)
-        end_date = datetime.now()
+        end_date = self.clock.now()
+        start_date = end_date - timedelta(days=1)
         
         # Get total file size
         total_size = self.file_manager.get_total_size(start_date, end_date)
         
         # Log file size to InfluxDB
-        self.influx_client.log_file_size(total_size)
+        self.telemetry.log_file_size(total_size)
+        self.telemetry.flush()
         
         # Clean up old videos
         self.file_manager.clean_videos(
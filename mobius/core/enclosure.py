@@ -0,0 +1,206 @@
+"""
+Enclosure Module
+One vivarium's sensors, relays, schedules and telemetry tags
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from mobius.config import settings
+from mobius.core.samples import SampleBatch
+
+
+def enclosure_configs(enclosures: Optional[Dict[str, Dict[str, Any]]] = None) -> 'OrderedDict[str, Dict[str, Any]]':
+    """Fill in each enclosure's config from the single-enclosure globals
+
+    Args:
+        enclosures: Enclosure name to config (defaults to ENCLOSURES)
+
+    Returns:
+        OrderedDict: Enclosure name to complete config, in a stable order
+    """
+    enclosures = settings.ENCLOSURES if enclosures is None else enclosures
+    if not enclosures:
+        raise ValueError("At least one enclosure must be configured")
+
+    defaults = {
+        'run': 'v1',
+        'device_pins': settings.DEVICE_PINS,
+        'dht_pins': settings.DHT_PINS,
+        'dht_sensors': [1, 2, 4],
+        'onewire_device': settings.ONEWIRE_DEVICE_PREFIX,
+        'time_settings': settings.TIME_SETTINGS,
+        'thermo_settings': settings.THERMO_SETTINGS,
+        'safe_states': settings.RELAY_SAFE_STATES,
+    }
+
+    configs = OrderedDict()
+    for name in sorted(enclosures):
+        config = dict(defaults)
+        config.update(enclosures[name] or {})
+        configs[name] = config
+    return configs
+
+
+class Enclosure:
+    """A single vivarium driven by the shared controller
+
+    The controller owns the scheduler, telemetry batcher and sensor worker
+    pool; an enclosure only knows its own hardware and schedules.
+    """
+
+    def __init__(self, plan, sensor_manager, relay_manager, hardware=None, sampler=None, compressor=None):
+        """Initialize the enclosure
+
+        Args:
+            plan: Compiled EnclosurePlan (see mobius.core.plan)
+            sensor_manager: SensorManager for this enclosure's sensors
+            relay_manager: RelayManager for this enclosure's relays
+            hardware: Optional SimulatedHardware backing the managers
+            sampler: Optional AdaptiveSampler choosing which channels to read
+            compressor: Optional TelemetryCompressor choosing which readings to store
+        """
+        self.logger = logging.getLogger('mobius.core.enclosure')
+        self.name = plan.name
+        self.plan = plan
+        self.sensor_manager = sensor_manager
+        self.relay_manager = relay_manager
+        self.hardware = hardware
+        self.sampler = sampler
+        self.compressor = compressor
+        # Set while the thermostat probe has no reading
+        self.probe_lost = False
+        if sampler is not None:
+            sampler.targets = plan.sampling_targets()
+
+        # Readings of the current tick and the latest of every field, refilled in place
+        table = getattr(sensor_manager, 'table', None)
+        self.readings = table.batch() if table is not None else {}
+        self.last_readings = table.batch() if table is not None else {}
+
+    @property
+    def tags(self) -> Dict[str, str]:
+        """Influx tags for this enclosure's points"""
+        return dict(self.plan.tags)
+
+    def apply_plan(self, plan):
+        """Swap in a new plan; takes effect on the next relay update
+
+        Args:
+            plan: Compiled EnclosurePlan with the same hardware layout
+        """
+        self.plan = plan
+        self.relay_manager.safe_states = plan.safe_states
+        self.relay_manager.tags = dict(plan.tags)
+        if self.sampler is not None:
+            self.sampler.targets = plan.sampling_targets()
+
+    def read_sensors(self) -> Dict[str, float]:
+        """Read the sensors that are due (all of them without a sampler)
+
+        With a SampleBatch sensor manager the returned batch is reused by
+        the next read.
+
+        Returns:
+            SampleBatch: New sensor readings (a dict for managers without a channel table)
+        """
+        if not isinstance(self.readings, SampleBatch):
+            readings = self.sensor_manager.get_all_readings()
+            self.readings = self.last_readings = readings
+            return readings
+
+        readings = self.readings
+        if self.sampler is None:
+            self.sensor_manager.get_all_readings(out=readings)
+            self.last_readings.copy_from(readings)
+            return readings
+
+        due = self.sampler.due()
+        readings.clear()
+        if due:
+            self.sensor_manager.read_channels(due, out=readings)
+            for channel in due:
+                self.sampler.update(channel, readings)
+            self.last_readings.update(readings)
+            self.last_readings.timestamp = readings.timestamp
+        return readings
+
+    def update_relays(self) -> bool:
+        """Switch relays to the states the current plan calls for
+
+        Only relays whose state changes are touched. Without a thermostat
+        reading the heaters cannot be judged, so the thermostat devices are
+        held in their failsafe states until the probe reads again while the
+        timed devices keep following their schedules.
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        plan = self.plan
+        temp = self.sensor_manager.get_temperature()
+        hour = self.relay_manager.clock.now().hour
+        states = plan.desired_states(hour, temp)
+        if temp is None:
+            if not self.probe_lost:
+                self.logger.error("No thermostat reading in {}, holding heaters in failsafe".format(self.name))
+            states.update(self._failsafe_states(plan.thermostat_devices()))
+        elif self.probe_lost:
+            self.logger.info("Thermostat reading restored in {}".format(self.name))
+        self.probe_lost = temp is None
+        success = self.relay_manager.set_states(states)
+        if hasattr(self.relay_manager, 'log_usage'):
+            self.relay_manager.log_usage()
+        return success
+
+    def set_safe_state(self) -> bool:
+        """Drive every relay to its safe state
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self.relay_manager.set_safe_state()
+
+    def set_failsafe_state(self) -> bool:
+        """Drive every relay to its failsafe state (RELAY_FAILSAFE_STATES, else its safe state)
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self.relay_manager.set_states(self._failsafe_states(self.relay_manager.device_pins), force=True)
+
+    def _failsafe_states(self, devices) -> Dict[str, bool]:
+        """Failsafe state of each device (RELAY_FAILSAFE_STATES, else its safe state)"""
+        states = settings.RELAY_FAILSAFE_STATES
+        if states is None:
+            states = self.plan.safe_states
+        return {device: states.get(device, False) for device in devices}
+
+    def cleanup(self):
+        """Release GPIO and sensor resources"""
+        self.relay_manager.cleanup()
+        self.sensor_manager.cleanup()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Summarize the enclosure for status endpoints
+
+        Returns:
+            dict: Device states, today's relay usage, latest readings, sensor statistics, sampling intervals and compression ratios
+        """
+        if hasattr(self.sensor_manager, 'sample'):
+            readings = self.sensor_manager.get_all_readings(consumer='status')
+        else:
+            readings = self.last_readings
+        status = {
+            'devices': dict(self.relay_manager.device_status),
+            'readings': dict(readings.items()),
+        }
+        if hasattr(self.relay_manager, 'usage'):
+            status['usage'] = self.relay_manager.usage.current_usage(self.relay_manager.clock.now())
+        if hasattr(self.sensor_manager, 'stats'):
+            status['sensors'] = self.sensor_manager.stats()
+        if self.sampler is not None:
+            status['sampling'] = self.sampler.intervals()
+        if self.compressor is not None:
+            status['compression'] = self.compressor.stats()
+        return status
@@ -0,0 +1,325 @@
+"""
+Control Plan Module
+Loads, validates and compiles enclosure configuration into immutable lookup tables
+"""
+
+import os
+import json
+import numbers
+from collections import namedtuple
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional, Tuple
+
+from mobius.core.enclosure import enclosure_configs
+from mobius.utils.helpers import optional_import
+
+# Enclosure keys a config file may set, globally or per enclosure
+ENCLOSURE_KEYS = ('run', 'device_pins', 'dht_pins', 'dht_sensors', 'onewire_device',
+                  'time_settings', 'thermo_settings', 'safe_states')
+
+
+class ConfigError(ValueError):
+    """Raised when a configuration file cannot be loaded or fails validation"""
+
+
+class EnclosurePlan(namedtuple('EnclosurePlan', [
+        'name', 'tags', 'device_pins', 'dht_pins', 'dht_sensors', 'onewire_device',
+        'timelines', 'thermostats', 'safe_states'])):
+    """Compiled, read-only control tables for one enclosure
+
+    timelines maps each scheduled device to a 24-entry tuple of hourly
+    states, and thermostats is a tuple of (target, devices) pairs.
+    """
+
+    __slots__ = ()
+
+    def desired_states(self, hour: int, temperature: Optional[float]) -> Dict[str, bool]:
+        """Relay states the plan calls for
+
+        Args:
+            hour: Current hour of day (0-23)
+            temperature: Current thermostat temperature in Celsius, or None to leave
+                the thermostat devices out
+
+        Returns:
+            dict: Device name to desired state
+        """
+        states = {device: timeline[hour] for device, timeline in self.timelines.items()}
+        if temperature is None:
+            for device in self.thermostat_devices():
+                states.pop(device, None)
+            return states
+        for target, devices in self.thermostats:
+            for device in devices:
+                states[device] = temperature <= target
+        return states
+
+    def sampling_targets(self) -> Dict[str, float]:
+        """Setpoints the adaptive sampler steers the thermostat input towards
+
+        Returns:
+            dict: Field name to target temperature
+        """
+        return {'Water_Temp': self.thermostats[0][0]} if self.thermostats else {}
+
+    def thermostat_devices(self) -> List[str]:
+        """Devices the thermostats switch
+
+        Returns:
+            list: Device names, in thermostat order
+        """
+        return [device for _, devices in self.thermostats for device in devices]
+
+    def heater_pins(self) -> List[int]:
+        """GPIO pins of the devices the thermostats switch
+
+        Returns:
+            list: Heater GPIO pins
+        """
+        pins = []
+        for device in self.thermostat_devices():
+            pin = self.device_pins[device]
+            pins.extend(pin if isinstance(pin, list) else [pin])
+        return pins
+
+    def hardware_key(self) -> Tuple:
+        """Values whose change needs hardware setup, so cannot be hot-reloaded"""
+        return (tuple(sorted(self.device_pins.items())), self.dht_pins, self.dht_sensors, self.onewire_device)
+
+
+class ControlPlan(namedtuple('ControlPlan', ['enclosures', 'source', 'version'])):
+    """Compiled control plan for every enclosure
+
+    enclosures is a tuple of EnclosurePlan in a stable order; source is the
+    config file path (or None for settings.py) and version its mtime.
+    """
+
+    __slots__ = ()
+
+    def enclosure(self, name: str) -> Optional[EnclosurePlan]:
+        """Look up an enclosure's plan by name"""
+        for plan in self.enclosures:
+            if plan.name == name:
+                return plan
+        return None
+
+
+def load_config_file(path: str) -> Dict[str, Any]:
+    """Read a JSON or TOML configuration file
+
+    TOML needs Python 3.11's tomllib or the toml package.
+
+    Args:
+        path: Path to a .json or .toml file
+
+    Returns:
+        dict: Parsed configuration
+    """
+    try:
+        if path.lower().endswith('.toml'):
+            tomllib = optional_import('tomllib')
+            if tomllib is not None:
+                with open(path, 'rb') as f:
+                    return tomllib.load(f)
+            toml = optional_import('toml')
+            if toml is None:
+                raise ConfigError("Reading {} needs tomllib (Python 3.11+) or the toml package".format(path))
+            with open(path) as f:
+                return toml.load(f)
+        with open(path) as f:
+            return json.load(f)
+    except ConfigError:
+        raise
+    except Exception as e:
+        raise ConfigError("Could not read config file {path}: {e}".format(path=path, e=e))
+
+
+def merge_config(file_config: Dict[str, Any], enclosures: Optional[Dict[str, Dict[str, Any]]] = None
+                 ) -> Dict[str, Dict[str, Any]]:
+    """Overlay a config file on the enclosure settings
+
+    Enclosure keys at the top level of the file apply to every enclosure;
+    entries under 'enclosures' override them per enclosure (and may add
+    new enclosures).
+
+    Args:
+        file_config: Parsed configuration file
+        enclosures: Base enclosure configs (defaults to ENCLOSURES)
+
+    Returns:
+        dict: Enclosure name to config
+    """
+    if not isinstance(file_config, dict):
+        raise ConfigError("Config file must contain a table/object")
+    unknown = set(file_config) - set(ENCLOSURE_KEYS) - {'enclosures'}
+    if unknown:
+        raise ConfigError("Unknown config keys: {}".format(', '.join(sorted(unknown))))
+
+    base = enclosure_configs(enclosures)
+    overrides = file_config.get('enclosures') or {}
+    if not isinstance(overrides, dict):
+        raise ConfigError("'enclosures' must map enclosure names to settings")
+
+    merged = {}
+    for name in set(base) | set(overrides):
+        config = dict(base.get(name) or {})
+        config.update({key: value for key, value in file_config.items() if key in ENCLOSURE_KEYS})
+        override = overrides.get(name) or {}
+        unknown = set(override) - set(ENCLOSURE_KEYS)
+        if unknown:
+            raise ConfigError("Unknown keys for enclosure {name}: {keys}".format(
+                name=name, keys=', '.join(sorted(unknown))))
+        config.update(override)
+        merged[name] = config
+    return merged
+
+
+def _check(condition: bool, message: str, *args):
+    if not condition:
+        raise ConfigError(message.format(*args))
+
+
+def _is_pin(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def compile_enclosure(name: str, config: Dict[str, Any]) -> EnclosurePlan:
+    """Validate one enclosure's config and compile its lookup tables
+
+    Args:
+        name: Enclosure name
+        config: Complete enclosure config
+
+    Returns:
+        EnclosurePlan: Compiled plan
+    """
+    # Pin table: every device maps to one pin or a list of pins, no pin used twice
+    device_pins = {}
+    used_pins = set()
+    _check(isinstance(config['device_pins'], dict) and config['device_pins'],
+           "{}: device_pins must be a non-empty mapping", name)
+    for device, pin in config['device_pins'].items():
+        pins = list(pin) if isinstance(pin, (list, tuple)) else [pin]
+        _check(pins and all(_is_pin(p) for p in pins), "{}: invalid pin for {}: {!r}", name, device, pin)
+        _check(not used_pins.intersection(pins), "{}: pin for {} is already in use", name, device)
+        used_pins.update(pins)
+        device_pins[device] = pins if isinstance(pin, (list, tuple)) else pin
+
+    dht_pins = tuple(config['dht_pins'])
+    _check(all(_is_pin(p) for p in dht_pins), "{}: invalid dht_pins {!r}", name, config['dht_pins'])
+    _check(len(set(dht_pins)) == len(dht_pins) and not used_pins.intersection(dht_pins),
+           "{}: dht_pins must be distinct and not used by a relay", name)
+    dht_sensors = tuple(config['dht_sensors'])
+    _check(all(isinstance(i, int) and 1 <= i <= len(dht_pins) for i in dht_sensors),
+           "{}: dht_sensors must be 1-based indexes into dht_pins", name)
+
+    # Schedule timelines: one state per hour; later windows override earlier ones
+    timelines = {}
+    for period, window in config['time_settings'].items():
+        _check(isinstance(window, dict) and 'on' in window and 'devices' in window,
+               "{}: time window {} needs 'on' and 'devices'", name, period)
+        _check(len(window['on']) == 2 and all(isinstance(h, int) and 0 <= h <= 24 for h in window['on']),
+               "{}: time window {} needs 'on' as [start_hour, end_hour]", name, period)
+        start, end = window['on']
+        if start < end:
+            hours = tuple(start <= hour < end for hour in range(24))
+        else:
+            hours = tuple(hour >= start or hour < end for hour in range(24))
+        for device in window['devices']:
+            _check(device in device_pins, "{}: time window {} uses unknown device {}", name, period, device)
+            timelines[device] = hours
+
+    # Thermostat parameters
+    thermostats = []
+    for zone, thermo in config['thermo_settings'].items():
+        _check(isinstance(thermo, dict) and 'target' in thermo and 'devices' in thermo,
+               "{}: thermostat {} needs 'target' and 'devices'", name, zone)
+        target = thermo['target']
+        _check(isinstance(target, numbers.Real) and not isinstance(target, bool) and 0 < target < 50,
+               "{}: thermostat {} target must be between 0 and 50 C", name, zone)
+        for device in thermo['devices']:
+            _check(device in device_pins, "{}: thermostat {} uses unknown device {}", name, zone, device)
+        thermostats.append((float(target), tuple(thermo['devices'])))
+
+    safe_states = {}
+    for device, state in config['safe_states'].items():
+        _check(device in device_pins, "{}: safe_states uses unknown device {}", name, device)
+        safe_states[device] = bool(state)
+
+    return EnclosurePlan(
+        name=name,
+        tags=MappingProxyType({'run': str(config['run']), 'enclosure': name}),
+        device_pins=MappingProxyType(device_pins),
+        dht_pins=dht_pins,
+        dht_sensors=dht_sensors,
+        onewire_device=config['onewire_device'],
+        timelines=MappingProxyType(timelines),
+        thermostats=tuple(thermostats),
+        safe_states=MappingProxyType(safe_states),
+    )
+
+
+def _check_shared_pins(plans: Tuple[EnclosurePlan, ...]):
+    """Make sure no GPIO pin is claimed by more than one enclosure
+
+    Args:
+        plans: Compiled plan of every enclosure
+    """
+    owners = {}
+    for plan in plans:
+        pins = list(plan.dht_pins)
+        for pin in plan.device_pins.values():
+            pins.extend(pin if isinstance(pin, list) else [pin])
+        for pin in pins:
+            _check(owners.setdefault(pin, plan.name) == plan.name,
+                   "{}: pin {} is already used by enclosure {}", plan.name, pin, owners[pin])
+
+
+def load_configs(path: Optional[str] = None, enclosures: Optional[Dict[str, Dict[str, Any]]] = None
+                 ) -> 'OrderedDict[str, Dict[str, Any]]':
+    """Complete, uncompiled config of every enclosure
+
+    Args:
+        path: Optional JSON/TOML config file overlaid on the settings
+        enclosures: Base enclosure configs (defaults to ENCLOSURES)
+
+    Returns:
+        OrderedDict: Enclosure name to config, in the order the plan compiles them
+
+    Raises:
+        ConfigError: If the file cannot be read
+    """
+    if path:
+        return enclosure_configs(merge_config(load_config_file(path), enclosures))
+    return enclosure_configs(enclosures)
+
+
+def load_plan(path: Optional[str] = None, enclosures: Optional[Dict[str, Dict[str, Any]]] = None) -> ControlPlan:
+    """Load, validate and compile the control plan
+
+    Args:
+        path: Optional JSON/TOML config file overlaid on the settings
+        enclosures: Base enclosure configs (defaults to ENCLOSURES)
+
+    Returns:
+        ControlPlan: Compiled plan
+
+    Raises:
+        ConfigError: If the file cannot be read or fails validation
+    """
+    version = None
+    if path:
+        try:
+            version = os.stat(path).st_mtime
+        except OSError as e:
+            raise ConfigError("Could not read config file {path}: {e}".format(path=path, e=e))
+    configs = load_configs(path, enclosures)
+
+    try:
+        plans = tuple(compile_enclosure(name, config) for name, config in configs.items())
+        _check_shared_pins(plans)
+    except ConfigError:
+        raise
+    except (KeyError, TypeError, ValueError) as e:
+        raise ConfigError("Invalid configuration: {!r}".format(e))
+    return ControlPlan(enclosures=plans, source=path, version=version)
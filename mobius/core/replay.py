@@ -0,0 +1,359 @@
+"""
+Replay Module
+Feeds recorded sensor history through the real control logic in virtual time
+"""
+
+import csv
+import json
+import calendar
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from mobius.core.clock import VirtualClock
+from mobius.core.controller import VivController
+from mobius.core.plan import load_configs, load_plan
+from mobius.hardware.relay import RelayManager
+from mobius.hardware.simulation import SimulatedGPIO
+from mobius.services.alerts import AlertDispatcher, AlertEngine
+
+# Column names recognised as the timestamp in history files
+TIME_COLUMNS = ('time', 'timestamp', 'datetime')
+
+
+def parse_time(value: Any) -> datetime:
+    """Parse a history timestamp into a naive local datetime
+
+    Accepts epoch numbers (s, ms, us or ns, detected by magnitude) and
+    ISO 8601 / RFC 3339 strings as written by InfluxDB.
+
+    Args:
+        value: Timestamp value from a CSV cell or JSON export
+
+    Returns:
+        datetime: Local time
+
+    Raises:
+        ValueError: If the value cannot be parsed
+    """
+    text = str(value).strip()
+    try:
+        number = float(text)
+    except ValueError:
+        number = None
+
+    if number is not None:
+        for scale in (1e9, 1e6, 1e3):
+            if abs(number) >= scale * 1e8:
+                number /= scale
+                break
+        return datetime.fromtimestamp(number)
+
+    utc = text.endswith('Z')
+    text = text.rstrip('Z').replace(' ', 'T')
+    if '.' in text:
+        # Influx writes nanoseconds, strptime only understands microseconds
+        head, fraction = text.split('.', 1)
+        text = '{}.{}'.format(head, fraction[:6])
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M'):
+        try:
+            parsed = datetime.strptime(text, fmt)
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError("Unrecognised timestamp: {}".format(value))
+
+    if utc:
+        return datetime.fromtimestamp(calendar.timegm(parsed.timetuple()) + parsed.microsecond / 1e6)
+    return parsed
+
+
+def _numeric_fields(record: Dict[str, Any]) -> Dict[str, float]:
+    """Keep only the numeric, non-boolean values of a record"""
+    fields = {}
+    for key, value in record.items():
+        if value is None or value == '' or isinstance(value, bool):
+            continue
+        try:
+            fields[key] = float(value)
+        except (TypeError, ValueError):
+            continue
+    return fields
+
+
+def load_csv_history(path: str) -> List[Tuple[datetime, Dict[str, float]]]:
+    """Load sensor history from a CSV file
+
+    The file needs a time column (see TIME_COLUMNS); every other numeric
+    column is treated as a sensor channel. This also reads the output of
+    `influx -format csv`.
+
+    Args:
+        path: CSV file path
+
+    Returns:
+        list: (time, readings) tuples sorted by time
+    """
+    history = []
+    with open(path, 'r', newline='') as f:
+        reader = csv.DictReader(f)
+        time_column = next((c for c in reader.fieldnames or [] if c.lower() in TIME_COLUMNS), None)
+        if time_column is None:
+            raise ValueError("No time column found in {}".format(path))
+
+        for row in reader:
+            timestamp = row.pop(time_column)
+            row.pop('name', None)
+            fields = _numeric_fields(row)
+            if fields:
+                history.append((parse_time(timestamp), fields))
+
+    history.sort(key=lambda item: item[0])
+    return history
+
+
+def load_influx_json_history(path: str) -> List[Tuple[datetime, Dict[str, float]]]:
+    """Load sensor history from an InfluxDB JSON export
+
+    Accepts the output of `influx -format json` or the raw /query API response.
+
+    Args:
+        path: JSON file path
+
+    Returns:
+        list: (time, readings) tuples sorted by time
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    results = data.get('results', [data]) if isinstance(data, dict) else data
+    history = []
+    for result in results:
+        for series in result.get('series', []):
+            columns = series['columns']
+            for values in series.get('values', []):
+                record = dict(zip(columns, values))
+                timestamp = record.pop('time')
+                fields = _numeric_fields(record)
+                if fields:
+                    history.append((parse_time(timestamp), fields))
+
+    history.sort(key=lambda item: item[0])
+    return history
+
+
+def load_history(path: str) -> List[Tuple[datetime, Dict[str, float]]]:
+    """Load sensor history, choosing the format from the file extension
+
+    Args:
+        path: Path to a .csv or .json history file
+
+    Returns:
+        list: (time, readings) tuples sorted by time
+    """
+    if path.lower().endswith('.json'):
+        return load_influx_json_history(path)
+    return load_csv_history(path)
+
+
+class ReplaySensorManager:
+    """Sensor manager that returns recorded readings instead of reading hardware"""
+
+    def __init__(self, temperature_channel: str = 'Water_Temp'):
+        """Initialize the replay sensor manager
+
+        Args:
+            temperature_channel: Channel used as the thermostat temperature
+        """
+        self.temperature_channel = temperature_channel
+        self.readings = {}
+
+    def update(self, readings: Dict[str, float]):
+        """Merge the next recorded readings, holding channels that are missing
+
+        Args:
+            readings: Dictionary of sensor readings
+        """
+        self.readings.update(readings)
+
+    def get_temperature(self) -> Optional[float]:
+        return self.readings.get(self.temperature_channel)
+
+    def get_all_readings(self) -> Dict[str, float]:
+        return dict(self.readings)
+
+    def cleanup(self):
+        pass
+
+
+class DecisionRecorder:
+    """Stand-in for InfluxClient that records relay decisions in memory"""
+
+    def __init__(self, clock: VirtualClock):
+        """Initialize the recorder
+
+        Args:
+            clock: Clock used to timestamp decisions
+        """
+        self.clock = clock
+        self.decisions = []
+        self.enabled = True
+
+    def log_device_state(self, device: str, state: bool, tags: Optional[Dict[str, str]] = None) -> bool:
+        if self.enabled:
+            self.decisions.append((self.clock.now(), device, bool(state)))
+        return True
+
+    def log_device_states(self, states: Dict[str, bool], tags: Optional[Dict[str, str]] = None) -> bool:
+        for device, state in states.items():
+            self.log_device_state(device, state)
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return True
+
+    def write_sensor_data(self, data: Dict[str, float], tags: Optional[Dict[str, str]] = None) -> bool:
+        return True
+
+    def make_sensor_points(self, data: Dict[str, float], tags: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        return []
+
+    def make_device_points(self, states: Dict[str, bool], tags: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        return []
+
+    def make_file_size_points(self, size: float) -> List[Dict[str, Any]]:
+        return []
+
+    def make_usage_points(self, buckets: List[Tuple[str, datetime, Dict[str, Dict[str, float]]]],
+                          tags: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        return []
+
+    def log_relay_usage(self, buckets: List[Tuple[str, datetime, Dict[str, Dict[str, float]]]],
+                        tags: Optional[Dict[str, str]] = None) -> bool:
+        return True
+
+    def log_file_size(self, size: float) -> bool:
+        return True
+
+    def write_points(self, json_body: List[Dict[str, Any]]) -> bool:
+        return True
+
+    def summarize(self, end_time: datetime) -> Dict[str, Dict[str, float]]:
+        """Compute switch counts and on-time per device
+
+        Args:
+            end_time: Time at which open ON periods are closed
+
+        Returns:
+            dict: Device name to {'switches', 'on_hours'}
+        """
+        summary = OrderedDict()
+        on_since = {}
+        for timestamp, device, state in self.decisions:
+            stats = summary.setdefault(device, {'switches': 0, 'on_hours': 0.0})
+            stats['switches'] += 1
+            if state:
+                on_since.setdefault(device, timestamp)
+            elif device in on_since:
+                stats['on_hours'] += (timestamp - on_since.pop(device)).total_seconds() / 3600
+        for device, since in on_since.items():
+            summary[device]['on_hours'] += (end_time - since).total_seconds() / 3600
+        return summary
+
+    def write_csv(self, path: str):
+        """Write recorded decisions as time,device,state rows
+
+        Args:
+            path: Output CSV path
+        """
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['time', 'device', 'state'])
+            for timestamp, device, state in self.decisions:
+                writer.writerow([timestamp.isoformat(), device, int(state)])
+
+
+def run_replay(history_path: str, output_path: Optional[str] = None,
+               config_path: Optional[str] = None) -> Dict[str, Any]:
+    """Replay recorded sensor history through the controller's relay logic
+
+    Sensor readings come from the history file, relays are driven on a
+    simulated GPIO and file maintenance is skipped. Relay decisions are
+    timestamped in virtual time and optionally written to a CSV file.
+    Only the first enclosure (by name) is replayed.
+
+    Args:
+        history_path: Path to a CSV or InfluxDB JSON history file
+        output_path: Optional path for the relay decision CSV
+        config_path: Optional JSON/TOML config file to replay against
+
+    Returns:
+        dict: Replay summary with record counts and per-device statistics
+    """
+    logger = logging.getLogger('mobius.core.replay')
+    history = load_history(history_path)
+    if not history:
+        raise ValueError("No readings found in {}".format(history_path))
+    sensors = ReplaySensorManager()
+    # Without the thermostat input every heater decision would be made on no data
+    if not any(sensors.temperature_channel in readings for _, readings in history):
+        raise ValueError("{path} has no {channel} readings to drive the thermostat".format(
+            path=history_path, channel=sensors.temperature_channel))
+
+    clock = VirtualClock(start=history[0][0])
+    recorder = DecisionRecorder(clock)
+
+    # Only the first enclosure is replayed, and the controller is given only
+    # that one: any other enclosure would be built on the real hardware
+    configs = load_configs(config_path)
+    name = next(iter(configs))
+    if len(configs) > 1:
+        logger.info("Replaying enclosure {name} only ({count} configured)".format(name=name, count=len(configs)))
+    enclosures = {name: configs[name]}
+    plan = load_plan(enclosures=enclosures).enclosures[0]
+
+    # Initial relay setup is not a decision, so don't record it
+    recorder.enabled = False
+    relays = RelayManager(gpio=SimulatedGPIO(), influx_client=recorder, settle_delay=0, clock=clock,
+                          device_pins=plan.device_pins, safe_states=plan.safe_states)
+    recorder.enabled = True
+
+    # Nothing replayed may reach the live controller's outputs: no alert
+    # notifications, live state segment, dashboard files or watchdog
+    controller = VivController(
+        clock=clock,
+        influx_client=recorder,
+        sensor_manager=sensors,
+        relay_manager=relays,
+        enclosures=enclosures,
+        alert_engine=AlertEngine(dispatcher=AlertDispatcher(notifiers=[]), clock=clock),
+        live_state=False,
+        dashboard=False,
+        watchdog=False
+    )
+    controller.scheduler.remove('files')
+    controller.scheduler.remove('alerts')
+
+    logger.info("Replaying {count} records from {start} to {end}".format(
+        count=len(history), start=history[0][0], end=history[-1][0]))
+
+    for timestamp, readings in history:
+        if timestamp > clock.now():
+            clock.set(timestamp)
+        sensors.update(readings)
+        controller.tick(clock.now())
+
+    end_time = clock.now()
+    if output_path:
+        recorder.write_csv(output_path)
+        logger.info("Wrote {count} relay decisions to {path}".format(count=len(recorder.decisions), path=output_path))
+
+    return {
+        'records': len(history),
+        'start': history[0][0],
+        'end': end_time,
+        'decisions': len(recorder.decisions),
+        'devices': recorder.summarize(end_time),
+    }
@@ -0,0 +1,190 @@
+"""
+Samples Module
+Compact, preallocated sensor sample batches shared by the data pipeline
+"""
+
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+MISSING = float('nan')
+
+
+class ChannelTable:
+    """Interned field names of one sensor manager, grouped by channel
+
+    Field IDs are positions in every SampleBatch built from the table,
+    so sinks can map them to their own slots once instead of looking up
+    names on every tick.
+    """
+
+    __slots__ = ('names', 'ids', 'channels', 'channel_ids', '_empty')
+
+    def __init__(self, channels: 'OrderedDict[str, Sequence[str]]'):
+        """Initialize the table
+
+        Args:
+            channels: Channel name to the field names it produces, in order
+        """
+        self.names = []
+        self.ids = {}
+        self.channels = list(channels)
+        self.channel_ids = OrderedDict()
+        for channel, fields in channels.items():
+            ids = []
+            for field in fields:
+                if field not in self.ids:
+                    self.ids[field] = len(self.names)
+                    self.names.append(field)
+                ids.append(self.ids[field])
+            self.channel_ids[channel] = tuple(ids)
+        self._empty = array('d', [MISSING]) * len(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def batch(self, timestamp: Optional[float] = None) -> 'SampleBatch':
+        """New batch with every field missing"""
+        return SampleBatch(self, timestamp)
+
+
+class SampleBatch(Mapping):
+    """Field values of one read, in an array indexed by ChannelTable field ID
+
+    Missing fields are NaN. A batch is allocated once and refilled on
+    every tick; it reads like a dict of the fields that are present, so
+    consumers that only iterate items() need no changes. Batches are
+    reused, so a consumer keeping values past the current tick must
+    copy() them or call to_dict().
+    """
+
+    __slots__ = ('table', 'data', 'timestamp')
+
+    def __init__(self, table: ChannelTable, timestamp: Optional[float] = None):
+        """Initialize an empty batch
+
+        Args:
+            table: Field layout of the batch
+            timestamp: Unix time the values were read
+        """
+        self.table = table
+        self.data = array('d', table._empty)
+        self.timestamp = timestamp
+
+    def __getitem__(self, field: str) -> float:
+        value = self.data[self.table.ids[field]]
+        if value != value:
+            raise KeyError(field)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        for name, value in zip(self.table.names, self.data):
+            if value == value:
+                yield name
+
+    def __len__(self) -> int:
+        return sum(1 for value in self.data if value == value)
+
+    def __bool__(self) -> bool:
+        for value in self.data:
+            if value == value:
+                return True
+        return False
+
+    def __contains__(self, field) -> bool:
+        index = self.table.ids.get(field)
+        if index is None:
+            return False
+        value = self.data[index]
+        return value == value
+
+    def __repr__(self) -> str:
+        return 'SampleBatch({!r})'.format(self.to_dict())
+
+    def get(self, field: str, default=None):
+        index = self.table.ids.get(field)
+        if index is None:
+            return default
+        value = self.data[index]
+        return value if value == value else default
+
+    def items(self) -> Iterator[Tuple[str, float]]:
+        for name, value in zip(self.table.names, self.data):
+            if value == value:
+                yield name, value
+
+    def channel_items(self, channel: str) -> Iterator[Tuple[str, float]]:
+        """Present fields of one channel"""
+        names, data = self.table.names, self.data
+        for index in self.table.channel_ids[channel]:
+            value = data[index]
+            if value == value:
+                yield names[index], value
+
+    def to_dict(self) -> Dict[str, float]:
+        """Plain dict of the present fields, e.g. for JSON or InfluxDB points"""
+        return {name: value for name, value in zip(self.table.names, self.data) if value == value}
+
+    def set(self, field_id: int, value: float):
+        self.data[field_id] = value
+
+    def clear(self, ids: Optional[Iterable[int]] = None):
+        """Mark fields missing
+
+        Args:
+            ids: Field IDs to clear (defaults to all)
+        """
+        if ids is None:
+            self.data[:] = self.table._empty
+        else:
+            for index in ids:
+                self.data[index] = MISSING
+
+    def copy_from(self, other: 'SampleBatch', ids: Optional[Iterable[int]] = None):
+        """Replace values with another batch's, including missing ones
+
+        Args:
+            other: Batch with the same table
+            ids: Field IDs to copy (defaults to all)
+        """
+        if ids is None:
+            self.data[:] = other.data
+            self.timestamp = other.timestamp
+        else:
+            data, source = self.data, other.data
+            for index in ids:
+                data[index] = source[index]
+
+    def update(self, other):
+        """Overwrite fields with the present values of another batch or mapping"""
+        data = self.data
+        if isinstance(other, SampleBatch) and other.table is self.table:
+            for index, value in enumerate(other.data):
+                if value == value:
+                    data[index] = value
+            return
+        ids = self.table.ids
+        for field, value in other.items():
+            index = ids.get(field)
+            if index is not None and value is not None:
+                data[index] = value
+
+    def copy(self) -> 'SampleBatch':
+        batch = SampleBatch(self.table, self.timestamp)
+        batch.data[:] = self.data
+        return batch
+
+
+def slot_map(table: ChannelTable, slots: Dict, key=None) -> List:
+    """Map a table's field IDs to a consumer's slots
+
+    Args:
+        table: Field layout
+        slots: Consumer key to slot
+        key: Optional function turning a field name into the consumer key
+
+    Returns:
+        list: Slot of each field ID (None where the consumer has none)
+    """
+    return [slots.get(key(name) if key else name) for name in table.names]
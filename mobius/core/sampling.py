@@ -0,0 +1,142 @@
+"""
+Adaptive Sampling Module
+Schedules each sensor channel on its own interval, driven by how its signal changes
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from mobius.config import settings
+from mobius.core.clock import system_clock
+from mobius.core.samples import SampleBatch
+
+
+class ChannelState:
+    """Sampling state of one sensor channel"""
+
+    def __init__(self, name: str, interval: float):
+        """Initialize the channel
+
+        Args:
+            name: Channel name (e.g. 'Water_Temp' or 'DHT1')
+            interval: Initial seconds between reads
+        """
+        self.name = name
+        self.interval = interval
+        self.next_due = None
+        self.reads = 0
+        self.values = {}
+        self.times = {}
+
+
+class AdaptiveSampler:
+    """Per-channel read scheduling within min/max bounds
+
+    A channel is read about every time one of its fields is expected to
+    move by a step (SAMPLING_TEMP_STEP or SAMPLING_HUMIDITY_STEP), and more
+    often while its temperature is away from the thermostat target or
+    heading towards it. Smaller changes count as noise, and flat channels
+    back off by SAMPLING_BACKOFF per read up to the maximum interval.
+    """
+
+    def __init__(self, channels: Iterable[str], clock=None, targets: Optional[Dict[str, float]] = None,
+                 min_interval: Optional[float] = None, max_interval: Optional[float] = None):
+        """Initialize the sampler
+
+        Args:
+            channels: Channel names to schedule
+            clock: Optional clock providing monotonic()
+            targets: Field name to thermostat target (e.g. {'Water_Temp': 34})
+            min_interval: Shortest interval (defaults to SAMPLING_MIN_INTERVAL)
+            max_interval: Longest interval (defaults to SAMPLING_MAX_INTERVAL)
+        """
+        self.logger = logging.getLogger('mobius.core.sampling')
+        self.clock = clock or system_clock
+        self.targets = dict(targets or {})
+        self.min_interval = settings.SAMPLING_MIN_INTERVAL if min_interval is None else min_interval
+        self.max_interval = settings.SAMPLING_MAX_INTERVAL if max_interval is None else max_interval
+
+        initial = min(max(settings.SENSOR_READ_INTERVAL, self.min_interval), self.max_interval)
+        self.channels = OrderedDict((name, ChannelState(name, initial)) for name in channels)
+
+    def due(self) -> List[str]:
+        """Channels whose next read is due
+
+        Returns:
+            list: Channel names
+        """
+        now = self.clock.monotonic()
+        return [name for name, state in self.channels.items()
+                if state.next_due is None or now >= state.next_due]
+
+    def update(self, channel: str, readings: Dict[str, float]) -> float:
+        """Record a read and schedule the channel's next one
+
+        Args:
+            channel: Channel name
+            readings: Field name to value from this read (may be empty on failure),
+                or a SampleBatch of which only the channel's fields are used
+
+        Returns:
+            float: Seconds until the channel's next read
+        """
+        state = self.channels[channel]
+        now = self.clock.monotonic()
+        state.reads += 1
+
+        # Flat signals back off gradually towards the maximum interval
+        intervals = [state.interval * settings.SAMPLING_BACKOFF]
+        read = False
+        items = readings.channel_items(channel) if isinstance(readings, SampleBatch) else readings.items()
+        for field, raw_value in items:
+            read = True
+            # Rates come from exponentially smoothed values so sensor noise is not mistaken for change
+            last_value = state.values.get(field)
+            last_time = state.times.get(field)
+            if last_value is None:
+                value = raw_value
+            else:
+                value = last_value + settings.SAMPLING_SMOOTHING * (raw_value - last_value)
+            rate = 0.0
+            if last_value is not None and now > last_time:
+                step = settings.SAMPLING_HUMIDITY_STEP if field.endswith('_Hum') else settings.SAMPLING_TEMP_STEP
+                delta = abs(value - last_value)
+                # Smaller changes are treated as noise
+                if delta >= step:
+                    rate = delta / (now - last_time)
+                    intervals.append(step / rate)
+            state.values[field] = value
+            state.times[field] = now
+
+            target = self.targets.get(field)
+            if target is not None:
+                error = abs(value - target)
+                band = settings.SAMPLING_TARGET_BAND
+                if error > band:
+                    # Far from the setpoint: the thermostat is working, so watch closely
+                    intervals.append(self.max_interval * band / error)
+                if rate > 0 and abs(last_value - target) > error:
+                    # Approaching the setpoint: read at least twice before crossing it
+                    intervals.append(error / rate / 2)
+
+        if read:
+            state.interval = min(max(min(intervals), self.min_interval), self.max_interval)
+        state.next_due = now + state.interval
+        return state.interval
+
+    def intervals(self) -> Dict[str, float]:
+        """Current interval of every channel
+
+        Returns:
+            dict: Channel name to seconds
+        """
+        return {name: state.interval for name, state in self.channels.items()}
+
+    def stats(self) -> Dict[str, int]:
+        """Reads per channel
+
+        Returns:
+            dict: Channel name to read count
+        """
+        return {name: state.reads for name, state in self.channels.items()}
@@ -0,0 +1,107 @@
+"""
+Scheduler Module
+Handles timing of the controller's periodic operations
+"""
+
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+
+class ScheduledTask:
+    """A named operation that runs at a fixed interval"""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], None]):
+        """Initialize the task
+
+        Args:
+            name: Task name used in logs
+            interval: Seconds between runs
+            func: Callable to run
+        """
+        self.name = name
+        self.interval = timedelta(seconds=interval)
+        self.func = func
+        self.last_run = datetime.min
+
+    def is_due(self, current_time: datetime) -> bool:
+        """Check if the task should run at the given time
+
+        Args:
+            current_time: datetime object
+
+        Returns:
+            bool: True if the interval has elapsed since the last run
+        """
+        return current_time >= self.last_run + self.interval
+
+
+class Scheduler:
+    """Runs scheduled tasks in registration order when they are due"""
+
+    def __init__(self, monitor=None):
+        """Initialize the scheduler
+
+        Args:
+            monitor: Optional DeadlineMonitor told when each task starts and finishes
+        """
+        self.logger = logging.getLogger('mobius.core.scheduler')
+        self.tasks = OrderedDict()
+        self.monitor = monitor
+
+    def add(self, name: str, interval: float, func: Callable[[], None]) -> ScheduledTask:
+        """Register a periodic task
+
+        Args:
+            name: Task name
+            interval: Seconds between runs
+            func: Callable to run
+
+        Returns:
+            ScheduledTask: The registered task
+        """
+        task = ScheduledTask(name, interval, func)
+        self.tasks[name] = task
+        if self.monitor is not None:
+            self.monitor.watch(name, interval)
+        return task
+
+    def remove(self, name: str) -> Optional[ScheduledTask]:
+        """Unregister a task
+
+        Args:
+            name: Task name
+
+        Returns:
+            ScheduledTask: The removed task, or None if it was not registered
+        """
+        if self.monitor is not None:
+            self.monitor.unwatch(name)
+        return self.tasks.pop(name, None)
+
+    def run_pending(self, current_time: datetime) -> List[str]:
+        """Run every task that is due
+
+        Args:
+            current_time: datetime of this iteration of the control loop
+
+        Returns:
+            list: Names of the tasks that ran
+        """
+        ran = []
+        for task in list(self.tasks.values()):
+            if not task.is_due(current_time):
+                continue
+            task.last_run = current_time
+            ran.append(task.name)
+            if self.monitor is not None:
+                self.monitor.task_started(task.name)
+            try:
+                task.func()
+            except Exception as e:
+                self.logger.error("Error processing {name}: {e}".format(name=task.name, e=e))
+            finally:
+                if self.monitor is not None:
+                    self.monitor.task_finished(task.name)
+        return ran
@@ -0,0 +1,87 @@
+"""
+Shutdown Coordinator Module
+Runs shutdown phases in order under an overall deadline
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class ShutdownCoordinator:
+    """Runs named shutdown phases, each bounded by the remaining deadline
+
+    A phase that overruns is abandoned (it keeps running in a daemon thread)
+    so later phases, and the process exit, are never blocked by it.
+    """
+
+    def __init__(self, timeout: float):
+        """Initialize the coordinator
+
+        Args:
+            timeout: Total seconds allowed for all phases
+        """
+        self.logger = logging.getLogger('mobius.core.shutdown')
+        self.timeout = timeout
+        self.phases = []
+
+    def add_phase(self, name: str, func: Callable[[float], None], max_time: Optional[float] = None):
+        """Register a shutdown phase
+
+        Args:
+            name: Phase name used in logs
+            func: Callable taking the seconds available to the phase
+            max_time: Optional cap on this phase's share of the deadline
+        """
+        self.phases.append((name, func, max_time))
+
+    def run(self) -> Dict[str, float]:
+        """Run every phase in registration order
+
+        Returns:
+            dict: Phase name to seconds taken (None if the phase overran)
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        timings = OrderedDict()
+
+        for name, func, max_time in self.phases:
+            remaining = max(0.0, deadline - time.monotonic())
+            budget = min(remaining, max_time) if max_time is not None else remaining
+            timings[name] = self._run_phase(name, func, budget)
+
+        total = time.monotonic() - started
+        self.logger.info("Shutdown finished in {total:.2f}s ({phases})".format(
+            total=total,
+            phases=', '.join('{} {}'.format(name, 'timed out' if t is None else '{:.2f}s'.format(t))
+                             for name, t in timings.items())
+        ))
+        return timings
+
+    def _run_phase(self, name: str, func: Callable[[float], None], budget: float) -> Optional[float]:
+        """Run one phase in a worker thread, waiting at most budget seconds"""
+        errors = []
+
+        def target():
+            try:
+                func(budget)
+            except Exception as e:
+                errors.append(e)
+
+        phase_start = time.monotonic()
+        worker = threading.Thread(target=target, name='shutdown-{}'.format(name), daemon=True)
+        worker.start()
+        worker.join(budget)
+        elapsed = time.monotonic() - phase_start
+
+        if worker.is_alive():
+            self.logger.error("Shutdown phase '{name}' exceeded {budget:.2f}s, continuing".format(
+                name=name, budget=budget))
+            return None
+        if errors:
+            self.logger.error("Shutdown phase '{name}' failed: {e}".format(name=name, e=errors[0]))
+        else:
+            self.logger.info("Shutdown phase '{name}' took {elapsed:.2f}s".format(name=name, elapsed=elapsed))
+        return elapsed
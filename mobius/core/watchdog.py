@@ -0,0 +1,360 @@
+"""
+Watchdog Module
+Tracks scheduled task deadlines and feeds a hardware watchdog while they are met
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from mobius.config import settings
+from mobius.core.clock import system_clock
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised when scheduled tasks overrun their deadlines or stop running"""
+
+    def __init__(self, overruns: Dict[str, str]):
+        """Initialize the exception
+
+        Args:
+            overruns: Task name to a description of how it overran
+        """
+        self.overruns = overruns
+        super().__init__("Deadline exceeded: {}".format('; '.join(
+            '{} {}'.format(name, reason) for name, reason in overruns.items())))
+
+
+class TaskHeartbeat:
+    """Start and finish times of one scheduled task"""
+
+    def __init__(self, name: str, interval: float, deadline: float, now: float):
+        """Initialize the heartbeat
+
+        Args:
+            name: Task name
+            interval: Seconds between runs
+            deadline: Longest a single run may take (seconds)
+            now: Current monotonic time, the reference until the first run
+        """
+        self.name = name
+        self.interval = interval
+        self.deadline = deadline
+        self.started = now
+        self.finished = None
+        self.running = False
+        self.overruns = 0
+
+
+class DeviceWatchdog:
+    """Linux watchdog device; the system resets if it is not fed in time"""
+
+    def __init__(self, path: str = '/dev/watchdog'):
+        """Initialize the watchdog
+
+        Args:
+            path: Watchdog device node
+        """
+        self.logger = logging.getLogger('mobius.core.watchdog')
+        self.path = path
+        self.feeds = 0
+        self._fd = None
+
+    def open(self):
+        """Open (and so arm) the device"""
+        self._fd = os.open(self.path, os.O_WRONLY)
+        self.logger.info("Watchdog {} armed".format(self.path))
+
+    def feed(self):
+        """Reset the device's countdown"""
+        if self._fd is not None:
+            os.write(self._fd, b'\0')
+            self.feeds += 1
+
+    def close(self):
+        """Disarm the device with the magic close character, then close it"""
+        if self._fd is None:
+            return
+        try:
+            os.write(self._fd, b'V')
+        finally:
+            os.close(self._fd)
+            self._fd = None
+        self.logger.info("Watchdog {} disarmed".format(self.path))
+
+
+class SimulatedWatchdog:
+    """Stand-in watchdog that records the resets a real device would have made"""
+
+    def __init__(self, timeout: Optional[float] = None, clock=None):
+        """Initialize the watchdog
+
+        Args:
+            timeout: Seconds without a feed before a reset (defaults to WATCHDOG_TIMEOUT)
+            clock: Optional clock providing monotonic()
+        """
+        self.logger = logging.getLogger('mobius.core.watchdog')
+        self.timeout = settings.WATCHDOG_TIMEOUT if timeout is None else timeout
+        self.clock = clock or system_clock
+        self.feeds = 0
+        self.resets = 0
+        self.armed = False
+        self.last_feed = None
+
+    @property
+    def expired(self) -> bool:
+        """True if a real watchdog would have reset the system by now"""
+        return self.armed and self.clock.monotonic() - self.last_feed > self.timeout
+
+    def open(self):
+        self.armed = True
+        self.last_feed = self.clock.monotonic()
+
+    def feed(self):
+        if self.expired:
+            self.resets += 1
+            self.logger.error("Simulated watchdog expired {:.1f}s after the last feed".format(
+                self.clock.monotonic() - self.last_feed))
+        self.last_feed = self.clock.monotonic()
+        self.feeds += 1
+
+    def close(self):
+        if self.expired:
+            self.resets += 1
+        self.armed = False
+
+
+def make_watchdog(device: Optional[str] = None, clock=None):
+    """Build the configured watchdog
+
+    Args:
+        device: Device path, 'simulated', or '' for none (defaults to WATCHDOG_DEVICE)
+        clock: Optional clock for the simulated watchdog
+
+    Returns:
+        DeviceWatchdog or SimulatedWatchdog, or None if disabled
+    """
+    device = settings.WATCHDOG_DEVICE if device is None else device
+    if not device:
+        return None
+    if device == 'simulated':
+        return SimulatedWatchdog(clock=clock)
+    return DeviceWatchdog(device)
+
+
+class DeadlineMonitor:
+    """Checks task heartbeats on its own thread and reacts to stalls
+
+    The scheduler reports when each task starts and finishes. A task
+    overruns if one run takes longer than its deadline, or if it has not
+    started within its interval plus deadline (the control loop is stuck
+    elsewhere or has died). On the first overrun of a critical (control)
+    task on_overrun is called with the DeadlineExceeded, and the watchdog
+    is no longer fed until every critical task meets its deadlines again.
+    Other tasks that overrun are only reported, through on_degraded and
+    on_restored, so slow housekeeping never drives the relays or resets
+    the system.
+    """
+
+    def __init__(self, clock=None, watchdog=None, on_overrun: Optional[Callable[[DeadlineExceeded], None]] = None,
+                 on_recover: Optional[Callable[[], None]] = None, check_interval: Optional[float] = None,
+                 deadlines: Optional[Dict[str, float]] = None, critical: Optional[Iterable[str]] = None,
+                 on_degraded: Optional[Callable[[DeadlineExceeded], None]] = None,
+                 on_restored: Optional[Callable[[], None]] = None):
+        """Initialize the monitor
+
+        Args:
+            clock: Optional clock providing monotonic()
+            watchdog: Optional watchdog fed while critical deadlines are met (see make_watchdog)
+            on_overrun: Called once when critical tasks start overrunning
+            on_recover: Called once when every critical task meets its deadline again
+            check_interval: Seconds between checks (defaults to WATCHDOG_CHECK_INTERVAL)
+            deadlines: Task name to deadline in seconds (defaults to TASK_DEADLINES)
+            critical: Tasks whose overruns trigger failsafe and stop the watchdog (defaults to CRITICAL_TASKS)
+            on_degraded: Called with the new overruns when other tasks start overrunning
+            on_restored: Called once when every other task meets its deadline again
+        """
+        self.logger = logging.getLogger('mobius.core.watchdog')
+        self.clock = clock or system_clock
+        self.watchdog = watchdog
+        self.on_overrun = on_overrun
+        self.on_recover = on_recover
+        self.check_interval = settings.WATCHDOG_CHECK_INTERVAL if check_interval is None else check_interval
+        self.deadlines = settings.TASK_DEADLINES if deadlines is None else deadlines
+        self.critical = frozenset(settings.CRITICAL_TASKS if critical is None else critical)
+        self.on_degraded = on_degraded
+        self.on_restored = on_restored
+
+        self.tasks = OrderedDict()
+        self.healthy = True
+        self.lagging = set()
+        self.overrun_count = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, name: str, interval: float):
+        """Start tracking a task
+
+        Args:
+            name: Task name
+            interval: Seconds between runs
+        """
+        deadline = self.deadlines.get(name, settings.TASK_DEFAULT_DEADLINE)
+        with self._lock:
+            self.tasks[name] = TaskHeartbeat(name, interval, deadline, self.clock.monotonic())
+
+    def unwatch(self, name: str):
+        """Stop tracking a task"""
+        with self._lock:
+            self.tasks.pop(name, None)
+
+    def task_started(self, name: str):
+        """Record that a task run began"""
+        with self._lock:
+            heartbeat = self.tasks.get(name)
+            if heartbeat is not None:
+                heartbeat.started = self.clock.monotonic()
+                heartbeat.running = True
+
+    def task_finished(self, name: str):
+        """Record that a task run ended"""
+        with self._lock:
+            heartbeat = self.tasks.get(name)
+            if heartbeat is not None:
+                heartbeat.finished = self.clock.monotonic()
+                heartbeat.running = False
+
+    def check(self):
+        """Check every task's heartbeat
+
+        Raises:
+            DeadlineExceeded: If any task is overrunning
+        """
+        now = self.clock.monotonic()
+        overruns = OrderedDict()
+        with self._lock:
+            for heartbeat in self.tasks.values():
+                elapsed = now - heartbeat.started
+                if heartbeat.running and elapsed > heartbeat.deadline:
+                    overruns[heartbeat.name] = "running for {:.1f}s (deadline {:g}s)".format(
+                        elapsed, heartbeat.deadline)
+                elif not heartbeat.running and elapsed > heartbeat.interval + heartbeat.deadline:
+                    overruns[heartbeat.name] = "not started for {:.1f}s (every {:g}s)".format(
+                        elapsed, heartbeat.interval)
+        if overruns:
+            raise DeadlineExceeded(overruns)
+
+    def poll(self) -> bool:
+        """Check deadlines, react to changes and feed the watchdog if healthy
+
+        Returns:
+            bool: True if every critical task is meeting its deadline
+        """
+        try:
+            self.check()
+            overruns = {}
+        except DeadlineExceeded as e:
+            overruns = e.overruns
+        self._update_lagging(OrderedDict(
+            (name, reason) for name, reason in overruns.items() if name not in self.critical))
+
+        critical = OrderedDict((name, reason) for name, reason in overruns.items() if name in self.critical)
+        if critical:
+            if self.healthy:
+                error = DeadlineExceeded(critical)
+                self.healthy = False
+                self.overrun_count += 1
+                with self._lock:
+                    for name in critical:
+                        self.tasks[name].overruns += 1
+                self.logger.critical(str(error))
+                if self.on_overrun is not None:
+                    self.on_overrun(error)
+            return False
+
+        if not self.healthy:
+            self.healthy = True
+            self.logger.warning("Control tasks are meeting their deadlines again")
+            if self.on_recover is not None:
+                self.on_recover()
+        if self.watchdog is not None:
+            self.watchdog.feed()
+        return True
+
+    def _update_lagging(self, overruns: Dict[str, str]):
+        """Report non-critical tasks that started or stopped overrunning"""
+        new = OrderedDict((name, reason) for name, reason in overruns.items() if name not in self.lagging)
+        if new:
+            error = DeadlineExceeded(new)
+            with self._lock:
+                for name in new:
+                    self.tasks[name].overruns += 1
+            self.logger.error("{} (relays and watchdog unaffected)".format(error))
+            if self.on_degraded is not None:
+                self.on_degraded(error)
+        if self.lagging and not overruns:
+            self.logger.warning("Non-critical tasks are meeting their deadlines again")
+            if self.on_restored is not None:
+                self.on_restored()
+        self.lagging = set(overruns)
+
+    def start(self):
+        """Arm the watchdog and start checking on a background thread"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            now = self.clock.monotonic()
+            for heartbeat in self.tasks.values():
+                if not heartbeat.running:
+                    heartbeat.started = now
+        if self.watchdog is not None:
+            self.watchdog.open()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='deadline-monitor', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self.logger.error("Deadline monitor error: {}".format(e))
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop checking and disarm the watchdog
+
+        Args:
+            timeout: Seconds to wait for the monitor thread
+        """
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+        if self.watchdog is not None:
+            self.watchdog.close()
+
+    def status(self) -> Dict[str, Any]:
+        """Summarize task heartbeats for status endpoints
+
+        Returns:
+            dict: Health flag, overrun count and per-task heartbeat ages
+        """
+        now = self.clock.monotonic()
+        with self._lock:
+            tasks = {
+                name: {
+                    'deadline': heartbeat.deadline,
+                    'running': heartbeat.running,
+                    'since_start': round(now - heartbeat.started, 1),
+                    'overruns': heartbeat.overruns,
+                }
+                for name, heartbeat in self.tasks.items()
+            }
+        status = {'healthy': self.healthy, 'overruns': self.overrun_count, 'lagging': sorted(self.lagging),
+                  'tasks': tasks}
+        if self.watchdog is not None:
+            status['watchdog_feeds'] = self.watchdog.feeds
+        return status
@@ -0,0 +1,3 @@
+"""
+Hardware drivers for Reptile Vivarium Monitoring System
+"""
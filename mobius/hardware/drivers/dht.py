@@ -0,0 +1,169 @@
+"""
+DHT Driver Module
+Rate-limited, non-blocking DHT reads with a last-good value cache per pin
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from typing import Dict, Iterable, Optional, Tuple
+
+from mobius.config import settings
+from mobius.core.clock import system_clock
+
+# humidity in %, temperature in Celsius; age is seconds since the values were
+# read and fresh is True if they came from this call's bus read
+DHTReading = namedtuple('DHTReading', ['humidity', 'temperature', 'age', 'fresh'])
+
+
+class PinState:
+    """Cache and statistics of one DHT pin"""
+
+    def __init__(self, pin: int):
+        """Initialize the pin
+
+        Args:
+            pin: GPIO pin of the sensor
+        """
+        self.pin = pin
+        self.humidity = None
+        self.temperature = None
+        self.read_time = None
+        self.next_attempt = None
+        self.failures = 0
+        self.attempts = 0
+        self.successes = 0
+        self.stale_logged = False
+        # Held across the bus read, so one pin is read by one caller at a time
+        self.lock = threading.Lock()
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / float(self.attempts) if self.attempts else 0.0
+
+
+class DHTReader:
+    """Per-pin DHT reader that never blocks on the sensor
+
+    Each call makes at most one read attempt (Adafruit_DHT.read rather
+    than read_retry's up to 15 attempts with 2 s sleeps), and only if the
+    pin's minimum poll interval has passed. Otherwise, or if the attempt
+    fails, the last good value is returned with its age. Failed pins are
+    retried after an exponentially growing delay.
+
+    Each pin has its own lock for the bus read; the shared lock only
+    guards the cached values and statistics, so stats() and reads of
+    other pins never wait on a sensor.
+    """
+
+    def __init__(self, dht, pins: Iterable[int] = (), clock=None, sensor_type: Optional[int] = None,
+                 min_interval: Optional[float] = None, max_backoff: Optional[float] = None):
+        """Initialize the reader
+
+        Args:
+            dht: DHT driver with the Adafruit_DHT interface (e.g. SimulatedDHT)
+            pins: GPIO pins to track from the start (others are added on first read)
+            clock: Optional clock providing monotonic()
+            sensor_type: Adafruit_DHT sensor type (defaults to dht.DHT11)
+            min_interval: Shortest time between reads of a pin (defaults to DHT_MIN_INTERVAL)
+            max_backoff: Longest delay before retrying a failing pin (defaults to DHT_MAX_BACKOFF)
+        """
+        self.logger = logging.getLogger('mobius.hardware.drivers.dht')
+        self.dht = dht
+        self.clock = clock or system_clock
+        self.sensor_type = dht.DHT11 if sensor_type is None else sensor_type
+        self.min_interval = settings.DHT_MIN_INTERVAL if min_interval is None else min_interval
+        self.max_backoff = settings.DHT_MAX_BACKOFF if max_backoff is None else max_backoff
+        self.pins = {pin: PinState(pin) for pin in pins}
+        self._lock = threading.Lock()
+
+    def _attempt(self, state: PinState) -> Tuple[Optional[float], Optional[float]]:
+        """Make a single read attempt on the bus, without holding the shared lock
+
+        Returns:
+            tuple: (humidity, temperature), either of which may be None
+        """
+        try:
+            return self.dht.read(self.sensor_type, state.pin)
+        except Exception as e:
+            self.logger.debug("DHT read on pin {pin} raised: {e}".format(pin=state.pin, e=e))
+            return None, None
+
+    def _record(self, state: PinState, now: float, humidity: Optional[float],
+                temperature: Optional[float]) -> bool:
+        """Record an attempt's result and schedule the next one (shared lock held)
+
+        Returns:
+            bool: True if the sensor returned plausible values
+        """
+        state.attempts += 1
+        if humidity is None or temperature is None or not 0 <= humidity <= 100 or not -40 <= temperature <= 80:
+            state.failures += 1
+            backoff = self.min_interval * 2 ** (state.failures - 1)
+            state.next_attempt = now + min(max(backoff, self.min_interval), self.max_backoff)
+            return False
+
+        if state.stale_logged:
+            self.logger.info("DHT sensor on pin {} is responding again".format(state.pin))
+        state.humidity = humidity
+        state.temperature = temperature
+        state.read_time = now
+        state.failures = 0
+        state.successes += 1
+        state.stale_logged = False
+        state.next_attempt = now + self.min_interval
+        return True
+
+    def read(self, pin: int, max_age: Optional[float] = None) -> Optional[DHTReading]:
+        """Latest humidity and temperature of a pin
+
+        Args:
+            pin: GPIO pin of the sensor
+            max_age: Oldest cached value to return (defaults to DHT_MAX_AGE)
+
+        Returns:
+            DHTReading: Values with their age, or None if there is no good value young enough
+        """
+        max_age = settings.DHT_MAX_AGE if max_age is None else max_age
+        with self._lock:
+            state = self.pins.get(pin)
+            if state is None:
+                state = self.pins[pin] = PinState(pin)
+
+        fresh = False
+        with state.lock:
+            now = self.clock.monotonic()
+            if state.next_attempt is None or now >= state.next_attempt:
+                humidity, temperature = self._attempt(state)
+                now = self.clock.monotonic()
+                with self._lock:
+                    fresh = self._record(state, now, humidity, temperature)
+
+        with self._lock:
+            if state.read_time is None or now - state.read_time > max_age:
+                if not state.stale_logged:
+                    self.logger.warning("DHT sensor on pin {pin} has no good reading from the last {age:g}s".format(
+                        pin=pin, age=max_age))
+                    state.stale_logged = True
+                return None
+            # Another caller may have read the pin since now was taken
+            return DHTReading(state.humidity, state.temperature, max(0.0, now - state.read_time), fresh)
+
+    def stats(self) -> Dict[int, Dict[str, float]]:
+        """Read statistics per pin
+
+        Returns:
+            dict: Pin to attempts, successes, success rate, consecutive failures and value age
+        """
+        now = self.clock.monotonic()
+        with self._lock:
+            return {
+                pin: {
+                    'attempts': state.attempts,
+                    'successes': state.successes,
+                    'success_rate': round(state.success_rate, 3),
+                    'consecutive_failures': state.failures,
+                    'age': round(now - state.read_time, 1) if state.read_time is not None else None,
+                }
+                for pin, state in sorted(self.pins.items())
+            }
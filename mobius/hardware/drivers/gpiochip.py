@@ -0,0 +1,336 @@
+"""
+GPIO Character Device Driver Module
+RPi.GPIO-compatible outputs on the Linux GPIO character device (v2 uAPI)
+"""
+
+import os
+import time
+import ctypes
+import logging
+import threading
+from typing import List, Optional
+
+from mobius.config import settings
+from mobius.utils.helpers import optional_import
+
+# Constants and structures from <linux/gpio.h>
+GPIO_MAX_NAME_SIZE = 32
+GPIO_V2_LINES_MAX = 64
+GPIO_V2_LINE_NUM_ATTRS_MAX = 10
+
+GPIO_V2_LINE_FLAG_INPUT = 1 << 2
+GPIO_V2_LINE_FLAG_OUTPUT = 1 << 3
+
+GPIO_V2_LINE_ATTR_ID_FLAGS = 1
+GPIO_V2_LINE_ATTR_ID_OUTPUT_VALUES = 2
+
+
+class gpio_v2_line_attribute(ctypes.Structure):
+    # The kernel's union of flags, values and debounce_period_us; all fit in the u64
+    _fields_ = [
+        ('id', ctypes.c_uint32),
+        ('padding', ctypes.c_uint32),
+        ('value', ctypes.c_uint64),
+    ]
+
+
+class gpio_v2_line_config_attribute(ctypes.Structure):
+    _fields_ = [
+        ('attr', gpio_v2_line_attribute),
+        ('mask', ctypes.c_uint64),
+    ]
+
+
+class gpio_v2_line_config(ctypes.Structure):
+    _fields_ = [
+        ('flags', ctypes.c_uint64),
+        ('num_attrs', ctypes.c_uint32),
+        ('padding', ctypes.c_uint32 * 5),
+        ('attrs', gpio_v2_line_config_attribute * GPIO_V2_LINE_NUM_ATTRS_MAX),
+    ]
+
+
+class gpio_v2_line_request(ctypes.Structure):
+    _fields_ = [
+        ('offsets', ctypes.c_uint32 * GPIO_V2_LINES_MAX),
+        ('consumer', ctypes.c_char * GPIO_MAX_NAME_SIZE),
+        ('config', gpio_v2_line_config),
+        ('num_lines', ctypes.c_uint32),
+        ('event_buffer_size', ctypes.c_uint32),
+        ('padding', ctypes.c_uint32 * 5),
+        ('fd', ctypes.c_int32),
+    ]
+
+
+class gpio_v2_line_values(ctypes.Structure):
+    _fields_ = [
+        ('bits', ctypes.c_uint64),
+        ('mask', ctypes.c_uint64),
+    ]
+
+
+def _iowr(number: int, struct) -> int:
+    """ioctl request code for a read/write GPIO ioctl (_IOWR(0xB4, number, struct))"""
+    return (3 << 30) | (ctypes.sizeof(struct) << 16) | (0xB4 << 8) | number
+
+
+GPIO_V2_GET_LINE_IOCTL = _iowr(0x07, gpio_v2_line_request)
+GPIO_V2_LINE_GET_VALUES_IOCTL = _iowr(0x0E, gpio_v2_line_values)
+GPIO_V2_LINE_SET_VALUES_IOCTL = _iowr(0x0F, gpio_v2_line_values)
+
+
+class ChipDevice:
+    """System calls on a real /dev/gpiochip* node"""
+
+    def __init__(self):
+        self.fcntl = optional_import('fcntl')
+        if self.fcntl is None:
+            raise OSError("fcntl is not available on this platform")
+
+    def open(self, path: str) -> int:
+        return os.open(path, os.O_RDWR | getattr(os, 'O_CLOEXEC', 0))
+
+    def ioctl(self, fd: int, request: int, arg: ctypes.Structure):
+        self.fcntl.ioctl(fd, request, arg, True)
+
+    def close(self, fd: int):
+        os.close(fd)
+
+
+class MockChipDevice:
+    """In-memory gpiochip implementing the v2 line request ioctls, for tests and benchmarks
+
+    Structures are decoded exactly as the kernel would, so the packing
+    in GpioChip is exercised. Line levels are kept in pin_states by
+    offset, like SimulatedGPIO.
+    """
+
+    def __init__(self, lines: int = 54, latency: float = 0.0, clock=None):
+        """Initialize the mock chip
+
+        Args:
+            lines: Number of lines on the chip
+            latency: Seconds each ioctl takes
+            clock: Optional clock whose sleep() models the latency
+        """
+        self.lines = lines
+        self.latency = latency
+        self.clock = clock
+        self.pin_states = {}
+        self.requested = {}
+        self.syscalls = 0
+        self._next_fd = 1000
+        self._lock = threading.Lock()
+
+    def _fd(self) -> int:
+        self._next_fd += 1
+        return self._next_fd
+
+    def open(self, path: str) -> int:
+        return self._fd()
+
+    def ioctl(self, fd: int, request: int, arg: ctypes.Structure):
+        with self._lock:
+            self.syscalls += 1
+        if self.latency:
+            (self.clock or time).sleep(self.latency)
+
+        with self._lock:
+            if request == GPIO_V2_GET_LINE_IOCTL:
+                offsets = list(arg.offsets[:arg.num_lines])
+                for offset in offsets:
+                    if offset >= self.lines:
+                        raise OSError(22, "Invalid argument: line {} not on chip".format(offset))
+                    if any(offset in lines for lines in self.requested.values()):
+                        raise OSError(16, "Device or resource busy: line {}".format(offset))
+                if not arg.config.flags & GPIO_V2_LINE_FLAG_OUTPUT:
+                    raise OSError(22, "Invalid argument: only outputs are mocked")
+                for index in range(arg.config.num_attrs):
+                    attribute = arg.config.attrs[index]
+                    if attribute.attr.id == GPIO_V2_LINE_ATTR_ID_OUTPUT_VALUES:
+                        for bit, offset in enumerate(offsets):
+                            if attribute.mask >> bit & 1:
+                                self.pin_states[offset] = attribute.attr.value >> bit & 1
+                for offset in offsets:
+                    self.pin_states.setdefault(offset, 0)
+                arg.fd = self._fd()
+                self.requested[arg.fd] = offsets
+            elif request == GPIO_V2_LINE_SET_VALUES_IOCTL:
+                offsets = self.requested[fd]
+                for bit, offset in enumerate(offsets):
+                    if arg.mask >> bit & 1:
+                        self.pin_states[offset] = arg.bits >> bit & 1
+            elif request == GPIO_V2_LINE_GET_VALUES_IOCTL:
+                offsets = self.requested[fd]
+                arg.bits = sum(self.pin_states.get(offset, 0) << bit
+                               for bit, offset in enumerate(offsets) if arg.mask >> bit & 1)
+            else:
+                raise OSError(25, "Inappropriate ioctl for device")
+
+    def close(self, fd: int):
+        with self._lock:
+            self.requested.pop(fd, None)
+
+
+class LineRequest:
+    """One set of output lines requested together; a write to any subset is one ioctl"""
+
+    def __init__(self, fd: int, offsets: List[int]):
+        self.fd = fd
+        self.offsets = offsets
+        self.bits = {offset: 1 << index for index, offset in enumerate(offsets)}
+
+
+class GpioChip:
+    """Drop-in replacement for the RPi.GPIO module on /dev/gpiochip*
+
+    Each setup() call requests its pins as one line set, with their
+    initial levels applied atomically by the kernel. output() groups the
+    pins by line set, so a full relay state vector costs one
+    GPIO_V2_LINE_SET_VALUES ioctl instead of one write per pin. Pin
+    numbers are line offsets on the chip, which match BCM numbering on
+    the Raspberry Pi's gpiochip0.
+    """
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self, path: Optional[str] = None, device=None, consumer: str = 'mobius'):
+        """Initialize the chip
+
+        Args:
+            path: Chip device node (defaults to GPIO_CHIP)
+            device: ChipDevice or MockChipDevice making the system calls (defaults to ChipDevice)
+            consumer: Label shown for the lines in gpioinfo
+
+        Raises:
+            OSError: If the chip cannot be opened
+        """
+        self.logger = logging.getLogger('mobius.hardware.drivers.gpiochip')
+        self.path = path or settings.GPIO_CHIP
+        self.device = device or ChipDevice()
+        self.consumer = consumer.encode('ascii')[:GPIO_MAX_NAME_SIZE - 1]
+        self.chip_fd = self.device.open(self.path)
+        self.requests = []
+        self.lines = {}
+        self.write_count = 0
+        self._lock = threading.Lock()
+
+    def setmode(self, mode):
+        if mode != self.BCM:
+            raise ValueError("gpiochip lines are numbered by offset; use BCM mode")
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, channel, direction, initial=None):
+        """Request pins as outputs in one line set, mirroring RPi.GPIO.setup
+
+        Args:
+            channel: Pin or list of pins
+            direction: OUT (inputs are not supported)
+            initial: Initial level, or a list of levels matching the pins
+        """
+        if direction != self.OUT:
+            raise ValueError("Only output lines are supported")
+        pins = self._channels(channel)
+        values = self._values(pins, self.LOW if initial is None else initial)
+        with self._lock:
+            taken = [pin for pin in pins if pin in self.lines]
+            if taken:
+                raise RuntimeError("GPIO lines {} are already set up".format(taken))
+            if self.chip_fd is None:
+                self.chip_fd = self.device.open(self.path)
+            for start in range(0, len(pins), GPIO_V2_LINES_MAX):
+                self._request(pins[start:start + GPIO_V2_LINES_MAX], values[start:start + GPIO_V2_LINES_MAX])
+
+    def _request(self, pins: List[int], values: List[int]):
+        """Request one line set with GPIO_V2_GET_LINE_IOCTL; must be called with _lock held"""
+        request = gpio_v2_line_request()
+        for index, pin in enumerate(pins):
+            request.offsets[index] = pin
+        request.num_lines = len(pins)
+        request.consumer = self.consumer
+        request.config.flags = GPIO_V2_LINE_FLAG_OUTPUT
+        request.config.num_attrs = 1
+        attribute = request.config.attrs[0]
+        attribute.attr.id = GPIO_V2_LINE_ATTR_ID_OUTPUT_VALUES
+        attribute.attr.value = sum(1 << index for index, value in enumerate(values) if value)
+        attribute.mask = (1 << len(pins)) - 1
+        self.device.ioctl(self.chip_fd, GPIO_V2_GET_LINE_IOCTL, request)
+
+        line_request = LineRequest(request.fd, list(pins))
+        self.requests.append(line_request)
+        for pin in pins:
+            self.lines[pin] = line_request
+        self.logger.debug("Requested GPIO lines {} on {}".format(pins, self.path))
+
+    def output(self, channel, value):
+        """Set one or more output pins with one ioctl per line set, mirroring RPi.GPIO.output"""
+        pins = self._channels(channel)
+        values = self._values(pins, value)
+        with self._lock:
+            writes = {}
+            for pin, pin_value in zip(pins, values):
+                line_request = self.lines.get(pin)
+                if line_request is None:
+                    raise RuntimeError("The GPIO channel {} has not been set up as an OUTPUT".format(pin))
+                bits, mask = writes.get(line_request, (0, 0))
+                bit = line_request.bits[pin]
+                writes[line_request] = (bits | bit if pin_value else bits, mask | bit)
+            for line_request, (bits, mask) in writes.items():
+                self.device.ioctl(line_request.fd, GPIO_V2_LINE_SET_VALUES_IOCTL, gpio_v2_line_values(bits, mask))
+                self.write_count += 1
+
+    def input(self, channel) -> int:
+        """Read back the level of an output pin"""
+        with self._lock:
+            line_request = self.lines.get(channel)
+            if line_request is None:
+                raise RuntimeError("The GPIO channel {} has not been set up".format(channel))
+            values = gpio_v2_line_values(0, line_request.bits[channel])
+            self.device.ioctl(line_request.fd, GPIO_V2_LINE_GET_VALUES_IOCTL, values)
+        return self.HIGH if values.bits else self.LOW
+
+    def cleanup(self, channel=None):
+        """Release line sets, mirroring RPi.GPIO.cleanup
+
+        The chip is closed once no line set is left, and reopened by the
+        next setup().
+
+        Args:
+            channel: Pin or list of pins whose line sets are released (defaults to
+                every line set). A line set is released as a whole, so only sets
+                whose pins are all listed are released.
+        """
+        with self._lock:
+            if channel is None:
+                released = self.requests
+            else:
+                pins = set(self._channels(channel))
+                released = [line_request for line_request in self.requests if pins.issuperset(line_request.offsets)]
+                kept = [pin for pin in pins if pin in self.lines and self.lines[pin] not in released]
+                if kept:
+                    self.logger.warning("GPIO lines {} share a line set with other pins and stay requested".format(kept))
+            for line_request in released:
+                self.device.close(line_request.fd)
+                for pin in line_request.offsets:
+                    self.lines.pop(pin, None)
+            self.requests = [line_request for line_request in self.requests if line_request not in released]
+            if not self.requests and self.chip_fd is not None:
+                self.device.close(self.chip_fd)
+                self.chip_fd = None
+
+    def _channels(self, channel) -> List[int]:
+        return list(channel) if isinstance(channel, (list, tuple)) else [channel]
+
+    def _values(self, pins: List[int], value) -> List[int]:
+        if isinstance(value, (list, tuple)):
+            if len(value) != len(pins):
+                raise ValueError("Number of values does not match the number of channels")
+            return list(value)
+        return [value] * len(pins)
@@ -3,58 +3,94 @@ Relay Manager Module
 Handles all relay hardware interactions for controlling devices
 """
 
-import time
 import logging
-from datetime import datetime
-
-try:
-    import RPi.GPIO as GPIO
-    GPIO_AVAILABLE = True
-except ImportError:
-    GPIO_AVAILABLE = False
+from collections import OrderedDict
 
 from mobius.config import settings
+from mobius.core.clock import system_clock
+from mobius.hardware.simulation import SimulatedGPIO
+from mobius.hardware.usage import RelayUsage
 from mobius.services.influx_client import InfluxClient
+from mobius.utils.helpers import optional_import
 
 
 class RelayManager:
     """Manages all relay interactions for the vivarium"""
     
-    def __init__(self):
-        """Initialize the relay manager"""
+    def __init__(self, gpio=None, influx_client=None, settle_delay=None, clock=None,
+                 device_pins=None, safe_states=None, tags=None, wattage=None):
+        """Initialize the relay manager
+        
+        Args:
+            gpio: Optional GPIO driver with the RPi.GPIO interface (e.g. SimulatedGPIO)
+            influx_client: Optional InfluxClient (or TelemetryBatcher) used to log device states
+            settle_delay: Seconds to wait after switching a relay (defaults to RELAY_SETTLE_DELAY)
+            clock: Optional clock used for schedules and delays
+            device_pins: Device name to GPIO pin(s) (defaults to DEVICE_PINS)
+            safe_states: Device states applied on shutdown (defaults to RELAY_SAFE_STATES)
+            tags: Optional Influx tags added to every device state point
+            wattage: Device name to watts drawn when on (defaults to DEVICE_WATTAGE)
+        """
         self.logger = logging.getLogger('mobius.hardware.relay')
-        self.influx_client = InfluxClient()
+        self.clock = clock or system_clock
+        self.influx_client = influx_client or InfluxClient()
+        self.settle_delay = settings.RELAY_SETTLE_DELAY if settle_delay is None else settle_delay
+        self.device_pins = settings.DEVICE_PINS if device_pins is None else device_pins
+        self.safe_states = settings.RELAY_SAFE_STATES if safe_states is None else safe_states
+        self.tags = tags
         
         # Initialize device status dictionary
-        self.device_status = {device: False for device in settings.DEVICE_PINS}
+        self.device_status = {device: False for device in self.device_pins}
         
-        # Initialize GPIO if available
-        if GPIO_AVAILABLE:
-            self._setup_gpio()
-        else:
+        # On-time, switch and energy rollups, updated as devices switch
+        self.usage = RelayUsage(self.device_pins, self.clock.now(), wattage=wattage)
+        
+        # Fall back to simulated GPIO when the configured backend is not available
+        self.gpio = gpio or self._load_gpio()
+        if self.gpio is None:
             self.logger.warning("GPIO module not available - running in simulation mode")
+            self.gpio = SimulatedGPIO()
+            
+        self._setup_gpio()
             
+    def _load_gpio(self):
+        """Load the GPIO_BACKEND driver
+        
+        Returns:
+            module: RPi.GPIO or a GpioChip, or None if unavailable
+        """
+        if settings.GPIO_BACKEND == 'gpiochip':
+            from mobius.hardware.drivers.gpiochip import GpioChip
+            try:
+                return GpioChip(settings.GPIO_CHIP)
+            except OSError as e:
+                self.logger.warning("Cannot open {chip}: {e}".format(chip=settings.GPIO_CHIP, e=e))
+                return None
+        return optional_import('RPi.GPIO')
+        
     def _setup_gpio(self):
         """Set up GPIO pins"""
         try:
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setwarnings(False)
+            self.gpio.setmode(self.gpio.BCM)
+            self.gpio.setwarnings(False)
             
-            # Initialize all relay pins to OFF state
+            # Initialize all relay pins to OFF state as they are configured.
+            # Relays (HIGH = OFF for most relay modules) are set up in one call and
+            # multi-pin devices (like steppers) start LOW, so gpiochip requests
+            # each group as a single line set.
             self.logger.info("Initializing all relays to OFF state")
-            for device, pin in settings.DEVICE_PINS.items():
+            groups = OrderedDict([(self.gpio.HIGH, []), (self.gpio.LOW, [])])
+            for device, pin in self.device_pins.items():
                 if isinstance(pin, list):
-                    # Handle multi-pin devices (like steppers)
-                    for p in pin:
-                        GPIO.setup(p, GPIO.OUT)
-                        GPIO.output(p, GPIO.LOW)
+                    groups[self.gpio.LOW].extend(pin)
                 else:
-                    # Normal relay (HIGH = OFF for most relay modules)
-                    GPIO.setup(pin, GPIO.OUT)
-                    GPIO.output(pin, GPIO.HIGH)
+                    groups[self.gpio.HIGH].append(pin)
+            for initial, pins in groups.items():
+                if pins:
+                    self.gpio.setup(pins, self.gpio.OUT, initial=initial)
                 
-                # Log initial state
-                self._log_device_state(device, False)
+            # Log all initial states as one point
+            self.influx_client.log_device_states(self.device_status, tags=self.tags)
         except Exception as e:
             self.logger.error("Error setting up GPIO: {}".format(e))
             raise
@@ -65,7 +101,7 @@ class RelayManager:
         Args:
             time_settings: Dictionary of time settings from settings.py
         """
-        current_time = datetime.now()
+        current_time = self.clock.now()
         
         for period, config in time_settings.items():
             # Determine if current time is within the ON period
@@ -94,14 +130,14 @@ class RelayManager:
         """Set a device to a specific state
         
         Args:
-            device: Device name (must be in DEVICE_PINS)
+            device: Device name (must be in device_pins)
             state: Boolean, True for ON, False for OFF
         
         Returns:
             bool: True if successful, False otherwise
         """
         # Check if device exists
-        if device not in settings.DEVICE_PINS:
+        if device not in self.device_pins:
             self.logger.error("Device {device} not found in settings".format(device=device))
             return False
             
@@ -109,34 +145,99 @@ class RelayManager:
         if self.device_status.get(device) == state:
             return True
             
-        # Update physical relay if GPIO available
-        if GPIO_AVAILABLE:
-            try:
-                pin = settings.DEVICE_PINS[device]
-                
-                # Set pin state (typically, relays are active LOW)
-                GPIO.output(pin, GPIO.LOW if state else GPIO.HIGH)
-                
-                # Log to console
-                action = "ON" if state else "OFF"
-                self.logger.info("Setting {device} {action}".format(device=device, action=action))
-                
-                # Small delay to prevent rapid relay switching
-                time.sleep(0.1)
-            except Exception as e:
-                self.logger.error("Error setting relay for {device}: {e}".format(device=device, e=e))
-                return False
-        else:
-            # Simulation mode
+        # Update physical relay
+        try:
+            pin = self.device_pins[device]
+            
+            # Set pin state (typically, relays are active LOW)
+            self.gpio.output(pin, self.gpio.LOW if state else self.gpio.HIGH)
+            
+            # Log to console
             action = "ON" if state else "OFF"
-            self.logger.info("[SIMULATION] Setting {device} {action}".format(device=device, action=action))
+            self.logger.info("Setting {device} {action}".format(device=device, action=action))
+            
+            # Small delay to prevent rapid relay switching
+            if self.settle_delay:
+                self.clock.sleep(self.settle_delay)
+        except Exception as e:
+            self.logger.error("Error setting relay for {device}: {e}".format(device=device, e=e))
+            return False
         
         # Update status and log to InfluxDB
         self.device_status[device] = state
+        self.usage.record({device: state}, self.clock.now())
         self._log_device_state(device, state)
         
         return True
         
+    def set_states(self, states, force=False):
+        """Set several devices at once with a single GPIO write and Influx point
+        
+        Args:
+            states: Dictionary of device name to boolean state
+            force: Drive every listed pin even if its cached state already matches
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        changes = {}
+        for device, state in states.items():
+            if device not in self.device_pins:
+                self.logger.error("Device {device} not found in settings".format(device=device))
+                continue
+            if force or self.device_status.get(device) != state:
+                changes[device] = bool(state)
+                
+        if not changes:
+            return True
+            
+        pins = []
+        values = []
+        for device, state in changes.items():
+            pin = self.device_pins[device]
+            for p in (pin if isinstance(pin, list) else [pin]):
+                pins.append(p)
+                values.append(self.gpio.LOW if state else self.gpio.HIGH)
+                
+        try:
+            # RPi.GPIO accepts matching lists of channels and values
+            self.gpio.output(pins, values)
+            self.logger.info("Setting {}".format(', '.join(
+                '{} {}'.format(device, "ON" if state else "OFF") for device, state in changes.items())))
+            if self.settle_delay:
+                self.clock.sleep(self.settle_delay)
+        except Exception as e:
+            self.logger.error("Error setting relays {devices}: {e}".format(devices=list(changes), e=e))
+            return False
+            
+        self.device_status.update(changes)
+        self.usage.record(changes, self.clock.now())
+        self.influx_client.log_device_states(changes, tags=self.tags)
+        return True
+        
+    def set_safe_state(self, force=True):
+        """Drive every relay to its configured safe state in one operation
+        
+        Args:
+            force: Drive every pin even if its cached state is already safe
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        safe_states = {device: self.safe_states.get(device, False) for device in self.device_pins}
+        return self.set_states(safe_states, force=force)
+        
+    def log_usage(self):
+        """Log the usage of every usage bucket that has ended as aggregate points
+        
+        Returns:
+            bool: True if successful or no bucket ended, False otherwise
+        """
+        buckets = self.usage.roll(self.clock.now(), settings.RELAY_USAGE_EMIT)
+        if not buckets:
+            return True
+        return self.influx_client.log_relay_usage(buckets, tags=self.tags)
+        
     def _log_device_state(self, device, state):
         """Log device state to InfluxDB
         
@@ -144,7 +245,7 @@ class RelayManager:
             device: Device name
             state: Boolean state
         """
-        self.influx_client.log_device_state(device, state)
+        self.influx_client.log_device_state(device, state, tags=self.tags)
         
     def _in_time_period(self, current_time, time_period):
         """Check if current time is within the specified time period
@@ -166,17 +267,16 @@ class RelayManager:
             return current_time.hour >= start_hour or current_time.hour < end_hour
             
     def cleanup(self):
-        """Clean up GPIO resources"""
-        if GPIO_AVAILABLE:
-            try:
-                # Turn off all relays before cleanup
-                for device in settings.DEVICE_PINS:
-                    self.set_device(device, False)
-                    
-                # Clean up GPIO
-                GPIO.cleanup()
-                self.logger.info("GPIO cleanup complete")
-            except Exception as e:
-                self.logger.error("Error during GPIO cleanup: {}".format(e))
-        else:
-            self.logger.info("Simulation mode - no GPIO cleanup needed") 
\ No newline at end of file
+        """Clean up this manager's GPIO pins, leaving other enclosures' pins alone"""
+        try:
+            # Put all relays in their safe state before cleanup
+            self.set_safe_state(force=False)
+                
+            # Clean up GPIO
+            pins = []
+            for pin in self.device_pins.values():
+                pins.extend(pin if isinstance(pin, list) else [pin])
+            self.gpio.cleanup(pins)
+            self.logger.info("GPIO cleanup complete")
+        except Exception as e:
+            self.logger.error("Error during GPIO cleanup: {}".format(e)) 
\ No newline at end of file
@@ -8,43 +8,104 @@ import logging
 import subprocess
 import glob
 import os
-import time
-from typing import Dict, List, Tuple
-
-try:
-    import Adafruit_DHT
-    DHT_AVAILABLE = True
-except ImportError:
-    DHT_AVAILABLE = False
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
 from mobius.config import settings
+from mobius.core.clock import system_clock
+from mobius.core.samples import MISSING, ChannelTable, SampleBatch
+from mobius.hardware.drivers.dht import DHTReader, DHTReading
+from mobius.hardware.simulation import SimulatedDHT, SimulatedEnvironment
+from mobius.utils.helpers import optional_import
 
 
 class SensorManager:
-    """Manager for all sensor interactions"""
+    """Manager for all sensor interactions
+    
+    Every channel read is kept in a shared sample cache with its time.
+    Consumers (telemetry, thermostat, status) ask for samples no older
+    than their own SAMPLE_MAX_AGE, and a channel is only read from the
+    hardware when its cached sample is too old for the caller.
+    
+    Readings are SampleBatch arrays laid out by the manager's channel
+    table, which is built once, so no field names are formatted or dicts
+    allocated per read.
+    """
     
-    def __init__(self):
-        """Initialize the sensor manager"""
+    def __init__(self, dht=None, onewire=None, clock=None, dht_pins=None, dht_sensors=None,
+                 onewire_device=None):
+        """Initialize the sensor manager
+        
+        Args:
+            dht: Optional DHT driver with the Adafruit_DHT interface (e.g. SimulatedDHT)
+            onewire: Optional one-wire probe with a read_lines() method (e.g. SimulatedOneWire)
+            clock: Optional clock used for retry delays and DHT poll intervals
+            dht_pins: GPIO pins of the DHT sensors (defaults to DHT_PINS)
+            dht_sensors: 1-based DHT sensor IDs to read (defaults to 1, 2 and 4)
+            onewire_device: Glob for this enclosure's one-wire device (defaults to ONEWIRE_DEVICE_PREFIX)
+        """
         self.logger = logging.getLogger('mobius.hardware.sensor')
+        self.clock = clock or system_clock
+        self.dht_pins = settings.DHT_PINS if dht_pins is None else dht_pins
+        self.dht_sensors = [1, 2, 4] if dht_sensors is None else dht_sensors
+        self.onewire_device = onewire_device or settings.ONEWIRE_DEVICE_PREFIX
         
         # Initialize one-wire temperature sensor if available
-        self._init_onewire()
+        self._init_onewire(onewire)
         
         # Initialize DHT sensors
-        self._init_dht()
+        self._init_dht(dht)
+        
+        # Field layout, with the IDs each channel writes
+        self.table = ChannelTable(OrderedDict(
+            [('Water_Temp', ['Water_Temp'])] +
+            [('DHT{}'.format(sensor_id), ['DHT{}_Temp'.format(sensor_id), 'DHT{}_Hum'.format(sensor_id)])
+             for sensor_id in self.dht_sensors]
+        ))
+        self._water_id = self.table.ids['Water_Temp']
+        self._channel_index = {channel: index for index, channel in enumerate(self.table.channels)}
+        self._dht_ids = {
+            'DHT{}'.format(sensor_id): (sensor_id,) + self.table.channel_ids['DHT{}'.format(sensor_id)]
+            for sensor_id in self.dht_sensors
+        }
+        
+        # Shared sample cache: latest values and each channel's monotonic read time
+        self.latest = self.table.batch()
+        self.read_times = array('d', [float('-inf')]) * len(self.table.channels)
+        # Age of the values each channel's last hardware read returned (DHT values may be cached)
+        self._value_ages = array('d', [0.0]) * len(self.table.channels)
+        self._scratch = self.table.batch()
+        self.physical_reads = 0
+        self.cache_hits = 0
+        self.consumer_stats = {}
+        self._cache_lock = threading.Lock()
+        self._channel_locks = {channel: threading.Lock() for channel in self.channels}
         
-    def _init_onewire(self):
-        """Initialize one-wire temperature sensor interface"""
+    def _init_onewire(self, onewire=None):
+        """Initialize one-wire temperature sensor interface
+        
+        Args:
+            onewire: Optional probe object replacing the sysfs device
+        """
+        if onewire is not None:
+            self.read_onewire_lines = onewire.read_lines
+            self.onewire_available = True
+            return
+            
+        self.read_onewire_lines = self._read_temp_raw
         try:
             if os.path.exists('/sys/bus/w1/devices/'):
                 self.logger.info("One-wire interface already initialized")
             else:
                 self.logger.info("Initializing one-wire interface")
-                os.system('modprobe w1-gpio')
-                os.system('modprobe w1-therm')
+                for module in ('w1-gpio', 'w1-therm'):
+                    subprocess.run(['modprobe', module], stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, timeout=10)
                 
             # Find device folder
-            device_folders = glob.glob(settings.ONEWIRE_BASE_DIR + settings.ONEWIRE_DEVICE_PREFIX)
+            device_folders = glob.glob(settings.ONEWIRE_BASE_DIR + self.onewire_device)
             if device_folders:
                 self.device_file = device_folders[0] + '/w1_slave'
                 self.logger.info("Found one-wire device: {}".format(device_folders[0]))
@@ -56,98 +117,266 @@ class SensorManager:
             self.logger.error("Error initializing one-wire: {}".format(e))
             self.onewire_available = False
             
-    def _init_dht(self):
-        """Initialize DHT temperature/humidity sensors"""
-        self.dht_available = DHT_AVAILABLE
-        if not self.dht_available:
-            self.logger.warning("Adafruit_DHT library not available - DHT sensors disabled")
+    def _init_dht(self, dht=None):
+        """Initialize DHT temperature/humidity sensors
+        
+        Args:
+            dht: Optional DHT driver replacing the Adafruit_DHT module
+        """
+        self.dht = dht or optional_import('Adafruit_DHT')
+        if self.dht is None:
+            self.logger.warning("Adafruit_DHT library not available - using simulated DHT sensors")
+            self.dht = SimulatedDHT(SimulatedEnvironment())
+        pins = [self.dht_pins[sensor_id - 1] for sensor_id in self.dht_sensors if sensor_id <= len(self.dht_pins)]
+        self.dht_reader = DHTReader(self.dht, pins, clock=self.clock)
             
-    def get_temperature(self) -> float:
-        """Get the current water temperature
+    def get_temperature(self, consumer: str = 'thermostat', max_age: Optional[float] = None) -> Optional[float]:
+        """Get the water temperature from the sample cache
         
+        Args:
+            consumer: SAMPLE_MAX_AGE policy to apply
+            max_age: Oldest acceptable sample in seconds, overriding the policy
+            
         Returns:
-            float: Temperature in Celsius
+            float: Temperature in Celsius, or None if the probe has no recent reading
+        """
+        if self._sample('Water_Temp', consumer, self._max_age(consumer, max_age)):
+            return self.latest.data[self._water_id]
+        self.logger.warning("No water temperature reading")
+        return None
+        
+    def _read_water_temperature(self) -> Optional[float]:
+        """Read the water temperature from the one-wire probe
+        
+        Returns:
+            float: Temperature in Celsius, or None if the probe cannot be read
         """
         if self.onewire_available:
             try:
-                return self._read_onewire_temp()
+                temperature = self._read_onewire_temp()
+                if temperature != -1:
+                    return temperature
             except Exception as e:
                 self.logger.error("Error reading water temperature: {}".format(e))
-                
-        # Return a reasonable default if sensor read fails
-        self.logger.warning("Using simulated temperature value")
-        return 25.0  # Default fallback
+        return None
     
     def get_dht_reading(self, sensor_id: int) -> Tuple[float, float]:
         """Get humidity and temperature from a DHT sensor
         
+        The sensor is read at most once per DHT_MIN_INTERVAL; between
+        reads, or if a read fails, its last good values are returned
+        while younger than DHT_MAX_AGE.
+        
         Args:
-            sensor_id: The sensor ID (1-based index into DHT_PINS)
+            sensor_id: The sensor ID (1-based index into dht_pins)
             
         Returns:
             tuple: (humidity, temperature) readings in % and Celsius
         """
-        if not self.dht_available or sensor_id > len(settings.DHT_PINS):
-            # Return simulated data if sensor not available
-            self.logger.debug("Using simulated data for DHT sensor {sensor_id}".format(sensor_id=sensor_id))
-            return (
-                60.0 + random.normalvariate(0, 5),  # Simulated humidity around 60%
-                25.0 + random.normalvariate(0, 2)   # Simulated temp around 25°C
-            )
+        if sensor_id > len(self.dht_pins):
+            self.logger.error("DHT sensor {sensor_id} not configured".format(sensor_id=sensor_id))
+            return (-1, -1)
             
         # Get the GPIO pin for this sensor
-        pin = settings.DHT_PINS[sensor_id - 1]
+        pin = self.dht_pins[sensor_id - 1]
+        
+        reading = self._read_dht(pin, sensor_id)
+        if reading is None:
+            return (-1, -1)  # Error indicator
+        return (reading.humidity, reading.temperature)
         
+    def _read_dht(self, pin: int, sensor_id: int) -> Optional[DHTReading]:
+        """Read a DHT pin through the rate-limited reader
+        
+        Returns:
+            DHTReading: Values (jittered if fresh) with their age, or None if there is no good value
+        """
         try:
-            # Read from sensor
-            humidity, temperature = Adafruit_DHT.read_retry(Adafruit_DHT.DHT11, pin)
-            
-            # Add jitter to readings to help visualize changes
-            if humidity is not None:
-                humidity += random.normalvariate(0, settings.DHT_JITTER)
-            else:
-                humidity = -1
+            # Single non-blocking attempt, falling back to the last good values
+            reading = self.dht_reader.read(pin)
+            if reading is None:
+                return None
                 
-            if temperature is not None:
-                temperature += random.normalvariate(0, settings.DHT_JITTER)
-            else:
-                temperature = -1
+            # Add jitter to new readings to help visualize changes
+            if reading.fresh:
+                reading = reading._replace(
+                    humidity=reading.humidity + random.normalvariate(0, settings.DHT_JITTER),
+                    temperature=reading.temperature + random.normalvariate(0, settings.DHT_JITTER))
                 
-            return (humidity, temperature)
+            return reading
             
         except Exception as e:
             self.logger.error("Error reading DHT sensor {sensor_id}: {e}".format(sensor_id=sensor_id, e=e))
-            return (-1, -1)  # Error indicator
+            return None
+            
+    @property
+    def channels(self) -> List[str]:
+        """Independently readable sensor channels
+        
+        Returns:
+            list: 'Water_Temp' followed by one 'DHT<id>' channel per DHT sensor
+        """
+        return list(self.table.channels)
+        
+    @property
+    def fields(self) -> List[str]:
+        """Reading field names the channels produce
+        
+        Returns:
+            list: 'Water_Temp' followed by 'DHT<id>_Temp' and 'DHT<id>_Hum' per DHT sensor
+        """
+        return list(self.table.names)
+        
+    def read_channel(self, channel: str, out: Optional[SampleBatch] = None) -> SampleBatch:
+        """Read one channel from the hardware, bypassing the sample cache
+        
+        Args:
+            channel: Channel name from channels
+            out: Batch to write the channel's fields into (defaults to a new one)
+            
+        Returns:
+            SampleBatch: out, with the channel's valid readings set and its other fields missing
+        """
+        if out is None:
+            out = self.table.batch()
+        if channel == 'Water_Temp':
+            # A failed probe read is left out (and shows up as stale) rather than faked
+            temperature = self._read_water_temperature()
+            out.data[self._water_id] = MISSING if temperature is None else temperature
+            self._value_ages[self._channel_index[channel]] = 0.0
+            return out
+            
+        sensor_id, temp_id, hum_id = self._dht_ids[channel]
+        if sensor_id > len(self.dht_pins):
+            self.logger.error("DHT sensor {sensor_id} not configured".format(sensor_id=sensor_id))
+            reading = None
+        else:
+            reading = self._read_dht(self.dht_pins[sensor_id - 1], sensor_id)
+        humidity, temperature = (-1, -1) if reading is None else (reading.humidity, reading.temperature)
+        self._value_ages[self._channel_index[channel]] = 0.0 if reading is None else reading.age
+        
+        # Filter out invalid readings
+        out.data[hum_id] = humidity if 35 <= humidity < 100 else MISSING
+        out.data[temp_id] = temperature if temperature > 12 else MISSING
+        return out
+        
+    def _max_age(self, consumer: str, max_age: Optional[float]) -> float:
+        if max_age is not None:
+            return max_age
+        return settings.SAMPLE_MAX_AGE.get(consumer, 0)
+        
+    def _cached(self, index: int, consumer: str, max_age: float) -> bool:
+        """Whether a channel's cached sample is young enough, counting the hit"""
+        with self._cache_lock:
+            if self.clock.monotonic() - self.read_times[index] > max_age:
+                return False
+            self.cache_hits += 1
+            self.consumer_stats.setdefault(consumer, {'reads': 0, 'hits': 0})['hits'] += 1
+            return True
+            
+    def _sample(self, channel: str, consumer: str, max_age: float) -> bool:
+        """Make sure latest holds a sample of the channel young enough for the caller
+        
+        Concurrent callers needing a new sample of the same channel share
+        a single hardware read.
+        
+        Returns:
+            bool: False if the channel could not be read
+        """
+        index = self._channel_index[channel]
+        if self._cached(index, consumer, max_age):
+            return True
             
-    def get_all_readings(self) -> Dict[str, float]:
-        """Get readings from all sensors
+        with self._channel_locks[channel]:
+            # Another consumer may have read the channel while we waited
+            if self._cached(index, consumer, max_age):
+                return True
+            ids = self.table.channel_ids[channel]
+            # Each channel only touches its own fields of the scratch batch
+            scratch = self.read_channel(channel, self._scratch).data
+            present = False
+            for field_id in ids:
+                if scratch[field_id] == scratch[field_id]:
+                    present = True
+            with self._cache_lock:
+                self.physical_reads += 1
+                self.consumer_stats.setdefault(consumer, {'reads': 0, 'hits': 0})['reads'] += 1
+                # Failed reads are not cached, so the next caller tries again
+                if present:
+                    self.latest.copy_from(self._scratch, ids)
+                    # Cached DHT values are stamped with when the sensor produced them
+                    self.read_times[index] = self.clock.monotonic() - self._value_ages[index]
+        return present
         
+    def sample(self, channel: str, consumer: str = 'telemetry', max_age: Optional[float] = None) -> Dict[str, float]:
+        """Readings of one channel, from the cache when fresh enough
+        
+        Args:
+            channel: Channel name from channels
+            consumer: SAMPLE_MAX_AGE policy to apply
+            max_age: Oldest acceptable sample in seconds, overriding the policy
+            
         Returns:
-            dict: Dictionary of sensor readings
+            dict: Dictionary of valid sensor readings from this channel
         """
-        readings = {}
+        if not self._sample(channel, consumer, self._max_age(consumer, max_age)):
+            return {}
+        with self._cache_lock:
+            return dict(self.latest.channel_items(channel))
         
-        # Get water temperature
-        water_temp = self.get_temperature()
-        readings['Water_Temp'] = float(water_temp)
+    def read_channels(self, channels: List[str], consumer: str = 'telemetry',
+                      out: Optional[SampleBatch] = None) -> SampleBatch:
+        """Read several channels through the sample cache
         
-        # Get DHT readings (3 sensors with IDs 1, 2, 4)
-        dht_sensors = [1, 2, 4]
-        for sensor_id in dht_sensors:
-            humidity, temperature = self.get_dht_reading(sensor_id)
+        Args:
+            channels: Channel names from channels
+            consumer: SAMPLE_MAX_AGE policy to apply
+            out: Batch to fill (defaults to a new one); fields of other channels are left as they are
             
-            # Set sensor name based on ID
-            humidity_key = "DHT{sensor_id}_Hum".format(sensor_id=sensor_id)
-            temperature_key = "DHT{sensor_id}_Temp".format(sensor_id=sensor_id)
+        Returns:
+            SampleBatch: out, with the channels' readings
+        """
+        if out is None:
+            out = self.table.batch()
+        max_age = self._max_age(consumer, None)
+        for channel in channels:
+            ids = self.table.channel_ids[channel]
+            if self._sample(channel, consumer, max_age):
+                with self._cache_lock:
+                    out.copy_from(self.latest, ids)
+            else:
+                out.clear(ids)
+        out.timestamp = self.clock.now().timestamp()
+        return out
+        
+    def get_all_readings(self, consumer: str = 'telemetry', out: Optional[SampleBatch] = None) -> SampleBatch:
+        """Get readings from all sensors through the sample cache
+        
+        Args:
+            consumer: SAMPLE_MAX_AGE policy to apply
+            out: Batch to fill (defaults to a new one)
             
-            # Filter out invalid readings
-            if humidity >= 35 and humidity < 100:
-                readings[humidity_key] = float(humidity)
-                
-            if temperature > 12:
-                readings[temperature_key] = float(temperature)
-                
-        return readings
+        Returns:
+            SampleBatch: Sensor readings
+        """
+        return self.read_channels(self.table.channels, consumer, out)
+        
+    def stats(self) -> Dict[str, Dict]:
+        """Sensor read statistics
+        
+        Returns:
+            dict: Per-pin DHT statistics, sample cache counters and the age of each cached sample
+        """
+        now = self.clock.monotonic()
+        with self._cache_lock:
+            cache = {
+                'physical_reads': self.physical_reads,
+                'cache_hits': self.cache_hits,
+                'consumers': {consumer: dict(counts) for consumer, counts in self.consumer_stats.items()},
+                'ages': {channel: round(now - self.read_times[index], 1)
+                         for index, channel in enumerate(self.table.channels) if self.read_times[index] > float('-inf')},
+            }
+        return {'dht': self.dht_reader.stats(), 'cache': cache}
         
     def _read_onewire_temp(self) -> float:
         """Read temperature from one-wire temperature sensor
@@ -160,14 +389,17 @@ class SensorManager:
             
         try:
             # Read raw data from sensor
-            lines = self._read_temp_raw()
+            lines = self.read_onewire_lines()
             
             # Wait for valid reading
             retries = 5
             while lines[0].strip()[-3:] != 'YES' and retries > 0:
-                time.sleep(0.2)
-                lines = self._read_temp_raw()
+                self.clock.sleep(settings.ONEWIRE_RETRY_DELAY)
+                lines = self.read_onewire_lines()
                 retries -= 1
+            if lines[0].strip()[-3:] != 'YES':
+                self.logger.debug("One-wire CRC check failed after retries")
+                return -1
                 
             # Parse temperature value
             equals_pos = lines[1].find('t=')
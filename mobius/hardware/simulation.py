@@ -0,0 +1,344 @@
+"""
+Hardware Simulation Module
+Fake GPIO, DHT and one-wire hardware for running the vivarium off-device
+"""
+
+import math
+import random
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from mobius.config import settings
+
+
+class SimulatedHardwareError(Exception):
+    """Raised by simulated hardware when a failure is injected"""
+
+
+class SimulatedEnvironment:
+    """Simple thermal model of the enclosure shared by all simulated sensors
+
+    The enclosure temperature relaxes towards a day/night ambient curve and
+    rises while any heater relay is switched on.
+    """
+
+    def __init__(self, now: Optional[Callable[[], datetime]] = None,
+                 gpio: Optional['SimulatedGPIO'] = None,
+                 heater_pins: Optional[Iterable[int]] = None,
+                 rng: Optional[random.Random] = None):
+        """Initialize the environment model
+
+        Args:
+            now: Callable returning the current (possibly simulated) time
+            gpio: Simulated GPIO used to detect active heaters
+            heater_pins: GPIO pins driving heaters (defaults to THERMO_SETTINGS devices)
+            rng: Random number generator for sensor noise
+        """
+        self.now = now or datetime.now
+        self.gpio = gpio
+        self.rng = rng or random.Random()
+
+        if heater_pins is None:
+            heater_pins = [
+                settings.DEVICE_PINS[device]
+                for config in settings.THERMO_SETTINGS.values()
+                for device in config['devices']
+                if device in settings.DEVICE_PINS
+            ]
+        self.heater_pins = list(heater_pins)
+
+        self.temperature = settings.SIM_AMBIENT_TEMP
+        self.last_update = None
+        self._lock = threading.Lock()
+
+    def ambient(self, current_time: datetime) -> float:
+        """Room temperature for the given time of day
+
+        Args:
+            current_time: datetime object
+
+        Returns:
+            float: Ambient temperature in Celsius
+        """
+        hours = current_time.hour + current_time.minute / 60.0
+        return settings.SIM_AMBIENT_TEMP + 2.0 * math.sin((hours - 9) / 24.0 * 2 * math.pi)
+
+    def heaters_on(self) -> int:
+        """Count heaters currently switched on (relays are active LOW)
+
+        Returns:
+            int: Number of active heaters
+        """
+        if self.gpio is None:
+            return 0
+        return sum(1 for pin in self.heater_pins if self.gpio.pin_states.get(pin) == self.gpio.LOW)
+
+    def update(self) -> float:
+        """Advance the thermal model to the current time
+
+        Returns:
+            float: Enclosure temperature in Celsius
+        """
+        with self._lock:
+            current_time = self.now()
+            if self.last_update is not None:
+                elapsed = max(0.0, (current_time - self.last_update).total_seconds())
+                ambient = self.ambient(current_time)
+                decay = math.exp(-elapsed / settings.SIM_THERMAL_TIME_CONSTANT)
+                self.temperature = ambient + (self.temperature - ambient) * decay
+                self.temperature += settings.SIM_HEATER_GAIN * self.heaters_on() * elapsed
+            self.last_update = current_time
+            return self.temperature
+
+    def humidity(self) -> float:
+        """Relative humidity, falling as the enclosure warms
+
+        Returns:
+            float: Humidity in %
+        """
+        return min(95.0, max(40.0, 70.0 - (self.temperature - settings.SIM_AMBIENT_TEMP) * 1.5))
+
+
+class SimulatedGPIO:
+    """Drop-in replacement for the RPi.GPIO module"""
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self, failure_rate: float = 0.0, latency: float = 0.0,
+                 rng: Optional[random.Random] = None):
+        """Initialize the simulated GPIO controller
+
+        Args:
+            failure_rate: Probability that an output call raises
+            latency: Seconds each output call takes
+            rng: Random number generator for failure injection
+        """
+        self.logger = logging.getLogger('mobius.hardware.simulation')
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.rng = rng or random.Random()
+
+        self.mode = None
+        self.pin_modes = {}
+        self.pin_states = {}
+        self.write_count = 0
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, channel, direction, initial=None):
+        for pin in self._channels(channel):
+            self.pin_modes[pin] = direction
+            if initial is not None:
+                self.pin_states[pin] = initial
+
+    def output(self, channel, value):
+        """Set one or more output pins, mirroring RPi.GPIO.output
+
+        Raises:
+            SimulatedHardwareError: If a failure is injected
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            raise SimulatedHardwareError("Injected GPIO write failure on {}".format(channel))
+
+        pins = self._channels(channel)
+        values = value if isinstance(value, (list, tuple)) else [value] * len(pins)
+        for pin, pin_value in zip(pins, values):
+            if self.pin_modes.get(pin) != self.OUT:
+                raise RuntimeError("The GPIO channel {} has not been set up as an OUTPUT".format(pin))
+            self.pin_states[pin] = pin_value
+        self.write_count += 1
+        self.logger.debug("GPIO {} -> {}".format(pins, values))
+
+    def input(self, channel):
+        return self.pin_states.get(channel, self.LOW)
+
+    def cleanup(self, channel=None):
+        pins = self._channels(channel) if channel is not None else list(self.pin_modes)
+        for pin in pins:
+            self.pin_modes.pop(pin, None)
+            self.pin_states.pop(pin, None)
+
+    def _channels(self, channel) -> List[int]:
+        return list(channel) if isinstance(channel, (list, tuple)) else [channel]
+
+
+class SimulatedDHT:
+    """Drop-in replacement for the Adafruit_DHT module"""
+
+    DHT11 = 11
+    DHT22 = 22
+    AM2302 = 22
+
+    def __init__(self, environment: SimulatedEnvironment, latency: float = 0.0,
+                 failure_rate: float = 0.0, jitter: float = 0.5,
+                 rng: Optional[random.Random] = None):
+        """Initialize the simulated DHT sensors
+
+        Args:
+            environment: Environment model providing temperature and humidity
+            latency: Seconds each read attempt takes
+            failure_rate: Probability a read attempt times out
+            jitter: Standard deviation of per-sensor noise
+            rng: Random number generator for noise and failure injection
+        """
+        self.environment = environment
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+
+        self.read_count = 0
+        self.failure_count = 0
+
+    def read(self, sensor: int, pin: int) -> Tuple[Optional[float], Optional[float]]:
+        """Single read attempt, mirroring Adafruit_DHT.read
+
+        Returns:
+            tuple: (humidity, temperature), or (None, None) on timeout
+        """
+        self.read_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            self.failure_count += 1
+            return (None, None)
+
+        temperature = self.environment.update() - 2.0 + self.rng.normalvariate(0, self.jitter)
+        humidity = self.environment.humidity() + self.rng.normalvariate(0, self.jitter * 4)
+        return (humidity, temperature)
+
+    def read_retry(self, sensor: int, pin: int, retries: int = 15,
+                   delay_seconds: float = 2) -> Tuple[Optional[float], Optional[float]]:
+        """Read with retries, mirroring Adafruit_DHT.read_retry
+
+        Returns:
+            tuple: (humidity, temperature), or (None, None) if all attempts fail
+        """
+        for attempt in range(retries):
+            humidity, temperature = self.read(sensor, pin)
+            if humidity is not None and temperature is not None:
+                return (humidity, temperature)
+            if self.latency:
+                time.sleep(delay_seconds)
+        return (None, None)
+
+
+class SimulatedOneWire:
+    """Simulated DS18B20 one-wire probe producing w1_slave output"""
+
+    def __init__(self, environment: SimulatedEnvironment, latency: float = 0.0,
+                 crc_failure_rate: float = 0.0, rng: Optional[random.Random] = None):
+        """Initialize the simulated probe
+
+        Args:
+            environment: Environment model providing the temperature
+            latency: Seconds each read takes (a real conversion takes ~750 ms)
+            crc_failure_rate: Probability a read reports a CRC failure
+            rng: Random number generator for noise and failure injection
+        """
+        self.environment = environment
+        self.latency = latency
+        self.crc_failure_rate = crc_failure_rate
+        self.rng = rng or random.Random()
+
+        self.read_count = 0
+        self.failure_count = 0
+
+    def read_lines(self) -> List[str]:
+        """Read the probe, returning lines in the kernel w1_slave format
+
+        Returns:
+            list: Lines of output from sensor
+        """
+        self.read_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        # DS18B20 reports in 1/16 degree steps as a little-endian 16-bit value
+        counts = int(round((self.environment.update() + self.rng.normalvariate(0, 0.05)) * 16)) & 0xffff
+        millidegrees = int(counts * 62.5)
+        raw = '{:02x} {:02x} 4b 46 7f ff 0c 10 1c'.format(counts & 0xff, counts >> 8)
+
+        crc_ok = not (self.crc_failure_rate and self.rng.random() < self.crc_failure_rate)
+        if not crc_ok:
+            self.failure_count += 1
+        return [
+            '{} : crc=1c {}'.format(raw, 'YES' if crc_ok else 'NO'),
+            '{} t={}'.format(raw, millidegrees),
+            ''
+        ]
+
+
+class SimulatedHardware:
+    """Bundle of simulated devices sharing one environment model"""
+
+    def __init__(self, now: Optional[Callable[[], datetime]] = None, seed: Optional[int] = None,
+                 dht_latency: Optional[float] = None, dht_failure_rate: Optional[float] = None,
+                 onewire_latency: Optional[float] = None, crc_failure_rate: Optional[float] = None,
+                 gpio_failure_rate: Optional[float] = None,
+                 heater_pins: Optional[Iterable[int]] = None):
+        """Create the simulated GPIO, DHT and one-wire devices
+
+        Any option left as None is taken from the SIM_* values in settings.py.
+
+        Args:
+            now: Callable returning the current (possibly simulated) time
+            seed: Seed for reproducible noise and failure injection
+            dht_latency: Seconds each DHT read attempt takes
+            dht_failure_rate: Probability a DHT read times out
+            onewire_latency: Seconds each one-wire read takes
+            crc_failure_rate: Probability a one-wire read fails its CRC
+            gpio_failure_rate: Probability a GPIO write raises
+            heater_pins: GPIO pins driving heaters (defaults to THERMO_SETTINGS devices)
+        """
+        rng = random.Random(seed)
+
+        def pick(value, default):
+            return default if value is None else value
+
+        self.gpio = SimulatedGPIO(
+            failure_rate=pick(gpio_failure_rate, settings.SIM_GPIO_FAILURE_RATE),
+            rng=random.Random(rng.random())
+        )
+        self.environment = SimulatedEnvironment(now=now, gpio=self.gpio, heater_pins=heater_pins,
+                                                rng=random.Random(rng.random()))
+        self.dht = SimulatedDHT(
+            self.environment,
+            latency=pick(dht_latency, settings.SIM_DHT_LATENCY),
+            failure_rate=pick(dht_failure_rate, settings.SIM_DHT_FAILURE_RATE),
+            rng=random.Random(rng.random())
+        )
+        self.onewire = SimulatedOneWire(
+            self.environment,
+            latency=pick(onewire_latency, settings.SIM_ONEWIRE_LATENCY),
+            crc_failure_rate=pick(crc_failure_rate, settings.SIM_ONEWIRE_CRC_FAILURE_RATE),
+            rng=random.Random(rng.random())
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """Read and failure counters for all simulated devices
+
+        Returns:
+            dict: Counter name to value
+        """
+        return {
+            'gpio_writes': self.gpio.write_count,
+            'dht_reads': self.dht.read_count,
+            'dht_failures': self.dht.failure_count,
+            'onewire_reads': self.onewire.read_count,
+            'onewire_crc_failures': self.onewire.failure_count,
+        }
@@ -0,0 +1,232 @@
+"""
+Relay Usage Module
+Incremental on-time, switch count and energy accounting per relay
+"""
+
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from mobius.config import settings
+
+# Bucket width in seconds of each rollup period
+PERIODS = OrderedDict([('minute', 60), ('hour', 3600), ('day', 86400)])
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _seconds(when: datetime) -> float:
+    """Seconds since 1970-01-01 on the clock's own (local) time scale, so days start at local midnight"""
+    if when.tzinfo is not None:
+        when = when.replace(tzinfo=None)
+    return (when - _EPOCH).total_seconds()
+
+
+class UsageRing:
+    """Fixed-size ring of usage buckets for one period
+
+    Each slot holds one bucket's on-seconds and switch count for every
+    device, in flat arrays indexed slot * devices + device. Slots are
+    reused once the ring wraps; a slot whose bucket id does not match
+    reads as empty.
+    """
+
+    def __init__(self, width: int, length: int, devices: int):
+        """Initialize the ring
+
+        Args:
+            width: Bucket width in seconds
+            length: Buckets kept
+            devices: Number of devices
+        """
+        self.width = width
+        self.length = length
+        self.devices = devices
+        self.ids = array('q', [-1] * length)
+        self.on_seconds = array('d', [0.0] * (length * devices))
+        self.switches = array('L', [0] * (length * devices))
+
+    def slot(self, bucket: int) -> int:
+        """Offset of a bucket's first device, claiming (and clearing) its slot if needed"""
+        slot = bucket % self.length
+        offset = slot * self.devices
+        if self.ids[slot] != bucket:
+            self.ids[slot] = bucket
+            for index in range(offset, offset + self.devices):
+                self.on_seconds[index] = 0.0
+                self.switches[index] = 0
+        return offset
+
+    def add_on_time(self, device: int, start: float, end: float):
+        """Add on-time between two times, split across the buckets it spans"""
+        while start < end:
+            bucket = int(start // self.width)
+            stop = min(end, (bucket + 1) * self.width)
+            self.on_seconds[self.slot(bucket) + device] += stop - start
+            start = stop
+
+    def bucket(self, bucket: int) -> Optional[Tuple[array, array]]:
+        """On-seconds and switch counts of a kept bucket
+
+        Returns:
+            tuple: (on_seconds, switches) per device, or None if the bucket was never written
+        """
+        slot = bucket % self.length
+        if self.ids[slot] != bucket:
+            return None
+        offset = slot * self.devices
+        return (self.on_seconds[offset:offset + self.devices],
+                self.switches[offset:offset + self.devices])
+
+
+class RelayUsage:
+    """Duty-cycle and energy accounting of one RelayManager's devices
+
+    record() is called with every state change. On-time is added to the
+    minute, hour and day rings up to each call, so reading a bucket needs
+    no scan of past transitions. roll() closes the buckets that have
+    ended and returns them for writing as aggregate points. Every method
+    holds a lock, as relay updates and status readers run on different
+    threads and all of them advance the rings.
+    """
+
+    def __init__(self, devices: Iterable[str], now: datetime, wattage: Optional[Dict[str, float]] = None,
+                 retention: Optional[Dict[str, int]] = None):
+        """Initialize the accounting
+
+        Args:
+            devices: Device names
+            now: Current time; every device starts off
+            wattage: Device name to power draw in watts when on (defaults to DEVICE_WATTAGE)
+            retention: Period name to buckets kept (defaults to RELAY_USAGE_RETENTION)
+        """
+        self.logger = logging.getLogger('mobius.hardware.usage')
+        self.devices = list(devices)
+        self.index = {device: i for i, device in enumerate(self.devices)}
+        wattage = settings.DEVICE_WATTAGE if wattage is None else wattage
+        self.watts = array('d', [float(wattage.get(device, 0.0)) for device in self.devices])
+        retention = settings.RELAY_USAGE_RETENTION if retention is None else retention
+        self.rings = OrderedDict(
+            (period, UsageRing(width, retention.get(period, 1), len(self.devices)))
+            for period, width in PERIODS.items())
+
+        start = _seconds(now)
+        self.states = array('b', [0] * len(self.devices))
+        self.since = start
+        self.current = {period: int(start // ring.width) for period, ring in self.rings.items()}
+        self._lock = threading.Lock()
+
+    def _advance(self, now: float):
+        """Add the on-time of every device that has been on since the last update"""
+        if now <= self.since:
+            return
+        for device, on in enumerate(self.states):
+            if on:
+                for ring in self.rings.values():
+                    ring.add_on_time(device, self.since, now)
+        self.since = now
+
+    def record(self, states: Dict[str, bool], now: datetime):
+        """Account for devices switching
+
+        Args:
+            states: Device name to its new state
+            now: Time of the switch
+        """
+        now = _seconds(now)
+        with self._lock:
+            self._advance(now)
+            for device, state in states.items():
+                index = self.index.get(device)
+                if index is None or bool(self.states[index]) == bool(state):
+                    continue
+                self.states[index] = 1 if state else 0
+                for ring in self.rings.values():
+                    ring.switches[ring.slot(int(now // ring.width)) + index] += 1
+
+    def roll(self, now: datetime, periods: Optional[Iterable[str]] = None) -> List[Tuple[str, datetime, Dict[str, Dict[str, float]]]]:
+        """Close every bucket that has ended
+
+        Args:
+            now: Current time
+            periods: Periods to return closed buckets for (defaults to all)
+
+        Returns:
+            list: (period, bucket start, usage by device) of each closed bucket, oldest first
+        """
+        now = _seconds(now)
+        periods = list(self.rings) if periods is None else periods
+        closed = []
+        with self._lock:
+            self._advance(now)
+            for period, ring in self.rings.items():
+                bucket = int(now // ring.width)
+                first = max(self.current[period], bucket - ring.length)
+                if period in periods:
+                    for ended in range(first, bucket):
+                        closed.append((period, _EPOCH + timedelta(seconds=ended * ring.width),
+                                       self._usage(ring, ended)))
+                self.current[period] = bucket
+        return closed
+
+    def _usage(self, ring: UsageRing, bucket: int) -> Dict[str, Dict[str, float]]:
+        """Usage of every device in one bucket (zeros if nothing was recorded)"""
+        data = ring.bucket(bucket)
+        usage = OrderedDict()
+        for index, device in enumerate(self.devices):
+            on_seconds = data[0][index] if data else 0.0
+            usage[device] = {
+                'on_seconds': on_seconds,
+                'switches': data[1][index] if data else 0,
+                'duty': on_seconds / ring.width,
+                'energy_wh': on_seconds * self.watts[index] / 3600.0,
+            }
+        return usage
+
+    def current_usage(self, now: datetime, period: str = 'day') -> Dict[str, Dict[str, float]]:
+        """Usage so far in the current bucket of a period
+
+        Args:
+            now: Current time
+            period: 'minute', 'hour' or 'day'
+
+        Returns:
+            dict: Device name to on_seconds, switches, duty (of the elapsed part) and energy_wh
+        """
+        now = _seconds(now)
+        ring = self.rings[period]
+        bucket = int(now // ring.width)
+        with self._lock:
+            self._advance(now)
+            usage = self._usage(ring, bucket)
+        elapsed = now - bucket * ring.width
+        for device in usage.values():
+            device['on_seconds'] = round(device['on_seconds'], 1)
+            device['duty'] = round(device['on_seconds'] / elapsed, 3) if elapsed > 0 else 0.0
+            device['energy_wh'] = round(device['energy_wh'], 2)
+        return usage
+
+    def totals(self, now: datetime, period: str = 'hour') -> Dict[str, Dict[str, float]]:
+        """Usage summed over every kept bucket of a period, including the current one
+
+        Args:
+            now: Current time
+            period: 'minute', 'hour' or 'day'
+
+        Returns:
+            dict: Device name to on_seconds, switches and energy_wh
+        """
+        ring = self.rings[period]
+        totals = OrderedDict((device, {'on_seconds': 0.0, 'switches': 0, 'energy_wh': 0.0}) for device in self.devices)
+        with self._lock:
+            self._advance(_seconds(now))
+            for bucket in ring.ids:
+                if bucket < 0:
+                    continue
+                for device, values in self._usage(ring, bucket).items():
+                    for key in totals[device]:
+                        totals[device][key] += values[key]
+        return totals
@@ -13,75 +13,119 @@ from pathlib import Path
 # Add parent directory to path so we can import mobius package
 sys.path.append(str(Path(__file__).parent.parent))
 
-from mobius.core.controller import VivController
+from mobius.services.logging import configure_logging, stop_logging
+from mobius.utils.helpers import startup_profiler
+
+# Controller, runtime and hardware modules are imported on demand in main()
+# so that unused runtimes and drivers never slow down startup
 
 
 def setup_logging(log_level=logging.INFO):
-    """Configure logging for the application"""
-    # Basic configuration for console output
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # Add a rotating file handler with date-based filenames
-    import os
-    import datetime
-    import glob
-    
-    # Create logs directory if it doesn't exist
-    log_dir = os.path.expanduser('~/mobius_logs')
-    os.makedirs(log_dir, exist_ok=True)
-    
-    # Create a log file with today's date in the filename
-    today = datetime.datetime.now().strftime('%Y%m%d')
-    log_file = os.path.join(log_dir, 'mobius_{}.log'.format(today))
-    
-    # Create a file handler
-    file_handler = logging.FileHandler(log_file)
-    
-    # Set the formatter
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    
-    # Add the handler to the root logger
-    logging.getLogger().addHandler(file_handler)
-    
-    # Clean up old log files (keep only the latest 30 days)
-    log_files = glob.glob(os.path.join(log_dir, 'mobius_*.log'))
-    if len(log_files) > 30:
-        # Sort files by modification time (oldest first)
-        log_files.sort(key=os.path.getmtime)
-        # Remove the oldest files, keeping only the latest 30
-        for old_file in log_files[:-30]:
-            try:
-                os.remove(old_file)
-                logging.debug("Removed old log file: {}".format(old_file))
-            except Exception as e:
-                logging.warning("Failed to remove old log file {}: {}".format(old_file, e))
-    
-    # Return the logger
+    """Configure queued logging to the console and rotating log files"""
+    configure_logging(log_level)
     return logging.getLogger('mobius')
 
 
-def signal_handler(sig, frame):
-    """Handle system signals for graceful shutdown"""
-    logger = logging.getLogger('mobius')
-    logger.info("Signal received, shutting down...")
-    sys.exit(0)
+def make_signal_handler(controller):
+    """Create a handler that asks the controller to shut down gracefully
+    
+    The handler only sets flags; the main thread then runs the controller's
+    bounded shutdown (relay safe state, telemetry flush, hardware cleanup).
+    """
+    def signal_handler(sig, frame):
+        logger = logging.getLogger('mobius')
+        logger.info("Signal {} received, shutting down...".format(sig))
+        controller.request_stop()
+    return signal_handler
+
+
+def make_reload_handler(controller):
+    """Create a SIGHUP handler that asks the controller to reload its config"""
+    def reload_handler(sig, frame):
+        logging.getLogger('mobius').info("SIGHUP received, reloading config")
+        controller.request_reload()
+    return reload_handler
 
 
 def parse_args():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(description='Reptile Vivarium Monitoring System')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging')
-    parser.add_argument('--config', help='Path to custom config file')
+    parser.add_argument('--config', help='JSON/TOML config file, reloaded on change or SIGHUP')
+    parser.add_argument('--simulate', action='store_true', help='Run against simulated hardware')
+    parser.add_argument('--runtime', choices=['thread', 'asyncio'], default='thread',
+                        help='Control loop runtime (default: thread)')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='Log import and initialization time per component')
+    parser.add_argument('--replay', metavar='HISTORY',
+                        help='Replay recorded sensor history (CSV or InfluxDB JSON export) and exit')
+    parser.add_argument('--replay-output', metavar='CSV', help='Write replayed relay decisions to this file')
     return parser.parse_args()
 
 
+def parse_export_args(argv):
+    """Parse arguments of the export subcommand"""
+    parser = argparse.ArgumentParser(prog='mobius export',
+                                     description='Export recorded history from InfluxDB to Parquet or gzipped CSV')
+    parser.add_argument('--start', required=True, help='Range start, UTC (YYYY-MM-DD[THH:MM[:SS]])')
+    parser.add_argument('--end', required=True, help='Range end, UTC and exclusive (YYYY-MM-DD[THH:MM[:SS]])')
+    parser.add_argument('--output', required=True,
+                        help='Output directory (parquet) or file (csv); rerun with the same arguments to resume')
+    parser.add_argument('--format', choices=['parquet', 'csv'],
+                        help='Output format (default: parquet if pyarrow is installed, else csv)')
+    parser.add_argument('--measurement', help='Measurement to export (default: vivarium)')
+    parser.add_argument('--chunk-hours', type=float, help='Hours of history per query')
+    parser.add_argument('--debug', action='store_true', help='Enable debug logging')
+    return parser.parse_args(argv)
+
+
+def run_export_mode(args):
+    """Export a time range of history and print the throughput"""
+    logger = logging.getLogger('mobius')
+    from datetime import timedelta
+    from mobius.services.exporter import HistoryExporter, parse_utc
+    try:
+        exporter = HistoryExporter(chunk=timedelta(hours=args.chunk_hours) if args.chunk_hours else None)
+        summary = exporter.export(args.output, parse_utc(args.start), parse_utc(args.end),
+                                  measurement=args.measurement, fmt=args.format)
+    except Exception as e:
+        logger.error("Export failed: {}".format(e))
+        return 1
+    
+    print("Exported {rows} rows in {chunks} chunks to {output} in {seconds:.1f} s ({rows_per_second:.0f} rows/s)".format(
+        **summary))
+    if summary['resumed']:
+        print("Resumed an earlier run; {total_rows} rows exported in total".format(**summary))
+    return 0
+
+
+def run_replay_mode(history_path, output_path=None, config_path=None):
+    """Replay sensor history through the control logic and print a summary"""
+    logger = logging.getLogger('mobius')
+    from mobius.core.replay import run_replay
+    try:
+        summary = run_replay(history_path, output_path, config_path)
+    except Exception as e:
+        logger.error("Replay failed: {}".format(e))
+        return 1
+    
+    print("Replayed {records} records from {start} to {end}, {decisions} relay decisions".format(**summary))
+    for device, stats in summary['devices'].items():
+        print("  {device:20s} {switches:5d} switches  {on_hours:7.2f} h on".format(device=device, **stats))
+    return 0
+
+
 def main():
     """Main entry point for the application"""
+    # Subcommands take their own arguments
+    if sys.argv[1:2] == ['export']:
+        args = parse_export_args(sys.argv[2:])
+        setup_logging(logging.DEBUG if args.debug else logging.INFO)
+        try:
+            return run_export_mode(args)
+        finally:
+            stop_logging()
+    
     # Parse command line arguments
     args = parse_args()
     
@@ -89,19 +133,44 @@ def main():
     log_level = logging.DEBUG if args.debug else logging.INFO
     logger = setup_logging(log_level)
     
-    # Register signal handlers for graceful shutdown
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    if args.replay:
+        try:
+            return run_replay_mode(args.replay, args.replay_output, args.config)
+        finally:
+            stop_logging()
     
     logger.info("Starting Reptile Vivarium Monitoring System")
     
     try:
         # Initialize and start the controller
-        controller = VivController()
-        controller.start()
+        with startup_profiler.section('import mobius.core.controller'):
+            from mobius.core.controller import VivController
+        with startup_profiler.section('init VivController'):
+            controller = VivController(simulate=args.simulate, config_path=args.config)
+            
+        if args.runtime == 'asyncio':
+            with startup_profiler.section('import mobius.core.async_runtime'):
+                from mobius.core.async_runtime import AsyncRuntime
+            if args.startup_profile:
+                logger.info(startup_profiler.report())
+                
+            # The event loop installs its own SIGINT/SIGTERM handlers
+            AsyncRuntime(controller).start()
+        else:
+            # Register signal handlers for graceful shutdown
+            handler = make_signal_handler(controller)
+            signal.signal(signal.SIGINT, handler)
+            signal.signal(signal.SIGTERM, handler)
+            if hasattr(signal, 'SIGHUP'):
+                signal.signal(signal.SIGHUP, make_reload_handler(controller))
+            if args.startup_profile:
+                logger.info(startup_profiler.report())
+            controller.start()
     except Exception as e:
         logger.error("Error in main execution: {}".format(e))
         return 1
+    finally:
+        stop_logging()
     
     return 0
 
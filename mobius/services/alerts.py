@@ -0,0 +1,466 @@
+"""
+Alert Engine Module
+Checks threshold, rate-of-change and staleness rules against live readings
+and delivers notifications on a background worker
+"""
+
+import os
+import json
+import queue
+import fnmatch
+import logging
+import smtplib
+import threading
+import urllib.request
+from collections import deque, namedtuple
+from email.mime.text import MIMEText
+from typing import Any, Dict, Iterable, List, Optional
+
+from mobius.config import settings
+from mobius.core.clock import system_clock
+from mobius.core.plan import ConfigError
+from mobius.core.samples import SampleBatch, slot_map
+
+# Rule kinds; each rule sets exactly one of these keys to its trigger threshold.
+# Rates are per hour; 'stale' is the age in seconds of the channel's last reading.
+KINDS = ('above', 'below', 'rate_above', 'rate_below', 'stale')
+_RISING = ('above', 'rate_above', 'stale')
+
+# state is 'firing', 'resolved' or 'repeat'; time is an ISO timestamp;
+# suppressed counts transitions held back by rate limiting since the last notification
+Alert = namedtuple('Alert', ['rule', 'enclosure', 'channel', 'state', 'value', 'threshold',
+                             'severity', 'time', 'message', 'suppressed'])
+
+
+class LogNotifier:
+    """Logs alerts at warning level"""
+
+    def __init__(self):
+        self.logger = logging.getLogger('mobius.services.alerts')
+
+    def send(self, alert: Alert):
+        self.logger.warning(alert.message)
+
+
+class FileNotifier:
+    """Appends alerts as JSON lines to a local spool file"""
+
+    def __init__(self, path: Optional[str] = None):
+        """Initialize the notifier
+
+        Args:
+            path: Spool file (defaults to ALERT_SPOOL_FILE)
+        """
+        self.path = path or settings.ALERT_SPOOL_FILE
+
+    def send(self, alert: Alert):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(alert._asdict(), sort_keys=True) + '\n')
+
+
+class SmtpNotifier:
+    """Emails alerts through an SMTP server, e.g. a local relay"""
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, sender: Optional[str] = None,
+                 recipients: Optional[List[str]] = None, timeout: float = 10):
+        """Initialize the notifier
+
+        Args:
+            host: SMTP host (defaults to ALERT_SMTP['host'])
+            port: SMTP port (defaults to ALERT_SMTP['port'])
+            sender: From address (defaults to ALERT_SMTP['from'])
+            recipients: To addresses (defaults to ALERT_SMTP['to'])
+            timeout: Connection timeout in seconds
+        """
+        config = settings.ALERT_SMTP
+        self.host = host or config.get('host', 'localhost')
+        self.port = port or config.get('port', 25)
+        self.sender = sender or config.get('from', 'mobius@localhost')
+        self.recipients = recipients if recipients is not None else list(config.get('to', []))
+        self.timeout = timeout
+
+    def send(self, alert: Alert):
+        if not self.recipients:
+            return
+        message = MIMEText(json.dumps(alert._asdict(), indent=2, sort_keys=True))
+        message['Subject'] = '[mobius] {}'.format(alert.message)
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.sendmail(self.sender, self.recipients, message.as_string())
+
+
+class WebhookNotifier:
+    """POSTs alerts as JSON to a webhook URL"""
+
+    def __init__(self, url: Optional[str] = None, timeout: float = 10):
+        """Initialize the notifier
+
+        Args:
+            url: Webhook URL (defaults to ALERT_WEBHOOK_URL)
+            timeout: Request timeout in seconds
+        """
+        self.url = url or settings.ALERT_WEBHOOK_URL
+        self.timeout = timeout
+
+    def send(self, alert: Alert):
+        if not self.url:
+            return
+        request = urllib.request.Request(
+            self.url, data=json.dumps(alert._asdict()).encode('utf-8'),
+            headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+NOTIFIERS = {
+    'log': LogNotifier,
+    'file': FileNotifier,
+    'smtp': SmtpNotifier,
+    'webhook': WebhookNotifier,
+}
+
+
+def make_notifiers(names: Optional[Iterable[str]] = None) -> List[Any]:
+    """Build notifiers by name
+
+    Args:
+        names: Notifier names from NOTIFIERS (defaults to ALERT_NOTIFIERS)
+
+    Returns:
+        list: Notifier instances
+    """
+    names = settings.ALERT_NOTIFIERS if names is None else names
+    unknown = [name for name in names if name not in NOTIFIERS]
+    if unknown:
+        raise ConfigError("Unknown alert notifiers: {}".format(', '.join(unknown)))
+    return [NOTIFIERS[name]() for name in names]
+
+
+class AlertDispatcher:
+    """Delivers alerts to notifiers on a worker thread
+
+    submit() never blocks: if the queue is full the alert is dropped and
+    counted, so slow SMTP or webhook endpoints cannot stall control.
+    """
+
+    def __init__(self, notifiers: Optional[List[Any]] = None, queue_size: Optional[int] = None):
+        """Initialize the dispatcher
+
+        Args:
+            notifiers: Objects with a send(alert) method (defaults to make_notifiers())
+            queue_size: Alerts waiting for delivery before new ones are dropped (defaults to ALERT_QUEUE_SIZE)
+        """
+        self.logger = logging.getLogger('mobius.services.alerts')
+        self.notifiers = make_notifiers() if notifiers is None else notifiers
+        self.queue = queue.Queue(maxsize=settings.ALERT_QUEUE_SIZE if queue_size is None else queue_size)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, alert: Alert) -> bool:
+        """Queue an alert for delivery
+
+        Args:
+            alert: Alert to deliver
+
+        Returns:
+            bool: True if queued, False if dropped
+        """
+        if not self.notifiers:
+            return True
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='alerts', daemon=True)
+                self._thread.start()
+        try:
+            self.queue.put_nowait(alert)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self.logger.error("Alert queue full, dropped: {}".format(alert.message))
+            return False
+
+    def _run(self):
+        while True:
+            alert = self.queue.get()
+            if alert is None:
+                return
+            for notifier in self.notifiers:
+                try:
+                    notifier.send(alert)
+                    self.sent += 1
+                except Exception as e:
+                    self.failed += 1
+                    self.logger.error("{name} could not deliver alert {rule}: {e}".format(
+                        name=type(notifier).__name__, rule=alert.rule, e=e))
+
+    def close(self, timeout: Optional[float] = None):
+        """Deliver queued alerts, then stop the worker
+
+        Args:
+            timeout: Seconds to wait for delivery
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+
+class AlertEngine:
+    """Compiled alert rules checked against every channel in one pass
+
+    Rules are expanded against the known fields of each enclosure into
+    one flat table (column lists indexed by row), and each field gets a
+    slot in the value, time and rate columns that observe() fills. check()
+    walks the table once, applying each row's hold time ('for') and
+    hysteresis ('clear'), and notifies only on state changes: at most
+    once per ALERT_MIN_INTERVAL per row, with a reminder every
+    ALERT_REPEAT_INTERVAL while an alert stays active.
+    """
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None, dispatcher: Optional[AlertDispatcher] = None,
+                 clock=None, rate_window: Optional[float] = None, min_interval: Optional[float] = None,
+                 repeat_interval: Optional[float] = None):
+        """Initialize the engine
+
+        Args:
+            rules: Rule dicts (defaults to ALERT_RULES)
+            dispatcher: AlertDispatcher delivering notifications (defaults to one with ALERT_NOTIFIERS)
+            clock: Optional clock providing now() and monotonic()
+            rate_window: Seconds of history used for rates (defaults to ALERT_RATE_WINDOW)
+            min_interval: Shortest time between notifications of one row (defaults to ALERT_MIN_INTERVAL)
+            repeat_interval: Reminder interval while active (defaults to ALERT_REPEAT_INTERVAL)
+        """
+        self.logger = logging.getLogger('mobius.services.alerts')
+        self.rules = settings.ALERT_RULES if rules is None else rules
+        self.dispatcher = dispatcher if dispatcher is not None else AlertDispatcher()
+        self.clock = clock or system_clock
+        self.rate_window = settings.ALERT_RATE_WINDOW if rate_window is None else rate_window
+        self.min_interval = settings.ALERT_MIN_INTERVAL if min_interval is None else min_interval
+        self.repeat_interval = settings.ALERT_REPEAT_INTERVAL if repeat_interval is None else repeat_interval
+        self.notification_count = 0
+        self._lock = threading.Lock()
+        self.compile({})
+
+    def compile(self, fields: Dict[str, Iterable[str]]):
+        """Expand the rules against each enclosure's fields into the rule table
+
+        A rule's 'channel' may be a glob (e.g. 'DHT*_Hum') and its
+        optional 'enclosures' list limits it to some enclosures.
+
+        Args:
+            fields: Enclosure name to its sensor field names
+
+        Raises:
+            ConfigError: If a rule is malformed
+        """
+        slots = {}
+        columns = {name: [] for name in ('rule', 'slot', 'kind', 'threshold', 'clear', 'hold', 'severity')}
+        for rule in self.rules:
+            kinds = [kind for kind in KINDS if kind in rule]
+            if 'name' not in rule or 'channel' not in rule or len(kinds) != 1:
+                raise ConfigError("Alert rule needs 'name', 'channel' and exactly one of {}: {!r}".format(
+                    ', '.join(KINDS), rule))
+            kind = kinds[0]
+            threshold = float(rule[kind])
+            clear = float(rule.get('clear', threshold))
+            if (clear > threshold) if kind in _RISING else (clear < threshold):
+                raise ConfigError("Alert rule {}: 'clear' must be on the safe side of the threshold".format(rule['name']))
+
+            for enclosure, names in sorted(fields.items()):
+                if rule.get('enclosures') and enclosure not in rule['enclosures']:
+                    continue
+                for field in fnmatch.filter(sorted(names), rule['channel']):
+                    slot = slots.setdefault((enclosure, field), len(slots))
+                    columns['rule'].append(rule['name'])
+                    columns['slot'].append(slot)
+                    columns['kind'].append(kind)
+                    columns['threshold'].append(threshold)
+                    columns['clear'].append(clear)
+                    columns['hold'].append(float(rule.get('for', 0)))
+                    columns['severity'].append(rule.get('severity', 'warning'))
+
+        rows = len(columns['rule'])
+        started = self.clock.monotonic()
+        with self._lock:
+            self.slots = slots
+            self.slot_names = sorted(slots, key=slots.get)
+            self.columns = columns
+            self.values = [None] * len(slots)
+            self.times = [started] * len(slots)
+            self.history = [deque() for _ in slots]
+            self.rates = [None] * len(slots)
+            # Enclosure to its channel table and the slot of each field ID
+            self.table_slots = {}
+            self.active = [False] * rows
+            self.since = [None] * rows
+            self.notified = [False] * rows
+            self.last_notified = [float('-inf')] * rows
+            self.suppressed = [0] * rows
+        if rows:
+            self.logger.info("Compiled {rows} alert checks over {slots} channels".format(rows=rows, slots=len(slots)))
+
+    def observe(self, enclosure: str, readings: Dict[str, float]):
+        """Record new readings
+
+        Args:
+            enclosure: Enclosure name
+            readings: Field name to value, or a SampleBatch
+        """
+        now = self.clock.monotonic()
+        with self._lock:
+            if isinstance(readings, SampleBatch):
+                table, slots = self.table_slots.get(enclosure, (None, None))
+                if table is not readings.table:
+                    slots = slot_map(readings.table, self.slots, key=lambda field: (enclosure, field))
+                    self.table_slots[enclosure] = (readings.table, slots)
+                pairs = zip(slots, readings.data)
+            else:
+                pairs = ((self.slots.get((enclosure, field)), value) for field, value in readings.items())
+            for slot, value in pairs:
+                # Missing batch fields are NaN
+                if slot is None or value is None or value != value:
+                    continue
+                self.values[slot] = value
+                self.times[slot] = now
+                history = self.history[slot]
+                history.append((now, value))
+                while now - history[0][0] > self.rate_window:
+                    history.popleft()
+                first_time, first_value = history[0]
+                # Rates need at least half a window of history to be meaningful
+                if now - first_time >= self.rate_window / 2:
+                    self.rates[slot] = (value - first_value) / (now - first_time) * 3600
+                else:
+                    self.rates[slot] = None
+
+    def check(self) -> List[Alert]:
+        """Evaluate every rule row and dispatch notifications
+
+        Returns:
+            list: Alerts dispatched by this check
+        """
+        now = self.clock.monotonic()
+        alerts = []
+        with self._lock:
+            columns = self.columns
+            for row, (slot, kind, threshold, clear, hold) in enumerate(zip(
+                    columns['slot'], columns['kind'], columns['threshold'], columns['clear'], columns['hold'])):
+                if kind == 'stale':
+                    value = now - self.times[slot]
+                elif kind in ('rate_above', 'rate_below'):
+                    value = self.rates[slot]
+                else:
+                    value = self.values[slot]
+                if value is None:
+                    continue
+
+                rising = kind in _RISING
+                changed = False
+                if not self.active[row]:
+                    if value > threshold if rising else value < threshold:
+                        if self.since[row] is None:
+                            self.since[row] = now
+                        if now - self.since[row] >= hold:
+                            self.active[row] = changed = True
+                    else:
+                        self.since[row] = None
+                elif value <= clear if rising else value >= clear:
+                    self.active[row] = False
+                    self.since[row] = None
+                    changed = True
+
+                if self.active[row] != self.notified[row]:
+                    if now - self.last_notified[row] < self.min_interval:
+                        # Flapping: hold the change back; a later check reports the state it settles in
+                        if changed:
+                            self.suppressed[row] += 1
+                        continue
+                    state = 'firing' if self.active[row] else 'resolved'
+                elif self.active[row] and now - self.last_notified[row] >= self.repeat_interval:
+                    state = 'repeat'
+                else:
+                    continue
+                alerts.append(self._alert(row, state, value))
+                self.notified[row] = self.active[row]
+                self.last_notified[row] = now
+                self.suppressed[row] = 0
+
+        self.notification_count += len(alerts)
+        for alert in alerts:
+            self.dispatcher.submit(alert)
+        return alerts
+
+    def _alert(self, row: int, state: str, value: float) -> Alert:
+        """Build the alert for a row; must be called with _lock held"""
+        columns = self.columns
+        enclosure, channel = self.slot_names[columns['slot'][row]]
+        kind = columns['kind'][row]
+        rule = columns['rule'][row]
+        units = {'stale': 's old', 'rate_above': '/h', 'rate_below': '/h'}.get(kind, '')
+        if state == 'resolved':
+            message = "{rule} resolved: {enclosure} {channel} is {value:.1f}{units}"
+        else:
+            message = "{rule}: {enclosure} {channel} is {value:.1f}{units} ({kind} {threshold:g})"
+        return Alert(
+            rule=rule,
+            enclosure=enclosure,
+            channel=channel,
+            state=state,
+            value=value,
+            threshold=columns['threshold'][row],
+            severity=columns['severity'][row],
+            time=self.clock.now().isoformat(),
+            message=message.format(rule=rule, enclosure=enclosure, channel=channel, value=value,
+                                   units=units, kind=kind.replace('_', ' '), threshold=columns['threshold'][row]),
+            suppressed=self.suppressed[row],
+        )
+
+    def notify(self, rule: str, state: str, message: str, severity: str = 'critical', value: Optional[float] = None) -> Alert:
+        """Dispatch an alert raised outside the rule table (e.g. a deadline overrun)
+
+        Args:
+            rule: Name the alert is reported under
+            state: 'firing' or 'resolved'
+            message: Human-readable description
+            severity: Alert severity
+            value: Optional value behind the alert
+
+        Returns:
+            Alert: The dispatched alert
+        """
+        alert = Alert(rule=rule, enclosure='', channel='', state=state, value=value, threshold=None,
+                      severity=severity, time=self.clock.now().isoformat(), message=message, suppressed=0)
+        self.notification_count += 1
+        self.dispatcher.submit(alert)
+        return alert
+
+    def active_alerts(self) -> List[Dict[str, str]]:
+        """Currently active alerts, for status endpoints
+
+        Returns:
+            list: Dicts with the rule, enclosure and channel of each active row
+        """
+        with self._lock:
+            return [
+                {'rule': self.columns['rule'][row], 'enclosure': self.slot_names[slot][0],
+                 'channel': self.slot_names[slot][1], 'severity': self.columns['severity'][row]}
+                for row, slot in enumerate(self.columns['slot']) if self.active[row]
+            ]
+
+    def close(self, timeout: Optional[float] = None):
+        """Deliver queued notifications and stop the worker
+
+        Args:
+            timeout: Seconds to wait for delivery
+        """
+        self.dispatcher.close(timeout)
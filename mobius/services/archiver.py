@@ -0,0 +1,286 @@
+"""
+Video Archiver Module
+Moves aged videos into daily tar containers on a cold-tier disk
+"""
+
+import os
+import json
+import time
+import signal
+import hashlib
+import logging
+import tarfile
+import subprocess
+import multiprocessing
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from mobius.config import settings
+from mobius.core.clock import system_clock
+from mobius.utils.helpers import optional_import
+
+
+class _ThrottledReader:
+    """File wrapper that hashes what it reads and caps the read rate"""
+
+    def __init__(self, f, max_rate: float):
+        self.f = f
+        self.max_rate = max_rate
+        self.bytes_read = 0
+        self.started = time.monotonic()
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        self.bytes_read += len(data)
+        self.sha256.update(data)
+        if self.max_rate:
+            ahead = self.bytes_read / self.max_rate - (time.monotonic() - self.started)
+            if ahead > 0:
+                time.sleep(ahead)
+        return data
+
+
+def _lower_priority(niceness: int, ionice_class: int):
+    """Pool initializer: run workers at idle CPU and I/O priority"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        os.nice(niceness)
+    except OSError:
+        pass
+
+    psutil = optional_import('psutil')
+    try:
+        if psutil is not None and hasattr(psutil, 'IOPRIO_CLASS_IDLE'):
+            psutil.Process().ionice(ionice_class)
+        else:
+            subprocess.run(['ionice', '-c', str(ionice_class), '-p', str(os.getpid())],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5)
+    except Exception:
+        pass
+
+
+def _write_json_atomic(path: str, data: Any):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _resume(tar_path: str, manifest_path: str, checkpoint_path: str) -> Dict[str, Any]:
+    """Roll a day's container back to its last checkpoint
+
+    Anything written after the checkpoint (a member interrupted mid-copy,
+    or a manifest line without its checkpoint) is discarded.
+
+    Returns:
+        dict: Checkpoint with the committed tar offset and member names
+    """
+    checkpoint = {'offset': 0, 'members': []}
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+    elif os.path.exists(tar_path) and os.path.getsize(tar_path) > 0:
+        raise RuntimeError("{} has no checkpoint, refusing to modify it".format(tar_path))
+
+    # Cut the container back to its last committed member and re-terminate
+    # it, so tarfile can append from there
+    if os.path.exists(tar_path):
+        if checkpoint['offset']:
+            with open(tar_path, 'r+b') as f:
+                f.truncate(checkpoint['offset'])
+                f.seek(checkpoint['offset'])
+                f.write(b'\0' * (2 * tarfile.BLOCKSIZE))
+        else:
+            os.remove(tar_path)
+
+    if os.path.exists(manifest_path):
+        members = set(checkpoint['members'])
+        with open(manifest_path) as f:
+            lines = [line for line in f if line.strip()]
+        kept = []
+        for line in lines:
+            name = json.loads(line)['name']
+            if name in members:
+                members.discard(name)
+                kept.append(line)
+        if len(kept) != len(lines):
+            with open(manifest_path, 'w') as f:
+                f.writelines(kept)
+    return checkpoint
+
+
+def archive_day(day: str, entries: List[Dict[str, Any]], archive_dir: str, max_rate: float) -> Dict[str, Any]:
+    """Append one day's videos to its tar container and delete the originals
+
+    Runs in a worker process. Every member is fsynced and checkpointed
+    before its source file is deleted, so an interrupted run resumes
+    where it stopped without losing or duplicating videos.
+
+    Args:
+        day: Day as YYYYMMDD
+        entries: Dicts with the video 'path' and any metadata for the manifest
+        archive_dir: Cold-tier directory
+        max_rate: Read limit in bytes per second (0 for unlimited)
+
+    Returns:
+        dict: Day, files archived, bytes copied and seconds taken
+    """
+    started = time.monotonic()
+    base = os.path.join(archive_dir, 'videos-{}'.format(day))
+    tar_path = base + '.tar'
+    manifest_path = base + '.manifest.jsonl'
+    checkpoint_path = os.path.join(archive_dir, '.videos-{}.checkpoint.json'.format(day))
+
+    checkpoint = _resume(tar_path, manifest_path, checkpoint_path)
+    done = set(checkpoint['members'])
+    archived = 0
+    copied = 0
+
+    with tarfile.open(tar_path, 'a') as tar:
+        for entry in sorted(entries, key=lambda e: e['path']):
+            path = entry['path']
+            name = os.path.basename(path)
+            if name not in done:
+                tarinfo = tar.gettarinfo(path, arcname=name)
+                with open(path, 'rb') as f:
+                    reader = _ThrottledReader(f, max_rate)
+                    tar.addfile(tarinfo, reader)
+                tar.fileobj.flush()
+                os.fsync(tar.fileobj.fileno())
+
+                record = dict(entry, name=name, size=tarinfo.size, mtime=tarinfo.mtime,
+                              sha256=reader.sha256.hexdigest())
+                record.pop('path')
+                with open(manifest_path, 'a') as manifest:
+                    manifest.write(json.dumps(record, sort_keys=True) + '\n')
+                    manifest.flush()
+                    os.fsync(manifest.fileno())
+
+                done.add(name)
+                _write_json_atomic(checkpoint_path, {'offset': tar.offset, 'members': sorted(done)})
+                archived += 1
+                copied += tarinfo.size
+            os.remove(path)
+
+    return {'day': day, 'files': archived, 'bytes': copied, 'seconds': time.monotonic() - started}
+
+
+class VideoArchiver:
+    """Archives aged videos to a cold tier in a low-priority process pool
+
+    Each day's videos go into one tar container (videos are already
+    compressed) with a JSON-lines manifest. Work is submitted without
+    blocking; videos in flight are reported so cleanup leaves them alone.
+    """
+
+    def __init__(self, archive_dir: Optional[str] = None, after_days: Optional[float] = None,
+                 workers: Optional[int] = None, max_rate: Optional[float] = None, clock=None):
+        """Initialize the archiver
+
+        Args:
+            archive_dir: Cold-tier directory, which must already exist (defaults to ARCHIVE_DIR; empty disables)
+            after_days: Archive videos older than this (defaults to ARCHIVE_AFTER_DAYS)
+            workers: Worker processes (defaults to ARCHIVE_WORKERS)
+            max_rate: Total read limit in bytes per second (defaults to ARCHIVE_MAX_BYTES_PER_SEC)
+            clock: Optional clock used to judge file ages
+        """
+        self.logger = logging.getLogger('mobius.services.archiver')
+        self.archive_dir = settings.ARCHIVE_DIR if archive_dir is None else archive_dir
+        self.after_days = settings.ARCHIVE_AFTER_DAYS if after_days is None else after_days
+        self.workers = workers or settings.ARCHIVE_WORKERS
+        self.max_rate = settings.ARCHIVE_MAX_BYTES_PER_SEC if max_rate is None else max_rate
+        self.clock = clock or system_clock
+
+        self.archived_files = 0
+        self.archived_bytes = 0
+        self._pool = None
+        self._pending = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.archive_dir)
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(
+                self.workers, initializer=_lower_priority,
+                initargs=(settings.ARCHIVE_NICE, settings.ARCHIVE_IONICE_CLASS))
+        return self._pool
+
+    def archive(self, file_list: Iterable[str], video_index=None) -> Set[str]:
+        """Submit videos older than after_days for archiving
+
+        Args:
+            file_list: Candidate video paths
+            video_index: Optional VideoIndex whose metadata goes in the manifest
+
+        Returns:
+            set: Paths being archived, which the caller must not delete
+        """
+        self.collect()
+        if not self.enabled:
+            return set()
+        if not os.path.isdir(self.archive_dir):
+            self.logger.warning("Archive directory {} is not available, skipping archiving".format(self.archive_dir))
+            return self.in_flight()
+
+        cutoff = self.clock.now() - timedelta(days=self.after_days)
+        by_day = defaultdict(list)
+        for path in file_list:
+            try:
+                modified = datetime.fromtimestamp(os.path.getmtime(path))
+            except OSError:
+                continue
+            if modified >= cutoff:
+                continue
+            created = video_index.creation_datetime(path) if video_index is not None else None
+            entry = {'path': path}
+            info = video_index.get(path) if video_index is not None else None
+            if info is not None:
+                entry.update(info._asdict())
+            by_day[(created or modified).strftime('%Y%m%d')].append(entry)
+
+        rate = self.max_rate / self.workers if self.max_rate else 0
+        for day, entries in sorted(by_day.items()):
+            if day in self._pending:
+                continue
+            result = self._get_pool().apply_async(archive_day, (day, entries, self.archive_dir, rate))
+            self._pending[day] = (result, {entry['path'] for entry in entries})
+            self.logger.info("Archiving {count} videos from {day}".format(count=len(entries), day=day))
+
+        return self.in_flight()
+
+    def in_flight(self) -> Set[str]:
+        """Paths submitted for archiving that are not finished yet"""
+        paths = set()
+        for _, day_paths in self._pending.values():
+            paths.update(day_paths)
+        return paths
+
+    def collect(self):
+        """Log and forget finished archive jobs"""
+        for day, (result, _) in list(self._pending.items()):
+            if not result.ready():
+                continue
+            del self._pending[day]
+            try:
+                summary = result.get()
+            except Exception as e:
+                self.logger.error("Archiving {day} failed, will resume next run: {e}".format(day=day, e=e))
+                continue
+            self.archived_files += summary['files']
+            self.archived_bytes += summary['bytes']
+            self.logger.info("Archived {files} videos ({mb:.1f} MB) from {day} in {seconds:.1f}s".format(
+                mb=summary['bytes'] / 1e6, **summary))
+
+    def close(self):
+        """Stop the workers; interrupted days resume from their checkpoints"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._pending.clear()
@@ -0,0 +1,135 @@
+"""
+Async InfluxDB Writer Module
+Writes points to the InfluxDB 1.x HTTP API over a persistent asyncio connection
+"""
+
+import asyncio
+import base64
+import logging
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlencode
+
+from mobius.config import settings
+from mobius.services.influx_client import to_line_protocol
+
+
+class AsyncInfluxWriter:
+    """Minimal keep-alive HTTP/1.1 client for InfluxDB writes
+
+    A single connection is reused for every write and reopened if the server
+    closes it, so each write costs one request rather than a TCP handshake.
+    """
+
+    def __init__(self, credentials: Dict[str, Any], timeout: float = None):
+        """Initialize the writer
+
+        Args:
+            credentials: InfluxDB connection parameters (host, port, username, password, database)
+            timeout: Seconds to wait for each request (defaults to INFLUX_HTTP_TIMEOUT)
+        """
+        self.logger = logging.getLogger('mobius.services.async_influx')
+        self.host = credentials.get('host', 'localhost')
+        self.port = int(credentials.get('port', 8086))
+        self.database = credentials.get('database', 'vivarium')
+        self.username = credentials.get('username')
+        self.password = credentials.get('password')
+        self.timeout = settings.INFLUX_HTTP_TIMEOUT if timeout is None else timeout
+
+        self.write_count = 0
+        self.error_count = 0
+        self.connect_count = 0
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    async def write_points(self, json_body: List[Dict[str, Any]]) -> bool:
+        """Write data points to InfluxDB
+
+        Args:
+            json_body: InfluxDB formatted json data
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        body = to_line_protocol(json_body).encode('utf-8')
+        if not body:
+            return False
+
+        query = {'db': self.database, 'precision': 's'}
+        path = '/write?' + urlencode(query)
+
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    status, response = await asyncio.wait_for(self._request('POST', path, body), self.timeout)
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                    # Stale keep-alive connection: reconnect once before giving up
+                    self._close()
+                    if attempt == 0:
+                        continue
+                    self.error_count += 1
+                    self.logger.error("Error writing to InfluxDB: {}".format(e or type(e).__name__))
+                    return False
+
+                if status == 204:
+                    self.write_count += 1
+                    return True
+
+                self.error_count += 1
+                self.logger.error("InfluxDB write failed with HTTP {status}: {response}".format(
+                    status=status, response=response[:200]))
+                return False
+        return False
+
+    async def _request(self, method: str, path: str, body: bytes) -> Tuple[int, str]:
+        """Send one request on the persistent connection and read the response"""
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self.connect_count += 1
+
+        headers = [
+            '{method} {path} HTTP/1.1'.format(method=method, path=path),
+            'Host: {host}:{port}'.format(host=self.host, port=self.port),
+            'Content-Type: application/octet-stream',
+            'Content-Length: {}'.format(len(body)),
+            'Connection: keep-alive',
+        ]
+        if self.username:
+            token = base64.b64encode('{}:{}'.format(self.username, self.password or '').encode('utf-8'))
+            headers.append('Authorization: Basic {}'.format(token.decode('ascii')))
+
+        self._writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b'', None)
+        status = int(status_line.split()[1])
+
+        length = 0
+        keep_alive = True
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name = name.strip().lower()
+            if name == 'content-length':
+                length = int(value.strip())
+            elif name == 'connection' and value.strip().lower() == 'close':
+                keep_alive = False
+
+        response = await self._reader.readexactly(length) if length else b''
+        if not keep_alive:
+            self._close()
+        return status, response.decode('utf-8', 'replace')
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+    async def close(self):
+        """Close the persistent connection"""
+        self._close()
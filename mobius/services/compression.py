@@ -0,0 +1,229 @@
+"""
+Telemetry Compression Module
+Drops sensor readings that can be reconstructed from the points already stored
+"""
+
+import logging
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from mobius.config import settings
+
+MODES = ('swinging_door', 'deadband')
+
+
+class ChannelCompressor:
+    """Deadband or swinging-door compression of one field
+
+    Points are (timestamp, value) pairs. With 'deadband' a reading is
+    emitted when it moves more than the tolerance from the last emitted
+    value, so holding each value until the next point reconstructs the
+    signal. With 'swinging_door' a reading is held back until no straight
+    line from the last emitted point passes within the tolerance of every
+    reading since; the held reading is then emitted, moved onto such a
+    line, so linear interpolation reconstructs the signal. Either way a
+    point is forced out once heartbeat seconds pass without one.
+    """
+
+    def __init__(self, tolerance: float, heartbeat: float, mode: str = 'swinging_door'):
+        """Initialize the channel
+
+        Args:
+            tolerance: Largest reconstruction error allowed
+            heartbeat: Longest gap between emitted points (seconds)
+            mode: 'swinging_door' or 'deadband'
+        """
+        if mode not in MODES:
+            raise ValueError("Unknown compression mode {!r}".format(mode))
+        self.tolerance = tolerance
+        self.heartbeat = heartbeat
+        self.mode = mode
+
+        self.archived = None
+        self.held = None
+        self.upper = float('inf')
+        self.lower = float('-inf')
+        self.received = 0
+        self.emitted = 0
+
+    def _emit(self, point: Tuple[float, float], out: List[Tuple[float, float]]):
+        self.archived = point
+        self.held = None
+        self.upper = float('inf')
+        self.lower = float('-inf')
+        self.emitted += 1
+        out.append(point)
+
+    def _doors(self, timestamp: float, value: float) -> Tuple[float, float]:
+        """Slopes of the doors from the archived point once a reading is included
+
+        Returns:
+            tuple: (upper, lower) slopes; the doors are closed if lower > upper
+        """
+        archived_time, archived_value = self.archived
+        elapsed = timestamp - archived_time
+        if elapsed <= 0:
+            return self.upper, self.lower
+        return (min(self.upper, (value + self.tolerance - archived_value) / elapsed),
+                max(self.lower, (value - self.tolerance - archived_value) / elapsed))
+
+    def _on_line(self, point: Tuple[float, float]) -> Tuple[float, float]:
+        """Move a held reading onto the closest line that fits every reading since the archived point
+
+        The result is within the tolerance of the reading itself, and
+        interpolating to it stays within the tolerance of everything between.
+        """
+        archived_time, archived_value = self.archived
+        elapsed = point[0] - archived_time
+        if elapsed <= 0 or self.lower > self.upper:
+            return point
+        slope = min(max((point[1] - archived_value) / elapsed, self.lower), self.upper)
+        return point[0], archived_value + slope * elapsed
+
+    def add(self, timestamp: float, value: float) -> List[Tuple[float, float]]:
+        """Offer a reading
+
+        Args:
+            timestamp: Unix time of the reading
+            value: Reading
+
+        Returns:
+            list: (timestamp, value) points to store, oldest first
+        """
+        self.received += 1
+        out = []
+        point = (timestamp, value)
+        if self.archived is None:
+            self._emit(point, out)
+            return out
+
+        if self.mode == 'deadband':
+            if abs(value - self.archived[1]) > self.tolerance:
+                self._emit(point, out)
+            else:
+                self.held = point
+        else:
+            upper, lower = self._doors(timestamp, value)
+            if lower > upper:
+                # The doors closed: the held reading ends this segment and starts the next
+                self._emit(self._on_line(self.held), out)
+                upper, lower = self._doors(timestamp, value)
+            self.upper, self.lower = upper, lower
+            self.held = point
+
+        if self.held is not None and timestamp - self.archived[0] >= self.heartbeat:
+            self._emit(self._on_line(self.held), out)
+        return out
+
+    def flush(self) -> List[Tuple[float, float]]:
+        """Emit the held reading, if any, so the stored series ends on the latest value
+
+        Returns:
+            list: Zero or one (timestamp, value) points
+        """
+        out = []
+        if self.held is not None:
+            self._emit(self._on_line(self.held), out)
+        return out
+
+    @property
+    def ratio(self) -> float:
+        """Readings received per point emitted"""
+        return self.received / float(self.emitted) if self.emitted else 0.0
+
+
+class TelemetryCompressor:
+    """Per-field compression of one enclosure's sensor readings
+
+    Sits between the sensor readings and the InfluxDB points: only the
+    readings needed to reconstruct each field within its tolerance are
+    passed on, grouped by the timestamp they were taken at.
+    """
+
+    def __init__(self, mode: Optional[str] = None, tolerances: Optional[Dict[str, float]] = None,
+                 heartbeat: Optional[float] = None):
+        """Initialize the compressor
+
+        Args:
+            mode: 'swinging_door' or 'deadband' (defaults to TELEMETRY_COMPRESSION)
+            tolerances: Field name suffix to tolerance (defaults to COMPRESSION_TOLERANCES)
+            heartbeat: Longest gap between stored points per field (defaults to COMPRESSION_HEARTBEAT)
+        """
+        self.logger = logging.getLogger('mobius.services.compression')
+        self.mode = mode or settings.TELEMETRY_COMPRESSION
+        if self.mode not in MODES:
+            raise ValueError("Unknown compression mode {!r}".format(self.mode))
+        self.tolerances = settings.COMPRESSION_TOLERANCES if tolerances is None else tolerances
+        self.heartbeat = settings.COMPRESSION_HEARTBEAT if heartbeat is None else heartbeat
+        self.channels = OrderedDict()
+
+    def tolerance(self, field: str) -> float:
+        """Tolerance for a field, matched on the longest configured suffix
+
+        Args:
+            field: Field name (e.g. 'DHT1_Temp')
+
+        Returns:
+            float: Tolerance (0 keeps every change)
+        """
+        matches = [suffix for suffix in self.tolerances if field.endswith(suffix)]
+        return self.tolerances[max(matches, key=len)] if matches else 0.0
+
+    def _channel(self, field: str) -> ChannelCompressor:
+        channel = self.channels.get(field)
+        if channel is None:
+            channel = ChannelCompressor(self.tolerance(field), self.heartbeat, self.mode)
+            self.channels[field] = channel
+        return channel
+
+    def compress(self, readings: Dict[str, float], timestamp: float) -> 'OrderedDict[int, Dict[str, float]]':
+        """Pass readings through each field's compressor
+
+        Args:
+            readings: Field name to value, or a SampleBatch
+            timestamp: Unix time the readings were taken
+
+        Returns:
+            OrderedDict: Timestamp (whole seconds) to the fields to store at it, oldest first
+        """
+        # Most readings are held back, so the grouping is only built when something is emitted
+        points = None
+        for field, value in readings.items():
+            if value is None:
+                continue
+            emitted = self._channel(field).add(timestamp, value)
+            if emitted:
+                if points is None:
+                    points = defaultdict(dict)
+                for point_time, point_value in emitted:
+                    points[int(point_time)][field] = point_value
+        return OrderedDict(sorted(points.items())) if points else OrderedDict()
+
+    def flush(self) -> 'OrderedDict[int, Dict[str, float]]':
+        """Emit every held reading, e.g. before shutdown
+
+        Returns:
+            OrderedDict: Timestamp (whole seconds) to the fields to store at it, oldest first
+        """
+        points = defaultdict(dict)
+        for field, channel in self.channels.items():
+            for point_time, point_value in channel.flush():
+                points[int(point_time)][field] = point_value
+        return OrderedDict(sorted(points.items()))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Readings received, points emitted and compression ratio per field
+
+        Returns:
+            dict: Field name to counters
+        """
+        return {
+            field: {'received': channel.received, 'emitted': channel.emitted, 'ratio': round(channel.ratio, 2)}
+            for field, channel in self.channels.items()
+        }
+
+    def ratio(self) -> float:
+        """Overall readings received per point emitted"""
+        emitted = sum(channel.emitted for channel in self.channels.values())
+        received = sum(channel.received for channel in self.channels.values())
+        return received / float(emitted) if emitted else 0.0
@@ -0,0 +1,421 @@
+"""
+Dashboard Module
+Pre-aggregated chart series for the website, kept up to date incrementally
+and written as static JSON files so page views never query InfluxDB
+"""
+
+import os
+import json
+import logging
+import threading
+from array import array
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from mobius.config import settings
+from mobius.core.samples import SampleBatch, slot_map
+
+
+class DashboardRing:
+    """Fixed-size ring of chart buckets for one range
+
+    Each slot holds one bucket's count, sum, minimum and maximum of every
+    sensor field and the on-seconds of every relay, in flat arrays indexed
+    slot * fields + field (slot * devices + device for relays). Slots are
+    reused once the ring wraps; a slot whose bucket id does not match
+    reads as empty.
+    """
+
+    def __init__(self, width: int, length: int, fields: int, devices: int):
+        """Initialize the ring
+
+        Args:
+            width: Bucket width in seconds
+            length: Buckets kept
+            fields: Number of sensor fields
+            devices: Number of relays
+        """
+        self.width = width
+        self.length = length
+        self.fields = fields
+        self.devices = devices
+        self.ids = array('q', [-1] * length)
+        self.counts = array('L', [0] * (length * fields))
+        self.sums = array('d', [0.0] * (length * fields))
+        self.lows = array('d', [0.0] * (length * fields))
+        self.highs = array('d', [0.0] * (length * fields))
+        self.on_seconds = array('d', [0.0] * (length * devices))
+
+    def slot(self, bucket: int) -> int:
+        """Slot of a bucket, claiming (and clearing) it if needed"""
+        slot = bucket % self.length
+        if self.ids[slot] != bucket:
+            self.ids[slot] = bucket
+            offset = slot * self.fields
+            for index in range(offset, offset + self.fields):
+                self.counts[index] = 0
+                self.sums[index] = 0.0
+            offset = slot * self.devices
+            for index in range(offset, offset + self.devices):
+                self.on_seconds[index] = 0.0
+        return slot
+
+    def add(self, values: List[Tuple[int, float]], when: float):
+        """Add readings taken at one time to the bucket containing it
+
+        Args:
+            values: (field index, value) of each reading
+            when: Unix time of the readings
+        """
+        offset = self.slot(int(when // self.width)) * self.fields
+        counts, sums, lows, highs = self.counts, self.sums, self.lows, self.highs
+        for field, value in values:
+            index = offset + field
+            if counts[index]:
+                if value < lows[index]:
+                    lows[index] = value
+                elif value > highs[index]:
+                    highs[index] = value
+            else:
+                lows[index] = highs[index] = value
+            counts[index] += 1
+            sums[index] += value
+
+    def add_on_time(self, device: int, start: float, end: float):
+        """Add on-time between two times, split across the buckets it spans"""
+        while start < end:
+            bucket = int(start // self.width)
+            stop = min(end, (bucket + 1) * self.width)
+            self.on_seconds[self.slot(bucket) * self.devices + device] += stop - start
+            start = stop
+
+
+class DashboardSeries:
+    """Chart series of every enclosure over each DASHBOARD_RANGES range
+
+    observe() adds a tick's readings and record_relays() the relay states
+    to the current bucket of every range, so the series are never rebuilt
+    from history. write() renders the ranges that are due as
+    dashboard-<range>.json in the dashboard directory, replacing each file
+    atomically, so the website serves them as static files. Series are
+    restored from those files on load(), so a restart keeps the charts.
+
+    A range file holds, per enclosure, the mean, min, max and reading count
+    (n) of each sensor field and the on fraction of each relay per bucket,
+    null where a bucket has no data. Buckets are 'step' seconds wide and
+    the first starts at 'start' (unix time). The DASHBOARD_TIMELINE_RANGE
+    file also lists each relay's [time, state] transitions in that range.
+    """
+
+    def __init__(self, layout: 'OrderedDict[str, Tuple[Iterable[str], Iterable[str]]]',
+                 directory: Optional[str] = None, ranges: Optional[Dict[str, Dict[str, int]]] = None):
+        """Initialize empty series
+
+        Args:
+            layout: Enclosure name to (sensor field names, relay device names)
+            directory: Directory for the files (defaults to DASHBOARD_DIR)
+            ranges: Range name to 'bucket', 'buckets' and 'write_every' seconds
+                (defaults to DASHBOARD_RANGES)
+        """
+        self.logger = logging.getLogger('mobius.services.dashboard')
+        self.directory = directory or settings.DASHBOARD_DIR
+        ranges = settings.DASHBOARD_RANGES if ranges is None else ranges
+
+        self.fields = []
+        self.devices = []
+        self.field_index = {}
+        self.device_index = {}
+        for enclosure, (fields, devices) in layout.items():
+            for field in fields:
+                self.field_index[(enclosure, field)] = len(self.fields)
+                self.fields.append((enclosure, field))
+            for device in devices:
+                self.device_index[(enclosure, device)] = len(self.devices)
+                self.devices.append((enclosure, device))
+        self.enclosures = list(layout)
+
+        # Shortest range first, so its file is the one checked most often
+        self.ranges = OrderedDict()
+        for name, config in sorted(ranges.items(), key=lambda item: item[1]['bucket'] * item[1]['buckets']):
+            self.ranges[name] = DashboardRing(config['bucket'], config['buckets'], len(self.fields),
+                                              len(self.devices))
+        self.write_every = {name: config.get('write_every', 0) for name, config in ranges.items()}
+        timeline_range = settings.DASHBOARD_TIMELINE_RANGE
+        self.timeline_range = timeline_range if timeline_range in self.ranges else None
+
+        self.states = array('b', [-1] * len(self.devices))
+        self.relays_since = None
+        self.timelines = [deque(maxlen=settings.DASHBOARD_TIMELINE_MAX) for _ in self.devices]
+        self.last_written = {name: None for name in self.ranges}
+        self.write_count = 0
+        self._dirty = {name: False for name in self.ranges}
+        self._table_slots = {}
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def path(self, range_name: str) -> str:
+        """File of one range"""
+        return os.path.join(self.directory, 'dashboard-{}.json'.format(range_name))
+
+    def observe(self, enclosure: str, readings, when: float):
+        """Add one enclosure's new readings to every range
+
+        Args:
+            enclosure: Enclosure name
+            readings: SampleBatch or field name to value
+            when: Unix time of the readings
+        """
+        if isinstance(readings, SampleBatch):
+            values = [(index, value) for index, value in zip(self._batch_slots(enclosure, readings), readings.data)
+                      if index is not None and value == value]
+        else:
+            field_index = self.field_index
+            values = [(field_index[(enclosure, field)], float(value)) for field, value in readings.items()
+                      if (enclosure, field) in field_index and value is not None]
+        if not values:
+            return
+        with self._lock:
+            for ring in self.ranges.values():
+                ring.add(values, when)
+            for name in self._dirty:
+                self._dirty[name] = True
+
+    def _batch_slots(self, enclosure: str, batch: SampleBatch) -> List[Optional[int]]:
+        """Field index of each field ID of an enclosure's batches"""
+        table, slots = self._table_slots.get(enclosure, (None, None))
+        if table is not batch.table:
+            slots = slot_map(batch.table, self.field_index, key=lambda field: (enclosure, field))
+            self._table_slots[enclosure] = (batch.table, slots)
+        return slots
+
+    def record_relays(self, relays: Dict[str, Dict[str, bool]], when: float):
+        """Account relay on-time up to now and record any transitions
+
+        Args:
+            relays: Enclosure name to device states
+            when: Unix time of the states
+        """
+        with self._lock:
+            self._advance(when)
+            for enclosure, states in relays.items():
+                for device, state in states.items():
+                    index = self.device_index.get((enclosure, device))
+                    if index is None:
+                        continue
+                    state = 1 if state else 0
+                    if self.states[index] != state:
+                        self.states[index] = state
+                        self.timelines[index].append((round(when, 1), state))
+                        for name in self._dirty:
+                            self._dirty[name] = True
+
+    def _advance(self, when: float):
+        """Add the on-time of every relay that has been on since the last record"""
+        since = self.relays_since
+        if since is not None and when > since:
+            for device, state in enumerate(self.states):
+                if state == 1:
+                    for ring in self.ranges.values():
+                        ring.add_on_time(device, since, when)
+        if since is None or when > since:
+            self.relays_since = when
+
+    def write(self, now: float, force: bool = False) -> List[str]:
+        """Write every range that changed and is due
+
+        Args:
+            now: Current unix time
+            force: Write changed ranges even if written recently
+
+        Returns:
+            list: Paths written
+        """
+        written = []
+        for name in self.ranges:
+            last = self.last_written[name]
+            if not self._dirty[name] or (not force and last is not None and now - last < self.write_every[name]):
+                continue
+            with self._lock:
+                data = json.dumps(self.render(name, now), separators=(',', ':'))
+                self._dirty[name] = False
+            path = self.path(name)
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                self.logger.error("Could not write dashboard file {path}: {e}".format(path=path, e=e))
+                continue
+            self.last_written[name] = now
+            self.write_count += 1
+            written.append(path)
+        return written
+
+    def render(self, range_name: str, now: float) -> Dict:
+        """Chart data of one range, as written to its file
+
+        Buckets that have closed never change, so their values are reused
+        from the previous render and only newly closed buckets and the
+        current one are computed.
+
+        Args:
+            range_name: Range to render
+            now: Current unix time; its bucket is the last one
+
+        Returns:
+            dict: JSON-serializable chart data
+        """
+        self._advance(now)
+        ring = self.ranges[range_name]
+        last = int(now // ring.width)
+        readings, relays = self._closed_columns(range_name, ring, last)
+
+        enclosures = OrderedDict((name, OrderedDict([('readings', OrderedDict()), ('relays', OrderedDict())]))
+                                 for name in self.enclosures)
+        current = self._bucket_values(ring, last, now)
+        for field, (enclosure, name) in enumerate(self.fields):
+            enclosures[enclosure]['readings'][name] = OrderedDict(
+                (key, column + [value]) for (key, column), value in zip(readings[field].items(), current[0][field]))
+        for device, (enclosure, name) in enumerate(self.devices):
+            enclosures[enclosure]['relays'][name] = relays[device] + [current[1][device]]
+
+        if range_name == self.timeline_range:
+            start = (last - ring.length + 1) * ring.width
+            for device, (enclosure, name) in enumerate(self.devices):
+                timeline = self.timelines[device]
+                # Transitions before the range collapse into the state at its start
+                while len(timeline) > 1 and timeline[1][0] <= start:
+                    timeline.popleft()
+                enclosures[enclosure].setdefault('timeline', OrderedDict())[name] = [
+                    [max(when, start), state] for when, state in timeline]
+
+        return OrderedDict([
+            ('range', range_name),
+            ('step', ring.width),
+            ('start', (last - ring.length + 1) * ring.width),
+            ('updated', round(now, 1)),
+            ('enclosures', enclosures),
+        ])
+
+    def _closed_columns(self, range_name: str, ring: DashboardRing, last: int) -> Tuple[List, List]:
+        """Rendered values of the closed buckets of a range, before the current bucket
+
+        Returns:
+            tuple: Per field an OrderedDict of mean, min, max and n lists, and per relay a list of on fractions
+        """
+        cached = self._rendered.get(range_name)
+        shift = last - cached[0] if cached is not None else ring.length
+        if 0 <= shift < ring.length:
+            _, readings, relays = cached
+        else:
+            shift = ring.length - 1
+            readings = [OrderedDict((key, []) for key in ('mean', 'min', 'max', 'n')) for _ in self.fields]
+            relays = [[] for _ in self.devices]
+        if shift:
+            closed = [self._bucket_values(ring, bucket) for bucket in range(last - shift, last)]
+            for field, series in enumerate(readings):
+                for position, key in enumerate(series):
+                    series[key] = series[key][shift:] + [values[0][field][position] for values in closed]
+            for device in range(len(relays)):
+                relays[device] = relays[device][shift:] + [values[1][device] for values in closed]
+            self._rendered[range_name] = (last, readings, relays)
+        return readings, relays
+
+    def _bucket_values(self, ring: DashboardRing, bucket: int, now: Optional[float] = None) -> Tuple[List, List]:
+        """Rendered values of one bucket
+
+        Args:
+            ring: Ring holding the bucket
+            bucket: Bucket id
+            now: Current unix time, for the current bucket (defaults to the bucket's end)
+
+        Returns:
+            tuple: Per field (mean, min, max, n), and per relay its on fraction (None where the bucket is empty)
+        """
+        slot = bucket % ring.length
+        if ring.ids[slot] != bucket:
+            return [(None, None, None, 0)] * ring.fields, [None] * ring.devices
+        fields = []
+        offset = slot * ring.fields
+        for index in range(offset, offset + ring.fields):
+            count = ring.counts[index]
+            if count:
+                fields.append((round(ring.sums[index] / count, 2), round(ring.lows[index], 2),
+                               round(ring.highs[index], 2), count))
+            else:
+                fields.append((None, None, None, 0))
+        # The current bucket's fraction is of the part that has elapsed
+        elapsed = ring.width if now is None else min(ring.width, now - bucket * ring.width)
+        offset = slot * ring.devices
+        relays = [round(min(1.0, on_seconds / elapsed), 3) if elapsed > 0 else 0.0
+                  for on_seconds in ring.on_seconds[offset:offset + ring.devices]]
+        return fields, relays
+
+    def load(self, now: float) -> int:
+        """Restore the series from previously written files
+
+        Buckets that have since left their range and fields or relays no
+        longer configured are skipped. Relay states are not restored; the
+        next record_relays() starts each timeline from the current state.
+
+        Args:
+            now: Current unix time
+
+        Returns:
+            int: Ranges restored
+        """
+        restored = 0
+        with self._lock:
+            for name, ring in self.ranges.items():
+                path = self.path(name)
+                try:
+                    with open(path) as f:
+                        data = json.load(f)
+                    if data.get('step') != ring.width:
+                        continue
+                    self._restore(name, ring, data, now)
+                except FileNotFoundError:
+                    continue
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    self.logger.warning("Ignoring dashboard file {path}: {e}".format(path=path, e=e))
+                    continue
+                restored += 1
+            self._rendered = {}
+        if restored:
+            self.logger.info("Restored {} dashboard range(s) from {}".format(restored, self.directory))
+        return restored
+
+    def _restore(self, name: str, ring: DashboardRing, data: Dict, now: float):
+        """Refill one ring from its rendered file"""
+        first = int(data['start'] // ring.width)
+        oldest = int(now // ring.width) - ring.length + 1
+        for enclosure, series in data['enclosures'].items():
+            for field, values in series.get('readings', {}).items():
+                index = self.field_index.get((enclosure, field))
+                if index is None:
+                    continue
+                for offset, count in enumerate(values['n']):
+                    if not count or first + offset < oldest:
+                        continue
+                    position = ring.slot(first + offset) * ring.fields + index
+                    ring.counts[position] = count
+                    ring.sums[position] = values['mean'][offset] * count
+                    ring.lows[position] = values['min'][offset]
+                    ring.highs[position] = values['max'][offset]
+            for device, duty in series.get('relays', {}).items():
+                index = self.device_index.get((enclosure, device))
+                if index is None:
+                    continue
+                for offset, fraction in enumerate(duty):
+                    bucket = first + offset
+                    if fraction is None or bucket < oldest:
+                        continue
+                    elapsed = min(ring.width, data['updated'] - bucket * ring.width)
+                    ring.on_seconds[ring.slot(bucket) * ring.devices + index] = fraction * max(0, elapsed)
+            if name == self.timeline_range:
+                for device, timeline in series.get('timeline', {}).items():
+                    index = self.device_index.get((enclosure, device))
+                    if index is not None:
+                        self.timelines[index].extend((when, state) for when, state in timeline)
@@ -0,0 +1,397 @@
+"""
+History Exporter Module
+Streams recorded InfluxDB history to Parquet or gzipped CSV in resumable time chunks
+"""
+
+import os
+import csv
+import glob
+import gzip
+import json
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from mobius.config import settings
+from mobius.services.influx_client import InfluxClient
+from mobius.utils.helpers import optional_import
+
+FORMATS = ('parquet', 'csv')
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def parse_utc(value: str) -> datetime:
+    """Parse a command line date or time (UTC, like InfluxDB timestamps)
+
+    Args:
+        value: 'YYYY-MM-DD', 'YYYY-MM-DDTHH:MM' or 'YYYY-MM-DDTHH:MM:SS' (a trailing 'Z' is allowed)
+
+    Returns:
+        datetime: Naive UTC datetime
+
+    Raises:
+        ValueError: If the value matches none of the formats
+    """
+    value = value.strip().rstrip('Z')
+    for fmt in ('%Y-%m-%d', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError("Unrecognised date {!r}, expected YYYY-MM-DD[THH:MM[:SS]]".format(value))
+
+
+def _rfc3339(when: datetime) -> str:
+    return when.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _rfc3339_ms(when: datetime) -> str:
+    """RFC 3339 with milliseconds, matching the precision rows are queried at"""
+    return '{}.{:03d}Z'.format(when.strftime('%Y-%m-%dT%H:%M:%S'), when.microsecond // 1000)
+
+
+def time_chunks(start: datetime, end: datetime, chunk: timedelta) -> Iterator[Tuple[datetime, datetime]]:
+    """Split a time range into consecutive [start, end) chunks
+
+    Yields:
+        tuple: (chunk start, chunk end)
+    """
+    while start < end:
+        stop = min(start + chunk, end)
+        yield start, stop
+        start = stop
+
+
+def batched(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Group rows into lists of at most size rows
+
+    Yields:
+        list: Rows
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_json_atomic(path: str, data: Any):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CsvGzipWriter:
+    """Appends chunks to one gzipped CSV file
+
+    Each committed chunk is a complete gzip member, which gzip readers
+    concatenate transparently, so resuming only has to cut the file back
+    to the last committed offset and append a new member.
+    """
+
+    extension = '.csv.gz'
+
+    def __init__(self, path: str, columns: List[Tuple[str, str]], offset: int = 0):
+        """Initialize the writer
+
+        Args:
+            path: Output file
+            columns: (name, type) pairs, starting with ('time', 'time')
+            offset: Committed length of the file to resume from (0 starts a new file)
+        """
+        self.path = path
+        self.names = [name for name, _ in columns]
+        self.offset = offset
+        self._file = None
+        self._member = None
+        self._text = None
+        self._writer = None
+
+    def open(self):
+        if self.offset and not os.path.exists(self.path):
+            raise ValueError("{} is missing; remove its checkpoint to start over".format(self.path))
+        self._file = open(self.path, 'r+b' if self.offset else 'wb')
+        self._file.seek(self.offset)
+        self._file.truncate()
+        if not self.offset:
+            self._start_member()
+            self._writer.writerow(self.names)
+            self.commit()
+
+    def _start_member(self):
+        self._member = gzip.GzipFile(fileobj=self._file, mode='wb', compresslevel=settings.EXPORT_GZIP_LEVEL)
+        self._text = _GzipText(self._member)
+        self._writer = csv.writer(self._text)
+
+    def begin(self, start: datetime):
+        pass
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if self._member is None:
+            self._start_member()
+        names = self.names
+        for row in rows:
+            row['time'] = _rfc3339_ms(_EPOCH + timedelta(milliseconds=row['time']))
+            self._writer.writerow([row.get(name) for name in names])
+
+    def commit(self) -> Dict[str, Any]:
+        """Finish the current chunk durably
+
+        Returns:
+            dict: Checkpoint state (the committed file length)
+        """
+        if self._member is not None:
+            self._member.close()
+            self._member = None
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.offset = self._file.tell()
+        return {'offset': self.offset}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _GzipText:
+    """Minimal text adapter so csv.writer can write into a binary gzip member"""
+
+    def __init__(self, member):
+        self.member = member
+
+    def write(self, text: str) -> int:
+        return self.member.write(text.encode('utf-8'))
+
+
+class ParquetWriter:
+    """Writes each chunk as one Parquet part file in an output directory
+
+    Rows are written a batch at a time as row groups, into a temporary
+    file that is renamed when the chunk commits, so the directory only
+    ever holds complete parts and reads as one dataset in pyarrow or pandas.
+    """
+
+    extension = ''
+
+    def __init__(self, path: str, columns: List[Tuple[str, str]], offset: int = 0):
+        """Initialize the writer
+
+        Args:
+            path: Output directory
+            columns: (name, type) pairs, starting with ('time', 'time')
+            offset: Unused, accepted for interface compatibility
+
+        Raises:
+            RuntimeError: If pyarrow is not installed
+        """
+        self.pa = optional_import('pyarrow')
+        self.pq = optional_import('pyarrow.parquet')
+        if self.pa is None or self.pq is None:
+            raise RuntimeError("Parquet export needs pyarrow; use --format csv instead")
+        self.path = path
+        self.columns = columns
+        pa = self.pa
+        types = {'time': pa.timestamp('ms', tz='UTC'), 'float': pa.float64(), 'integer': pa.int64(),
+                 'boolean': pa.bool_(), 'string': pa.string(), 'tag': pa.string()}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        self.part = None
+        self._writer = None
+
+    def open(self):
+        os.makedirs(self.path, exist_ok=True)
+        # Parts that never committed are incomplete
+        for stale in glob.glob(os.path.join(self.path, '*.parquet.tmp')):
+            os.remove(stale)
+
+    def begin(self, start: datetime):
+        self.part = os.path.join(self.path, 'part-{}.parquet'.format(start.strftime('%Y%m%dT%H%M%S')))
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if self._writer is None:
+            self._writer = self.pq.ParquetWriter(self.part + '.tmp', self.schema,
+                                                   compression=settings.EXPORT_PARQUET_COMPRESSION)
+        data = {name: [row.get(name) for row in rows] for name, _ in self.columns}
+        self._writer.write_table(self.pa.Table.from_pydict(data, schema=self.schema))
+
+    def commit(self) -> Dict[str, Any]:
+        """Finish the current part durably (chunks without rows leave no part)
+
+        Returns:
+            dict: Checkpoint state (the committed part, if any)
+        """
+        part = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            with open(self.part + '.tmp', 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(self.part + '.tmp', self.part)
+            part = os.path.basename(self.part)
+        return {'part': part}
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+WRITERS = {'csv': CsvGzipWriter, 'parquet': ParquetWriter}
+
+
+class HistoryExporter:
+    """Exports one measurement over a time range without loading it all
+
+    The range is queried one chunk at a time (EXPORT_CHUNK_HOURS), so
+    memory stays bounded by a single chunk however long the range is.
+    Rows stream from the query through batches into the writer, and a
+    checkpoint is written after every chunk. Rerunning the same export
+    resumes after the last completed chunk.
+    """
+
+    def __init__(self, influx_client: Optional[InfluxClient] = None, chunk: Optional[timedelta] = None,
+                 batch_rows: Optional[int] = None, clock=time):
+        """Initialize the exporter
+
+        Args:
+            influx_client: InfluxClient to query (defaults to a new one)
+            chunk: Time span per query (defaults to EXPORT_CHUNK_HOURS)
+            batch_rows: Rows per write batch / Parquet row group (defaults to EXPORT_BATCH_ROWS)
+            clock: Object with monotonic() used for throughput
+        """
+        self.logger = logging.getLogger('mobius.services.exporter')
+        self.influx_client = influx_client or InfluxClient()
+        self.chunk = chunk or timedelta(hours=settings.EXPORT_CHUNK_HOURS)
+        self.batch_rows = batch_rows or settings.EXPORT_BATCH_ROWS
+        self.clock = clock
+
+    @staticmethod
+    def default_format() -> str:
+        """'parquet' if pyarrow is installed, otherwise 'csv'"""
+        return 'parquet' if optional_import('pyarrow.parquet') is not None else 'csv'
+
+    def columns(self, measurement: str) -> List[Tuple[str, str]]:
+        """Column names and types of a measurement, from its tag and field keys
+
+        Returns:
+            list: (name, type) pairs: time, then tags, then fields
+        """
+        tags = sorted(row['tagKey'] for row in self.influx_client.iter_query(
+            'SHOW TAG KEYS FROM "{}"'.format(measurement)))
+        fields = {}
+        for row in self.influx_client.iter_query('SHOW FIELD KEYS FROM "{}"'.format(measurement)):
+            # A field written with different types in different shards is exported as float if numeric
+            kind = row['fieldType']
+            previous = fields.get(row['fieldKey'])
+            if previous is not None and previous != kind:
+                kind = 'float' if {previous, kind} <= {'float', 'integer'} else 'string'
+            fields[row['fieldKey']] = kind
+        return [('time', 'time')] + [(tag, 'tag') for tag in tags] + sorted(fields.items())
+
+    def rows(self, measurement: str, start: datetime, end: datetime) -> Iterator[Dict[str, Any]]:
+        """Rows of one chunk, oldest first, with times in epoch milliseconds"""
+        query = 'SELECT * FROM "{measurement}" WHERE time >= \'{start}\' AND time < \'{end}\' ORDER BY time'.format(
+            measurement=measurement, start=_rfc3339(start), end=_rfc3339(end))
+        return self.influx_client.iter_query(query, epoch='ms', chunk_size=self.batch_rows)
+
+    def export(self, output: str, start: datetime, end: datetime, measurement: Optional[str] = None,
+               fmt: Optional[str] = None) -> Dict[str, Any]:
+        """Export a time range, resuming an interrupted export of the same range
+
+        Args:
+            output: Output file (csv) or directory (parquet); the format's extension is added if missing
+            start: Range start (naive UTC)
+            end: Range end (naive UTC, exclusive)
+            measurement: Measurement to export (defaults to the client's measurement)
+            fmt: 'parquet' or 'csv' (defaults to parquet if pyarrow is installed)
+
+        Returns:
+            dict: Output path, rows, chunks, seconds and rows per second of this run
+
+        Raises:
+            ValueError: If the arguments are invalid or do not match the checkpoint being resumed
+        """
+        measurement = measurement or self.influx_client.measurement
+        fmt = fmt or self.default_format()
+        if fmt not in FORMATS:
+            raise ValueError("Unknown export format {!r}, expected one of {}".format(fmt, ', '.join(FORMATS)))
+        if end <= start:
+            raise ValueError("Export end must be after its start")
+        writer_class = WRITERS[fmt]
+        if writer_class.extension and not output.endswith(writer_class.extension):
+            output += writer_class.extension
+        checkpoint_path = output.rstrip(os.sep) + '.checkpoint.json'
+
+        job = {'measurement': measurement, 'format': fmt, 'start': _rfc3339(start), 'end': _rfc3339(end),
+               'chunk_seconds': int(self.chunk.total_seconds())}
+        checkpoint = None
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint['job'] != job:
+                raise ValueError("{} belongs to a different export ({}); remove it to start over".format(
+                    checkpoint_path, checkpoint['job']))
+            if checkpoint.get('complete'):
+                self.logger.info("Export to {} is already complete".format(output))
+                return {'output': output, 'rows': 0, 'chunks': 0, 'seconds': 0.0, 'rows_per_second': 0.0,
+                        'total_rows': checkpoint['rows'], 'resumed': True}
+            columns = [tuple(column) for column in checkpoint['columns']]
+            self.logger.info("Resuming export to {} after {}".format(output, checkpoint['done_until']))
+        else:
+            columns = self.columns(measurement)
+            if len(columns) == 1:
+                raise ValueError("Measurement {!r} has no fields".format(measurement))
+            checkpoint = {'job': job, 'columns': columns, 'done_until': job['start'], 'rows': 0, 'offset': 0,
+                          'parts': []}
+
+        writer = writer_class(output, columns, checkpoint['offset'])
+        resume_from = parse_utc(checkpoint['done_until'])
+        chunks = list(time_chunks(resume_from, end, self.chunk))
+        started = self.clock.monotonic()
+        rows = 0
+        writer.open()
+        try:
+            for index, (chunk_start, chunk_end) in enumerate(chunks):
+                chunk_started = self.clock.monotonic()
+                writer.begin(chunk_start)
+                chunk_rows = 0
+                for batch in batched(self.rows(measurement, chunk_start, chunk_end), self.batch_rows):
+                    writer.write(batch)
+                    chunk_rows += len(batch)
+                state = writer.commit()
+
+                rows += chunk_rows
+                checkpoint['rows'] += chunk_rows
+                checkpoint['done_until'] = _rfc3339(chunk_end)
+                checkpoint['offset'] = state.get('offset', 0)
+                if state.get('part'):
+                    checkpoint['parts'].append(state['part'])
+                _write_json_atomic(checkpoint_path, checkpoint)
+
+                elapsed = self.clock.monotonic() - chunk_started
+                self.logger.info("Chunk {index}/{total} {start}: {rows} rows ({rate:.0f} rows/s)".format(
+                    index=index + 1, total=len(chunks), start=_rfc3339(chunk_start), rows=chunk_rows,
+                    rate=chunk_rows / elapsed if elapsed > 0 else 0.0))
+        finally:
+            writer.close()
+
+        checkpoint['complete'] = True
+        _write_json_atomic(checkpoint_path, checkpoint)
+        seconds = self.clock.monotonic() - started
+        return {
+            'output': output,
+            'rows': rows,
+            'chunks': len(chunks),
+            'seconds': seconds,
+            'rows_per_second': rows / seconds if seconds > 0 else 0.0,
+            'total_rows': checkpoint['rows'],
+            'resumed': resume_from > start,
+        }
@@ -0,0 +1,165 @@
+"""
+Fake InfluxDB Server Module
+Minimal InfluxDB 1.x HTTP API stand-in for simulation and benchmarking
+"""
+
+import gzip
+import json
+import random
+import threading
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _InfluxRequestHandler(BaseHTTPRequestHandler):
+    """Request handler implementing /ping, /write and /query"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_HEAD(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        body = self._read_body()
+        fake.request_count += 1
+
+        if fake.latency:
+            time.sleep(fake.latency)
+        if fake.failure_rate and fake.rng.random() < fake.failure_rate:
+            fake.failure_count += 1
+            self._respond(500, {'error': 'injected failure'})
+            return
+
+        if url.path == '/ping':
+            self._respond(204)
+        elif url.path == '/write':
+            lines = [line for line in body.decode('utf-8').split('\n') if line.strip()]
+            fake.record_lines(lines)
+            self._respond(204)
+        elif url.path == '/query':
+            self._respond(200, {'results': [{'statement_id': 0}]})
+        else:
+            self._respond(404, {'error': 'not found'})
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body
+
+    def _respond(self, status: int, payload: Optional[Dict[str, Any]] = None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('X-Influxdb-Version', '1.8.10-fake')
+        self.end_headers()
+        if data and self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logging.getLogger('mobius.services.fake_influx').debug(format % args)
+
+
+class FakeInfluxServer:
+    """In-process fake InfluxDB server with latency and failure injection"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 failure_rate: float = 0.0, keep_lines: int = 10000, seed: Optional[int] = None):
+        """Initialize the fake server
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            latency: Seconds added to every request
+            failure_rate: Probability a request returns HTTP 500
+            keep_lines: Number of most recent line-protocol lines to retain
+            seed: Seed for failure injection
+        """
+        self.logger = logging.getLogger('mobius.services.fake_influx')
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.keep_lines = keep_lines
+        self.rng = random.Random(seed)
+
+        self.request_count = 0
+        self.failure_count = 0
+        self.point_count = 0
+        self.lines = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def start(self) -> 'FakeInfluxServer':
+        """Start serving in a background thread
+
+        Returns:
+            FakeInfluxServer: self, for chaining
+        """
+        self._server = _ThreadingHTTPServer((self.host, self.port), _InfluxRequestHandler)
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self.logger.info("Fake InfluxDB listening on {host}:{port}".format(host=self.host, port=self.port))
+        return self
+
+    def stop(self):
+        """Stop the server and wait for its thread"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def record_lines(self, lines: List[str]):
+        """Store written line-protocol lines
+
+        Args:
+            lines: Non-empty line-protocol lines from a /write request
+        """
+        with self._lock:
+            self.point_count += len(lines)
+            self.lines.extend(lines)
+            if len(self.lines) > self.keep_lines:
+                del self.lines[:len(self.lines) - self.keep_lines]
+
+    @property
+    def credentials(self) -> Dict[str, Any]:
+        """Connection parameters for InfluxClient
+
+        Returns:
+            dict: InfluxDB connection parameters
+        """
+        return {
+            'host': self.host,
+            'port': self.port,
+            'database': 'vivarium'
+        }
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
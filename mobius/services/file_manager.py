@@ -10,16 +10,28 @@ from datetime import datetime, timedelta
 from typing import List, Set, Tuple
 
 from mobius.config import settings
+from mobius.core.clock import system_clock
+from mobius.services.archiver import VideoArchiver
+from mobius.services.mp4 import VideoIndex
 
 
 class FileManager:
     """Manages video files for the vivarium"""
     
-    def __init__(self):
-        """Initialize the file manager"""
+    def __init__(self, clock=None, video_index=None, archiver=None):
+        """Initialize the file manager
+        
+        Args:
+            clock: Optional clock used to judge file ages
+            video_index: Optional VideoIndex caching MP4 metadata
+            archiver: Optional VideoArchiver moving aged videos to a cold tier
+        """
         self.logger = logging.getLogger('mobius.services.file_manager')
+        self.clock = clock or system_clock
         self.source_path = settings.DATA_DIR
         self.max_age_days = settings.VIDEO_MAX_AGE_DAYS
+        self.video_index = video_index or VideoIndex()
+        self.archiver = archiver or VideoArchiver(clock=self.clock)
         
     def get_mp4s(self) -> Set[str]:
         """Get all MP4 files in the source directory
@@ -57,14 +69,22 @@ class FileManager:
             self.logger.error("Error calculating total size: {}".format(e))
             return 0
             
-    def clean_videos(self, min_hour: int, max_hour: int, max_size: float) -> None:
+    def clean_videos(self, min_hour: int, max_hour: int, max_size: float,
+                     min_duration: float = None, min_bitrate: float = None) -> None:
         """Clean up video files based on specified criteria
         
         Args:
             min_hour: Minimum hour for daytime videos (e.g., 6 for 6 AM)
             max_hour: Maximum hour for daytime videos (e.g., 20 for 8 PM)
-            max_size: Maximum file size to keep (bytes)
+            max_size: Size below which videos without readable metadata are removed (bytes)
+            min_duration: Shortest video to keep (defaults to VIDEO_CLEAN_MIN_DURATION)
+            min_bitrate: Lowest bitrate to keep (defaults to VIDEO_CLEAN_MIN_BITRATE)
         """
+        if min_duration is None:
+            min_duration = settings.VIDEO_CLEAN_MIN_DURATION
+        if min_bitrate is None:
+            min_bitrate = settings.VIDEO_CLEAN_MIN_BITRATE
+            
         try:
             remaining_files = self.get_mp4s()
             total_file_count = len(remaining_files)
@@ -80,9 +100,9 @@ class FileManager:
                     'desc': 'Removing {} during day, {} KB'
                 },
                 {
-                    'function': self._filter_by_size,
-                    'condition': (max_size,),
-                    'desc': 'Removing {} below size limit, {} KB'
+                    'function': self._filter_by_content,
+                    'condition': (min_duration, min_bitrate, max_size),
+                    'desc': 'Removing {} short or low-motion, {} KB'
                 },
                 {
                     'function': self._filter_by_age,
@@ -94,8 +114,15 @@ class FileManager:
             files_to_remove = []
             log_messages = []
             
-            # Apply each filter
+            # Apply each filter; aged videos that survive the time and content
+            # filters are archived rather than deleted when a cold tier is set
             for filter_obj in filter_functions:
+                if filter_obj['function'] == self._filter_by_age and self.archiver.enabled:
+                    archiving = self.archiver.archive(remaining_files, self.video_index)
+                    remaining_files -= archiving
+                    if archiving:
+                        log_messages.append('Archiving {}'.format(len(archiving)))
+                        
                 filtered_files, size_kb = filter_obj['function'](
                     remaining_files, 
                     *filter_obj['condition']
@@ -114,6 +141,10 @@ class FileManager:
             # Remove files
             self._remove_files(files_to_remove)
             
+            # Forget removed clips and keep the metadata cache for next time
+            self.video_index.prune(remaining_files | self.archiver.in_flight())
+            self.video_index.save()
+            
         except Exception as e:
             self.logger.error("Error cleaning videos: {}".format(e))
             
@@ -133,11 +164,15 @@ class FileManager:
         
         for file_path in file_list:
             try:
-                # Extract hour from filename (format: xx-YYYYMMDDHHMMSS.mp4)
-                # Or use file creation time as fallback
+                # Prefer the creation time recorded in the MP4 header, then the
+                # hour in the filename (format: xx-YYYYMMDDHHMMSS.mp4)
+                created = self.video_index.creation_datetime(file_path)
                 try:
-                    file_name = os.path.basename(file_path)
-                    hour = int(file_name[-10:-8])
+                    if created is not None:
+                        hour = created.hour
+                    else:
+                        file_name = os.path.basename(file_path)
+                        hour = int(file_name[-10:-8])
                 except (ValueError, IndexError):
                     # Fallback to file modification time
                     file_date = datetime.fromtimestamp(os.path.getmtime(file_path))
@@ -175,6 +210,41 @@ class FileManager:
                 
         return in_size, total_size / 1024
         
+    def _filter_by_content(self, file_list: Set[str], min_duration: float, min_bitrate: float,
+                           max_size: float) -> Tuple[List[str], float]:
+        """Filter files that are too short or show too little motion
+        
+        Bitrate stands in for motion, since still scenes compress well.
+        Files whose MP4 header cannot be read are judged by size instead.
+        
+        Args:
+            file_list: Set of file paths
+            min_duration: Minimum duration in seconds
+            min_bitrate: Minimum bitrate in bits per second
+            max_size: Size limit in bytes for files without readable metadata
+            
+        Returns:
+            tuple: (list of matching files, total size in KB)
+        """
+        unparsed = set()
+        low_content = []
+        total_size = 0
+        
+        for file_path in file_list:
+            info = self.video_index.get(file_path)
+            if info is None:
+                unparsed.add(file_path)
+                continue
+            if info.duration < min_duration or info.bitrate < min_bitrate:
+                try:
+                    total_size += os.path.getsize(file_path)
+                    low_content.append(file_path)
+                except OSError as e:
+                    self.logger.error("Error getting size for {file_path}: {e}".format(file_path=file_path, e=e))
+                    
+        small, small_kb = self._filter_by_size(unparsed, max_size)
+        return low_content + small, total_size / 1024 + small_kb
+        
     def _filter_by_age(self, file_list: Set[str], age_limit: timedelta) -> Tuple[List[str], float]:
         """Filter files older than age_limit
         
@@ -187,11 +257,12 @@ class FileManager:
         """
         old_files = []
         total_size = 0
+        cutoff = self.clock.now() - age_limit
         
         for file_path in file_list:
             try:
                 file_date = datetime.fromtimestamp(os.path.getmtime(file_path))
-                if file_date < (datetime.now() - age_limit):
+                if file_date < cutoff:
                     old_files.append(file_path)
                     total_size += os.path.getsize(file_path)
             except Exception as e:
@@ -199,6 +270,10 @@ class FileManager:
                 
         return old_files, total_size / 1024
         
+    def close(self) -> None:
+        """Stop background archiving (interrupted days resume next run)"""
+        self.archiver.close()
+        
     def _remove_files(self, file_list: List[str]) -> None:
         """Remove files from the filesystem
         
@@ -6,30 +6,119 @@ Handles all interactions with InfluxDB for data logging
 import json
 import logging
 import os
-from typing import Dict, List, Any
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 
-try:
-    from influxdb import InfluxDBClient
-    INFLUX_AVAILABLE = True
-except ImportError:
-    INFLUX_AVAILABLE = False
+from mobius.config import settings
+from mobius.core.samples import SampleBatch
+from mobius.utils.helpers import optional_import
+
+
+def _escape(value: str, characters: str) -> str:
+    """Backslash-escape characters for InfluxDB line protocol"""
+    value = value.replace('\\', '\\\\')
+    for char in characters:
+        value = value.replace(char, '\\' + char)
+    return value
+
+
+def _format_field(value: Any) -> str:
+    """Format a field value for InfluxDB line protocol"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return '{}i'.format(value)
+    if isinstance(value, float):
+        return repr(value)
+    return '"{}"'.format(str(value).replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def to_line_protocol(json_body: List[Dict[str, Any]]) -> str:
+    """Convert InfluxDB json points to line protocol
+    
+    Args:
+        json_body: InfluxDB formatted json data
+        
+    Returns:
+        str: Newline separated line protocol (timestamps in seconds)
+    """
+    lines = []
+    for point in json_body:
+        key = _escape(point['measurement'], ', ')
+        for tag, tag_value in sorted(point.get('tags', {}).items()):
+            key += ',{}={}'.format(_escape(tag, ',= '), _escape(str(tag_value), ',= '))
+            
+        fields = ','.join(
+            '{}={}'.format(_escape(field, ',= '), _format_field(value))
+            for field, value in point['fields'].items()
+            if value is not None
+        )
+        if not fields:
+            continue
+            
+        line = '{} {}'.format(key, fields)
+        if point.get('time') is not None:
+            line += ' {}'.format(int(point['time']))
+        lines.append(line)
+    return '\n'.join(lines)
 
 
 class InfluxClient:
     """Client for interacting with InfluxDB"""
     
-    def __init__(self):
-        """Initialize the InfluxDB client"""
+    def __init__(self, credentials: Optional[Dict[str, Any]] = None):
+        """Initialize the InfluxDB client
+        
+        Args:
+            credentials: Optional connection parameters overriding the secrets file
+        """
         self.logger = logging.getLogger('mobius.services.influx')
         
         self.measurement = "vivarium"
+        self.usage_measurement = "relay_usage"
         self.run_id = "v1"
         
         # Set up InfluxDB connection
-        self.credentials = self._get_credentials()
+        self.credentials = credentials if credentials is not None else self._get_credentials()
+        
+        # Points that failed to write, retried by flush()
+        self.pending = deque(maxlen=settings.INFLUX_PENDING_MAX_POINTS)
+        self._pending_lock = threading.Lock()
         
-        if not INFLUX_AVAILABLE:
-            self.logger.warning("InfluxDB package not available - data will not be logged")
+        # The influxdb package is imported and connected on first use
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._unavailable_logged = False
+        
+    def _get_client(self) -> Any:
+        """Get the shared InfluxDB client, importing the package on first use
+        
+        Must be called with _client_lock held.
+        
+        Returns:
+            InfluxDBClient: Client with a persistent HTTP session, or None if unavailable
+        """
+        if self._client is None:
+            influxdb = optional_import('influxdb')
+            if influxdb is None:
+                if not self._unavailable_logged:
+                    self.logger.warning("InfluxDB package not available - data will not be logged")
+                    self._unavailable_logged = True
+                return None
+            self._client = influxdb.InfluxDBClient(**self.credentials)
+        return self._client
+        
+    def _reset_client(self) -> None:
+        """Drop the shared client after an error so the next call reconnects"""
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+            self._client = None
             
     def _get_credentials(self) -> Dict[str, Any]:
         """Get InfluxDB credentials from secrets file
@@ -61,11 +150,26 @@ class InfluxClient:
                 'database': 'vivarium'
             }
             
-    def write_sensor_data(self, data: Dict[str, float]) -> bool:
+    def _tags(self, tags: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Point tags: the run tag plus any enclosure tags
+        
+        Args:
+            tags: Optional extra tags, which may override the run tag
+            
+        Returns:
+            dict: Tag name to value
+        """
+        point_tags = {"run": self.run_id}
+        if tags:
+            point_tags.update(tags)
+        return point_tags
+        
+    def write_sensor_data(self, data: Dict[str, float], tags: Optional[Dict[str, str]] = None) -> bool:
         """Write sensor readings to InfluxDB
         
         Args:
             data: Dictionary of sensor readings
+            tags: Optional extra tags (e.g. the enclosure)
             
         Returns:
             bool: True if successful, False otherwise
@@ -74,49 +178,120 @@ class InfluxClient:
             self.logger.warning("No data to write to InfluxDB")
             return False
             
-        # Format as InfluxDB json structure
-        json_body = [{
+        return self.write_points(self.make_sensor_points(data, tags))
+        
+    def make_sensor_points(self, data: Dict[str, float], tags: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """Format sensor readings as InfluxDB json points
+        
+        Args:
+            data: Dictionary of sensor readings, or a SampleBatch (copied, as batches are reused)
+            tags: Optional extra tags (e.g. the enclosure)
+            
+        Returns:
+            list: InfluxDB formatted json data
+        """
+        return [{
             "measurement": self.measurement,
-            "tags": {
-                "run": self.run_id
-            },
-            "fields": data
+            "tags": self._tags(tags),
+            "fields": data.to_dict() if isinstance(data, SampleBatch) else data
         }]
         
-        return self.write_points(json_body)
-        
-    def log_device_state(self, device: str, state: bool) -> bool:
-        """Log device state to InfluxDB
+    def make_device_points(self, states: Dict[str, bool], tags: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """Format device states as a single InfluxDB json point
         
         Args:
-            device: Device name
-            state: Boolean state
+            states: Dictionary of device name to boolean state
+            tags: Optional extra tags (e.g. the enclosure)
             
         Returns:
-            bool: True if successful, False otherwise
+            list: InfluxDB formatted json data
         """
-        json_body = [{
+        return [{
             "measurement": self.measurement,
-            "tags": {
-                "run": self.run_id
-            },
+            "tags": self._tags(tags),
             "fields": {
                 "{device}_status".format(device=device): bool(state)
+                for device, state in states.items()
             }
         }]
         
-        return self.write_points(json_body)
+    def log_device_state(self, device: str, state: bool, tags: Optional[Dict[str, str]] = None) -> bool:
+        """Log device state to InfluxDB
         
-    def log_file_size(self, size: float) -> bool:
-        """Log file size to InfluxDB
+        Args:
+            device: Device name
+            state: Boolean state
+            tags: Optional extra tags (e.g. the enclosure)
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self.write_points(self.make_device_points({device: state}, tags))
+        
+    def log_device_states(self, states: Dict[str, bool], tags: Optional[Dict[str, str]] = None) -> bool:
+        """Log several device states as a single InfluxDB point
         
         Args:
-            size: File size in bytes
+            states: Dictionary of device name to boolean state
+            tags: Optional extra tags (e.g. the enclosure)
             
         Returns:
             bool: True if successful, False otherwise
         """
-        json_body = [{
+        return self.write_points(self.make_device_points(states, tags))
+        
+    def make_usage_points(self, buckets: List[Tuple[str, datetime, Dict[str, Dict[str, float]]]],
+                          tags: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """Format closed relay usage buckets as one InfluxDB json point each
+        
+        Args:
+            buckets: (period, bucket start, usage by device) tuples from RelayUsage.roll
+            tags: Optional extra tags (e.g. the enclosure)
+            
+        Returns:
+            list: InfluxDB formatted json data, tagged with the period and stamped with the bucket start
+        """
+        points = []
+        for period, start, usage in buckets:
+            fields = {}
+            for device, values in usage.items():
+                fields["{device}_on_seconds".format(device=device)] = float(values['on_seconds'])
+                fields["{device}_switches".format(device=device)] = int(values['switches'])
+                fields["{device}_duty".format(device=device)] = float(values['duty'])
+                fields["{device}_energy_wh".format(device=device)] = float(values['energy_wh'])
+            point_tags = self._tags(tags)
+            point_tags["period"] = period
+            points.append({
+                "measurement": self.usage_measurement,
+                "tags": point_tags,
+                "time": int(start.timestamp()),
+                "fields": fields
+            })
+        return points
+        
+    def log_relay_usage(self, buckets: List[Tuple[str, datetime, Dict[str, Dict[str, float]]]],
+                        tags: Optional[Dict[str, str]] = None) -> bool:
+        """Log closed relay usage buckets to InfluxDB
+        
+        Args:
+            buckets: (period, bucket start, usage by device) tuples from RelayUsage.roll
+            tags: Optional extra tags (e.g. the enclosure)
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self.write_points(self.make_usage_points(buckets, tags))
+        
+    def make_file_size_points(self, size: float) -> List[Dict[str, Any]]:
+        """Format the recorded video size as InfluxDB json points
+        
+        Args:
+            size: File size in bytes
+            
+        Returns:
+            list: InfluxDB formatted json data
+        """
+        return [{
             "measurement": self.measurement,
             "tags": {
                 "run": self.run_id
@@ -126,7 +301,16 @@ class InfluxClient:
             }
         }]
         
-        return self.write_points(json_body)
+    def log_file_size(self, size: float) -> bool:
+        """Log file size to InfluxDB
+        
+        Args:
+            size: File size in bytes
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self.write_points(self.make_file_size_points(size))
         
     def write_points(self, json_body: List[Dict[str, Any]]) -> bool:
         """Write data points to InfluxDB
@@ -137,19 +321,84 @@ class InfluxClient:
         Returns:
             bool: True if successful, False otherwise
         """
-        if not INFLUX_AVAILABLE:
-            self.logger.debug("InfluxDB not available, skipping write")
-            return False
+        with self._client_lock:
+            client = self._get_client()
+            if client is None:
+                self.logger.debug("InfluxDB not available, skipping write")
+                return False
+                
+            try:
+                # Timestamped points (e.g. compressed telemetry) carry Unix seconds
+                client.write_points(json_body, time_precision='s')
+                self.logger.debug("Data written to InfluxDB successfully")
+                return True
+            except Exception as e:
+                self.logger.error("Error writing to InfluxDB: {}".format(e))
+                self._reset_client()
+                
+        self.queue_pending(json_body)
+        return False
             
-        try:
-            client = InfluxDBClient(**self.credentials)
-            client.write_points(json_body)
-            client.close()
-            self.logger.debug("Data written to InfluxDB successfully")
-            return True
-        except Exception as e:
-            self.logger.error("Error writing to InfluxDB: {}".format(e))
-            return False
+    def queue_pending(self, json_body: List[Dict[str, Any]]) -> None:
+        """Keep failed points, timestamped now, so flush() can retry them
+        
+        Args:
+            json_body: InfluxDB formatted json data
+        """
+        now = int(time.time())
+        with self._pending_lock:
+            for point in json_body:
+                point = dict(point)
+                point.setdefault('time', now)
+                self.pending.append(point)
+                
+    def take_pending(self) -> List[Dict[str, Any]]:
+        """Remove and return every pending point, for a writer that retries them itself
+        
+        Returns:
+            list: Pending points, oldest first
+        """
+        with self._pending_lock:
+            points = list(self.pending)
+            self.pending.clear()
+        return points
+        
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Retry writing pending points until they succeed or the timeout expires
+        
+        Args:
+            timeout: Seconds allowed for the flush (defaults to one attempt)
+            
+        Returns:
+            bool: True if nothing is left pending, False otherwise
+        """
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            with self._pending_lock:
+                points = list(self.pending)
+                self.pending.clear()
+            if not points:
+                return True
+            with self._client_lock:
+                client = self._get_client()
+                if client is None:
+                    self.logger.warning("InfluxDB not available, dropping {} pending points".format(len(points)))
+                    return False
+                    
+                try:
+                    client.write_points(points, time_precision='s')
+                    self.logger.info("Flushed {} pending points to InfluxDB".format(len(points)))
+                    return True
+                except Exception as e:
+                    error = e
+                    self._reset_client()
+                    
+            with self._pending_lock:
+                self.pending.extendleft(reversed(points))
+            if time.monotonic() + 1 > deadline:
+                self.logger.error("Could not flush {count} pending points: {e}".format(count=len(points), e=error))
+                return False
+            time.sleep(1)
             
     def read_query(self, query: str) -> Any:
         """Execute a query against InfluxDB
@@ -160,15 +409,64 @@ class InfluxClient:
         Returns:
             ResultSet: Query results
         """
-        if not INFLUX_AVAILABLE:
-            self.logger.error("InfluxDB not available, cannot execute query")
-            return None
-            
+        with self._client_lock:
+            client = self._get_client()
+            if client is None:
+                self.logger.error("InfluxDB not available, cannot execute query")
+                return None
+                
+            try:
+                return client.query(query)
+            except Exception as e:
+                self.logger.error("Error querying InfluxDB: {}".format(e))
+                self._reset_client()
+                return None
+                
+    def iter_query(self, query: str, epoch: Optional[str] = None,
+                   chunk_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Execute a query and yield its rows
+        
+        Unlike read_query, errors are raised so callers such as the
+        exporter can tell a failed query from an empty result. With a
+        chunk_size the response is streamed, so only one chunk of rows
+        is held in memory at a time.
+        
+        Args:
+            query: InfluxQL query string
+            epoch: Optional time precision ('s', 'ms', ...) for integer timestamps
+            chunk_size: Optional rows per streamed chunk (the whole result is buffered without one)
+        
+        Yields:
+            dict: One row per point, with 'time', tag and field columns
+        
+        Raises:
+            RuntimeError: If the influxdb package is not installed
+        """
+        with self._client_lock:
+            client = self._get_client()
+            if client is None:
+                raise RuntimeError("InfluxDB package not available")
+            try:
+                if chunk_size:
+                    result = client.query(query, epoch=epoch, chunked=True, chunk_size=chunk_size)
+                else:
+                    result = client.query(query, epoch=epoch)
+            except Exception:
+                self._reset_client()
+                raise
+                
+        # Chunked queries yield one ResultSet per chunk (older clients merge them into one)
+        results = [result] if hasattr(result, 'get_points') else result
         try:
-            client = InfluxDBClient(**self.credentials)
-            results = client.query(query)
-            client.close()
-            return results
-        except Exception as e:
-            self.logger.error("Error querying InfluxDB: {}".format(e))
-            return None 
\ No newline at end of file
+            for chunk in results:
+                for row in chunk.get_points():
+                    yield row
+        except Exception:
+            with self._client_lock:
+                self._reset_client()
+            raise
+        
+    def close(self) -> None:
+        """Close the shared InfluxDB connection"""
+        with self._client_lock:
+            self._reset_client() 
\ No newline at end of file
@@ -0,0 +1,310 @@
+"""
+Live State Module
+Publishes the latest readings, relay states and controller health into a
+shared memory-mapped file that other local processes read without IPC
+"""
+
+import os
+import sys
+import json
+import mmap
+import math
+import struct
+import logging
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from mobius.config import settings
+from mobius.core.samples import SampleBatch, slot_map
+
+MAGIC = b'MOBL'
+VERSION = 1
+
+# magic, version, flags, schema length, sequence, updated (unix time), value count
+HEADER = struct.Struct('<4sIIIQdI4x')
+HEADER_SIZE = 64
+FLAGS_OFFSET = 8
+SEQ_OFFSET = 16
+SEQ = struct.Struct('<Q')
+UPDATED = struct.Struct('<d')
+UPDATED_OFFSET = 24
+
+# The file was replaced by a new layout; readers must reopen the path
+FLAG_REPLACED = 1
+
+# Slot groups: readings and relays per enclosure, health for the controller ('' enclosure)
+GROUPS = ('readings', 'relays', 'health')
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+class LiveStateBusy(RuntimeError):
+    """Raised when no consistent snapshot could be read (the writer kept updating)"""
+
+
+class LiveStateWriter:
+    """Single writer of the live state segment
+
+    The layout is fixed when the writer is created: a header, a JSON
+    list of (enclosure, group, name) slots, then one float64 per slot.
+    Updates are guarded by a sequence counter (a seqlock): it is odd while
+    values are being written, so a reader that sees the same even value
+    before and after copying the values has a consistent snapshot.
+    Missing values are stored as NaN.
+    """
+
+    def __init__(self, slots: Iterable[Tuple[str, str, str]], path: Optional[str] = None):
+        """Create the segment, replacing any earlier one at the path
+
+        Args:
+            slots: (enclosure, group, name) of every value, group being one of GROUPS
+            path: Segment file (defaults to LIVE_STATE_PATH)
+        """
+        self.logger = logging.getLogger('mobius.services.live_state')
+        self.path = path or settings.LIVE_STATE_PATH
+        self.slots = [tuple(slot) for slot in slots]
+        self.index = {slot: i for i, slot in enumerate(self.slots)}
+        self.values = struct.Struct('<{}d'.format(len(self.slots)))
+        self.publish_count = 0
+        self._current = array('d', [float('nan')]) * len(self.slots)
+        self._table_slots = {}
+        self._relay_slots = {}
+        self._swap = sys.byteorder != 'little'
+        self._lock = threading.Lock()
+
+        schema = json.dumps({'slots': self.slots}).encode('utf-8')
+        self.values_offset = HEADER_SIZE + _align(len(schema))
+        size = self.values_offset + self.values.size
+
+        # Build the new segment beside the old one and swap it in atomically
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.live-', dir=directory)
+        try:
+            os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self._mmap, 0, MAGIC, VERSION, 0, len(schema), 0, 0.0, len(self.slots))
+        self._mmap[HEADER_SIZE:HEADER_SIZE + len(schema)] = schema
+        self._write_values()
+        os.chmod(tmp_path, 0o644)
+
+        previous = None
+        try:
+            previous = open(self.path, 'r+b')
+        except OSError:
+            pass
+        os.replace(tmp_path, self.path)
+        if previous is not None:
+            # Tell readers of the old segment to reopen the path
+            with previous:
+                try:
+                    with mmap.mmap(previous.fileno(), HEADER_SIZE) as old:
+                        if old[:4] == MAGIC:
+                            flags = struct.unpack_from('<I', old, FLAGS_OFFSET)[0]
+                            struct.pack_into('<I', old, FLAGS_OFFSET, flags | FLAG_REPLACED)
+                except (OSError, ValueError):
+                    pass
+        self.logger.info("Publishing live state for {} values to {}".format(len(self.slots), self.path))
+
+    def update(self, values: Dict[Tuple[str, str, str], Optional[float]], timestamp: Optional[float] = None,
+               readings: Optional[Dict[str, SampleBatch]] = None, relays: Optional[Dict[str, Dict[str, bool]]] = None):
+        """Write new values as one consistent update
+
+        Args:
+            values: (enclosure, group, name) to value; slots not given keep their last value
+            timestamp: Unix time of the update (defaults to now)
+            readings: Enclosure name to new readings; missing fields keep their last value
+            relays: Enclosure name to device states
+        """
+        with self._lock:
+            if self._mmap is None:
+                return
+            current = self._current
+            for slot, value in values.items():
+                index = self.index.get(slot)
+                if index is not None:
+                    current[index] = float('nan') if value is None else float(value)
+            if readings:
+                for enclosure, batch in readings.items():
+                    for index, value in zip(self._batch_slots(enclosure, batch), batch.data):
+                        if index is not None and value == value:
+                            current[index] = value
+            if relays:
+                for enclosure, states in relays.items():
+                    slots = self._relay_slots.get(enclosure)
+                    if slots is None:
+                        slots = self._relay_slots[enclosure] = {
+                            name: index for (slot_enclosure, group, name), index in self.index.items()
+                            if slot_enclosure == enclosure and group == 'relays'}
+                    for device, state in states.items():
+                        index = slots.get(device)
+                        if index is not None:
+                            current[index] = 1.0 if state else 0.0
+            seq = SEQ.unpack_from(self._mmap, SEQ_OFFSET)[0]
+            SEQ.pack_into(self._mmap, SEQ_OFFSET, seq + 1)
+            self._write_values()
+            UPDATED.pack_into(self._mmap, UPDATED_OFFSET, time.time() if timestamp is None else timestamp)
+            SEQ.pack_into(self._mmap, SEQ_OFFSET, seq + 2)
+            self.publish_count += 1
+
+    def _write_values(self):
+        """Copy the staged values into the segment (little-endian float64)"""
+        if self._swap:
+            values = array('d', self._current)
+            values.byteswap()
+        else:
+            values = self._current
+        self._mmap[self.values_offset:self.values_offset + self.values.size] = values
+
+    def _batch_slots(self, enclosure: str, batch: SampleBatch) -> List[Optional[int]]:
+        """Slot index of each field ID of an enclosure's batches"""
+        table, slots = self._table_slots.get(enclosure, (None, None))
+        if table is not batch.table:
+            slots = slot_map(batch.table, self.index, key=lambda field: (enclosure, 'readings', field))
+            self._table_slots[enclosure] = (batch.table, slots)
+        return slots
+
+    def close(self):
+        """Unmap the segment; the file stays so readers keep the last state"""
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+
+
+class LiveStateReader:
+    """Reads consistent snapshots of the live state segment
+
+    Reading maps the file once; a snapshot then costs a few memory copies
+    and no system calls. The segment is reopened if the controller
+    restarted with a new layout.
+
+    Example:
+        reader = LiveStateReader()
+        state = reader.snapshot()
+        state['enclosures']['main']['readings']['Water_Temp']
+    """
+
+    # Attempts spinning before backing off, for a writer descheduled mid-update
+    SPIN = 100
+
+    def __init__(self, path: Optional[str] = None, timeout: float = 0.5):
+        """Initialize the reader
+
+        Args:
+            path: Segment file (defaults to LIVE_STATE_PATH)
+            timeout: Seconds to keep retrying before giving up on a consistent snapshot
+        """
+        self.path = path or settings.LIVE_STATE_PATH
+        self.timeout = timeout
+        self._mmap = None
+        self._inode = None
+        self.slots = []
+
+    def _open(self):
+        self.close()
+        with open(self.path, 'rb') as f:
+            self._inode = os.fstat(f.fileno()).st_ino
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, flags, schema_len, seq, updated, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("{} is not a live state segment (version {})".format(self.path, VERSION))
+        schema = json.loads(self._mmap[HEADER_SIZE:HEADER_SIZE + schema_len].decode('utf-8'))
+        self.slots = [tuple(slot) for slot in schema['slots']]
+        self.values = struct.Struct('<{}d'.format(count))
+        self.values_offset = HEADER_SIZE + _align(schema_len)
+
+    def read(self) -> Tuple[int, float, Tuple[float, ...]]:
+        """Read the raw values consistently
+
+        Returns:
+            tuple: (sequence number, update time, values in slot order)
+
+        Raises:
+            OSError: If the segment does not exist
+            LiveStateBusy: If no consistent copy was read within the timeout
+        """
+        if self._mmap is None or struct.unpack_from('<I', self._mmap, FLAGS_OFFSET)[0] & FLAG_REPLACED:
+            self._open()
+        segment = self._mmap
+        start, end = self.values_offset, self.values_offset + self.values.size
+        attempts = 0
+        deadline = None
+        while True:
+            seq = SEQ.unpack_from(segment, SEQ_OFFSET)[0]
+            if not seq & 1:
+                data = segment[start:end]
+                updated = UPDATED.unpack_from(segment, UPDATED_OFFSET)[0]
+                if SEQ.unpack_from(segment, SEQ_OFFSET)[0] == seq:
+                    return seq, updated, self.values.unpack(data)
+            attempts += 1
+            if attempts >= self.SPIN:
+                if deadline is None:
+                    deadline = time.monotonic() + self.timeout
+                elif time.monotonic() > deadline:
+                    raise LiveStateBusy("No consistent live state snapshot within {}s".format(self.timeout))
+                time.sleep(0.0001)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Latest state as nested dicts
+
+        A segment whose controller has stopped updating it is checked
+        for a replacement file before being read.
+
+        Returns:
+            dict: 'seq', 'updated' (unix time), 'age' (seconds), 'health' and
+                'enclosures' (name to 'readings' and 'relays'); missing values are None
+        """
+        if self._mmap is not None and time.time() - UPDATED.unpack_from(self._mmap, UPDATED_OFFSET)[0] > \
+                settings.LIVE_STATE_REOPEN_AFTER:
+            try:
+                if os.stat(self.path).st_ino != self._inode:
+                    self._open()
+            except OSError:
+                pass
+        seq, updated, values = self.read()
+        enclosures = OrderedDict()
+        health = {}
+        for (enclosure, group, name), value in zip(self.slots, values):
+            if math.isnan(value):
+                value = None
+            elif group == 'relays':
+                value = bool(value)
+            if group == 'health':
+                health[name] = value
+            else:
+                enclosures.setdefault(enclosure, {'readings': {}, 'relays': {}})[group][name] = value
+        return {'seq': seq, 'updated': updated, 'age': time.time() - updated, 'health': health,
+                'enclosures': enclosures}
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+def make_slots(enclosures: Dict[str, Tuple[Iterable[str], Iterable[str]]],
+               health: Iterable[str]) -> List[Tuple[str, str, str]]:
+    """Slot list for a controller's enclosures
+
+    Args:
+        enclosures: Enclosure name to (sensor fields, device names)
+        health: Controller health value names
+
+    Returns:
+        list: (enclosure, group, name) slots
+    """
+    slots = [('', 'health', name) for name in health]
+    for enclosure, (fields, devices) in enclosures.items():
+        slots.extend((enclosure, 'readings', field) for field in fields)
+        slots.extend((enclosure, 'relays', device) for device in devices)
+    return slots
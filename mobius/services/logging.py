@@ -0,0 +1,172 @@
+"""
+Logging Service Module
+Queued, non-blocking logging with time/size rotation and background compression
+"""
+
+import os
+import glob
+import gzip
+import queue
+import atexit
+import shutil
+import logging
+import threading
+import logging.handlers
+from typing import List, Optional
+
+from mobius.config import settings
+
+# Active listener, stopped by stop_logging()
+_listener = None
+
+
+class CompressingRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """Rotates on a time schedule or when the file grows too large
+
+    Rotated files are gzipped in a background thread, and old files are
+    pruned to stay within both a file count and a total size cap.
+    """
+
+    def __init__(self, filename: str, when: str = 'midnight', backup_count: int = 30,
+                 max_bytes: int = 0, max_total_bytes: int = 0, compress: bool = True):
+        """Initialize the handler
+
+        Args:
+            filename: Path of the active log file
+            when: Rotation schedule, as for TimedRotatingFileHandler
+            backup_count: Number of rotated files to keep (0 keeps all)
+            max_bytes: Rotate once the active file reaches this size (0 disables)
+            max_total_bytes: Cap on the combined size of rotated files (0 disables)
+            compress: Gzip rotated files in the background
+        """
+        super().__init__(filename, when=when, backupCount=0, delay=True)
+        self.backup_limit = backup_count
+        self.max_bytes = max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.compress = compress
+        self.namer = self._unique_name
+        self.rotator = self._rotate
+        self._prune_lock = threading.Lock()
+
+    def shouldRollover(self, record) -> bool:
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes and self.stream is not None:
+            self.stream.seek(0, 2)
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def _unique_name(self, default_name: str) -> str:
+        """Add a counter so size rollovers on the same day don't overwrite each other"""
+        name = default_name
+        index = 1
+        while os.path.exists(name) or os.path.exists(name + '.gz'):
+            name = '{}.{}'.format(default_name, index)
+            index += 1
+        return name
+
+    def _rotate(self, source: str, dest: str):
+        """Move the active file aside and compress/prune in the background"""
+        if not os.path.exists(source):
+            return
+        os.rename(source, dest)
+        worker = threading.Thread(target=self._finish_rotation, args=(dest,),
+                                  name='log-compress', daemon=True)
+        worker.start()
+
+    def _finish_rotation(self, path: str):
+        try:
+            if self.compress:
+                with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(path)
+            self.prune()
+        except Exception as e:
+            logging.getLogger('mobius.services.logging').warning("Log rotation cleanup failed: {}".format(e))
+
+    def rotated_files(self) -> List[str]:
+        """Rotated log files, oldest first
+
+        Returns:
+            list: File paths
+        """
+        files = glob.glob(glob.escape(self.baseFilename) + '.*')
+        return sorted(files, key=os.path.getmtime)
+
+    def prune(self):
+        """Delete the oldest rotated files beyond the count and size caps"""
+        with self._prune_lock:
+            files = self.rotated_files()
+            if self.backup_limit and len(files) > self.backup_limit:
+                for path in files[:-self.backup_limit]:
+                    os.remove(path)
+                files = files[-self.backup_limit:]
+
+            if self.max_total_bytes:
+                sizes = [os.path.getsize(path) for path in files]
+                total = sum(sizes)
+                for path, size in zip(files, sizes):
+                    if total <= self.max_total_bytes:
+                        break
+                    os.remove(path)
+                    total -= size
+
+
+def configure_logging(log_level: int = logging.INFO, log_dir: Optional[str] = None) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to console and rotating file handlers
+
+    Application threads only enqueue records; formatting and disk I/O happen
+    on the listener's thread.
+
+    Args:
+        log_level: Root log level
+        log_dir: Directory for log files (defaults to LOG_DIR)
+
+    Returns:
+        QueueListener: The running listener
+    """
+    global _listener
+    stop_logging()
+
+    log_dir = log_dir or settings.LOG_DIR
+    os.makedirs(log_dir, exist_ok=True)
+
+    formatter = logging.Formatter(settings.LOG_FORMAT, datefmt='%Y-%m-%d %H:%M:%S')
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    file_handler = CompressingRotatingFileHandler(
+        os.path.join(log_dir, settings.LOG_FILE_NAME),
+        when=settings.LOG_ROTATE_WHEN,
+        backup_count=settings.LOG_BACKUP_COUNT,
+        max_bytes=settings.LOG_MAX_BYTES,
+        max_total_bytes=settings.LOG_MAX_TOTAL_BYTES,
+        compress=settings.LOG_COMPRESS
+    )
+    file_handler.setFormatter(formatter)
+    file_handler.prune()
+
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(log_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler,
+                                               respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Drain the queue and close the log handlers"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,255 @@
+"""
+MP4 Metadata Module
+Reads duration, bitrate, creation time and frame count from MP4 headers
+"""
+
+import os
+import json
+import mmap
+import struct
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from mobius.config import settings
+
+# Seconds between the MP4 epoch (1904-01-01) and the Unix epoch
+MP4_EPOCH_OFFSET = 2082844800
+
+
+class Mp4Error(ValueError):
+    """Raised when a file is not a readable MP4"""
+
+
+# duration and bitrate are in seconds and bits/s; creation_time is a Unix
+# timestamp, or None if the camera left it unset
+Mp4Info = namedtuple('Mp4Info', ['duration', 'bitrate', 'creation_time', 'frame_count'])
+
+
+def _boxes(buf, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Iterate over the boxes in buf[start:end]
+
+    Yields:
+        tuple: (box type, payload start, box end)
+    """
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', buf, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                raise Mp4Error("Truncated box header at {}".format(offset))
+            size, = struct.unpack_from('>Q', buf, offset + 8)
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise Mp4Error("Invalid {} box size {} at {}".format(box_type, size, offset))
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _find(buf, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    """Find the first child box of a type
+
+    Returns:
+        tuple: (payload start, box end), or None if absent
+    """
+    for found, payload, box_end in _boxes(buf, start, end):
+        if found == box_type:
+            return payload, box_end
+    return None
+
+
+def _parse_mvhd(buf, start: int) -> Tuple[Optional[int], float]:
+    """Read creation time and duration from a movie header box"""
+    version = buf[start]
+    if version == 1:
+        created, _, timescale, duration = struct.unpack_from('>QQIQ', buf, start + 4)
+    else:
+        created, _, timescale, duration = struct.unpack_from('>IIII', buf, start + 4)
+    if not timescale:
+        raise Mp4Error("Movie header has a zero timescale")
+    creation_time = created - MP4_EPOCH_OFFSET if created > MP4_EPOCH_OFFSET else None
+    return creation_time, duration / float(timescale)
+
+
+def _video_frame_count(buf, moov_start: int, moov_end: int) -> Optional[int]:
+    """Sample count of the first video track's stsz box"""
+    for box_type, trak_start, trak_end in _boxes(buf, moov_start, moov_end):
+        if box_type != b'trak':
+            continue
+        mdia = _find(buf, trak_start, trak_end, b'mdia')
+        if mdia is None:
+            continue
+        hdlr = _find(buf, mdia[0], mdia[1], b'hdlr')
+        if hdlr is None or bytes(buf[hdlr[0] + 8:hdlr[0] + 12]) != b'vide':
+            continue
+
+        node = mdia
+        for child in (b'minf', b'stbl'):
+            node = _find(buf, node[0], node[1], child)
+            if node is None:
+                break
+        else:
+            stsz = _find(buf, node[0], node[1], b'stsz')
+            if stsz is None:
+                stsz = _find(buf, node[0], node[1], b'stz2')
+            if stsz is not None:
+                _, _, count = struct.unpack_from('>III', buf, stsz[0])
+                return count
+    return None
+
+
+def parse_mp4(path: str) -> Mp4Info:
+    """Read an MP4 file's movie header without loading the file
+
+    The file is memory-mapped and only the top-level box headers and the
+    moov box are touched, so only a few KB are read even for large files.
+
+    Args:
+        path: Path to the MP4 file
+
+    Returns:
+        Mp4Info: Duration, bitrate, creation time and frame count
+
+    Raises:
+        Mp4Error: If the file is empty, truncated or has no movie header
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < 8:
+            raise Mp4Error("{} is too small to be an MP4".format(path))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            try:
+                moov = _find(buf, 0, size, b'moov')
+                if moov is None:
+                    raise Mp4Error("{} has no moov box (still recording?)".format(path))
+                mvhd = _find(buf, moov[0], moov[1], b'mvhd')
+                if mvhd is None:
+                    raise Mp4Error("{} has no movie header".format(path))
+                creation_time, duration = _parse_mvhd(buf, mvhd[0])
+                frame_count = _video_frame_count(buf, moov[0], moov[1])
+            except (struct.error, IndexError) as e:
+                raise Mp4Error("{} is truncated: {}".format(path, e))
+
+    bitrate = size * 8 / duration if duration > 0 else 0.0
+    return Mp4Info(duration=duration, bitrate=bitrate, creation_time=creation_time, frame_count=frame_count)
+
+
+class VideoIndex:
+    """Cache of parsed MP4 metadata, persisted as JSON
+
+    Entries are keyed by path and reused while the file's size and mtime
+    are unchanged, so each clip is parsed once.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """Initialize the index
+
+        Args:
+            path: JSON file to persist the index in (defaults to VIDEO_INDEX_FILE, '' to keep it in memory)
+        """
+        self.logger = logging.getLogger('mobius.services.mp4')
+        self.path = settings.VIDEO_INDEX_FILE if path is None else path
+        self.entries = {}
+        self.parse_count = 0
+        self.hit_count = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning("Ignoring unreadable video index {path}: {e}".format(path=self.path, e=e))
+            self.entries = {}
+
+    def get(self, file_path: str) -> Optional[Mp4Info]:
+        """Metadata for a clip, parsing it only if it changed since last seen
+
+        Args:
+            file_path: Path to the MP4 file
+
+        Returns:
+            Mp4Info: Parsed metadata, or None if the file is not a readable MP4
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        key = [stat.st_size, stat.st_mtime]
+
+        with self._lock:
+            entry = self.entries.get(file_path)
+            if entry is not None and entry[:2] == key:
+                self.hit_count += 1
+                return Mp4Info(*entry[2:]) if entry[2] is not None else None
+
+        try:
+            info = parse_mp4(file_path)
+        except (OSError, ValueError) as e:
+            self.logger.debug("Cannot parse {path}: {e}".format(path=file_path, e=e))
+            info = None
+
+        with self._lock:
+            self.parse_count += 1
+            self.entries[file_path] = key + (list(info) if info else [None] * len(Mp4Info._fields))
+            self._dirty = True
+        return info
+
+    def creation_datetime(self, file_path: str) -> Optional[datetime]:
+        """Local creation time recorded in the clip's movie header
+
+        Args:
+            file_path: Path to the MP4 file
+
+        Returns:
+            datetime: Creation time, or None if unknown
+        """
+        info = self.get(file_path)
+        if info is None or info.creation_time is None:
+            return None
+        return datetime.fromtimestamp(info.creation_time)
+
+    def prune(self, existing: Iterable[str]):
+        """Forget clips that no longer exist
+
+        Args:
+            existing: Paths that are still present
+        """
+        existing = set(existing)
+        with self._lock:
+            for file_path in [p for p in self.entries if p not in existing]:
+                del self.entries[file_path]
+                self._dirty = True
+
+    def save(self):
+        """Write the index atomically if it changed"""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            data = json.dumps(self.entries)
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.error("Could not save video index {path}: {e}".format(path=self.path, e=e))
+
+    def stats(self) -> Dict[str, int]:
+        """Parse and cache-hit counters
+
+        Returns:
+            dict: Counter name to value
+        """
+        return {'entries': len(self.entries), 'parsed': self.parse_count, 'cached': self.hit_count}
@@ -0,0 +1,131 @@
+"""
+Telemetry Batcher Module
+Collects points from every enclosure and writes them to InfluxDB together
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from mobius.config import settings
+
+
+class TelemetryBatcher:
+    """Buffers InfluxDB points so each control pass costs one write
+
+    Exposes the same logging methods as InfluxClient, so relay and sensor
+    code can log through it unchanged. Points are written on flush(), or
+    early once max_points are buffered. Writes go to the InfluxClient
+    unless a runtime installs its own writer (see AsyncRuntime).
+    """
+
+    def __init__(self, influx_client, max_points: Optional[int] = None):
+        """Initialize the batcher
+
+        Args:
+            influx_client: InfluxClient used to format and write points
+            max_points: Buffered points that trigger an early write (defaults to TELEMETRY_BATCH_MAX_POINTS)
+        """
+        self.logger = logging.getLogger('mobius.services.telemetry')
+        self.influx_client = influx_client
+        self.max_points = settings.TELEMETRY_BATCH_MAX_POINTS if max_points is None else max_points
+        self.writer = influx_client.write_points
+        self.points = []
+        self.write_count = 0
+        self._lock = threading.Lock()
+
+    def add(self, json_body: List[Dict[str, Any]]) -> bool:
+        """Buffer points, writing the batch if it is full
+
+        Args:
+            json_body: InfluxDB formatted json data
+
+        Returns:
+            bool: True if buffered (or written) successfully
+        """
+        with self._lock:
+            self.points.extend(json_body)
+            full = len(self.points) >= self.max_points
+        return self.flush() if full else True
+
+    def write_sensor_data(self, data: Dict[str, float], tags: Optional[Dict[str, str]] = None) -> bool:
+        """Buffer sensor readings
+
+        Args:
+            data: Dictionary of sensor readings, or a SampleBatch
+            tags: Optional extra tags (e.g. the enclosure)
+
+        Returns:
+            bool: True if buffered successfully
+        """
+        if not data:
+            return False
+        return self.add(self.influx_client.make_sensor_points(data, tags))
+
+    def log_device_state(self, device: str, state: bool, tags: Optional[Dict[str, str]] = None) -> bool:
+        """Buffer one device state
+
+        Args:
+            device: Device name
+            state: Boolean state
+            tags: Optional extra tags (e.g. the enclosure)
+
+        Returns:
+            bool: True if buffered successfully
+        """
+        return self.add(self.influx_client.make_device_points({device: state}, tags))
+
+    def log_device_states(self, states: Dict[str, bool], tags: Optional[Dict[str, str]] = None) -> bool:
+        """Buffer several device states as one point
+
+        Args:
+            states: Dictionary of device name to boolean state
+            tags: Optional extra tags (e.g. the enclosure)
+
+        Returns:
+            bool: True if buffered successfully
+        """
+        return self.add(self.influx_client.make_device_points(states, tags))
+
+    def log_relay_usage(self, buckets: List[Tuple[str, datetime, Dict[str, Dict[str, float]]]],
+                        tags: Optional[Dict[str, str]] = None) -> bool:
+        """Buffer closed relay usage buckets
+
+        Args:
+            buckets: (period, bucket start, usage by device) tuples from RelayUsage.roll
+            tags: Optional extra tags (e.g. the enclosure)
+
+        Returns:
+            bool: True if buffered successfully
+        """
+        return self.add(self.influx_client.make_usage_points(buckets, tags))
+
+    def log_file_size(self, size: float) -> bool:
+        """Buffer the recorded video size
+
+        Args:
+            size: File size in bytes
+
+        Returns:
+            bool: True if buffered successfully
+        """
+        return self.add(self.influx_client.make_file_size_points(size))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write every buffered point in a single request
+
+        Failed points are kept by the InfluxClient for its own retry.
+
+        Args:
+            timeout: Unused, accepted for shutdown phase compatibility
+
+        Returns:
+            bool: True if successful or nothing was buffered
+        """
+        with self._lock:
+            points, self.points = self.points, []
+        if not points:
+            return True
+        self.write_count += 1
+        return self.writer(points)
@@ -0,0 +1,3 @@
+"""
+Utility package for Reptile Vivarium Monitoring System
+"""
@@ -0,0 +1,90 @@
+"""
+Helper Functions Module
+Lazy optional imports and startup timing
+"""
+
+import time
+import logging
+import importlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# Modules already looked up by optional_import (None when unavailable)
+_optional_modules = {}
+_optional_lock = threading.Lock()
+
+
+class StartupProfiler:
+    """Records how long each import and initialization step takes"""
+
+    def __init__(self):
+        """Initialize the profiler"""
+        self.timings = OrderedDict()
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def section(self, name: str):
+        """Time a block of code under the given name
+
+        Args:
+            name: Component or step name
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def report(self) -> str:
+        """Format the recorded timings, slowest first
+
+        Returns:
+            str: Multi-line report
+        """
+        with self._lock:
+            timings = list(self.timings.items())
+        total = time.monotonic() - self.started
+        lines = ["Startup profile ({:.3f}s total):".format(total)]
+        for name, elapsed in sorted(timings, key=lambda item: item[1], reverse=True):
+            lines.append("  {elapsed:8.3f}s  {name}".format(elapsed=elapsed, name=name))
+        return '\n'.join(lines)
+
+
+# Shared profiler used during startup
+startup_profiler = StartupProfiler()
+
+
+def optional_import(module_name: str) -> Optional[Any]:
+    """Import a module on first use, returning None if it is not installed
+
+    Results are cached, so the import cost is paid at most once and is
+    recorded in the startup profiler.
+
+    Args:
+        module_name: Dotted module name (e.g. 'RPi.GPIO')
+
+    Returns:
+        module: The imported module, or None if unavailable
+    """
+    with _optional_lock:
+        if module_name in _optional_modules:
+            return _optional_modules[module_name]
+
+        with startup_profiler.section('import {}'.format(module_name)):
+            try:
+                module = importlib.import_module(module_name)
+            except ImportError:
+                logging.getLogger('mobius.utils').debug("Optional module {} not available".format(module_name))
+                module = None
+            except RuntimeError as e:
+                # RPi.GPIO raises RuntimeError when not running on a Pi
+                logging.getLogger('mobius.utils').warning("Could not import {}: {}".format(module_name, e))
+                module = None
+
+        _optional_modules[module_name] = module
+        return module
@@ -15,7 +15,7 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/GeoffC31415/Mobius_Automation",
-    packages=find_packages(),
+    packages=find_packages(exclude=['tests', 'tests.*']),
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,46 @@
+"""
+Shared test fixtures
+Keeps every test's files, shared memory and sockets out of the production paths
+"""
+
+import pytest
+
+from mobius.config import settings
+from mobius.services.influx_client import InfluxClient
+
+
+class RecordingInfluxClient(InfluxClient):
+    """InfluxClient that keeps written points in memory instead of sending them"""
+
+    def __init__(self):
+        super().__init__(credentials={'host': 'localhost', 'port': 8086, 'database': 'test'})
+        self.written = []
+
+    def write_points(self, json_body):
+        self.written.extend(json_body)
+        return True
+
+    def device_points(self):
+        """Fields of every device state point written so far"""
+        return [point['fields'] for point in self.written
+                if any(name.endswith('_status') for name in point['fields'])]
+
+
+@pytest.fixture(autouse=True)
+def isolated_paths(tmp_path, monkeypatch):
+    """Point every configured file and device at the test's temporary directory"""
+    monkeypatch.setattr(settings, 'DATA_DIR', str(tmp_path / 'data'))
+    monkeypatch.setattr(settings, 'STATE_DIR', str(tmp_path / 'state'))
+    monkeypatch.setattr(settings, 'ALERT_SPOOL_FILE', str(tmp_path / 'state' / 'alerts.jsonl'))
+    monkeypatch.setattr(settings, 'VIDEO_INDEX_FILE', str(tmp_path / 'state' / 'video_index.json'))
+    monkeypatch.setattr(settings, 'LIVE_STATE_PATH', str(tmp_path / 'live'))
+    monkeypatch.setattr(settings, 'DASHBOARD_DIR', str(tmp_path / 'dashboard'))
+    monkeypatch.setattr(settings, 'ARCHIVE_DIR', '')
+    monkeypatch.setattr(settings, 'WATCHDOG_DEVICE', '')
+    monkeypatch.setattr(settings, 'RELAY_SETTLE_DELAY', 0)
+    return tmp_path
+
+
+@pytest.fixture
+def influx():
+    return RecordingInfluxClient()
@@ -0,0 +1,93 @@
+"""Alert rule hysteresis, hold time and notification rate limiting"""
+
+from datetime import datetime
+
+import pytest
+
+from mobius.core.clock import VirtualClock
+from mobius.core.plan import ConfigError
+from mobius.services.alerts import AlertDispatcher, AlertEngine
+
+FIELDS = {'main': ['Water_Temp', 'DHT1_Hum', 'DHT2_Hum']}
+
+
+def make_engine(rules, min_interval=0, repeat_interval=10 ** 6):
+    clock = VirtualClock(start=datetime(2024, 6, 1, 12))
+    engine = AlertEngine(rules=rules, dispatcher=AlertDispatcher(notifiers=[]), clock=clock,
+                         rate_window=600, min_interval=min_interval, repeat_interval=repeat_interval)
+    engine.compile(FIELDS)
+    return engine, clock
+
+
+def step(engine, clock, value, field='Water_Temp', seconds=10):
+    clock.advance(seconds)
+    engine.observe('main', {field: value})
+    return [(alert.state, alert.channel) for alert in engine.check()]
+
+
+def test_hysteresis_needs_the_clear_level_to_resolve():
+    engine, clock = make_engine([{'name': 'hot', 'channel': 'Water_Temp', 'above': 38, 'clear': 37}])
+
+    assert step(engine, clock, 37.5) == []
+    assert step(engine, clock, 38.5) == [('firing', 'Water_Temp')]
+    # Back under the threshold but not under the clear level: still active, no new notification
+    assert step(engine, clock, 37.5) == []
+    assert engine.active_alerts() == [{'rule': 'hot', 'enclosure': 'main', 'channel': 'Water_Temp',
+                                       'severity': 'warning'}]
+    assert step(engine, clock, 38.2) == []
+    assert step(engine, clock, 36.9) == [('resolved', 'Water_Temp')]
+    assert engine.active_alerts() == []
+
+
+def test_hold_time_ignores_short_excursions():
+    engine, clock = make_engine([{'name': 'cold', 'channel': 'Water_Temp', 'below': 22, 'clear': 24, 'for': 60}])
+
+    assert step(engine, clock, 21, seconds=10) == []
+    assert step(engine, clock, 21, seconds=40) == []
+    # Recovered before the hold elapsed: the timer restarts
+    assert step(engine, clock, 23, seconds=10) == []
+    assert step(engine, clock, 21, seconds=10) == []
+    assert step(engine, clock, 21, seconds=50) == []
+    assert step(engine, clock, 21, seconds=10) == [('firing', 'Water_Temp')]
+
+
+def test_flapping_is_rate_limited_and_settles_on_the_final_state():
+    engine, clock = make_engine([{'name': 'hot', 'channel': 'Water_Temp', 'above': 38, 'clear': 37}],
+                                min_interval=900)
+
+    assert step(engine, clock, 39) == [('firing', 'Water_Temp')]
+    # Resolves and fires again within the minimum interval: both held back
+    assert step(engine, clock, 36) == []
+    assert step(engine, clock, 39) == []
+    assert step(engine, clock, 36) == []
+    # Only the changes away from the last notified state are counted
+    assert engine.suppressed[0] == 2
+
+    clock.advance(900)
+    alerts = engine.check()
+    assert [(alert.state, alert.suppressed) for alert in alerts] == [('resolved', 2)]
+    assert engine.check() == []
+
+
+def test_active_alerts_repeat_as_reminders():
+    engine, clock = make_engine([{'name': 'hot', 'channel': 'Water_Temp', 'above': 38}], repeat_interval=3600)
+
+    assert step(engine, clock, 39) == [('firing', 'Water_Temp')]
+    assert step(engine, clock, 39, seconds=1800) == []
+    assert step(engine, clock, 39, seconds=1800) == [('repeat', 'Water_Temp')]
+
+
+def test_glob_rules_alert_per_channel_and_stale_fires_without_readings():
+    engine, clock = make_engine([
+        {'name': 'dry', 'channel': 'DHT*_Hum', 'below': 40},
+        {'name': 'probe_stale', 'channel': 'Water_Temp', 'stale': 180},
+    ])
+
+    assert step(engine, clock, 35, field='DHT2_Hum') == [('firing', 'DHT2_Hum')]
+    clock.advance(200)
+    assert [(alert.rule, alert.state) for alert in engine.check()] == [('probe_stale', 'firing')]
+
+
+def test_clear_on_the_wrong_side_is_rejected():
+    with pytest.raises(ConfigError):
+        make_engine([{'name': 'hot', 'channel': 'Water_Temp', 'above': 38, 'clear': 39}])
@@ -0,0 +1,105 @@
+"""Video archiving checkpoints and rollback"""
+
+import hashlib
+import json
+import os
+import tarfile
+
+import pytest
+
+from mobius.services.archiver import archive_day
+
+DAY = '20240601'
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    videos, archive = tmp_path / 'videos', tmp_path / 'archive'
+    videos.mkdir()
+    archive.mkdir()
+    return str(videos), str(archive)
+
+
+def make_video(directory, name, size=50000):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(hashlib.sha256(name.encode()).digest() * (size // 32))
+    return path
+
+
+def contents(archive):
+    tar_path = os.path.join(archive, 'videos-{}.tar'.format(DAY))
+    with tarfile.open(tar_path) as tar:
+        members = {member.name: hashlib.sha256(tar.extractfile(member).read()).hexdigest()
+                   for member in tar.getmembers()}
+        names = tar.getnames()
+    with open(os.path.join(archive, 'videos-{}.manifest.jsonl'.format(DAY))) as f:
+        manifest = [json.loads(line) for line in f]
+    return names, members, manifest
+
+
+def test_archive_day_moves_videos_into_the_container(dirs):
+    videos, archive = dirs
+    paths = [make_video(videos, '01-2024060112000{}.mp4'.format(i)) for i in range(3)]
+    expected = {}
+    for path in paths:
+        with open(path, 'rb') as f:
+            expected[os.path.basename(path)] = hashlib.sha256(f.read()).hexdigest()
+
+    result = archive_day(DAY, [{'path': path, 'duration': 60.0} for path in paths], archive, 0)
+
+    assert result['files'] == 3
+    assert not any(os.path.exists(path) for path in paths)
+    names, members, manifest = contents(archive)
+    assert members == expected
+    assert [(record['name'], record['sha256'], record['duration']) for record in manifest] == \
+        [(name, expected[name], 60.0) for name in sorted(expected)]
+
+
+def test_interrupted_member_is_rolled_back_and_redone(dirs):
+    videos, archive = dirs
+    first = make_video(videos, 'a.mp4')
+    archive_day(DAY, [{'path': first}], archive, 0)
+
+    # A crash while copying b: a partial member after the checkpoint and a manifest line without one
+    tar_path = os.path.join(archive, 'videos-{}.tar'.format(DAY))
+    with open(tar_path, 'ab') as f:
+        f.write(b'partial member' * 1000)
+    with open(os.path.join(archive, 'videos-{}.manifest.jsonl'.format(DAY)), 'a') as f:
+        f.write(json.dumps({'name': 'b.mp4'}) + '\n')
+
+    rest = [make_video(videos, 'b.mp4'), make_video(videos, 'c.mp4')]
+    result = archive_day(DAY, [{'path': path} for path in rest], archive, 0)
+
+    assert result['files'] == 2
+    names, members, manifest = contents(archive)
+    assert names == ['a.mp4', 'b.mp4', 'c.mp4']
+    assert [record['name'] for record in manifest] == names
+    assert all(members[record['name']] == record['sha256'] for record in manifest)
+
+
+def test_checkpointed_video_left_behind_is_not_archived_twice(dirs):
+    videos, archive = dirs
+    archive_day(DAY, [{'path': make_video(videos, 'a.mp4')}], archive, 0)
+
+    # A crash after the checkpoint but before the original was deleted
+    left_behind = make_video(videos, 'a.mp4')
+    result = archive_day(DAY, [{'path': left_behind}], archive, 0)
+
+    assert result['files'] == 0
+    assert not os.path.exists(left_behind)
+    names, _, manifest = contents(archive)
+    assert names == ['a.mp4'] and len(manifest) == 1
+
+
+def test_container_without_checkpoint_is_left_alone(dirs):
+    videos, archive = dirs
+    tar_path = os.path.join(archive, 'videos-{}.tar'.format(DAY))
+    with open(tar_path, 'wb') as f:
+        f.write(b'\0' * 1024)
+    path = make_video(videos, 'a.mp4')
+
+    with pytest.raises(RuntimeError):
+        archive_day(DAY, [{'path': path}], archive, 0)
+    assert os.path.exists(path)
+    assert os.path.getsize(tar_path) == 1024
@@ -0,0 +1,124 @@
+"""Asyncio runtime writes over the keep-alive Influx connection"""
+
+import asyncio
+
+import pytest
+
+from mobius.core.async_runtime import AsyncRuntime
+from mobius.services.async_influx import AsyncInfluxWriter
+
+POINT = {'measurement': 'vivarium', 'tags': {'enclosure': 'main'}, 'fields': {'Water_Temp': 24.5}, 'time': 1}
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+class InfluxServer:
+    """Answers each /write with the next scripted status, recording the bodies"""
+
+    def __init__(self, statuses=(), close_after_response=False):
+        self.statuses = list(statuses)
+        self.close_after_response = close_after_response
+        self.bodies = []
+        self.connections = 0
+        self.server = None
+        self.handlers = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        return {'host': '127.0.0.1', 'port': self.server.sockets[0].getsockname()[1], 'database': 'test'}
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        self.handlers.append(asyncio.current_task())
+        while True:
+            if not await reader.readline():
+                break
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            self.bodies.append((await reader.readexactly(length)).decode('utf-8'))
+            status = self.statuses.pop(0) if self.statuses else 204
+            body = b'' if status == 204 else b'{"error": "bad"}'
+            writer.write('HTTP/1.1 {} X\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+                status, len(body), 'close' if self.close_after_response else 'keep-alive').encode('latin-1') + body)
+            await writer.drain()
+            if self.close_after_response:
+                break
+        writer.close()
+
+    async def stop(self):
+        self.server.close()
+        await asyncio.gather(*self.handlers)
+        await self.server.wait_closed()
+
+
+def write_several(loop, server, count=3):
+    async def run():
+        writer = AsyncInfluxWriter(await server.start(), timeout=5)
+        results = [await writer.write_points([POINT]) for _ in range(count)]
+        await writer.close()
+        await server.stop()
+        return writer, results
+    return loop.run_until_complete(run())
+
+
+def test_writes_share_one_keep_alive_connection(loop):
+    server = InfluxServer()
+    writer, results = write_several(loop, server)
+    assert results == [True, True, True]
+    assert (writer.write_count, writer.error_count, writer.connect_count) == (3, 0, 1)
+    assert server.connections == 1
+    assert server.bodies == ['vivarium,enclosure=main Water_Temp=24.5 1'] * 3
+
+
+def test_closed_connections_are_reopened(loop):
+    server = InfluxServer(close_after_response=True)
+    writer, results = write_several(loop, server)
+    assert results == [True, True, True]
+    assert writer.connect_count == 3
+
+
+def test_rejected_write_is_reported(loop):
+    server = InfluxServer(statuses=[400])
+    writer, results = write_several(loop, server, count=2)
+    assert results == [False, True]
+    assert (writer.write_count, writer.error_count) == (1, 1)
+
+
+class ScriptedWriter:
+    def __init__(self, results):
+        self.results = list(results)
+        self.written = []
+
+    async def write_points(self, points):
+        self.written.append(list(points))
+        return self.results.pop(0)
+
+
+class StubController:
+    def __init__(self, influx_client):
+        self.influx_client = influx_client
+
+
+def test_failed_points_are_queued_and_sent_with_the_next_write(loop, influx):
+    runtime = AsyncRuntime(StubController(influx), status_port=0, workers=1)
+    runtime.influx_writer = ScriptedWriter([False, True])
+    first = dict(POINT, time=1)
+    second = dict(POINT, time=2)
+
+    assert not loop.run_until_complete(runtime._write_points([first]))
+    assert influx.pending and influx.pending[0]['time'] == 1
+    assert loop.run_until_complete(runtime._write_points([second]))
+    assert [[p['time'] for p in points] for points in runtime.influx_writer.written] == [[1], [1, 2]]
+    assert not influx.pending
+    runtime.executor.shutdown()
@@ -0,0 +1,96 @@
+"""Swinging-door and deadband telemetry compression"""
+
+import math
+import random
+from bisect import bisect_right
+
+import pytest
+
+from mobius.services.compression import ChannelCompressor, TelemetryCompressor
+
+
+def signal(count=2000, seed=1):
+    """A slow daily-like swing with sensor noise and a few steps, one reading every 10 s"""
+    rng = random.Random(seed)
+    readings = []
+    for i in range(count):
+        t = 1700000000 + i * 10
+        value = 26 + 2 * math.sin(i / 300.0) + rng.gauss(0, 0.05)
+        if 800 <= i < 900:
+            value += 1.5
+        readings.append((t, value))
+    return readings
+
+
+def compress(mode, readings, tolerance, heartbeat=600):
+    channel = ChannelCompressor(tolerance, heartbeat, mode)
+    stored = []
+    for t, value in readings:
+        stored.extend(channel.add(t, value))
+    stored.extend(channel.flush())
+    return channel, stored
+
+
+def interpolate(stored, t):
+    times = [point[0] for point in stored]
+    i = bisect_right(times, t) - 1
+    if times[i] == t or i + 1 == len(stored):
+        return stored[i][1]
+    (t0, v0), (t1, v1) = stored[i], stored[i + 1]
+    return v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+
+
+def hold(stored, t):
+    times = [point[0] for point in stored]
+    return stored[bisect_right(times, t) - 1][1]
+
+
+@pytest.mark.parametrize('tolerance', [0.1, 0.25])
+def test_swinging_door_interpolation_stays_within_tolerance(tolerance):
+    readings = signal()
+    channel, stored = compress('swinging_door', readings, tolerance)
+
+    worst = max(abs(interpolate(stored, t) - value) for t, value in readings)
+    assert worst <= tolerance + 1e-9
+    assert channel.ratio > 3
+    assert stored[0] == readings[0]
+    assert stored[-1][0] == readings[-1][0]
+
+
+@pytest.mark.parametrize('tolerance', [0.1, 0.25])
+def test_deadband_hold_stays_within_tolerance(tolerance):
+    readings = signal()
+    channel, stored = compress('deadband', readings, tolerance)
+
+    worst = max(abs(hold(stored, t) - value) for t, value in readings[:-1])
+    assert worst <= tolerance + 1e-9
+    assert channel.ratio > 1.5
+    # Emitted points are real readings, unmoved
+    assert set(stored) <= set(readings)
+
+
+@pytest.mark.parametrize('mode', ['swinging_door', 'deadband'])
+def test_heartbeat_bounds_the_gap_on_a_flat_signal(mode):
+    readings = [(1700000000 + i * 10, 25.0) for i in range(400)]
+    _, stored = compress(mode, readings, 0.5, heartbeat=600)
+
+    gaps = [b[0] - a[0] for a, b in zip(stored, stored[1:])]
+    assert gaps and max(gaps) <= 600
+    assert all(value == 25.0 for _, value in stored)
+
+
+def test_telemetry_compressor_groups_fields_by_timestamp():
+    compressor = TelemetryCompressor(mode='deadband', tolerances={'_Temp': 0.5, '_Hum': 2.0}, heartbeat=3600)
+    assert compressor.tolerance('DHT1_Temp') == 0.5
+    assert compressor.tolerance('Water_Level') == 0.0
+
+    first = compressor.compress({'DHT1_Temp': 25.0, 'DHT1_Hum': 60.0}, 1000.4)
+    assert first == {1000: {'DHT1_Temp': 25.0, 'DHT1_Hum': 60.0}}
+    assert compressor.compress({'DHT1_Temp': 25.2, 'DHT1_Hum': 61.0}, 1010) == {}
+    assert compressor.compress({'DHT1_Temp': 26.0, 'DHT1_Hum': None}, 1020) == {1020: {'DHT1_Temp': 26.0}}
+    assert compressor.flush() == {1010: {'DHT1_Hum': 61.0}}
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ChannelCompressor(0.1, 60, 'gorilla')
@@ -0,0 +1,101 @@
+"""Dashboard chart series"""
+
+import json
+from collections import OrderedDict
+
+import pytest
+
+from mobius.config import settings
+from mobius.services.dashboard import DashboardSeries
+
+LAYOUT = OrderedDict([('main', (['Water_Temp', 'DHT1_Hum'], ['lamp']))])
+RANGES = {'5m': {'bucket': 60, 'buckets': 5, 'write_every': 0}}
+T0 = 1717243200  # Bucket-aligned
+
+
+@pytest.fixture(autouse=True)
+def timeline_range(monkeypatch):
+    monkeypatch.setattr(settings, 'DASHBOARD_TIMELINE_RANGE', '5m')
+
+
+def make_series(directory):
+    return DashboardSeries(LAYOUT, directory=str(directory), ranges=RANGES)
+
+
+def fill(series, minutes, skip=()):
+    """Two water readings per minute: 20 + minute and 21 + minute"""
+    for minute in range(minutes):
+        if minute in skip:
+            continue
+        series.observe('main', {'Water_Temp': 20.0 + minute}, T0 + minute * 60 + 10)
+        series.observe('main', {'Water_Temp': 21.0 + minute, 'DHT1_Hum': None}, T0 + minute * 60 + 40)
+
+
+def test_ring_wraps_to_the_latest_buckets(tmp_path):
+    series = make_series(tmp_path)
+    fill(series, 8, skip=(5,))
+    now = T0 + 7 * 60 + 50
+    data = series.render('5m', now)
+
+    assert data['step'] == 60 and data['start'] == T0 + 3 * 60
+    water = data['enclosures']['main']['readings']['Water_Temp']
+    # Minutes 3 to 7; minute 5 had no readings and the reused slots hold nothing from minutes 0 to 2
+    assert water['mean'] == [23.5, 24.5, None, 26.5, 27.5]
+    assert water['min'] == [23.0, 24.0, None, 26.0, 27.0]
+    assert water['max'] == [24.0, 25.0, None, 27.0, 28.0]
+    assert water['n'] == [2, 2, 0, 2, 2]
+    assert data['enclosures']['main']['readings']['DHT1_Hum']['n'] == [0] * 5
+
+
+def test_incremental_render_matches_a_full_render(tmp_path):
+    series = make_series(tmp_path)
+    for minute in range(12):
+        series.observe('main', {'Water_Temp': 20.0 + minute % 4}, T0 + minute * 60 + 5)
+        series.record_relays({'main': {'lamp': minute % 3 == 0}}, T0 + minute * 60 + 5)
+        incremental = series.render('5m', T0 + minute * 60 + 30)
+        series._rendered = {}
+        assert series.render('5m', T0 + minute * 60 + 30) == incremental
+
+
+def test_relay_on_fraction_and_timeline(tmp_path):
+    series = make_series(tmp_path)
+    series.record_relays({'main': {'lamp': True}}, T0 + 30)
+    series.record_relays({'main': {'lamp': False}}, T0 + 90)
+    data = series.render('5m', T0 + 150)
+
+    # Buckets no relay time was accounted in have no data
+    assert data['enclosures']['main']['relays']['lamp'] == [None, None, 0.5, 0.5, None]
+    assert data['enclosures']['main']['timeline']['lamp'] == [[T0 + 30, 1], [T0 + 90, 0]]
+
+
+def test_written_files_restore_after_a_restart(tmp_path):
+    series = make_series(tmp_path)
+    fill(series, 4)
+    series.record_relays({'main': {'lamp': True}}, T0 + 60)
+    series.record_relays({'main': {'lamp': False}}, T0 + 120)
+    now = T0 + 3 * 60 + 50
+    assert series.write(now, force=True) == [series.path('5m')]
+    with open(series.path('5m')) as f:
+        assert json.load(f) == json.loads(json.dumps(series.render('5m', now)))
+
+    restarted = make_series(tmp_path)
+    assert restarted.load(now + 120) == 1
+    later = now + 120
+    restored = restarted.render('5m', later)
+    expected = series.render('5m', later)
+    assert restored['enclosures']['main']['readings'] == expected['enclosures']['main']['readings']
+    assert restored['enclosures']['main']['relays'] == expected['enclosures']['main']['relays']
+    # Minute 0 has left the range; minutes 1 to 3 came back from the file
+    assert restored['enclosures']['main']['readings']['Water_Temp']['n'] == [2, 2, 2, 0, 0]
+    assert restored['enclosures']['main']['relays']['lamp'][:2] == [1.0, 0.0]
+
+
+def test_unreadable_or_mismatched_files_are_ignored(tmp_path):
+    series = make_series(tmp_path)
+    with open(series.path('5m'), 'w') as f:
+        f.write('{"step": 60, "start": ')
+    assert make_series(tmp_path).load(T0) == 0
+
+    with open(series.path('5m'), 'w') as f:
+        json.dump({'step': 300, 'start': T0, 'enclosures': {}}, f)
+    assert make_series(tmp_path).load(T0) == 0
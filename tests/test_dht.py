@@ -0,0 +1,85 @@
+"""DHT driver rate limiting, backoff and last-good caching"""
+
+from datetime import datetime
+
+from mobius.core.clock import VirtualClock
+from mobius.hardware.drivers.dht import DHTReader
+
+PIN = 4
+
+
+class ScriptedDHT:
+    """Returns scripted (humidity, temperature) pairs, taking read_time virtual seconds each"""
+
+    DHT11 = 11
+
+    def __init__(self, clock, results=(), read_time=0.0):
+        self.clock = clock
+        self.results = list(results)
+        self.read_time = read_time
+        self.reads = []
+
+    def read(self, sensor, pin):
+        self.reads.append(self.clock.monotonic())
+        self.clock.advance(self.read_time)
+        return self.results.pop(0) if self.results else (55.0, 25.0)
+
+
+def make_reader(results=(), read_time=0.0, **kwargs):
+    clock = VirtualClock(start=datetime(2024, 6, 1))
+    dht = ScriptedDHT(clock, results, read_time)
+    kwargs.setdefault('min_interval', 2)
+    kwargs.setdefault('max_backoff', 60)
+    return clock, dht, DHTReader(dht, [PIN], clock=clock, **kwargs)
+
+
+def test_reads_within_the_minimum_interval_come_from_the_cache():
+    clock, dht, reader = make_reader(results=[(50.0, 24.0), (51.0, 24.5)])
+
+    assert reader.read(PIN, max_age=30) == (50.0, 24.0, 0.0, True)
+    clock.advance(1.5)
+    assert reader.read(PIN, max_age=30) == (50.0, 24.0, 1.5, False)
+    clock.advance(0.5)
+    assert reader.read(PIN, max_age=30) == (51.0, 24.5, 0.0, True)
+    assert dht.reads == [0.0, 2.0]
+
+
+def test_failing_pin_backs_off_exponentially_up_to_the_cap():
+    clock, dht, reader = make_reader(results=[(None, None)] * 8, max_backoff=20)
+    for _ in range(120):
+        reader.read(PIN, max_age=30)
+        clock.advance(1)
+
+    gaps = [later - earlier for earlier, later in zip(dht.reads, dht.reads[1:])]
+    assert gaps[:5] == [2, 4, 8, 16, 20]
+    # The first good read resets the delay to the minimum interval
+    assert gaps[-1] == 2
+    assert reader.stats()[PIN]['consecutive_failures'] == 0
+
+
+def test_last_good_value_is_served_until_it_is_too_old():
+    clock, dht, reader = make_reader(results=[(50.0, 24.0)] + [(None, None)] * 10)
+    reader.read(PIN, max_age=10)
+
+    clock.advance(6)
+    reading = reader.read(PIN, max_age=10)
+    assert reading.temperature == 24.0 and reading.age == 6 and not reading.fresh
+    clock.advance(6)
+    assert reader.read(PIN, max_age=10) is None
+    stats = reader.stats()[PIN]
+    assert stats['successes'] == 1 and stats['attempts'] == 3
+
+
+def test_implausible_values_count_as_failures():
+    clock, dht, reader = make_reader(results=[(150.0, 24.0), (50.0, -99.0)])
+    assert reader.read(PIN, max_age=30) is None
+    clock.advance(2)
+    assert reader.read(PIN, max_age=30) is None
+    assert reader.stats()[PIN]['consecutive_failures'] == 2
+
+
+def test_age_is_measured_from_the_end_of_a_slow_read():
+    clock, dht, reader = make_reader(results=[(50.0, 24.0)], read_time=2.5)
+    reading = reader.read(PIN, max_age=30)
+    assert reading.age == 0.0 and reading.fresh
+    assert reader.stats()[PIN]['age'] == 0.0
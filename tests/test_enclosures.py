@@ -0,0 +1,72 @@
+"""Several enclosures driven by one controller"""
+
+import copy
+from datetime import datetime
+
+import pytest
+
+from mobius.config import settings
+from mobius.core.clock import VirtualClock
+from mobius.core.controller import VivController
+from mobius.core.enclosure import enclosure_configs
+from mobius.core.plan import ConfigError, load_plan
+from mobius.hardware.relay import RelayManager
+from mobius.hardware.simulation import SimulatedGPIO
+
+
+def two_enclosures():
+    main = copy.deepcopy(enclosure_configs()['main'])
+    spare = dict(main, run='spare-1', dht_pins=[5], dht_sensors=[1], safe_states={},
+                 device_pins={'lamp': 7, 'heater': 8},
+                 time_settings={'day': {'on': [8, 20], 'devices': ['lamp']}},
+                 thermo_settings={'water': {'target': 30, 'devices': ['heater']}})
+    return {'main': main, 'spare': spare}
+
+
+def test_enclosures_cannot_share_pins():
+    enclosures = two_enclosures()
+    enclosures['spare']['device_pins'] = {'lamp': 7, 'heater': settings.DEVICE_PINS['fountain']}
+    with pytest.raises(ConfigError, match='already used'):
+        load_plan(enclosures=enclosures)
+
+    enclosures['spare']['dht_pins'] = [settings.DHT_PINS[0]]
+    enclosures['spare']['device_pins']['heater'] = 8
+    with pytest.raises(ConfigError, match='already used'):
+        load_plan(enclosures=enclosures)
+
+    assert [plan.name for plan in load_plan(enclosures=two_enclosures()).enclosures] == ['main', 'spare']
+
+
+def test_each_enclosure_switches_its_own_relays_under_its_own_tags(influx):
+    controller = VivController(simulate=True, clock=VirtualClock(start=datetime(2024, 6, 1, 12)),
+                               influx_client=influx, enclosures=two_enclosures(),
+                               live_state=False, dashboard=False, watchdog=False)
+    try:
+        controller._process_relays()
+    finally:
+        controller.sensor_pool.shutdown(wait=False)
+
+    spare = controller.enclosures['spare']
+    assert spare.relay_manager.device_status['lamp']
+    assert spare.hardware is not controller.enclosures['main'].hardware
+    assert set(spare.hardware.gpio.pin_modes) == {7, 8}
+
+    tags = {(point['tags']['enclosure'], point['tags']['run']) for point in influx.written
+            if 'lamp_status' in point['fields']}
+    assert tags == {('main', 'v1'), ('spare', 'spare-1')}
+
+
+def test_injected_managers_are_refused_with_several_enclosures(influx):
+    relays = RelayManager(gpio=SimulatedGPIO(), influx_client=influx, settle_delay=0, device_pins={'lamp': 5})
+    with pytest.raises(ValueError, match='single enclosure'):
+        VivController(simulate=True, influx_client=influx, relay_manager=relays, enclosures=two_enclosures(),
+                      live_state=False, dashboard=False, watchdog=False)
+
+
+def test_cleanup_releases_only_the_enclosures_own_pins(influx):
+    gpio = SimulatedGPIO()
+    main = RelayManager(gpio=gpio, influx_client=influx, settle_delay=0, device_pins={'lamp': 5})
+    RelayManager(gpio=gpio, influx_client=influx, settle_delay=0, device_pins={'lamp': 6, 'pump': [20, 21]})
+
+    main.cleanup()
+    assert sorted(gpio.pin_modes) == [6, 20, 21]
@@ -0,0 +1,87 @@
+"""gpiochip backend against the in-memory v2 uAPI chip"""
+
+import pytest
+
+from mobius.hardware.drivers.gpiochip import GpioChip, MockChipDevice
+from mobius.hardware.relay import RelayManager
+
+
+def make_chip(**kwargs):
+    device = MockChipDevice(**kwargs)
+    return device, GpioChip('/dev/gpiochip0', device=device)
+
+
+def test_setup_requests_the_pins_with_their_initial_levels_at_once():
+    device, chip = make_chip()
+    chip.setup([5, 6, 13], chip.OUT, initial=[chip.HIGH, chip.LOW, chip.HIGH])
+    assert device.syscalls == 1
+    assert device.pin_states == {5: 1, 6: 0, 13: 1}
+    assert [chip.input(pin) for pin in (5, 6, 13)] == [chip.HIGH, chip.LOW, chip.HIGH]
+
+
+def test_output_writes_each_line_set_with_one_ioctl():
+    device, chip = make_chip()
+    chip.setup([5, 6, 13], chip.OUT, initial=chip.HIGH)
+    chip.setup([20, 21], chip.OUT)
+    device.syscalls = 0
+
+    chip.output([5, 6, 13], [chip.LOW, chip.HIGH, chip.LOW])
+    assert device.syscalls == 1
+    chip.output([13, 20, 21], chip.HIGH)
+    assert device.syscalls == 3
+    assert device.pin_states == {5: 0, 6: 1, 13: 1, 20: 1, 21: 1}
+    assert chip.write_count == 3
+
+
+def test_errors_mirror_rpi_gpio_and_the_kernel():
+    device, chip = make_chip(lines=30)
+    with pytest.raises(RuntimeError):
+        chip.output(5, chip.LOW)
+    chip.setup(5, chip.OUT)
+    with pytest.raises(RuntimeError):
+        chip.setup([5, 6], chip.OUT)
+    with pytest.raises(OSError):
+        chip.setup(40, chip.OUT)
+    with pytest.raises(ValueError):
+        chip.setmode(chip.BOARD)
+    # Another process (here another chip handle) cannot take requested lines
+    other = GpioChip('/dev/gpiochip0', device=device)
+    with pytest.raises(OSError):
+        other.setup(5, other.OUT)
+
+
+def test_cleanup_releases_only_the_listed_line_sets():
+    device, chip = make_chip()
+    chip.setup([5, 6], chip.OUT)
+    chip.setup([20, 21], chip.OUT)
+
+    chip.cleanup([5, 6])
+    assert list(device.requested.values()) == [[20, 21]]
+    chip.output(20, chip.HIGH)
+    with pytest.raises(RuntimeError):
+        chip.output(5, chip.HIGH)
+
+    # Part of a line set cannot be released on its own
+    chip.cleanup(20)
+    assert list(device.requested.values()) == [[20, 21]]
+
+    chip.cleanup()
+    assert device.requested == {} and chip.chip_fd is None
+    chip.setup(5, chip.OUT)
+    assert chip.chip_fd is not None
+
+
+def test_relay_state_vector_is_one_ioctl(influx):
+    device, chip = make_chip()
+    relays = RelayManager(gpio=chip, influx_client=influx, settle_delay=0,
+                          device_pins={'lamp': 26, 'heater': 19, 'fountain': 16, 'stepper': [20, 21]})
+    # Relays come up OFF (HIGH) in one set and the stepper LOW in another
+    assert device.syscalls == 2
+    assert device.pin_states == {26: 1, 19: 1, 16: 1, 20: 0, 21: 0}
+
+    assert relays.set_states({'lamp': True, 'heater': True, 'fountain': True})
+    assert device.syscalls == 3
+    assert device.pin_states[26] == device.pin_states[19] == device.pin_states[16] == 0
+
+    relays.cleanup()
+    assert device.requested == {}
@@ -0,0 +1,104 @@
+"""Live state segment seqlock"""
+
+import threading
+import time
+
+import pytest
+
+from mobius.services.live_state import (LiveStateBusy, LiveStateReader, LiveStateWriter, SEQ, SEQ_OFFSET,
+                                        make_slots)
+
+SLOTS = make_slots({'main': (['Water_Temp', 'DHT1_Temp'], ['lamp'])}, health=['running'])
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'live')
+
+
+def test_round_trip(path):
+    writer = LiveStateWriter(SLOTS, path=path)
+    reader = LiveStateReader(path=path)
+    try:
+        empty = reader.snapshot()
+        assert empty['enclosures']['main']['readings'] == {'Water_Temp': None, 'DHT1_Temp': None}
+
+        writer.update({('', 'health', 'running'): 1, ('main', 'readings', 'Water_Temp'): 26.5},
+                      timestamp=1700000000.0, relays={'main': {'lamp': True, 'unknown': True}})
+        state = reader.snapshot()
+        assert state['seq'] == 2
+        assert state['updated'] == 1700000000.0
+        assert state['health'] == {'running': 1.0}
+        assert state['enclosures']['main'] == {'readings': {'Water_Temp': 26.5, 'DHT1_Temp': None},
+                                               'relays': {'lamp': True}}
+
+        # Slots left out of an update keep their value; None clears one
+        writer.update({('main', 'readings', 'Water_Temp'): None, ('main', 'readings', 'DHT1_Temp'): 24.0})
+        readings = reader.snapshot()['enclosures']['main']['readings']
+        assert readings == {'Water_Temp': None, 'DHT1_Temp': 24.0}
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_reader_never_sees_a_torn_update(path):
+    writer = LiveStateWriter(SLOTS, path=path)
+    reader = LiveStateReader(path=path, timeout=5)
+    stop = threading.Event()
+
+    def write():
+        value = 0
+        while not stop.is_set():
+            value += 1
+            # Every update keeps both readings equal
+            writer.update({('main', 'readings', 'Water_Temp'): value, ('main', 'readings', 'DHT1_Temp'): value})
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        reader.read()
+        water = reader.slots.index(('main', 'readings', 'Water_Temp'))
+        dht = reader.slots.index(('main', 'readings', 'DHT1_Temp'))
+        seen = set()
+        deadline = time.monotonic() + 5
+        while len(seen) < 50 and time.monotonic() < deadline:
+            seq, _, values = reader.read()
+            assert seq % 2 == 0
+            assert values[water] == values[dht] or (values[water] != values[water] and values[dht] != values[dht])
+            seen.add(seq)
+        assert len(seen) >= 50
+    finally:
+        stop.set()
+        thread.join()
+        reader.close()
+        writer.close()
+
+
+def test_reader_gives_up_on_a_writer_stuck_mid_update(path):
+    writer = LiveStateWriter(SLOTS, path=path)
+    reader = LiveStateReader(path=path, timeout=0.05)
+    try:
+        reader.read()
+        # An odd sequence number means an update is in progress
+        SEQ.pack_into(writer._mmap, SEQ_OFFSET, 7)
+        with pytest.raises(LiveStateBusy):
+            reader.read()
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_reader_follows_a_replaced_segment(path):
+    first = LiveStateWriter(SLOTS, path=path)
+    reader = LiveStateReader(path=path)
+    try:
+        first.update({('main', 'readings', 'Water_Temp'): 20.0})
+        assert reader.snapshot()['enclosures']['main']['readings']['Water_Temp'] == 20.0
+
+        second = LiveStateWriter(make_slots({'main': (['Water_Temp'], [])}, health=[]), path=path)
+        second.update({('main', 'readings', 'Water_Temp'): 30.0})
+        assert reader.snapshot()['enclosures'] == {'main': {'readings': {'Water_Temp': 30.0}, 'relays': {}}}
+        second.close()
+    finally:
+        reader.close()
+        first.close()
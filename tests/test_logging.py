@@ -0,0 +1,101 @@
+"""Queued logging with rotation, compression and pruning"""
+
+import gzip
+import logging
+import os
+import sys
+import threading
+
+import pytest
+
+from mobius.config import settings
+from mobius.main import main
+from mobius.services import logging as log_service
+from mobius.services.logging import CompressingRotatingFileHandler, configure_logging, stop_logging
+
+
+@pytest.fixture
+def root_logger():
+    # configure_logging replaces the root handlers; put pytest's back afterwards
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def wait_for_rotation():
+    for thread in threading.enumerate():
+        if thread.name == 'log-compress':
+            thread.join(5)
+
+
+def emit(handler, count, size=100):
+    logger = logging.getLogger('mobius.test.rotation')
+    for index in range(count):
+        handler.handle(logger.makeRecord(logger.name, logging.INFO, __file__, 0, '{:04d} {}'.format(
+            index, 'x' * size), None, None))
+        wait_for_rotation()
+
+
+def test_size_rollover_compresses_the_rotated_file(tmp_path):
+    handler = CompressingRotatingFileHandler(str(tmp_path / 'mobius.log'), max_bytes=1000, backup_count=0)
+    emit(handler, 25)
+    handler.close()
+
+    rotated = handler.rotated_files()
+    assert rotated and all(path.endswith('.gz') for path in rotated)
+    lines = []
+    for path in rotated:
+        with gzip.open(path, 'rt') as f:
+            lines.extend(f.read().splitlines())
+    with open(str(tmp_path / 'mobius.log')) as f:
+        lines.extend(f.read().splitlines())
+    # Nothing is lost or overwritten across same-day rollovers
+    assert sorted(int(line.split()[0]) for line in lines) == list(range(25))
+
+
+def test_prune_keeps_the_newest_files_within_both_caps(tmp_path):
+    handler = CompressingRotatingFileHandler(str(tmp_path / 'mobius.log'), max_bytes=1000, backup_count=3,
+                                             compress=False)
+    emit(handler, 60)
+    handler.close()
+    assert len(handler.rotated_files()) == 3
+
+    handler.max_total_bytes = 2500
+    handler.prune()
+    rotated = handler.rotated_files()
+    assert sum(os.path.getsize(path) for path in rotated) <= 2500
+    assert len(rotated) == 2
+
+
+def test_stop_logging_writes_every_queued_record(tmp_path, monkeypatch, root_logger):
+    monkeypatch.setattr(settings, 'LOG_DIR', str(tmp_path))
+    configure_logging(logging.INFO)
+    logger = logging.getLogger('mobius.test.queue')
+    for index in range(500):
+        logger.info("record {}".format(index))
+    stop_logging()
+
+    with open(str(tmp_path / settings.LOG_FILE_NAME)) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 500
+    assert lines[-1].endswith('record 499')
+
+
+def test_replay_mode_flushes_its_log_records(tmp_path, monkeypatch, root_logger):
+    history = tmp_path / 'history.csv'
+    history.write_text('time,Water_Temp\n2024-06-01T06:00:00,35\n2024-06-01T09:00:00,20\n')
+    output = str(tmp_path / 'decisions.csv')
+    monkeypatch.setattr(settings, 'LOG_DIR', str(tmp_path / 'logs'))
+    monkeypatch.setattr(sys, 'argv', ['mobius', '--replay', str(history), '--replay-output', output])
+
+    assert main() == 0
+    # The listener is stopped, so every queued record has been written
+    assert log_service._listener is None
+    with open(str(tmp_path / 'logs' / settings.LOG_FILE_NAME)) as f:
+        assert 'relay decisions to {}'.format(output) in f.read()
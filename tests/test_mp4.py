@@ -0,0 +1,88 @@
+"""MP4 header parsing"""
+
+import struct
+
+import pytest
+
+from mobius.services.mp4 import MP4_EPOCH_OFFSET, Mp4Error, parse_mp4
+
+CREATED = 1717243200  # 2024-06-01 12:00 UTC
+
+
+def box(box_type, payload=b''):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def large_box(box_type, payload=b''):
+    """Box with a 64-bit size field"""
+    return struct.pack('>I4sQ', 1, box_type, 16 + len(payload)) + payload
+
+
+def mvhd(version, duration, timescale=1000, created=CREATED):
+    if version == 1:
+        fields = struct.pack('>QQIQ', created + MP4_EPOCH_OFFSET, created + MP4_EPOCH_OFFSET, timescale,
+                             int(duration * timescale))
+    else:
+        fields = struct.pack('>IIII', created + MP4_EPOCH_OFFSET, created + MP4_EPOCH_OFFSET, timescale,
+                             int(duration * timescale))
+    return box(b'mvhd', struct.pack('>B3x', version) + fields + bytes(80))
+
+
+def video_trak(frames):
+    hdlr = box(b'hdlr', bytes(8) + b'vide' + bytes(12))
+    stsz = box(b'stsz', struct.pack('>III', 0, 0, frames))
+    return box(b'trak', box(b'mdia', hdlr + box(b'minf', box(b'stbl', stsz))))
+
+
+def write(tmp_path, *boxes):
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(b''.join(boxes))
+    return str(path)
+
+
+@pytest.mark.parametrize('version', [0, 1])
+def test_movie_header_versions(tmp_path, version):
+    path = write(tmp_path, box(b'ftyp', b'isom'), box(b'moov', mvhd(version, 120.5) + video_trak(3615)),
+                 box(b'mdat', bytes(1000)))
+    info = parse_mp4(path)
+    assert info.duration == 120.5
+    assert info.creation_time == CREATED
+    assert info.frame_count == 3615
+    size = (tmp_path / 'clip.mp4').stat().st_size
+    assert info.bitrate == pytest.approx(size * 8 / 120.5)
+
+
+def test_64_bit_box_sizes(tmp_path):
+    # Cameras write large mdat boxes with 64-bit sizes, before or after the moov
+    path = write(tmp_path, box(b'ftyp', b'isom'), large_box(b'mdat', bytes(5000)),
+                 large_box(b'moov', mvhd(1, 60) + video_trak(1800)))
+    info = parse_mp4(path)
+    assert info.duration == 60
+    assert info.frame_count == 1800
+
+
+def test_box_extending_to_end_of_file(tmp_path):
+    path = write(tmp_path, box(b'ftyp', b'isom'), box(b'moov', mvhd(0, 30)),
+                 struct.pack('>I4s', 0, b'mdat') + bytes(2000))
+    info = parse_mp4(path)
+    assert info.duration == 30
+    assert info.frame_count is None
+
+
+def test_unset_creation_time(tmp_path):
+    path = write(tmp_path, box(b'moov', mvhd(0, 10, created=-MP4_EPOCH_OFFSET)))
+    assert parse_mp4(path).creation_time is None
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    box(b'ftyp', b'isom') + box(b'mdat', bytes(100)),
+    box(b'ftyp', b'isom') + struct.pack('>I4s', 4096, b'moov') + bytes(64),
+    box(b'moov', mvhd(0, 10, timescale=0)),
+    box(b'moov', box(b'mvhd', b'\0\0')),
+])
+def test_unreadable_files_raise_mp4_error(tmp_path, data):
+    path = tmp_path / 'bad.mp4'
+    path.write_bytes(data)
+    with pytest.raises(Mp4Error):
+        parse_mp4(str(path))
@@ -0,0 +1,145 @@
+"""Control plan compilation and hot reload"""
+
+import copy
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from mobius.config import settings
+from mobius.core.clock import VirtualClock
+from mobius.core.controller import VivController
+from mobius.core.plan import ConfigError, compile_enclosure
+from mobius.core.enclosure import Enclosure, enclosure_configs
+from mobius.hardware.relay import RelayManager
+from mobius.hardware.simulation import SimulatedGPIO
+
+# Heaters never run below a 1 C target, so only the schedule drives relays
+CONFIG = {
+    'time_settings': {'day': {'on': [8, 20], 'devices': ['lamp', 'led_lights']}},
+    'thermo_settings': {'water': {'target': 1, 'devices': ['heatpad_backwall']}},
+}
+
+
+def write_config(path, config):
+    with open(path, 'w') as f:
+        json.dump(config, f)
+    # Reloads are detected by mtime; make each write distinct
+    stamp = os.stat(path).st_mtime + 1
+    os.utime(path, (stamp, stamp))
+
+
+def main_config(**overrides):
+    config = copy.deepcopy(enclosure_configs()['main'])
+    config.update(overrides)
+    return config
+
+
+def test_compiled_plan_is_hourly_and_thermostatic():
+    plan = compile_enclosure('main', main_config(
+        time_settings={'night': {'on': [20, 8], 'devices': ['lamp']}},
+        thermo_settings={'water': {'target': 28, 'devices': ['heatpad_backwall', 'heatpad_underlog']}}))
+
+    assert plan.timelines['lamp'][22] and plan.timelines['lamp'][3]
+    assert not plan.timelines['lamp'][8] and not plan.timelines['lamp'][19]
+    assert plan.desired_states(22, 27.0) == {'lamp': True, 'heatpad_backwall': True, 'heatpad_underlog': True}
+    assert plan.desired_states(12, 28.5) == {'lamp': False, 'heatpad_backwall': False, 'heatpad_underlog': False}
+    assert sorted(plan.heater_pins()) == sorted([settings.DEVICE_PINS['heatpad_backwall'],
+                                                 settings.DEVICE_PINS['heatpad_underlog']])
+    with pytest.raises(TypeError):
+        plan.timelines['lamp'] = ()
+
+
+@pytest.mark.parametrize('overrides', [
+    {'time_settings': {'day': {'on': [8, 20], 'devices': ['nonexistent']}}},
+    {'thermo_settings': {'water': {'target': 80, 'devices': ['heatpad_backwall']}}},
+    {'device_pins': {'lamp': 26, 'fountain': 26}},
+    {'dht_pins': [26]},
+])
+def test_invalid_enclosure_config_is_rejected(overrides):
+    with pytest.raises(ConfigError):
+        compile_enclosure('main', main_config(**overrides))
+
+
+class ProbeSensors:
+    """Sensor manager whose thermostat reading the test sets"""
+
+    temperature = None
+
+    def get_temperature(self):
+        return self.temperature
+
+
+def test_lost_probe_holds_only_the_heaters_in_failsafe(influx):
+    plan = compile_enclosure('main', main_config(
+        time_settings={'day': {'on': [8, 20], 'devices': ['lamp']}},
+        thermo_settings={'water': {'target': 28, 'devices': ['heatpad_backwall', 'heatpad_underlog']}}))
+    assert plan.desired_states(12, None) == {'lamp': True}
+
+    sensors = ProbeSensors()
+    relays = RelayManager(gpio=SimulatedGPIO(), influx_client=influx, settle_delay=0,
+                          clock=VirtualClock(start=datetime(2024, 6, 1, 12)),
+                          device_pins=plan.device_pins, safe_states=plan.safe_states)
+    enclosure = Enclosure(plan, sensors, relays)
+    sensors.temperature = 20
+    assert enclosure.update_relays()
+    assert relays.device_status['heatpad_backwall'] and relays.device_status['lamp']
+
+    # The heaters drop to failsafe once; the lamp keeps its schedule and repeated ticks touch nothing
+    sensors.temperature = None
+    del influx.written[:]
+    for _ in range(3):
+        assert enclosure.update_relays()
+    assert not relays.device_status['heatpad_backwall'] and not relays.device_status['heatpad_underlog']
+    assert relays.device_status['lamp']
+    assert influx.device_points() == [{'heatpad_backwall_status': False, 'heatpad_underlog_status': False}]
+
+    sensors.temperature = 20
+    assert enclosure.update_relays()
+    assert relays.device_status['heatpad_backwall'] and relays.device_status['heatpad_underlog']
+
+
+@pytest.fixture
+def controller(tmp_path, influx):
+    config_path = str(tmp_path / 'mobius.json')
+    write_config(config_path, CONFIG)
+    controller = VivController(simulate=True, clock=VirtualClock(start=datetime(2024, 6, 1, 12)),
+                               influx_client=influx, config_path=config_path,
+                               live_state=False, dashboard=False, watchdog=False)
+    controller._process_relays()
+    yield controller
+    controller.sensor_pool.shutdown(wait=False)
+
+
+def test_reload_switches_only_the_relays_that_change(controller, influx):
+    relays = controller.relay_manager
+    assert relays.device_status['lamp'] and relays.device_status['led_lights']
+    written = len(influx.device_points())
+
+    config = copy.deepcopy(CONFIG)
+    config['time_settings']['night'] = {'on': [20, 8], 'devices': ['lamp']}
+    config['time_settings']['day']['devices'] = ['led_lights']
+    write_config(controller.config_path, config)
+    assert controller.reload_config()
+
+    assert not relays.device_status['lamp'] and relays.device_status['led_lights']
+    assert influx.device_points()[written:] == [{'lamp_status': False}]
+    assert controller.plan.enclosure('main').timelines['led_lights'][12]
+
+
+def test_reload_keeps_the_running_plan_on_bad_or_hardware_changes(controller):
+    plan = controller.plan
+
+    write_config(controller.config_path, {'thermo_settings': {'water': {'target': 'warm', 'devices': []}}})
+    assert not controller.reload_config()
+    assert controller.plan is plan
+
+    write_config(controller.config_path, dict(CONFIG, dht_pins=[5, 17]))
+    assert not controller.reload_config()
+    assert controller.plan is plan
+
+    with open(controller.config_path, 'w') as f:
+        f.write('{not json')
+    assert not controller.reload_config()
+    assert controller.plan is plan
@@ -0,0 +1,92 @@
+"""Replaying recorded history through the control logic"""
+
+import csv
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from mobius.core.replay import load_history, parse_time, run_replay
+from mobius.hardware.relay import RelayManager
+from mobius.hardware.sensor import SensorManager
+
+START = datetime(2024, 6, 1, 6, 0)
+
+
+def write_history(path, rows, columns=('time', 'Water_Temp', 'Humidity_1')):
+    with open(str(path), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    return str(path)
+
+
+def day_history(path, minutes=24 * 60, step=10):
+    # Water is below the 34 C target by day and above it at night
+    rows = []
+    for minute in range(0, minutes, step):
+        time = START + timedelta(minutes=minute)
+        rows.append((time.isoformat(), 20.0 if 8 <= time.hour < 20 else 35.0, 60))
+    return write_history(path, rows)
+
+
+def test_timestamps_in_every_supported_form():
+    expected = datetime(2024, 6, 1, 6, 0, 0, 123456)
+    assert parse_time('2024-06-01T06:00:00.123456789') == expected
+    assert parse_time('2024-06-01 06:00:00.123456') == expected
+    epoch = expected.timestamp()
+    for scale in (1, 10 ** 3, 10 ** 6, 10 ** 9):
+        assert abs((parse_time(repr(epoch * scale)) - expected).total_seconds()) < 0.001
+
+
+def test_history_is_sorted_and_non_numeric_cells_dropped(tmp_path):
+    path = write_history(tmp_path / 'history.csv', [
+        ('2024-06-01T06:10:00', 24.0, ''),
+        ('2024-06-01T06:00:00', 23.0, 'n/a'),
+    ])
+    assert load_history(path) == [
+        (datetime(2024, 6, 1, 6, 0), {'Water_Temp': 23.0}),
+        (datetime(2024, 6, 1, 6, 10), {'Water_Temp': 24.0}),
+    ]
+
+
+def test_replay_records_relay_decisions_in_virtual_time(tmp_path):
+    output = str(tmp_path / 'decisions.csv')
+    summary = run_replay(day_history(tmp_path / 'history.csv'), output)
+
+    assert summary['records'] == 24 * 6
+    assert summary['end'] == START + timedelta(hours=23, minutes=50)
+    devices = summary['devices']
+    # Heaters follow the water temperature and the lamp its 08:00-20:00 window
+    for device in ('heatpad_backwall', 'heatpad_underlog', 'lamp'):
+        assert devices[device]['switches'] == 2
+        assert devices[device]['on_hours'] == pytest.approx(12, abs=0.5)
+    with open(output) as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == summary['decisions']
+    assert all(parse_time(row['time']) >= START for row in rows)
+
+
+def test_replay_needs_the_thermostat_channel(tmp_path):
+    path = write_history(tmp_path / 'history.csv', [('2024-06-01T06:00:00', 60)], columns=('time', 'Humidity_1'))
+    with pytest.raises(ValueError):
+        run_replay(path)
+
+
+def test_only_the_replayed_enclosure_is_built(tmp_path, monkeypatch):
+    config_path = str(tmp_path / 'mobius.json')
+    with open(config_path, 'w') as f:
+        json.dump({'enclosures': {'spare': {
+            'device_pins': {'spare_lamp': 7}, 'dht_pins': [5], 'dht_sensors': [1], 'safe_states': {},
+            'time_settings': {'day': {'on': [8, 20], 'devices': ['spare_lamp']}}, 'thermo_settings': {},
+        }}}, f)
+
+    def real_hardware(*args, **kwargs):
+        raise AssertionError("replay built hardware for another enclosure")
+
+    monkeypatch.setattr(RelayManager, '_load_gpio', real_hardware)
+    monkeypatch.setattr(SensorManager, '__init__', real_hardware)
+
+    summary = run_replay(day_history(tmp_path / 'history.csv'), config_path=config_path)
+    assert 'spare_lamp' not in summary['devices']
+    assert summary['devices']['lamp']['switches'] == 2
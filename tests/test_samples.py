@@ -0,0 +1,68 @@
+"""Typed sample batches flowing through the pipeline"""
+
+import math
+from collections import OrderedDict
+from datetime import datetime
+
+import pytest
+
+from mobius.core.clock import VirtualClock
+from mobius.core.samples import MISSING, ChannelTable, slot_map
+from mobius.hardware.sensor import SensorManager
+from mobius.hardware.simulation import SimulatedHardware
+
+TABLE = ChannelTable(OrderedDict([
+    ('Water_Temp', ['Water_Temp']),
+    ('DHT1', ['DHT1_Temp', 'DHT1_Hum']),
+]))
+
+
+def test_table_interns_fields_by_channel():
+    assert TABLE.names == ['Water_Temp', 'DHT1_Temp', 'DHT1_Hum']
+    assert TABLE.channel_ids == OrderedDict([('Water_Temp', (0,)), ('DHT1', (1, 2))])
+    assert slot_map(TABLE, {'water': 7, 'dht1_hum': 9}, key=str.lower) == [None, None, 9]
+
+
+def test_batch_reads_like_a_dict_of_present_fields():
+    batch = TABLE.batch(timestamp=10.0)
+    assert not batch and len(batch) == 0
+    batch.set(TABLE.ids['DHT1_Hum'], 55.0)
+
+    assert dict(batch) == {'DHT1_Hum': 55.0} == batch.to_dict()
+    assert 'DHT1_Hum' in batch and 'DHT1_Temp' not in batch and 'nope' not in batch
+    assert batch.get('DHT1_Temp', -1) == -1
+    with pytest.raises(KeyError):
+        batch['Water_Temp']
+    assert list(batch.channel_items('DHT1')) == [('DHT1_Hum', 55.0)]
+
+
+def test_update_copy_and_clear():
+    batch = TABLE.batch()
+    batch.update({'Water_Temp': 24.0, 'DHT1_Temp': None, 'Unknown': 1.0})
+    assert batch.to_dict() == {'Water_Temp': 24.0}
+
+    other = TABLE.batch(timestamp=5.0)
+    other.update({'DHT1_Temp': 22.0})
+    batch.update(other)
+    assert batch.to_dict() == {'Water_Temp': 24.0, 'DHT1_Temp': 22.0}
+
+    snapshot = batch.copy()
+    batch.copy_from(other, TABLE.channel_ids['Water_Temp'])
+    assert batch.to_dict() == {'DHT1_Temp': 22.0}
+    assert snapshot.to_dict() == {'Water_Temp': 24.0, 'DHT1_Temp': 22.0}
+
+    batch.clear()
+    assert math.isnan(batch.data[1]) and MISSING != MISSING
+
+
+def test_sensor_reads_refill_the_callers_batch(influx):
+    clock = VirtualClock(start=datetime(2024, 6, 1, 12))
+    hardware = SimulatedHardware(now=clock.now, seed=2, dht_failure_rate=0, crc_failure_rate=0)
+    sensors = SensorManager(dht=hardware.dht, onewire=hardware.onewire, clock=clock, dht_pins=[4], dht_sensors=[1])
+    batch = sensors.table.batch()
+
+    assert sensors.get_all_readings(out=batch) is batch
+    assert set(batch) == {'Water_Temp', 'DHT1_Temp', 'DHT1_Hum'}
+    assert batch.timestamp == clock.now().timestamp()
+    # Sinks see the same points as they would from a plain dict
+    assert influx.make_sensor_points(batch) == influx.make_sensor_points(batch.to_dict())
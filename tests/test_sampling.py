@@ -0,0 +1,62 @@
+"""Adaptive per-channel sampling intervals"""
+
+from datetime import datetime
+
+from mobius.config import settings
+from mobius.core.clock import VirtualClock
+from mobius.core.sampling import AdaptiveSampler
+
+
+def run(sampler, clock, values, channel='Water_Temp', field='Water_Temp'):
+    """Feed one reading per due read, returning the interval after each"""
+    intervals = []
+    for value in values:
+        intervals.append(sampler.update(channel, {field: value}))
+        clock.advance(intervals[-1])
+        assert sampler.due() == [channel]
+    return intervals
+
+
+def test_flat_channel_backs_off_to_the_maximum():
+    clock = VirtualClock(start=datetime(2024, 6, 1))
+    sampler = AdaptiveSampler(['Water_Temp'], clock=clock, min_interval=2, max_interval=60)
+    intervals = run(sampler, clock, [25.0] * 15)
+
+    assert intervals[0] == settings.SENSOR_READ_INTERVAL * settings.SAMPLING_BACKOFF
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == 60
+    assert max(intervals) == 60
+
+
+def test_fast_change_is_read_at_the_minimum_and_no_faster():
+    clock = VirtualClock(start=datetime(2024, 6, 1))
+    sampler = AdaptiveSampler(['Water_Temp'], clock=clock, min_interval=2, max_interval=60)
+    intervals = run(sampler, clock, [20.0 + 5 * index for index in range(10)])
+
+    assert intervals[-1] == 2
+    assert min(intervals) == 2
+
+
+def test_distance_from_the_target_bounds_the_interval():
+    clock = VirtualClock(start=datetime(2024, 6, 1))
+    sampler = AdaptiveSampler(['Water_Temp'], clock=clock, targets={'Water_Temp': 30},
+                              min_interval=2, max_interval=60)
+    # 4 C below the target with a 1 C band: no more than a quarter of the maximum
+    intervals = run(sampler, clock, [26.0] * 10)
+    assert max(intervals) == 60 * settings.SAMPLING_TARGET_BAND / 4
+
+
+def test_failed_read_keeps_the_interval_and_channels_are_independent():
+    clock = VirtualClock(start=datetime(2024, 6, 1))
+    sampler = AdaptiveSampler(['Water_Temp', 'DHT1'], clock=clock, min_interval=2, max_interval=60)
+    assert sampler.due() == ['Water_Temp', 'DHT1']
+
+    interval = sampler.update('Water_Temp', {})
+    assert interval == settings.SENSOR_READ_INTERVAL
+    assert sampler.due() == ['DHT1']
+    sampler.update('DHT1', {'DHT1_Temp': 25.0, 'DHT1_Hum': 60.0})
+    assert sampler.due() == []
+
+    clock.advance(interval)
+    assert sampler.due() == ['Water_Temp']
+    assert sampler.stats() == {'Water_Temp': 1, 'DHT1': 1}
@@ -0,0 +1,86 @@
+"""Scheduler and VirtualClock"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from mobius.core.clock import VirtualClock
+from mobius.core.scheduler import Scheduler
+from mobius.core.watchdog import DeadlineMonitor
+
+START = datetime(2024, 6, 1, 12, 0)
+
+
+def test_virtual_clock_advances_without_blocking():
+    clock = VirtualClock(start=START)
+    clock.sleep(90)
+    assert clock.now() == START + timedelta(seconds=90)
+    assert clock.monotonic() == 90
+
+    assert clock.advance(10) == START + timedelta(seconds=100)
+    clock.set(START + timedelta(hours=1))
+    assert clock.monotonic() == 3600
+
+
+def test_virtual_clock_never_moves_backwards():
+    clock = VirtualClock(start=START)
+    clock.advance(60)
+    with pytest.raises(ValueError):
+        clock.set(START)
+    assert clock.now() == START + timedelta(seconds=60)
+
+
+def test_tasks_run_when_due_in_registration_order():
+    clock = VirtualClock(start=START)
+    runs = []
+    scheduler = Scheduler()
+    scheduler.add('fast', 5, lambda: runs.append(('fast', clock.monotonic())))
+    scheduler.add('slow', 20, lambda: runs.append(('slow', clock.monotonic())))
+
+    for _ in range(25):
+        scheduler.run_pending(clock.now())
+        clock.advance(1)
+
+    assert [t for name, t in runs if name == 'fast'] == [0, 5, 10, 15, 20]
+    assert [t for name, t in runs if name == 'slow'] == [0, 20]
+    # Both were due on the first pass; registration order decides
+    assert runs[:2] == [('fast', 0), ('slow', 0)]
+
+
+def test_failing_task_does_not_stop_the_others():
+    clock = VirtualClock(start=START)
+    runs = []
+    scheduler = Scheduler()
+    scheduler.add('broken', 1, lambda: 1 / 0)
+    scheduler.add('healthy', 1, lambda: runs.append(clock.monotonic()))
+
+    assert scheduler.run_pending(clock.now()) == ['broken', 'healthy']
+    clock.advance(1)
+    assert scheduler.run_pending(clock.now()) == ['broken', 'healthy']
+    assert runs == [0, 1]
+
+
+def test_removed_task_stops_running_and_is_unwatched():
+    clock = VirtualClock(start=START)
+    monitor = DeadlineMonitor(clock=clock, deadlines={})
+    scheduler = Scheduler(monitor=monitor)
+    scheduler.add('files', 60, lambda: None)
+    assert 'files' in monitor.tasks
+
+    assert scheduler.remove('files') is not None
+    assert 'files' not in monitor.tasks
+    assert scheduler.run_pending(clock.now()) == []
+    assert scheduler.remove('files') is None
+
+
+def test_monitor_sees_each_run_start_and_finish():
+    clock = VirtualClock(start=START)
+    monitor = DeadlineMonitor(clock=clock, deadlines={'slow': 5}, critical=['slow'])
+    scheduler = Scheduler(monitor=monitor)
+    # The task takes 10 virtual seconds against a 5 second deadline
+    scheduler.add('slow', 60, lambda: clock.advance(10))
+
+    scheduler.run_pending(clock.now())
+    heartbeat = monitor.tasks['slow']
+    assert not heartbeat.running
+    assert heartbeat.finished - heartbeat.started == 10
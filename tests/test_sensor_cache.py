@@ -0,0 +1,74 @@
+"""Shared, freshness-aware sample cache in SensorManager"""
+
+import threading
+from datetime import datetime
+
+from mobius.core.clock import VirtualClock
+from mobius.hardware.sensor import SensorManager
+from mobius.hardware.simulation import SimulatedHardware
+
+
+def make_manager(**hardware_options):
+    clock = VirtualClock(start=datetime(2024, 6, 1, 12))
+    hardware = SimulatedHardware(now=clock.now, seed=1, dht_failure_rate=0, **hardware_options)
+    manager = SensorManager(dht=hardware.dht, onewire=hardware.onewire, clock=clock,
+                            dht_pins=[4], dht_sensors=[1])
+    return clock, hardware, manager
+
+
+def counters(manager):
+    cache = manager.stats()['cache']
+    return cache['physical_reads'], cache['cache_hits'], cache['consumers']
+
+
+def test_consumers_reuse_samples_young_enough_for_them():
+    clock, hardware, manager = make_manager(crc_failure_rate=0)
+    temperature = manager.get_temperature()
+    assert temperature is not None
+
+    clock.advance(5)
+    # The thermostat accepts 10 s old samples, telemetry only 1 s
+    assert manager.get_temperature() == temperature
+    assert manager.sample('Water_Temp', consumer='telemetry') != {}
+    assert manager.get_temperature(consumer='status') is not None
+
+    assert counters(manager) == (2, 2, {
+        'thermostat': {'reads': 1, 'hits': 1},
+        'telemetry': {'reads': 1, 'hits': 0},
+        'status': {'reads': 0, 'hits': 1},
+    })
+    assert hardware.onewire.read_count == 2
+
+
+def test_channels_are_cached_independently():
+    clock, hardware, manager = make_manager(crc_failure_rate=0)
+    manager.get_all_readings(consumer='status')
+    dht_reads = hardware.dht.read_count
+
+    clock.advance(20)
+    manager.get_temperature()
+    assert hardware.dht.read_count == dht_reads
+    assert manager.stats()['cache']['ages'] == {'Water_Temp': 0.0, 'DHT1': 20.0}
+
+
+def test_failed_reads_are_not_cached():
+    clock, hardware, manager = make_manager(crc_failure_rate=1)
+    assert manager.get_temperature() is None
+    assert manager.get_temperature() is None
+    physical, hits, _ = counters(manager)
+    assert (physical, hits) == (2, 0)
+    assert 'Water_Temp' not in manager.stats()['cache']['ages']
+
+
+def test_concurrent_callers_share_one_hardware_read():
+    clock, hardware, manager = make_manager(crc_failure_rate=0, onewire_latency=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(manager.get_temperature())) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(results)) == 1 and results[0] is not None
+    assert hardware.onewire.read_count == 1
+    assert counters(manager)[:2] == (1, 4)
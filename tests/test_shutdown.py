@@ -0,0 +1,73 @@
+"""Shutdown coordinator phase ordering and budgets"""
+
+import threading
+
+from mobius.core.shutdown import ShutdownCoordinator
+
+
+def test_phases_run_in_order_with_the_remaining_budget():
+    calls = []
+    coordinator = ShutdownCoordinator(timeout=5.0)
+    coordinator.add_phase('relays', lambda budget: calls.append(('relays', budget)))
+    coordinator.add_phase('telemetry', lambda budget: calls.append(('telemetry', budget)), max_time=1.0)
+    coordinator.add_phase('archive', lambda budget: calls.append(('archive', budget)))
+
+    timings = coordinator.run()
+
+    assert list(timings) == ['relays', 'telemetry', 'archive']
+    assert all(elapsed is not None for elapsed in timings.values())
+    assert [name for name, _ in calls] == ['relays', 'telemetry', 'archive']
+    assert 4.5 < calls[0][1] <= 5.0
+    # max_time caps a phase's share without shrinking the phases after it
+    assert calls[1][1] == 1.0
+    assert 4.5 < calls[2][1] <= 5.0
+
+
+def test_overrunning_phase_is_abandoned_and_later_phases_still_run():
+    release = threading.Event()
+    budgets = []
+    coordinator = ShutdownCoordinator(timeout=1.0)
+    coordinator.add_phase('stuck', lambda budget: release.wait(10), max_time=0.2)
+    coordinator.add_phase('relays', budgets.append)
+
+    try:
+        timings = coordinator.run()
+    finally:
+        release.set()
+
+    assert timings['stuck'] is None
+    assert timings['relays'] is not None
+    # The stuck phase used its own cap, not the whole deadline
+    assert 0.6 < budgets[0] <= 0.8
+
+
+def test_exhausted_deadline_leaves_later_phases_no_time():
+    release = threading.Event()
+    budgets = []
+    coordinator = ShutdownCoordinator(timeout=0.2)
+    coordinator.add_phase('stuck', lambda budget: release.wait(10))
+    coordinator.add_phase('late', budgets.append)
+
+    try:
+        timings = coordinator.run()
+    finally:
+        release.set()
+
+    assert timings['stuck'] is None
+    assert budgets == [0.0]
+
+
+def test_failing_phase_is_timed_and_does_not_stop_the_rest():
+    ran = []
+
+    def fail(budget):
+        raise RuntimeError('GPIO gone')
+
+    coordinator = ShutdownCoordinator(timeout=2.0)
+    coordinator.add_phase('telemetry', fail)
+    coordinator.add_phase('relays', lambda budget: ran.append('relays'))
+
+    timings = coordinator.run()
+
+    assert timings['telemetry'] is not None
+    assert ran == ['relays']
@@ -0,0 +1,68 @@
+"""Simulated GPIO, DHT and one-wire hardware"""
+
+from datetime import datetime
+
+import pytest
+
+from mobius.config import settings
+from mobius.core.clock import VirtualClock
+from mobius.hardware.simulation import SimulatedGPIO, SimulatedHardware, SimulatedHardwareError
+
+START = datetime(2024, 6, 1, 12, 0)
+HEATER_PIN = 17
+
+
+def readings(hardware, count=5):
+    return [hardware.dht.read(22, 4) for _ in range(count)] + [hardware.onewire.read_lines()]
+
+
+def test_same_seed_gives_the_same_readings():
+    first = SimulatedHardware(now=VirtualClock(start=START).now, seed=7, dht_failure_rate=0.3)
+    second = SimulatedHardware(now=VirtualClock(start=START).now, seed=7, dht_failure_rate=0.3)
+    assert readings(first) == readings(second)
+    assert first.stats() == second.stats()
+
+
+def test_heater_warms_the_enclosure():
+    temperatures = {}
+    for heater in (False, True):
+        clock = VirtualClock(start=START)
+        hardware = SimulatedHardware(now=clock.now, seed=1, heater_pins=[HEATER_PIN])
+        hardware.gpio.setup(HEATER_PIN, hardware.gpio.OUT)
+        # Relays are active LOW
+        hardware.gpio.output(HEATER_PIN, hardware.gpio.LOW if heater else hardware.gpio.HIGH)
+        hardware.environment.update()
+        clock.advance(1800)
+        temperatures[heater] = hardware.environment.update()
+
+    assert temperatures[True] > temperatures[False] + 1
+
+
+def test_onewire_lines_carry_the_model_temperature():
+    hardware = SimulatedHardware(now=VirtualClock(start=START).now, seed=3, crc_failure_rate=0)
+    crc, data = hardware.onewire.read_lines()[:2]
+    assert crc.endswith('YES')
+    celsius = int(data.split('t=')[1]) / 1000.0
+    assert celsius == pytest.approx(settings.SIM_AMBIENT_TEMP, abs=2.5)
+
+    failing = SimulatedHardware(now=VirtualClock(start=START).now, seed=3, crc_failure_rate=1)
+    assert failing.onewire.read_lines()[0].endswith('NO')
+    assert failing.stats()['onewire_crc_failures'] == 1
+
+
+def test_gpio_mirrors_rpi_gpio_errors_and_injected_failures():
+    gpio = SimulatedGPIO()
+    with pytest.raises(RuntimeError):
+        gpio.output(HEATER_PIN, gpio.LOW)
+
+    gpio.setup([HEATER_PIN, 27], gpio.OUT, initial=gpio.HIGH)
+    gpio.output([HEATER_PIN, 27], [gpio.LOW, gpio.HIGH])
+    assert gpio.pin_states == {HEATER_PIN: gpio.LOW, 27: gpio.HIGH}
+    gpio.cleanup([27])
+    assert list(gpio.pin_states) == [HEATER_PIN]
+
+    broken = SimulatedGPIO(failure_rate=1)
+    broken.setup(HEATER_PIN, broken.OUT)
+    with pytest.raises(SimulatedHardwareError):
+        broken.output(HEATER_PIN, broken.LOW)
+    assert broken.write_count == 0
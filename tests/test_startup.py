@@ -0,0 +1,60 @@
+"""Lazy imports and one-shot relay setup at startup"""
+
+import subprocess
+import sys
+import time
+
+from mobius.hardware.relay import RelayManager
+from mobius.hardware.simulation import SimulatedGPIO
+from mobius.utils import helpers
+from mobius.utils.helpers import StartupProfiler, optional_import
+
+DEVICE_PINS = {'lamp': 5, 'heater': 6, 'stepper': [20, 21]}
+
+
+def test_importing_main_leaves_hardware_and_database_modules_unloaded():
+    code = ("import sys, mobius.main; print(','.join(sorted(name for name in ("
+            "'RPi', 'Adafruit_DHT', 'influxdb', 'mobius.core.controller', 'mobius.core.async_runtime') "
+            "if name in sys.modules)))")
+    output = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True)
+    assert output.strip() == ''
+
+
+def test_optional_import_caches_hits_and_misses(monkeypatch):
+    imports = []
+    real_import = helpers.importlib.import_module
+
+    def counting_import(name):
+        imports.append(name)
+        return real_import(name)
+
+    monkeypatch.setattr(helpers.importlib, 'import_module', counting_import)
+    monkeypatch.setattr(helpers, '_optional_modules', {})
+
+    assert optional_import('mobius_missing_module') is None
+    assert optional_import('mobius_missing_module') is None
+    assert optional_import('json') is optional_import('json') is sys.modules['json']
+    assert imports == ['mobius_missing_module', 'json']
+
+
+def test_profiler_accumulates_sections_slowest_first():
+    profiler = StartupProfiler()
+    for name, seconds in (('fast', 0.001), ('slow', 0.02), ('fast', 0.001)):
+        with profiler.section(name):
+            time.sleep(seconds)
+
+    lines = profiler.report().splitlines()
+    assert lines[0].startswith('Startup profile')
+    assert [line.split()[-1] for line in lines[1:]] == ['slow', 'fast']
+    assert profiler.timings['fast'] >= 0.002
+
+
+def test_relays_start_off_with_one_setup_call_per_level_and_one_point(influx):
+    gpio = SimulatedGPIO()
+    relays = RelayManager(gpio=gpio, influx_client=influx, settle_delay=0, device_pins=DEVICE_PINS)
+
+    # Relays are active LOW, so OFF is HIGH; stepper pins start LOW
+    assert gpio.pin_states == {5: gpio.HIGH, 6: gpio.HIGH, 20: gpio.LOW, 21: gpio.LOW}
+    assert gpio.write_count == 0
+    assert influx.device_points() == [{'lamp_status': False, 'heater_status': False, 'stepper_status': False}]
+    assert relays.device_status == {'lamp': False, 'heater': False, 'stepper': False}
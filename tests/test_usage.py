@@ -0,0 +1,75 @@
+"""Incremental relay duty-cycle and energy rollups"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from mobius.hardware.usage import RelayUsage
+
+START = datetime(2024, 6, 1, 12, 0)
+
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+def make_usage(**retention):
+    return RelayUsage(['lamp', 'heater'], START, wattage={'lamp': 60, 'heater': 100},
+                      retention=dict({'minute': 60, 'hour': 48, 'day': 7}, **retention))
+
+
+def test_on_time_is_split_across_the_buckets_it_spans():
+    usage = make_usage()
+    usage.record({'lamp': True}, at(30))
+    usage.record({'lamp': False}, at(135))
+
+    minutes = usage.roll(at(180), ['minute'])
+    assert [start for _, start, _ in minutes] == [START, at(60), at(120)]
+    assert [devices['lamp']['on_seconds'] for _, _, devices in minutes] == [30, 60, 15]
+    assert [devices['lamp']['switches'] for _, _, devices in minutes] == [1, 0, 1]
+    assert minutes[1][2]['lamp']['duty'] == 1.0
+    assert all(devices['heater']['on_seconds'] == 0 for _, _, devices in minutes)
+
+
+def test_buckets_are_closed_once_and_carry_energy():
+    usage = make_usage()
+    usage.record({'heater': True}, START)
+
+    assert usage.roll(at(1800), ['hour', 'day']) == []
+    closed = usage.roll(at(3600 + 10))
+    assert [(period, start) for period, start, _ in closed if period == 'hour'] == [('hour', START)]
+    hour = [devices for period, _, devices in closed if period == 'hour'][0]
+    assert hour['heater'] == {'on_seconds': 3600, 'switches': 1, 'duty': 1.0, 'energy_wh': 100}
+    # Minute buckets closed by the earlier roll are not returned again
+    assert len([period for period, _, _ in closed if period == 'minute']) == 30
+
+    assert [period for period, _, _ in usage.roll(at(3600 + 20))] == []
+
+
+def test_long_gaps_close_at_most_the_kept_buckets():
+    usage = make_usage(minute=5)
+    usage.record({'lamp': True}, START)
+    minutes = usage.roll(at(3600), ['minute'])
+    # Only buckets still in the ring can be reported; each was fully on
+    assert len(minutes) == 5
+    assert [start for _, start, _ in minutes] == [at(3600 - 60 * n) for n in range(5, 0, -1)]
+    assert all(devices['lamp']['duty'] == 1.0 for _, _, devices in minutes)
+
+
+def test_current_usage_and_totals_include_the_open_bucket():
+    usage = make_usage()
+    usage.record({'lamp': True}, START)
+    usage.record({'lamp': False}, at(1800))
+    usage.record({'lamp': True}, at(5400))
+
+    now = at(7200)
+    today = usage.current_usage(now)
+    assert today['lamp']['on_seconds'] == 3600
+    assert today['lamp']['switches'] == 3
+    # 12:00 is half way through the local day
+    assert today['lamp']['duty'] == pytest.approx(3600 / (12 * 3600 + 7200), abs=0.001)
+    assert today['lamp']['energy_wh'] == 60
+
+    totals = usage.totals(now, 'hour')
+    assert totals['lamp'] == {'on_seconds': 3600, 'switches': 3, 'energy_wh': 60}
+    assert totals['heater']['switches'] == 0
@@ -0,0 +1,131 @@
+"""Deadline monitor, watchdog feeding and the failsafe path"""
+
+from datetime import datetime
+
+from mobius.core.clock import VirtualClock
+from mobius.core.controller import VivController
+from mobius.core.watchdog import DeadlineMonitor, SimulatedWatchdog, make_watchdog
+
+START = datetime(2024, 6, 1, 12)
+
+
+class Events:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name,) + tuple(str(arg) for arg in args))
+
+
+def make_monitor(clock, events):
+    watchdog = SimulatedWatchdog(timeout=15, clock=clock)
+    monitor = DeadlineMonitor(clock=clock, watchdog=watchdog, deadlines={'relays': 5, 'files': 60},
+                              critical=['relays'], on_overrun=events.overrun, on_recover=events.recover,
+                              on_degraded=events.degraded, on_restored=events.restored)
+    monitor.watch('relays', 30)
+    monitor.watch('files', 300)
+    watchdog.open()
+    return monitor, watchdog
+
+
+def run(monitor, clock, name, seconds):
+    monitor.task_started(name)
+    clock.advance(seconds)
+    monitor.task_finished(name)
+
+
+def test_watchdog_is_fed_while_tasks_meet_their_deadlines():
+    clock = VirtualClock(start=START)
+    events = Events()
+    monitor, watchdog = make_monitor(clock, events)
+    for _ in range(10):
+        run(monitor, clock, 'relays', 1)
+        assert monitor.poll()
+        clock.advance(9)
+
+    assert watchdog.feeds == 10 and watchdog.resets == 0
+    assert events.calls == []
+
+
+def test_stuck_critical_task_starves_the_watchdog_until_it_recovers():
+    clock = VirtualClock(start=START)
+    events = Events()
+    monitor, watchdog = make_monitor(clock, events)
+
+    monitor.task_started('relays')
+    clock.advance(6)
+    assert not monitor.poll()
+    clock.advance(10)
+    assert not monitor.poll()
+    assert watchdog.feeds == 0 and watchdog.expired
+    assert [call[0] for call in events.calls] == ['overrun']
+    assert 'relays running for 6.0s' in events.calls[0][1]
+
+    monitor.task_finished('relays')
+    assert monitor.poll()
+    assert [call[0] for call in events.calls] == ['overrun', 'recover']
+    # A real watchdog would have reset the system during the stall
+    assert watchdog.resets == 1
+    assert monitor.status()['tasks']['relays']['overruns'] == 1
+
+
+def test_task_that_stops_being_scheduled_overruns():
+    clock = VirtualClock(start=START)
+    events = Events()
+    monitor, watchdog = make_monitor(clock, events)
+    run(monitor, clock, 'relays', 1)
+    clock.advance(34)
+    assert monitor.poll()
+    clock.advance(2)
+    assert not monitor.poll()
+    assert 'relays not started for 37.0s' in events.calls[0][1]
+
+
+def test_housekeeping_overruns_only_degrade():
+    clock = VirtualClock(start=START)
+    events = Events()
+    monitor, watchdog = make_monitor(clock, events)
+
+    monitor.task_started('files')
+    for _ in range(8):
+        clock.advance(10)
+        run(monitor, clock, 'relays', 1)
+        assert monitor.poll()
+    monitor.task_finished('files')
+    assert monitor.poll()
+
+    assert [call[0] for call in events.calls] == ['degraded', 'restored']
+    assert monitor.healthy and watchdog.feeds == 9
+    assert monitor.status()['lagging'] == []
+
+
+def test_make_watchdog_follows_the_setting():
+    assert make_watchdog('') is None
+    assert isinstance(make_watchdog('simulated'), SimulatedWatchdog)
+
+
+def test_overrun_holds_relays_in_failsafe_until_control_resumes(influx):
+    clock = VirtualClock(start=START)
+    watchdog = SimulatedWatchdog(timeout=15, clock=clock)
+    controller = VivController(simulate=True, clock=clock, influx_client=influx,
+                               live_state=False, dashboard=False, watchdog=watchdog)
+    try:
+        controller.tick(clock.now())
+        relays = controller.relay_manager
+        assert relays.device_status['lamp']
+
+        # The control loop stops ticking; the monitor notices and forces every relay off
+        clock.advance(60)
+        assert not controller.monitor.poll()
+        assert not any(relays.device_status.values())
+        feeds = watchdog.feeds
+        assert not controller.monitor.poll()
+        assert watchdog.feeds == feeds
+
+        controller.tick(clock.now())
+        assert controller.monitor.poll()
+        controller.tick(clock.now())
+        assert relays.device_status['lamp']
+        assert watchdog.feeds == feeds + 1
+    finally:
+        controller.sensor_pool.shutdown(wait=False)